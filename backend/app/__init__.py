@@ -1,27 +1,81 @@
 from flask import Flask
+import logging
+import os
 from flask_cors import CORS
 from .models.user_profile import db
+from .models.workout_plan import WorkoutPlan
+from .models.latest_workout_plan import LatestWorkoutPlan
+from .models.generation_job import GenerationJob
+from .models.workout_plan_template import WorkoutPlanTemplate
+from .models.batch_run import BatchRun, BatchRunItem
+from .models.profile_change import ProfileChange
+from .models.exercise_library import ExerciseLibraryEntry
+from .models.exercise_alias import ExerciseAlias
+from .models.plan_data_dictionary import PlanDataDictionary
 from .routes.api import api
+from .utils.job_queue import job_queue
+from .utils import llm_registry, database, metrics, tracing, plan_codec
+from .utils.logging_setup import configure_logging
+from .cli import register_commands
 
-def create_app():
+logger = logging.getLogger(__name__)
+
+def create_app(test_config=None):
     app = Flask(__name__)
     CORS(app)
 
-    # Configure SQLAlchemy - use app.root_path to ensure correct path
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{app.root_path}/instance/fitness.db"
-    # No need to use environment variable 
-
-    print(f"SQLALCHEMY_DATABASE_URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    # Configure SQLAlchemy from DATABASE_URL, defaulting to SQLite under app.root_path
+    app.config.update(database.database_config(f"sqlite:///{app.root_path}/instance/fitness.db"))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # LLM backend: "vertex" or "fake" (deterministic local responses)
+    app.config['LLM_BACKEND'] = os.environ.get("LLM_BACKEND", "vertex")
+    app.config['FAKE_LLM_LATENCY_MS'] = float(os.environ.get("FAKE_LLM_LATENCY_MS", 0))
+
+    # Overrides for tests and benchmarks
+    if test_config:
+        app.config.update(test_config)
+
+    configure_logging(app.config.get('LOG_LEVEL'), app.config.get('LOG_FORMAT'))
+    logger.info("SQLALCHEMY_DATABASE_URI: %s", database.redact_uri(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', database.engine_options(app.config))
+
+    fake_llm_options = {}
+    if app.config['LLM_BACKEND'] == 'fake':
+        fake_llm_options['latency_seconds'] = app.config['FAKE_LLM_LATENCY_MS'] / 1000
+    llm_registry.set_backend(app.config['LLM_BACKEND'], **fake_llm_options)
+
     # Initialize extensions
     db.init_app(app)
+    if database.is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        with app.app_context():
+            database.configure_sqlite(db.engine, app.config)
 
     # Register blueprints
     app.register_blueprint(api, url_prefix='/api')
 
+    # Request latency, SQL timings and GET /metrics
+    metrics.init_app(app)
+
+    # Request and generation stage traces, and GET /debug/traces
+    tracing.init_app(app)
+
+    # Register CLI commands
+    register_commands(app)
+
     # Create database tables
     with app.app_context():
         db.create_all()
 
+    # Dictionary new plan data is compressed with
+    plan_codec.init_app(app)
+
+    # Start the background workout plan job queue
+    job_queue.init_app(app)
+
+    # Optionally create shared LLM clients before the first request. Off by
+    # default so workers start without importing the LLM SDKs.
+    if os.environ.get("LLM_WARMUP", "false").lower() in ("1", "true", "yes"):
+        llm_registry.warm_up()
+
     return app
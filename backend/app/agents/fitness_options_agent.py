@@ -1,34 +1,90 @@
 """
 Agent for generating personalized fitness options based on user age.
 """
-from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import asyncio
+import contextvars
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from langchain_google_vertexai import VertexAI
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
-from pydantic import ValidationError
+from pydantic import Field, ValidationError, create_model
 from ..models.fitness_options import FitnessOptions, FitnessGoal, EquipmentOption, WorkoutType, ExperienceLevel
+from ..utils.options_cache import options_cache, make_options_cache_key
+from ..utils.options_catalog import SELECTION_CATEGORIES, options_catalog
+from ..utils.options_rules import OPTIONS_MODE, OPTIONS_MODES, options_rules
+from ..utils.llm_registry import FITNESS_OPTIONS_MODEL_ID, get_chain, get_llm, get_parser
+from ..utils.output_repair import format_errors, repair_structured_output
+from ..utils.prompt_compiler import build_chain
+from ..utils.tracing import langchain_config, tracer, wrap
+import logging
 import os
-import json
+import threading
+import time
 
 load_dotenv()
 
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "your-default-project-id")
-print(f"Loaded PROJECT_ID: {PROJECT_ID}")
+logger = logging.getLogger(__name__)
+logger.debug("Loaded PROJECT_ID: %s", PROJECT_ID)
 
 LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1")
 
+MODEL_ID = FITNESS_OPTIONS_MODEL_ID
+
+# "catalog": serve the static catalog when the LLM fails or is slower than the timeout; "off": return the error
+OPTIONS_FALLBACK = os.environ.get("OPTIONS_FALLBACK", "catalog").lower()
+OPTIONS_LLM_TIMEOUT_SECONDS = float(os.environ.get("OPTIONS_LLM_TIMEOUT_SECONDS", 8))
+OPTIONS_LLM_WORKERS = int(os.environ.get("OPTIONS_LLM_WORKERS", 4))
+# Generations waiting for a free worker; when full, requests get the fallback right away
+OPTIONS_LLM_QUEUE_SIZE = int(os.environ.get("OPTIONS_LLM_QUEUE_SIZE", 16))
+# Rank fallback options for the user's age group (otherwise only by their selections)
+OPTIONS_FALLBACK_AGE_RANKING = os.environ.get("OPTIONS_FALLBACK_AGE_RANKING", "true").lower() in ("1", "true", "yes")
+
+# Category-specific field and text for previously selected options the LLM left out
+SELECTED_OPTION_NOTES = {
+    'fitness_goals': ('age_specific_notes', 'Previously selected goal'),
+    'equipment_options': ('safety_considerations', 'Review proper form and technique'),
+    'workout_types': ('intensity_recommendation', 'Maintain your comfortable intensity level'),
+    'experience_levels': ('progression_timeline', 'Continue with your current level'),
+}
+
+# Categories are re-prompted on their own when they fail validation
+OPTIONS_REPAIR_UNITS = ((str,),)
+
+# Single-category models for the category re-prompts, e.g. {'fitness_goals': [FitnessGoal, ...]}
+CATEGORY_MODELS = {
+    name: create_model(
+        ''.join(part.title() for part in name.split('_')),
+        **{name: (field.annotation, Field(..., description=field.description))}
+    )
+    for name, field in FitnessOptions.model_fields.items()
+}
+
+class _Generation:
+    """An options generation queued or running on the executor, shared by the requests for its cache key."""
+
+    def __init__(self):
+        self.future = Future()
+        self.started = threading.Event()
+        self.started_at = None
+
+    def result(self, timeout: float):
+        """
+        Wait for the generation, allowing it `timeout` seconds of running time:
+        time spent queued for a worker (bounded by OPTIONS_LLM_QUEUE_SIZE) is not counted.
+        """
+        arrived = time.monotonic()
+        self.started.wait()
+        deadline = max(self.started_at, arrived) + timeout
+        return self.future.result(timeout=max(0.0, deadline - time.monotonic()))
+
+
 class FitnessOptionsAgent:
     def __init__(self):
-        # Initialize Vertex AI
-        self.llm = VertexAI(model_name="gemini-2.0-flash-lite", location=LOCATION)
-        
-        # Create parser for structured output
-        self.parser = JsonOutputParser(pydantic_object=FitnessOptions)
+        # Shared parser from the LLM registry
+        self.parser = get_parser(FitnessOptions)
         
-        # Create prompt template
-        self.prompt_template = PromptTemplate(
-            template="""
+        # Prompt template; schema instructions are added by the prompt compiler
+        self.prompt_template = """
             Generate personalized fitness options for a {user_age} year old person.
             
             Current selections:
@@ -61,13 +117,75 @@ class FitnessOptionsAgent:
             
             Focus on safety, sustainability, and age-appropriate progression.
             {format_instructions}
-            """,
-            input_variables=["user_age", "user_selections_formatted"],
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
+            """
+
+        # Cache of final responses, keyed on age group and selections
+        self.cache = options_cache
+
+        # Runs LLM calls so get_options() can stop waiting after the timeout or return before they finish
+        self.executor = ThreadPoolExecutor(max_workers=OPTIONS_LLM_WORKERS, thread_name_prefix='options-llm')
+        # Cache keys with a hybrid-mode refinement queued or running
+        self._refining = set()
+        self._refining_lock = threading.Lock()
+        # LLM-mode generations by cache key, and how many are waiting for a worker
+        self._generations: Dict[Tuple, _Generation] = {}
+        self._queued = 0
+        self._generations_lock = threading.Lock()
+        # Async generations still running after aget_options() stopped waiting for them
+        self._background_tasks = set()
+
+    @property
+    def llm(self):
+        """Shared LLM client for the options model."""
+        return get_llm(MODEL_ID, LOCATION)
+
+    @property
+    def chain(self):
+        """Compiled chain returning the raw text, built once per model, location and LLM backend."""
+        return get_chain(
+            "fitness_options",
+            lambda llm: build_chain(
+                llm, "fitness_options", self.prompt_template, ["user_age", "user_selections_formatted"],
+                FitnessOptions,
+            ),
+            MODEL_ID,
+            LOCATION
         )
 
-        # Create the chain
-        self.chain = self.prompt_template | self.llm | self.parser
+    def _category_chain(self, category: str):
+        """Compiled chain that regenerates a single options category."""
+        def build(llm):
+            return build_chain(
+                llm, "fitness_options_category",
+                """
+            Generate the {category_name} for a {user_age} year old person.
+
+            Current selections:
+            {user_selections_formatted}
+
+            A previous attempt at this list was invalid:
+            {errors}
+
+            Each option needs a unique ID, a clear name, a detailed description, an icon name
+            (activity, heart-pulse, dumbbell, running, yoga, swimming, cycling, walking, stretching, meditation)
+            and a relevance score (1-10). Focus on safety and age-appropriate progression.
+            {format_instructions}
+            """,
+                ["category_name", "user_age", "user_selections_formatted", "errors"],
+                CATEGORY_MODELS[category], parse=True,
+            )
+
+        return get_chain(("fitness_options_category", category), build, MODEL_ID, LOCATION)
+
+    def _regenerate_category(self, user_age: int, formatted_selections: str, category: str, errors: List[Dict]):
+        """Re-prompt one invalid or missing category and return its options."""
+        response = self._category_chain(category).invoke({
+            "category_name": category.replace('_', ' '),
+            "user_age": user_age,
+            "user_selections_formatted": formatted_selections,
+            "errors": format_errors(errors) if errors else "- missing",
+        }, config=langchain_config('fitness_options.category_chain', MODEL_ID))
+        return response.get(category) if isinstance(response, dict) else response
 
     def _format_selections_for_prompt(self, selections: List[Dict]) -> str:
         """Format the user's selections into a readable string for the prompt."""
@@ -92,61 +210,45 @@ class FitnessOptionsAgent:
         if not user_selections:
             return generated_options
 
-        # Create maps for each category
-        category_maps = {
-            'goal': ('fitness_goals', FitnessGoal),
-            'equipment': ('equipment_options', EquipmentOption),
-            'workout': ('workout_types', WorkoutType),
-            'level': ('experience_levels', ExperienceLevel)
-        }
+        # Ids per category, so each selection is checked in O(1)
+        seen_ids = {key: set() for key in generated_options}
+        for category_key, category_options in generated_options.items():
+            unique_options = []
+            for option in category_options:
+                if option['id'] not in seen_ids[category_key]:
+                    seen_ids[category_key].add(option['id'])
+                    unique_options.append(option)
+            generated_options[category_key] = unique_options
 
         # Process each user selection
         for selection in user_selections:
-            selection_type = selection.get('type')
-            if selection_type not in category_maps:
+            category_key = SELECTION_CATEGORIES.get(selection.get('type'))
+            if category_key is None or selection['id'] in seen_ids[category_key]:
                 continue
 
-            category_key, model_class = category_maps[selection_type]
-            category_options = generated_options[category_key]
-            
-            # Check if the selection is already in the generated options
-            selection_exists = any(opt['id'] == selection['id'] for opt in category_options)
-            
-            if not selection_exists:
-                # Create a new option with the selected item
-                new_option = {
-                    'id': selection['id'],
-                    'name': selection['name'],
-                    'description': selection.get('description', 'Previously selected option'),
-                    'icon': selection.get('icon', 'activity'),
-                    'relevance_score': 10  # High relevance for selected items
-                }
-
-                # Add category-specific fields
-                if selection_type == 'goal':
-                    new_option['age_specific_notes'] = 'Previously selected goal'
-                elif selection_type == 'equipment':
-                    new_option['safety_considerations'] = 'Review proper form and technique'
-                elif selection_type == 'workout':
-                    new_option['intensity_recommendation'] = 'Maintain your comfortable intensity level'
-                elif selection_type == 'level':
-                    new_option['progression_timeline'] = 'Continue with your current level'
-
-                # Add the option to the appropriate category
-                generated_options[category_key].insert(0, new_option)
-
-        # Remove duplicates from each category while preserving order
-        for category_key in generated_options:
-            seen_ids = set()
-            unique_options = []
-            for option in generated_options[category_key]:
-                if option['id'] not in seen_ids:
-                    seen_ids.add(option['id'])
-                    unique_options.append(option)
-            generated_options[category_key] = unique_options
+            # Fill in catalog details for catalog options the wizard sent without them
+            catalog_option = options_catalog.get_selection(selection) or {}
+            note_field, note = SELECTED_OPTION_NOTES[category_key]
+            new_option = {
+                'id': selection['id'],
+                'name': selection['name'],
+                'description': selection.get('description', catalog_option.get('description', 'Previously selected option')),
+                'icon': selection.get('icon', catalog_option.get('icon', 'activity')),
+                'relevance_score': 10,  # High relevance for selected items
+                note_field: note
+            }
+
+            # Add the option to the appropriate category
+            generated_options[category_key].insert(0, new_option)
+            seen_ids[category_key].add(selection['id'])
 
         return generated_options
 
+    def _merge_selections(self, options: Dict, user_selections: List[Dict]) -> Dict:
+        """Add the user's selections to generated or ranked options, traced as options.merge_selections."""
+        with tracer.span('options.merge_selections', selections=len(user_selections)):
+            return self._ensure_selected_options_included(options, user_selections)
+
     def generate_personalized_options(self, user_age: int, user_selections: List[Dict] = None) -> Dict:
         """
         Generate personalized fitness options based on user's age and previous selections.
@@ -159,30 +261,292 @@ class FitnessOptionsAgent:
             Dict: Structured fitness options
         """
         user_selections = user_selections or []
-        formatted_selections = self._format_selections_for_prompt(user_selections)
-        
+
+        with tracer.span('fitness_options.generate', age=user_age, selections=len(user_selections)) as span:
+            cache_key = make_options_cache_key(user_age, user_selections)
+            cached = self.cache.get(cache_key)
+            if span is not None:
+                span.set_attribute('cache.hit', cached is not None)
+            if cached is not None:
+                return cached
+
+            return self._generate_options(user_age, user_selections, cache_key)
+
+    def get_options(self, user_age: int, user_selections: List[Dict] = None, mode: Optional[str] = None) -> Tuple[Dict, str]:
+        """
+        Return personalized options in one of the OPTIONS_MODES.
+
+        - "llm": cached or LLM-generated options, falling back to the rules
+          engine when the LLM fails or takes longer than OPTIONS_LLM_TIMEOUT_SECONDS
+          (a generation that times out still fills the cache when it completes)
+        - "rules": the rules engine only
+        - "hybrid": cached LLM options if there are any, else the rules engine's
+          answer right away while the LLM refines it into the cache in the background
+
+        Args:
+            user_age: The age of the user
+            user_selections: List of previous user selections with their types
+            mode: One of OPTIONS_MODES; defaults to OPTIONS_MODE
+
+        Returns:
+            Tuple[Dict, str]: The options and their source: "cache", "llm", "rules" or "catalog"
+        """
+        user_selections = user_selections or []
+        mode = mode or OPTIONS_MODE
+        if mode not in OPTIONS_MODES:
+            raise ValueError(f"Unsupported options mode: {mode}")
+
+        with tracer.span('fitness_options.get', mode=mode, age=user_age, selections=len(user_selections)) as span:
+            options, source = self._get_options(user_age, user_selections, mode)
+            if span is not None:
+                span.set_attribute('options.source', source)
+            return options, source
+
+    def _get_options(self, user_age: int, user_selections: List[Dict], mode: str) -> Tuple[Dict, str]:
+        if mode == 'rules':
+            return self.rules_options(user_age, user_selections), 'rules'
+
+        cache_key = make_options_cache_key(user_age, user_selections)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached, 'cache'
+
+        if mode == 'hybrid':
+            self._refine_in_background(user_age, user_selections, cache_key)
+            return self.rules_options(user_age, user_selections), 'rules'
+
+        if OPTIONS_FALLBACK != 'catalog':
+            return self._generate_options(user_age, user_selections, cache_key), 'llm'
+
+        generation = self._start_generation(user_age, user_selections, cache_key)
+        if generation is None:
+            logger.warning("Fitness options generation queue is full, serving the static catalog")
+            return self.rules_options(user_age if OPTIONS_FALLBACK_AGE_RANKING else None, user_selections), 'catalog'
         try:
-            # Generate options using the chain
-            response = self.chain.invoke({
-                "user_age": user_age,
-                "user_selections_formatted": formatted_selections
-            })
+            return generation.result(OPTIONS_LLM_TIMEOUT_SECONDS), 'llm'
+        except FutureTimeoutError:
+            logger.warning("Fitness options generation exceeded %ss, serving the static catalog", OPTIONS_LLM_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning("Fitness options generation failed, serving the static catalog: %s", e)
+        return self.rules_options(user_age if OPTIONS_FALLBACK_AGE_RANKING else None, user_selections), 'catalog'
+
+    def _start_generation(self, user_age: int, user_selections: List[Dict], cache_key) -> Optional[_Generation]:
+        """
+        Queue an LLM generation for a cache key, or join the one already queued
+        or running for it. Returns None when OPTIONS_LLM_QUEUE_SIZE generations
+        are already waiting for a worker.
+        """
+        with self._generations_lock:
+            generation = self._generations.get(cache_key)
+            if generation is not None:
+                return generation
+            if self._queued >= OPTIONS_LLM_QUEUE_SIZE:
+                return None
+            generation = self._generations[cache_key] = _Generation()
+            self._queued += 1
+
+        # wrap() keeps the generation's spans in the caller's trace
+        generate = wrap(self._generate_options)
+
+        def run():
+            with self._generations_lock:
+                self._queued -= 1
+            generation.started_at = time.monotonic()
+            generation.started.set()
+            try:
+                result = generate(user_age, user_selections, cache_key)
+            except BaseException as e:
+                self._end_generation(cache_key)
+                generation.future.set_exception(e)
+            else:
+                self._end_generation(cache_key)
+                generation.future.set_result(result)
+
+        try:
+            self.executor.submit(run)
+        except RuntimeError as e:
+            # The executor has been shut down
+            with self._generations_lock:
+                self._queued -= 1
+            self._end_generation(cache_key)
+            generation.future.set_exception(e)
+            generation.started_at = time.monotonic()
+            generation.started.set()
+        return generation
+
+    def _end_generation(self, cache_key) -> None:
+        with self._generations_lock:
+            self._generations.pop(cache_key, None)
+
+    async def aget_options(self, user_age: int, user_selections: List[Dict] = None,
+                           mode: Optional[str] = None) -> Tuple[Dict, str]:
+        """
+        Like get_options, awaiting the LLM with chain.ainvoke instead of
+        blocking a thread on it. Hybrid refinements and generations that
+        outlive OPTIONS_LLM_TIMEOUT_SECONDS keep running as tasks on the loop.
+        """
+        user_selections = user_selections or []
+        mode = mode or OPTIONS_MODE
+        if mode not in OPTIONS_MODES:
+            raise ValueError(f"Unsupported options mode: {mode}")
+
+        with tracer.span('fitness_options.get', mode=mode, age=user_age, selections=len(user_selections),
+                         **{'async': True}) as span:
+            options, source = await self._aget_options(user_age, user_selections, mode)
+            if span is not None:
+                span.set_attribute('options.source', source)
+            return options, source
+
+    async def _aget_options(self, user_age: int, user_selections: List[Dict], mode: str) -> Tuple[Dict, str]:
+        if mode == 'rules':
+            return self.rules_options(user_age, user_selections), 'rules'
+
+        cache_key = make_options_cache_key(user_age, user_selections)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached, 'cache'
 
-            # Convert response to dict if it's a Pydantic model
-            if isinstance(response, FitnessOptions):
-                response = response.dict()
-            elif not isinstance(response, dict):
-                raise ValueError(f"Unexpected response type: {type(response)}")
+        if mode == 'hybrid':
+            self._arefine_in_background(user_age, user_selections, cache_key)
+            return self.rules_options(user_age, user_selections), 'rules'
+
+        if OPTIONS_FALLBACK != 'catalog':
+            return await self._agenerate_options(user_age, user_selections, cache_key), 'llm'
+
+        task = self._start_task(self._agenerate_options(user_age, user_selections, cache_key))
+        try:
+            # shield() lets a generation that times out still fill the cache
+            return await asyncio.wait_for(asyncio.shield(task), OPTIONS_LLM_TIMEOUT_SECONDS), 'llm'
+        except asyncio.TimeoutError:
+            logger.warning("Fitness options generation exceeded %ss, serving the static catalog", OPTIONS_LLM_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning("Fitness options generation failed, serving the static catalog: %s", e)
+        return self.rules_options(user_age if OPTIONS_FALLBACK_AGE_RANKING else None, user_selections), 'catalog'
+
+    def _start_task(self, coroutine, detached: bool = False) -> asyncio.Task:
+        """
+        Run a coroutine as a task, keeping a reference until it finishes.
+        A detached task starts from an empty context, so it is traced as its own root span.
+        """
+        if detached:
+            task = contextvars.Context().run(asyncio.ensure_future, coroutine)
+        else:
+            task = asyncio.ensure_future(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _arefine_in_background(self, user_age: int, user_selections: List[Dict], cache_key) -> None:
+        """Like _refine_in_background, as a task on the running loop."""
+        with self._refining_lock:
+            if cache_key in self._refining:
+                return
+            self._refining.add(cache_key)
+
+        async def refine():
+            try:
+                with tracer.span('fitness_options.refine', age=user_age):
+                    await self._agenerate_options(user_age, user_selections, cache_key)
+            except Exception as e:
+                logger.warning("Background refinement of fitness options failed: %s", e)
+            finally:
+                with self._refining_lock:
+                    self._refining.discard(cache_key)
+
+        # Traced as its own root span: it outlives the request that queued it
+        self._start_task(refine(), detached=True)
+
+    def rules_options(self, user_age: int, user_selections: List[Dict] = None) -> Dict:
+        """Options from the static catalog ranked by the rules engine, including the user's selections."""
+        with tracer.span('options.rules_rank'):
+            options = options_rules.rank(user_age, user_selections)
+        return self._merge_selections(options, user_selections or [])
+
+    def _refine_in_background(self, user_age: int, user_selections: List[Dict], cache_key) -> None:
+        """
+        Generate LLM options into the cache, at most once at a time per cache
+        key; skipped when OPTIONS_LLM_QUEUE_SIZE generations are already waiting.
+        """
+        with self._refining_lock:
+            if cache_key in self._refining:
+                return
+            self._refining.add(cache_key)
+        with self._generations_lock:
+            # Refinements share the bounded queue with LLM-mode generations
+            queue_full = self._queued >= OPTIONS_LLM_QUEUE_SIZE
+            if not queue_full:
+                self._queued += 1
+        if queue_full:
+            with self._refining_lock:
+                self._refining.discard(cache_key)
+            return
+
+        def refine():
+            with self._generations_lock:
+                self._queued -= 1
+            try:
+                # Traced as its own root span: it outlives the request that queued it
+                with tracer.span('fitness_options.refine', age=user_age):
+                    self._generate_options(user_age, user_selections, cache_key)
+            except Exception as e:
+                logger.warning("Background refinement of fitness options failed: %s", e)
+            finally:
+                with self._refining_lock:
+                    self._refining.discard(cache_key)
+
+        self.executor.submit(refine)
+
+    def _generate_options(self, user_age: int, user_selections: List[Dict], cache_key) -> Dict:
+        """Generate options with the LLM and cache them."""
+        formatted_selections = self._format_selections_for_prompt(user_selections)
+        start = time.perf_counter()
+        text = self.chain.invoke({
+            "user_age": user_age,
+            "user_selections_formatted": formatted_selections
+        }, config=langchain_config('fitness_options.chain', MODEL_ID))
+        return self._finish_options(text, user_age, user_selections, formatted_selections, cache_key,
+                                    time.perf_counter() - start)
+
+    async def _agenerate_options(self, user_age: int, user_selections: List[Dict], cache_key) -> Dict:
+        """
+        Like _generate_options, awaiting the LLM with chain.ainvoke. Category
+        re-prompts are rare and run synchronously in a worker thread.
+        """
+        formatted_selections = self._format_selections_for_prompt(user_selections)
+        start = time.perf_counter()
+        text = await self.chain.ainvoke({
+            "user_age": user_age,
+            "user_selections_formatted": formatted_selections
+        }, config=langchain_config('fitness_options.chain', MODEL_ID))
+        return await asyncio.to_thread(self._finish_options, text, user_age, user_selections, formatted_selections,
+                                       cache_key, time.perf_counter() - start)
+
+    def _finish_options(self, text: str, user_age: int, user_selections: List[Dict], formatted_selections: str,
+                        cache_key, generation_seconds: float) -> Dict:
+        """Validate and repair generated options, add the user's selections and cache them."""
+        try:
+            # Repair malformed output and re-prompt only invalid categories
+            response = repair_structured_output(
+                text, FitnessOptions,
+                units=OPTIONS_REPAIR_UNITS,
+                regenerate=lambda data, path, errors: self._regenerate_category(
+                    user_age, formatted_selections, path[0], errors
+                ),
+                generation_seconds=generation_seconds,
+            ).model_dump()
 
             # Ensure all selected options are included
-            response = self._ensure_selected_options_included(response, user_selections)
+            response = self._merge_selections(response, user_selections)
+            self.cache.set(cache_key, response)
             
-            print(f"Generated options: {json.dumps(response, indent=2)}")
+            logger.debug("Generated options", extra={
+                'age': user_age, 'option_counts': {key: len(value) for key, value in response.items()}
+            })
             return response
                 
         except ValidationError as e:
-            print(f"Validation error in fitness options: {str(e)}")
+            logger.warning("Validation error in fitness options: %s", e)
             raise
         except Exception as e:
-            print(f"Error generating fitness options: {str(e)}")
+            logger.warning("Error generating fitness options: %s", e)
             raise
@@ -1,4 +1,8 @@
 from ..models.user_profile import UserProfile, db
+from ..models.profile_change import ProfileChange
+
+# Profile fields whose changes are recorded for plan revisions
+TRACKED_FIELDS = ('name', 'age', 'fitness_goal', 'equipment', 'workout_types', 'experience_level')
 
 class FitnessProfileAgent:
     @staticmethod
@@ -21,7 +25,12 @@ class FitnessProfileAgent:
 
     @staticmethod
     def update_profile(profile_id, profile_data):
-        """Update an existing user fitness profile."""
+        """
+        Update an existing user fitness profile.
+
+        Fields whose value changed are recorded as ProfileChange rows, so the
+        latest workout plan can later be revised for just those changes.
+        """
         try:
             profile = UserProfile.query.filter_by(uuid=profile_id).first()
             if not profile:
@@ -36,6 +45,14 @@ class FitnessProfileAgent:
             for key, value in profile_data.items():
                 db_key = key_map.get(key, key)
                 if hasattr(profile, db_key):
+                    old_value = getattr(profile, db_key)
+                    if db_key in TRACKED_FIELDS and old_value != value:
+                        db.session.add(ProfileChange(
+                            user_profile_id=profile.id,
+                            field=db_key,
+                            old_value=old_value,
+                            new_value=value
+                        ))
                     setattr(profile, db_key, value)
 
             db.session.commit()
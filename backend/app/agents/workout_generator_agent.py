@@ -1,35 +1,178 @@
 from datetime import datetime, timedelta
 from ..models.workout_plan import WorkoutPlan, db
 from ..models.user_profile import UserProfile
-from ..utils.search import generate_structured_workout_plan
+from ..models.latest_workout_plan import LatestWorkoutPlan
+from ..models.profile_change import ProfileChange
+from ..utils.search import (
+    agenerate_structured_workout_plan, generate_structured_workout_plan, library_exercises,
+    stream_structured_workout_plan
+)
+from ..utils.plan_templates import plan_template_store
+from ..utils import plan_storage
+from ..utils.plan_storage import attach_plan_content
+from ..utils.plan_revision import revise_plan
+from ..utils.exercise_names import EXERCISE_NAMES_ENABLED, canonicalize_plan
+from ..utils.aio import run_in_app_context
+from ..utils.tracing import tracer
 import json
 
 class WorkoutGeneratorAgent:
     @staticmethod
     def generate_workout_plan(profile_id):
         """Generate a 3-week workout plan based on user profile."""
+        with tracer.span('workout_plan.agent', **{'profile.uuid': profile_id}):
+            with tracer.span('profile.load'):
+                profile = UserProfile.query.filter_by(uuid=profile_id).first()
+            if not profile:
+                raise ValueError("Profile not found")
+            # Profile changes saved from here on are not reflected in this plan
+            changes_through = ProfileChange.latest_id(profile.id) or 0
+
+            # Reuse the template for this profile's fingerprint, generating one on a miss
+            plan_data = plan_template_store.get_plan_data(profile, generate_structured_workout_plan)
+
+            return WorkoutGeneratorAgent._save_workout_plan(profile, plan_data, changes_through)
+
+    @staticmethod
+    async def agenerate_workout_plan(profile_id):
+        """
+        Like generate_workout_plan, for the async job runner: the LLM calls are
+        awaited and the database work runs on the aio thread pool, so the event
+        loop can hold many generations at once. Needs an app context.
+        """
+        with tracer.span('workout_plan.agent', **{'profile.uuid': profile_id, 'async': True}):
+            profile, changes_through, plan_data, candidates = await run_in_app_context(
+                WorkoutGeneratorAgent._load_generation_inputs, profile_id
+            )
+            if plan_data is None:
+                plan_data = await agenerate_structured_workout_plan(profile, candidates=candidates)
+                await run_in_app_context(WorkoutGeneratorAgent._store_template, profile, plan_data)
+            return await run_in_app_context(
+                WorkoutGeneratorAgent._save_workout_plan, profile, plan_data, changes_through
+            )
+
+    @staticmethod
+    def _load_generation_inputs(profile_id):
+        """
+        Load what agenerate_workout_plan needs from the database.
+
+        Returns:
+            Tuple: The profile (detached, so it can be used outside this app
+            context), the newest profile change id, the template plan data or
+            None on a miss, and the library candidates for a miss
+        """
+        with tracer.span('profile.load'):
+            profile = UserProfile.query.filter_by(uuid=profile_id).first()
+        if not profile:
+            raise ValueError("Profile not found")
+        changes_through = ProfileChange.latest_id(profile.id) or 0
+        with tracer.span('plan_template.lookup') as span:
+            plan_data = plan_template_store.lookup(profile)
+            if span is not None:
+                span.set_attribute('plan_template.hit', plan_data is not None)
+        candidates = library_exercises(profile) if plan_data is None else []
+        db.session.refresh(profile)
+        db.session.expunge(profile)
+        return profile, changes_through, plan_data, candidates
+
+    @staticmethod
+    def _store_template(profile, plan_data):
+        with tracer.span('plan_template.store'):
+            plan_template_store.store(profile, plan_data)
+
+    @staticmethod
+    def stream_workout_plan(profile_id):
+        """
+        Generate a 3-week workout plan, yielding days and weeks as they are generated.
+
+        Yields ('day', ...) and ('week', ...) events while the plan is streamed and a
+        final ('complete', plan) event once the whole plan has been saved.
+        """
         profile = UserProfile.query.filter_by(uuid=profile_id).first()
         if not profile:
             raise ValueError("Profile not found")
+        changes_through = ProfileChange.latest_id(profile.id) or 0
+
+        plan_data = plan_template_store.lookup(profile)
+        if plan_data is not None:
+            for week_index, week in enumerate(plan_data.get('weeks', [])):
+                for day in week.get('days', []):
+                    yield 'day', {'week_index': week_index, 'day': day}
+                yield 'week', week
+            yield 'complete', WorkoutGeneratorAgent._save_workout_plan(profile, plan_data, changes_through)
+            return
+
+        for event, data in stream_structured_workout_plan(profile):
+            if event == 'plan':
+                plan_template_store.store(profile, data)
+                yield 'complete', WorkoutGeneratorAgent._save_workout_plan(profile, data, changes_through)
+            else:
+                yield event, data
+
+    @staticmethod
+    def revise_workout_plan(profile, base_plan, changes, changes_through=None):
+        """
+        Revise a profile's latest plan for equipment and workout type changes
+        and save the result as a new plan version.
 
-        # Use the new structured approach to generate a workout plan
-        plan_data = generate_structured_workout_plan(profile)
+        Only the affected days are re-prompted (see plan_revision.revise_plan);
+        the new version keeps the schedule of base_plan.
 
-        # Create and save the workout plan
-        start_date = datetime.utcnow()
+        Args:
+            profile: The updated UserProfile
+            base_plan: The WorkoutPlan to revise
+            changes: Net profile changes, {field: (old_value, new_value)}
+            changes_through: Id of the newest ProfileChange the revision covers
+
+        Returns:
+            Tuple[Dict, Dict]: The saved plan and a summary of what was regenerated
+        """
+        plan_data, summary = revise_plan(profile, base_plan.get_plan_data(), changes)
+        saved = WorkoutGeneratorAgent._save_workout_plan(
+            profile, plan_data, changes_through, start_date=base_plan.start_date
+        )
+        return saved, summary
+
+    @staticmethod
+    def build_workout_plan(profile_id, plan_data, start_date=None):
+        """Create an unsaved 3-week workout plan for a profile id, starting today unless start_date is given."""
+        start_date = start_date or datetime.utcnow()
         end_date = start_date + timedelta(weeks=3)
         
         workout_plan = WorkoutPlan(
-            user_profile_id=profile.id,
+            user_profile_id=profile_id,
             start_date=start_date,
-            end_date=end_date,
-            plan_data=plan_data
+            end_date=end_date
         )
+        attach_plan_content(workout_plan, plan_data)
+        return workout_plan
 
-        try:
-            db.session.add(workout_plan)
-            db.session.commit()
-            return workout_plan.to_dict()
-        except Exception as e:
-            db.session.rollback()
-            raise e
+    @staticmethod
+    def _save_workout_plan(profile, plan_data, changes_through=None, start_date=None):
+        """
+        Persist generated plan data as a new workout plan, starting today unless
+        start_date is given, and mark the profile changes up to changes_through
+        (all pending ones when None) as applied by it. Exercise names are
+        canonicalized first (see exercise_names.canonicalize_plan).
+        """
+        weeks = plan_data.get('weeks', [])
+        with tracer.span('plan.persist', storage=plan_storage.WORKOUT_PLAN_STORAGE, **{
+            'plan.weeks': len(weeks),
+            'plan.exercises': sum(len(day.get('exercises', [])) for week in weeks for day in week.get('days', [])),
+        }):
+            try:
+                if EXERCISE_NAMES_ENABLED:
+                    with tracer.span('plan.canonicalize_names') as span:
+                        plan_data, stats = canonicalize_plan(plan_data)
+                        if span is not None:
+                            span.set_attributes({f'names.{key}': value for key, value in stats.items()})
+                workout_plan = WorkoutGeneratorAgent.build_workout_plan(profile.id, plan_data, start_date)
+                db.session.add(workout_plan)
+                db.session.flush()
+                LatestWorkoutPlan.point_to(profile.id, workout_plan.id)
+                ProfileChange.mark_applied(profile.id, workout_plan.id, changes_through)
+                db.session.commit()
+                return workout_plan.to_dict()
+            except Exception as e:
+                db.session.rollback()
+                raise e
@@ -0,0 +1,173 @@
+"""
+Flask CLI commands for the fitness backend.
+
+Run with the app set, e.g. `flask --app run startup-report`.
+"""
+import json
+import time
+import click
+from flask.cli import AppGroup
+
+
+def register_commands(app):
+    """Register the backend's CLI commands on an app."""
+
+    @app.cli.command('startup-report')
+    @click.option('--top', default=15, show_default=True, help='Number of slowest packages to list.')
+    @click.option('--as-json', is_flag=True, help='Print the report as JSON.')
+    def startup_report(top, as_json):
+        """Measure create_app() cold start with an import-time breakdown."""
+        from .utils.startup_report import collect_startup_report, format_startup_report
+
+        report = collect_startup_report(top=top)
+        click.echo(json.dumps(report, indent=2) if as_json else format_startup_report(report))
+
+    profiles = AppGroup('profiles', help='Bulk import and export user profiles.')
+
+    @profiles.command('import')
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+                  help='Input format (default: from the file extension).')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Rows per INSERT and transaction.')
+    @click.option('--errors', 'errors_file', type=click.File('w'), help='Write per-row errors to this file as NDJSON.')
+    def import_profiles_command(source, fmt, chunk_size, errors_file):
+        """Import profiles from an NDJSON or CSV file ('-' for stdin)."""
+        from .utils.profile_bulk import detect_format, import_profiles, read_rows
+
+        fmt = fmt or detect_format(filename=source.name)
+        start = time.perf_counter()
+        result = import_profiles(read_rows(source, fmt), chunk_size=chunk_size, collect_uuids=False)
+        elapsed = time.perf_counter() - start
+
+        click.echo(f"Imported {result.imported} profiles in {elapsed:.1f}s "
+                   f"({result.imported / elapsed if elapsed else 0:.0f}/s), {result.failed} failed")
+        if errors_file:
+            for error in result.errors:
+                errors_file.write(json.dumps(error) + "\n")
+        elif result.errors:
+            for error in result.errors[:10]:
+                click.echo(f"  row {error['row']}: {error['error']}", err=True)
+            if result.failed > 10:
+                click.echo(f"  ... {result.failed - 10} more (use --errors FILE)", err=True)
+
+    @profiles.command('export')
+    @click.argument('destination', type=click.File('w', encoding='utf-8'), default='-')
+    @click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+                  help='Output format (default: from the file extension, else NDJSON).')
+    def export_profiles_command(destination, fmt):
+        """Export all profiles to an NDJSON or CSV file (default: stdout)."""
+        from .utils.profile_bulk import detect_format, export_profiles
+
+        fmt = fmt or detect_format(filename=destination.name)
+        for chunk in export_profiles(fmt):
+            destination.write(chunk)
+
+    app.cli.add_command(profiles)
+
+    plans = AppGroup('plans', help='Workout plan maintenance.')
+
+    @plans.command('batch')
+    @click.option('--uuids', 'uuids_file', type=click.File('r'), help='File with one profile uuid per line.')
+    @click.option('--fitness-goal', help='Only profiles with this fitness goal.')
+    @click.option('--experience-level', help='Only profiles with this experience level.')
+    @click.option('--resume', 'resume_id', help='Resume an interrupted batch run by id.')
+    @click.option('--concurrency', type=int, help='Concurrent generations (default: BATCH_MAX_CONCURRENCY).')
+    @click.option('--rpm', type=float, help='Generations per minute (default: BATCH_REQUESTS_PER_MINUTE).')
+    def batch_plans_command(uuids_file, fitness_goal, experience_level, resume_id, concurrency, rpm):
+        """Generate plans for a cohort of profiles (default: every profile)."""
+        from .utils.batch_generation import BatchGenerator, create_batch_run, format_progress
+
+        if resume_id:
+            run_id = resume_id
+        else:
+            profile_uuids = None
+            if uuids_file:
+                profile_uuids = [line.strip() for line in uuids_file if line.strip()]
+            filters = {key: value for key, value in
+                       (('fitness_goal', fitness_goal), ('experience_level', experience_level)) if value}
+            run, missing = create_batch_run(profile_uuids, filters)
+            run_id = run.id
+            click.echo(f"Batch run {run_id}: {run.total} profiles")
+            if missing:
+                click.echo(f"  {len(missing)} uuids not found, skipped", err=True)
+
+        last_report = [0.0]
+
+        def report(run):
+            # Print at most once a second, plus the final state
+            if run['status'] == 'running' and time.monotonic() - last_report[0] < 1:
+                return
+            last_report[0] = time.monotonic()
+            click.echo(format_progress(run))
+
+        options = {'progress': report}
+        if concurrency:
+            options['max_concurrency'] = concurrency
+        if rpm:
+            options['requests_per_minute'] = rpm
+        try:
+            BatchGenerator(**options).run(run_id)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    @plans.command('compress')
+    @click.option('--train', is_flag=True, help='Train a new compression dictionary from stored plans first.')
+    @click.option('--samples', default=1000, show_default=True, help='Most plans to train the dictionary on.')
+    @click.option('--batch-size', default=500, show_default=True, help='Plans per read and transaction.')
+    def compress_plans_command(train, samples, batch_size):
+        """Re-encode stored plan data with the current codec and dictionary."""
+        from .utils.plan_codec import compress_stored_plans
+
+        start = time.perf_counter()
+        stats = compress_stored_plans(batch_size=batch_size, train=train, samples=samples)
+        ratio = stats['bytes_before'] / stats['bytes_after'] if stats['bytes_after'] else 1.0
+        click.echo(f"Re-encoded {stats['recompressed']} of {stats['plans']} plans with {stats['codec']} "
+                   f"(dictionary {stats['dictionary']}) in {time.perf_counter() - start:.1f}s; "
+                   f"{stats['bytes_before']} -> {stats['bytes_after']} bytes ({ratio:.2f}x)")
+
+    app.cli.add_command(plans)
+
+    exercises = AppGroup('exercises', help='Local exercise library.')
+
+    @exercises.command('seed')
+    @click.option('--no-plans', is_flag=True, help='Only harvest the sample plan, not stored workout plans.')
+    def seed_exercises_command(no_plans):
+        """Harvest exercises from stored plans and workout_plan.json into the library."""
+        from .utils.exercise_library import seed_exercise_library
+
+        start = time.perf_counter()
+        stats = seed_exercise_library(include_stored_plans=not no_plans)
+        click.echo(f"Scanned {stats['plans']} plans in {time.perf_counter() - start:.1f}s: "
+                   f"{stats['exercises']} exercises, {stats['added']} added, {stats['updated']} updated, "
+                   f"{stats['total']} in the library")
+
+    @exercises.command('query')
+    @click.option('--equipment', multiple=True, help='Available equipment (repeatable; default: any).')
+    @click.option('--type', 'workout_types', multiple=True, help='Workout type (repeatable; default: all).')
+    @click.option('--level', help='Experience level.')
+    @click.option('--limit', default=20, show_default=True, help='Most exercises to list.')
+    def query_exercises_command(equipment, workout_types, level, limit):
+        """List library exercises matching equipment, workout types and level."""
+        from .utils.exercise_library import exercise_library
+
+        exercise_library.ensure_loaded()
+        matches = exercise_library.query(list(equipment) or None, list(workout_types), level, limit)
+        for entry in matches:
+            click.echo(f"{entry['id']}: {entry['name']} ({entry['type']}; "
+                       f"{', '.join(entry['equipment']) or 'no equipment'}; used {entry['usage_count']}x)")
+        click.echo(f"{len(matches)} of {len(exercise_library)} exercises")
+
+    @exercises.command('canonicalize')
+    @click.option('--batch-size', default=500, show_default=True, help='Plans per read and transaction.')
+    @click.option('--dry-run', is_flag=True, help='Report what would change without saving it.')
+    def canonicalize_exercises_command(batch_size, dry_run):
+        """Rewrite the exercise names of stored plans to their canonical names."""
+        from .utils.exercise_names import canonicalize_stored_plans
+
+        start = time.perf_counter()
+        stats = canonicalize_stored_plans(batch_size=batch_size, dry_run=dry_run)
+        click.echo(f"{'Would rename' if dry_run else 'Renamed'} {stats['exercises_renamed']} exercises in "
+                   f"{stats['plans_updated']} of {stats['plans']} plans in {time.perf_counter() - start:.1f}s; "
+                   f"distinct names {stats['names_before']} -> {stats['names_after']}")
+
+    app.cli.add_command(exercises)
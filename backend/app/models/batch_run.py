@@ -0,0 +1,61 @@
+from datetime import datetime
+from ..models.user_profile import db
+import uuid
+
+BATCH_PENDING = 'pending'
+BATCH_RUNNING = 'running'
+BATCH_DONE = 'done'
+BATCH_FAILED = 'failed'
+
+class BatchRun(db.Model):
+    """A batch of workout plan generations for a cohort of profiles, checkpointed per item."""
+    __tablename__ = 'batch_runs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = db.Column(db.String(20), nullable=False, default=BATCH_PENDING)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    llm_calls = db.Column(db.Integer, nullable=False, default=0)
+    plans_per_minute = db.Column(db.Float, nullable=True)
+    eta_seconds = db.Column(db.Float, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'completed': self.completed,
+            'failed': self.failed,
+            'remaining': self.total - self.completed - self.failed,
+            'llm_calls': self.llm_calls,
+            'plans_per_minute': self.plans_per_minute,
+            'eta_seconds': self.eta_seconds,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'updated_at': self.updated_at.isoformat()
+        }
+
+class BatchRunItem(db.Model):
+    """One profile of a batch run; pending items are what a resumed run still has to generate."""
+    __tablename__ = 'batch_run_items'
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'user_profile_id'),
+        db.Index('ix_batch_run_items_run_status_fingerprint', 'run_id', 'status', 'fingerprint'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.String(36), db.ForeignKey('batch_runs.id'), nullable=False)
+    user_profile_id = db.Column(db.Integer, db.ForeignKey('user_profiles.id'), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=BATCH_PENDING)
+    workout_plan_id = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,46 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from ..models.user_profile import db
+
+class ExerciseAlias(db.Model):
+    """
+    A normalized exercise name seen in generated plans and the canonical
+    exercise it was mapped to.
+
+    Canonical exercises are the exercise library entries plus the names that
+    first introduced a new exercise (their alias maps to themselves).
+    """
+    __tablename__ = 'exercise_aliases'
+
+    key = db.Column(db.String(200), primary_key=True)  # exercise_names.name_key() of the name
+    exercise_id = db.Column(db.String(100), nullable=False, index=True)  # Canonical exercise id
+    name = db.Column(db.String(200), nullable=False)  # Canonical exercise name
+    score = db.Column(db.Float, nullable=False, default=1.0)  # Similarity of the match, 1 for exact
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def record(key, exercise_id, name, score=1.0):
+        """
+        Save an alias unless another worker saved the same key first.
+
+        Runs inside the caller's transaction, so aliases are committed together
+        with the plan they were seen in.
+
+        Returns:
+            Tuple[str, str]: The canonical (exercise_id, name) stored for the key
+        """
+        try:
+            with db.session.begin_nested():
+                db.session.add(ExerciseAlias(key=key, exercise_id=exercise_id, name=name, score=score))
+        except IntegrityError:
+            existing = db.session.get(ExerciseAlias, key)
+            return existing.exercise_id, existing.name
+        return exercise_id, name
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'exercise_id': self.exercise_id,
+            'name': self.name,
+            'score': self.score
+        }
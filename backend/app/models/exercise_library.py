@@ -0,0 +1,39 @@
+from datetime import datetime
+from ..models.user_profile import db
+from ..models.types import JSONType
+
+class ExerciseLibraryEntry(db.Model):
+    """
+    An exercise of the local exercise library, harvested from generated plans.
+
+    Plans generated from the library reference exercises by id and are
+    hydrated with the name, type, instructions and equipment stored here.
+    """
+    __tablename__ = 'exercise_library'
+
+    id = db.Column(db.String(100), primary_key=True)  # Slug of the normalized name
+    name = db.Column(db.String(200), nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+    instructions = db.Column(db.Text, nullable=True)
+    equipment = db.Column(JSONType, nullable=False)  # Equipment needed, [] for none
+    experience_levels = db.Column(JSONType, nullable=False)  # Normalized levels it was planned for, [] for any
+    sets = db.Column(db.Integer, nullable=True)
+    reps = db.Column(db.String(50), nullable=True)
+    duration = db.Column(db.String(50), nullable=True)
+    usage_count = db.Column(db.Integer, nullable=False, default=0)  # Occurrences in the harvested plans
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'type': self.type,
+            'instructions': self.instructions,
+            'equipment': self.equipment,
+            'experience_levels': self.experience_levels,
+            'sets': self.sets,
+            'reps': self.reps,
+            'duration': self.duration,
+            'usage_count': self.usage_count
+        }
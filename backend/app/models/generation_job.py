@@ -0,0 +1,44 @@
+from datetime import datetime
+from ..models.user_profile import db
+import uuid
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'
+    __table_args__ = (
+        # At most one queued/running job per profile, so concurrent requests are deduplicated
+        db.Index(
+            'ix_generation_jobs_active_profile',
+            'profile_uuid',
+            unique=True,
+            sqlite_where=db.text("status IN ('queued', 'running')"),
+            postgresql_where=db.text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    profile_uuid = db.Column(db.String(36), db.ForeignKey('user_profiles.uuid'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=JOB_QUEUED, index=True)
+    workout_plan_id = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'profile_uuid': self.profile_uuid,
+            'status': self.status,
+            'workout_plan_id': self.workout_plan_id,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
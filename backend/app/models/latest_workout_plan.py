@@ -0,0 +1,35 @@
+from sqlalchemy.exc import IntegrityError
+from ..models.user_profile import db
+
+class LatestWorkoutPlan(db.Model):
+    """Pointer from a profile to its most recent workout plan, kept up to date on save."""
+    __tablename__ = 'latest_workout_plans'
+
+    user_profile_id = db.Column(db.Integer, db.ForeignKey('user_profiles.id'), primary_key=True)
+    workout_plan_id = db.Column(db.Integer, db.ForeignKey('workout_plans.id'), nullable=False)
+
+    @staticmethod
+    def point_to(user_profile_id, workout_plan_id):
+        """
+        Point a profile at workout_plan_id unless it already points at a newer plan.
+
+        Runs inside the caller's transaction, so the pointer is committed together
+        with the plan it refers to.
+        """
+        table = LatestWorkoutPlan.__table__
+        advance = (
+            table.update()
+            .where(table.c.user_profile_id == user_profile_id, table.c.workout_plan_id < workout_plan_id)
+            .values(workout_plan_id=workout_plan_id)
+        )
+        if db.session.execute(advance).rowcount:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(
+                    user_profile_id=user_profile_id,
+                    workout_plan_id=workout_plan_id
+                ))
+        except IntegrityError:
+            # Another plan for this profile was saved concurrently
+            db.session.execute(advance)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from ..models.user_profile import db
+
+class PlanDataDictionary(db.Model):
+    """
+    A dictionary workout plan data is compressed with (utils/plan_codec.py).
+
+    Encoded rows carry the id of their dictionary, so dictionaries are never
+    deleted while rows use them.
+    """
+    __tablename__ = 'plan_data_dictionaries'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)  # plan_codec.dictionary_id() of the data
+    codec = db.Column(db.String(10), nullable=False)  # Codec it was trained for, or 'builtin'
+    data = db.Column(db.LargeBinary, nullable=False)
+    samples = db.Column(db.Integer, nullable=False, default=0)  # Plans it was trained on
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': f"{self.id:#010x}",
+            'codec': self.codec,
+            'bytes': len(self.data),
+            'samples': self.samples,
+            'created_at': self.created_at.isoformat()
+        }
@@ -0,0 +1,81 @@
+from datetime import datetime
+from ..models.user_profile import db
+from ..models.types import JSONType
+
+class ProfileChange(db.Model):
+    """
+    A profile field changed by an update, kept until a workout plan reflects it.
+
+    workout_plan_id is set to the plan version (full or revised) that applied
+    the change; changes without one are pending.
+    """
+    __tablename__ = 'profile_changes'
+    __table_args__ = (
+        db.Index('ix_profile_changes_user_profile_id_workout_plan_id', 'user_profile_id', 'workout_plan_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_profile_id = db.Column(db.Integer, db.ForeignKey('user_profiles.id'), nullable=False)
+    field = db.Column(db.String(50), nullable=False)
+    old_value = db.Column(JSONType, nullable=True)
+    new_value = db.Column(JSONType, nullable=True)
+    workout_plan_id = db.Column(db.Integer, db.ForeignKey('workout_plans.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def pending(user_profile_id):
+        """Changes of a profile not yet applied to a plan, oldest first."""
+        return (
+            ProfileChange.query
+            .filter_by(user_profile_id=user_profile_id, workout_plan_id=None)
+            .order_by(ProfileChange.id)
+            .all()
+        )
+
+    @staticmethod
+    def net_changes(changes):
+        """
+        Collapse a sequence of changes into {field: (old_value, new_value)}.
+
+        Each field goes from its value before the first change to its value
+        after the last one; fields that ended up unchanged are left out.
+        """
+        net = {}
+        for change in changes:
+            old_value = net[change.field][0] if change.field in net else change.old_value
+            net[change.field] = (old_value, change.new_value)
+        return {field: values for field, values in net.items() if values[0] != values[1]}
+
+    @staticmethod
+    def latest_id(user_profile_id):
+        """Id of the newest change of a profile, or None."""
+        return (
+            db.session.query(db.func.max(ProfileChange.id))
+            .filter_by(user_profile_id=user_profile_id)
+            .scalar()
+        )
+
+    @staticmethod
+    def mark_applied(user_profile_id, workout_plan_id, through_id=None):
+        """
+        Attach the pending changes of a profile to the plan that applied them.
+
+        Runs inside the caller's transaction. With through_id, only changes up to
+        that id are marked, so a change saved while the plan was being generated
+        stays pending.
+        """
+        table = ProfileChange.__table__
+        conditions = [table.c.user_profile_id == user_profile_id, table.c.workout_plan_id.is_(None)]
+        if through_id is not None:
+            conditions.append(table.c.id <= through_id)
+        db.session.execute(table.update().where(*conditions).values(workout_plan_id=workout_plan_id))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'field': self.field,
+            'old_value': self.old_value,
+            'new_value': self.new_value,
+            'workout_plan_id': self.workout_plan_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,28 @@
+from sqlalchemy import JSON, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import TypeDecorator
+from ..utils import plan_codec
+
+# JSON on SQLite and other databases, binary JSONB on PostgreSQL
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
+
+class CompressedJSON(TypeDecorator):
+    """
+    A JSON document stored as compressed bytes (see utils/plan_codec.py).
+
+    Reads and writes plain Python values like JSON; values stored as JSON
+    text before compression are still read.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else plan_codec.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return plan_codec.decode(value)
+
+    def result_processor(self, dialect, coltype):
+        # Skip LargeBinary's bytes() conversion, which fails on legacy JSON text
+        return lambda value: self.process_result_value(value, dialect)
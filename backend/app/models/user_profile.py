@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
+from ..models.types import JSONType
 
 db = SQLAlchemy()
 
@@ -12,8 +13,8 @@ class UserProfile(db.Model):
     name = db.Column(db.String(100), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     fitness_goal = db.Column(db.String(50), nullable=False)
-    equipment = db.Column(db.JSON, nullable=False)  # Store as JSON array
-    workout_types = db.Column(db.JSON, nullable=False)  # Store as JSON array
+    equipment = db.Column(JSONType, nullable=False)  # Store as JSON array
+    workout_types = db.Column(JSONType, nullable=False)  # Store as JSON array
     experience_level = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -25,3 +25,41 @@ class WeeklyWorkout(BaseModel):
 class WorkoutPlanData(BaseModel):
     """Complete workout plan data structure"""
     weeks: List[WeeklyWorkout] = Field(description="List of weekly workouts in the plan")
+
+class WeekOutline(BaseModel):
+    """Outline of one week, used to generate each week of a plan independently"""
+    week_number: int = Field(description="Week number in the plan")
+    focus: str = Field(description="Main training focus of this week")
+    progression: str = Field(description="How volume or intensity changes compared to the previous week")
+    day_focuses: List[str] = Field(description="Focus of each workout day in this week, in order")
+
+class WorkoutPlanSkeleton(BaseModel):
+    """Compact outline of a workout plan, generated before the individual weeks"""
+    weeks: List[WeekOutline] = Field(description="Outline of each week in the plan")
+
+class DayRevision(BaseModel):
+    """Exercises that replace or are added to one day of an existing plan after a profile update"""
+    replacements: List[Exercise] = Field(description="One replacement per listed exercise, in the same order")
+    additions: List[Exercise] = Field(description="New exercises to append to the day")
+
+class ExerciseRef(BaseModel):
+    """An exercise of the local exercise library, referenced by id"""
+    id: str = Field(description="Id of the exercise in the exercise list")
+    sets: Optional[int] = Field(description="Number of sets to perform", default=None)
+    reps: Optional[str] = Field(description="Number of repetitions per set (e.g., '10-12', '15')", default=None)
+    duration: Optional[str] = Field(description="Duration of the exercise (for timed exercises)", default=None)
+
+class LibraryDailyWorkout(BaseModel):
+    """A daily workout whose exercises are library references"""
+    day_number: int = Field(description="Day number in the week")
+    focus: str = Field(description="Main focus of this workout (e.g., 'Upper Body', 'Cardio')")
+    exercises: List[ExerciseRef] = Field(description="Exercises for this day, by library id")
+
+class LibraryWeeklyWorkout(BaseModel):
+    """A week of daily workouts whose exercises are library references"""
+    week_number: int = Field(description="Week number in the plan")
+    days: List[LibraryDailyWorkout] = Field(description="List of daily workouts for this week")
+
+class LibraryWorkoutPlan(BaseModel):
+    """Workout plan referencing library exercises by id, hydrated into WorkoutPlanData"""
+    weeks: List[LibraryWeeklyWorkout] = Field(description="List of weekly workouts in the plan")
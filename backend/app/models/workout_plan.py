@@ -1,16 +1,33 @@
 from datetime import datetime
 from ..models.user_profile import db
+from ..models.workout_plan_detail import WorkoutPlanWeek
+from ..models.types import CompressedJSON
 
 class WorkoutPlan(db.Model):
     __tablename__ = 'workout_plans'
+    __table_args__ = (
+        # Covers the per-profile history lookup ordered by creation time
+        db.Index('ix_workout_plans_user_profile_id_created_at', 'user_profile_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_profile_id = db.Column(db.String(36), db.ForeignKey('user_profiles.uuid'), nullable=False)
+    user_profile_id = db.Column(db.Integer, db.ForeignKey('user_profiles.id'), nullable=False)
     start_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     end_date = db.Column(db.DateTime, nullable=False)
-    plan_data = db.Column(db.JSON, nullable=False)  # Store the complete 3-week plan
+    # The complete 3-week plan as one JSON document. Deferred so that queries which
+    # only need plan metadata or single weeks/days don't load it; NULL for plans
+    # saved in normalized storage mode, whose content lives in `weeks`. Stored
+    # compressed (utils/plan_codec.py).
+    plan_data = db.deferred(db.Column(CompressedJSON, nullable=True))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    weeks = db.relationship(WorkoutPlanWeek, order_by=WorkoutPlanWeek.position, cascade='all, delete-orphan')
+
+    def get_plan_data(self):
+        """Return the plan as WorkoutPlanData-shaped JSON, whichever way it is stored."""
+        if self.plan_data is not None:
+            return self.plan_data
+        return {'weeks': [week.to_dict() for week in self.weeks]}
 
     def to_dict(self):
         return {
@@ -18,7 +35,7 @@ class WorkoutPlan(db.Model):
             'user_profile_id': self.user_profile_id,
             'start_date': self.start_date.isoformat(),
             'end_date': self.end_date.isoformat(),
-            'plan_data': self.plan_data,
+            'plan_data': self.get_plan_data(),
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
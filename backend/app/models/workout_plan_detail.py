@@ -0,0 +1,69 @@
+from ..models.user_profile import db
+
+class WorkoutPlanWeek(db.Model):
+    """One week of a workout plan stored as rows (mirrors WeeklyWorkout)."""
+    __tablename__ = 'workout_plan_weeks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    workout_plan_id = db.Column(db.Integer, db.ForeignKey('workout_plans.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # Order of the week within the plan
+    week_number = db.Column(db.Integer, nullable=False)
+    days = db.relationship('WorkoutPlanDay', order_by='WorkoutPlanDay.position', lazy='selectin',
+                           cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'week_number': self.week_number,
+            'days': [day.to_dict() for day in self.days]
+        }
+
+class WorkoutPlanDay(db.Model):
+    """One workout day of a plan stored as rows (mirrors DailyWorkout)."""
+    __tablename__ = 'workout_plan_days'
+    __table_args__ = (
+        db.Index('ix_workout_plan_days_plan_day', 'workout_plan_id', 'plan_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    week_id = db.Column(db.Integer, db.ForeignKey('workout_plan_weeks.id'), nullable=False, index=True)
+    workout_plan_id = db.Column(db.Integer, db.ForeignKey('workout_plans.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # Order of the day within its week
+    plan_day = db.Column(db.Integer, nullable=False)  # 1-based day count across the whole plan
+    day_number = db.Column(db.Integer, nullable=False)
+    focus = db.Column(db.String(255), nullable=False)
+    plan = db.relationship('WorkoutPlan')
+    exercises = db.relationship('WorkoutPlanExercise', order_by='WorkoutPlanExercise.position', lazy='selectin',
+                                cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'day_number': self.day_number,
+            'focus': self.focus,
+            'exercises': [exercise.to_dict() for exercise in self.exercises]
+        }
+
+class WorkoutPlanExercise(db.Model):
+    """One exercise of a workout day stored as a row (mirrors Exercise)."""
+    __tablename__ = 'workout_plan_exercises'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day_id = db.Column(db.Integer, db.ForeignKey('workout_plan_days.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # Order of the exercise within its day
+    name = db.Column(db.String(255), nullable=False)
+    type = db.Column(db.String(255), nullable=False)
+    sets = db.Column(db.Integer, nullable=True)
+    reps = db.Column(db.String(255), nullable=True)
+    duration = db.Column(db.String(255), nullable=True)
+    instructions = db.Column(db.Text, nullable=True)
+    equipment = db.Column(db.JSON, nullable=False)  # Store as JSON array
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'type': self.type,
+            'sets': self.sets,
+            'reps': self.reps,
+            'duration': self.duration,
+            'instructions': self.instructions,
+            'equipment': self.equipment
+        }
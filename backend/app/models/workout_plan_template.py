@@ -0,0 +1,24 @@
+from datetime import datetime
+from ..models.user_profile import db
+
+class WorkoutPlanTemplate(db.Model):
+    """A generated plan shared by every profile with the same normalized fingerprint."""
+    __tablename__ = 'workout_plan_templates'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fingerprint = db.Column(db.String(64), unique=True, nullable=False)
+    profile_key = db.Column(db.JSON, nullable=False)  # Normalized profile fields that were hashed
+    plan_data = db.Column(db.JSON, nullable=False)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'fingerprint': self.fingerprint,
+            'profile_key': self.profile_key,
+            'hit_count': self.hit_count,
+            'created_at': self.created_at.isoformat(),
+            'last_used_at': self.last_used_at.isoformat()
+        }
@@ -70,3 +70,21 @@ Remember to:
 5. Emphasize proper form and technique
 
 Ensure all IDs are lowercase, use underscores instead of spaces, and are unique within their category.'''
+
+
+# Age groups referenced by the guidelines above, as (upper age bound, name).
+# The last group has no upper bound.
+AGE_GROUPS = [
+    (17, 'teens'),
+    (29, 'young adults'),
+    (49, 'adults'),
+    (64, 'mature adults'),
+    (None, 'seniors'),
+]
+
+def get_age_group(age: int) -> str:
+    """Return the age group name used in the prompt guidelines for an age."""
+    for upper_bound, group in AGE_GROUPS:
+        if upper_bound is None or age <= upper_bound:
+            return group
+    return AGE_GROUPS[-1][1]
@@ -1,17 +1,74 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, url_for, stream_with_context
 from pydantic import ValidationError
 from ..agents.fitness_profile_agent import FitnessProfileAgent
-from ..agents.workout_generator_agent import WorkoutGeneratorAgent
-from ..agents.fitness_options_agent import FitnessOptionsAgent
 from ..utils.fitness_options import get_fitness_options
+from ..utils.job_queue import job_queue
+from ..utils.lazy import LazyObject
+from ..utils.options_cache import options_cache
+from ..utils.options_catalog import STATIC_OPTIONS_MAX_AGE, options_catalog
+from ..utils.options_rules import OPTIONS_MODES
+from ..utils.plan_templates import plan_template_store
+from ..utils.plan_storage import get_plan_day, get_plan_week
+from ..utils.http_cache import conditional_get, make_etag
+from ..utils.profile_bulk import (
+    BULK_FORMATS, DEFAULT_CHUNK_SIZE, detect_format, export_profiles, import_profiles, read_rows
+)
+from ..models.user_profile import db
+import io
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 api = Blueprint('api', __name__)
 
-# Initialize agents
-fitness_options_agent = FitnessOptionsAgent()
+def _create_fitness_options_agent():
+    from ..agents.fitness_options_agent import FitnessOptionsAgent
+    return FitnessOptionsAgent()
+
+def _create_workout_generator():
+    from ..agents.workout_generator_agent import WorkoutGeneratorAgent
+    return WorkoutGeneratorAgent()
+
+# Initialize agents. The LLM-backed agents (and their SDK imports) are only
+# created when a request first needs them, so profile-only workers start fast.
+fitness_options_agent = LazyObject(_create_fitness_options_agent)
 fitness_profile_agent = FitnessProfileAgent()
-workout_generator = WorkoutGeneratorAgent()
+workout_generator = LazyObject(_create_workout_generator)
+
+def _profile_etag(profile_id=None, session_token=None):
+    """ETag of a profile from its id and updated_at, or None if it doesn't exist."""
+    from ..models.user_profile import UserProfile
+
+    version = (
+        db.session.query(UserProfile.id, UserProfile.updated_at)
+        .filter_by(uuid=str(profile_id or session_token))
+        .first()
+    )
+    return make_etag('profile', *version) if version else None
+
+def _latest_plan_etag(profile_id, **kwargs):
+    """ETag of a profile's latest workout plan, looked up without loading plan_data."""
+    from ..models.user_profile import UserProfile
+    from ..models.workout_plan import WorkoutPlan
+    from ..models.latest_workout_plan import LatestWorkoutPlan
+
+    version = (
+        db.session.query(WorkoutPlan.id, WorkoutPlan.updated_at)
+        .join(LatestWorkoutPlan, LatestWorkoutPlan.workout_plan_id == WorkoutPlan.id)
+        .join(UserProfile, UserProfile.id == LatestWorkoutPlan.user_profile_id)
+        .filter(UserProfile.uuid == str(profile_id))
+        .first()
+    )
+    if not version:
+        version = (
+            db.session.query(WorkoutPlan.id, WorkoutPlan.updated_at)
+            .join(UserProfile, UserProfile.id == WorkoutPlan.user_profile_id)
+            .filter(UserProfile.uuid == str(profile_id))
+            .order_by(WorkoutPlan.created_at.desc(), WorkoutPlan.id.desc())
+            .first()
+        )
+    return make_etag('workout_plan', *version) if version else None
 
 @api.route('/profiles', methods=['POST'])
 def create_profile():
@@ -22,7 +79,46 @@ def create_profile():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@api.route('/profiles/bulk', methods=['POST'])
+def bulk_import_profiles():
+    """
+    Import profiles from an NDJSON or CSV request body.
+
+    The format comes from the `format` query parameter or the Content-Type
+    (text/csv for CSV, NDJSON otherwise). Rows are inserted in chunks; invalid
+    rows are reported by row number without aborting the import.
+    """
+    try:
+        fmt = request.args.get('format') or detect_format(content_type=request.content_type)
+        if fmt not in BULK_FORMATS:
+            return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+        chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        result = import_profiles(read_rows(lines, fmt), chunk_size=max(1, chunk_size))
+        return jsonify(result.to_dict())
+    except Exception as e:
+        logger.exception("Error importing profiles: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/profiles/export', methods=['GET'])
+def export_profiles_route():
+    """
+    Stream every profile as NDJSON (default) or CSV (`?format=csv`).
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in BULK_FORMATS:
+        return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(export_profiles(fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=profiles.{fmt}'}
+    )
+
 @api.route('/profiles/<uuid:profile_id>', methods=['GET'])
+@conditional_get(_profile_etag)
 def get_profile(profile_id):
     try:
         profile = fitness_profile_agent.get_profile(str(profile_id))
@@ -45,31 +141,214 @@ def update_profile(profile_id):
 
 @api.route('/profiles/<uuid:profile_id>/workout-plan', methods=['POST'])
 def generate_workout_plan(profile_id):
+    """
+    Queue workout plan generation and return the job to poll.
+    """
     try:
-        workout_plan = workout_generator.generate_workout_plan(str(profile_id))
-        return jsonify(workout_plan), 201
-    except ValueError as e:
-        return jsonify({'error': str(e)}), 404
+        if not fitness_profile_agent.get_profile(str(profile_id)):
+            return jsonify({'error': 'Profile not found'}), 404
+
+        job, _ = job_queue.enqueue_workout_plan(str(profile_id))
+        response = jsonify(job)
+        response.headers['Location'] = url_for('api.get_job', job_id=job['id'])
+        return response, 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/profiles/<uuid:profile_id>/workout-plan/stream', methods=['GET'])
+def stream_workout_plan(profile_id):
+    """
+    Generate a workout plan and stream it as Server-Sent Events.
+
+    Emits a `day` event for each completed day, a `week` event for each completed
+    week, and a final `complete` event with the saved plan (or an `error` event).
+    """
+    if not fitness_profile_agent.get_profile(str(profile_id)):
+        return jsonify({'error': 'Profile not found'}), 404
+
+    def events():
+        try:
+            for event, data in workout_generator.stream_workout_plan(str(profile_id)):
+                yield _format_sse(event, data)
+        except Exception as e:
+            logger.exception("Error streaming workout plan: %s", e)
+            yield _format_sse('error', {'error': str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _format_sse(event, data):
+    """Format a Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api.route('/jobs/<uuid:job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Report the status of a workout plan generation job.
+    """
+    try:
+        job = job_queue.get_job(str(job_id))
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+def _get_latest_plan(profile, load_plan_data=False):
+    """
+    Return the profile's newest WorkoutPlan, or None.
+
+    Follows the latest-plan pointer and falls back to the indexed history scan
+    for plans saved before the pointer table existed. plan_data is only loaded
+    when load_plan_data is set.
+    """
+    from ..models.workout_plan import WorkoutPlan
+    from ..models.latest_workout_plan import LatestWorkoutPlan
+
+    options = [db.undefer(WorkoutPlan.plan_data)] if load_plan_data else []
+    plan = (
+        WorkoutPlan.query
+        .options(*options)
+        .join(LatestWorkoutPlan, LatestWorkoutPlan.workout_plan_id == WorkoutPlan.id)
+        .filter(LatestWorkoutPlan.user_profile_id == profile.id)
+        .first()
+    )
+    if not plan:
+        plan = (
+            WorkoutPlan.query
+            .options(*options)
+            .filter_by(user_profile_id=profile.id)
+            .order_by(WorkoutPlan.created_at.desc(), WorkoutPlan.id.desc())
+            .first()
+        )
+    return plan
+
 @api.route('/profiles/<uuid:profile_id>/workout-plan', methods=['GET'])
+@conditional_get(_latest_plan_etag)
 def get_latest_workout_plan(profile_id):
     try:
         from ..models.user_profile import UserProfile
-        from ..models.workout_plan import WorkoutPlan
 
         profile = UserProfile.query.filter_by(uuid=str(profile_id)).first()
         if not profile:
             return jsonify({'error': 'Profile not found'}), 404
 
-        plan = WorkoutPlan.query.filter_by(user_profile_id=profile.id).order_by(WorkoutPlan.created_at.desc()).first()
+        plan = _get_latest_plan(profile, load_plan_data=True)
         if not plan:
             return jsonify({'error': 'No workout plan found'}), 404
         return jsonify(plan.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@api.route('/profiles/<uuid:profile_id>/workout-plan/regenerate', methods=['POST'])
+def regenerate_workout_plan(profile_id):
+    """
+    Bring the profile's latest workout plan up to date with the profile changes
+    made since it was generated.
+
+    Equipment and workout type changes are applied incrementally: only the
+    affected exercises are regenerated, and the result is saved as a new plan
+    version (201). Age, fitness goal and experience level changes, or
+    `?mode=full`, queue a full plan like POST .../workout-plan (202). With no
+    relevant changes the latest plan is returned as is (200).
+    """
+    from ..models.user_profile import UserProfile
+    from ..models.profile_change import ProfileChange
+    from ..utils.plan_revision import REVISABLE_FIELDS, needs_full_regeneration
+
+    try:
+        mode = request.args.get('mode', 'incremental')
+        if mode not in ('incremental', 'full'):
+            return jsonify({'error': "mode must be one of: incremental, full"}), 400
+
+        profile = UserProfile.query.filter_by(uuid=str(profile_id)).first()
+        if not profile:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        plan = _get_latest_plan(profile, load_plan_data=True)
+        if not plan:
+            return jsonify({'error': 'No workout plan found'}), 404
+
+        changes_through = ProfileChange.latest_id(profile.id)
+        changes = ProfileChange.net_changes(ProfileChange.pending(profile.id))
+        changed_fields = sorted(changes)
+
+        if mode == 'full' or needs_full_regeneration(changes):
+            job, _ = job_queue.enqueue_workout_plan(str(profile_id))
+            response = jsonify({**job, 'mode': 'full', 'changed_fields': changed_fields})
+            response.headers['Location'] = url_for('api.get_job', job_id=job['id'])
+            return response, 202
+
+        if not any(field in REVISABLE_FIELDS for field in changes):
+            # Nothing that affects the exercises changed (e.g. only the name)
+            ProfileChange.mark_applied(profile.id, plan.id, changes_through)
+            db.session.commit()
+            return jsonify({'mode': 'unchanged', 'changed_fields': changed_fields, 'workout_plan': plan.to_dict()})
+
+        workout_plan, summary = workout_generator.revise_workout_plan(profile, plan, changes, changes_through)
+        return jsonify({
+            'mode': 'incremental',
+            'changed_fields': changed_fields,
+            'base_plan_id': plan.id,
+            'regenerated': summary,
+            'workout_plan': workout_plan
+        }), 201
+    except Exception as e:
+        logger.exception("Error regenerating workout plan: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/profiles/<uuid:profile_id>/workout-plan/weeks/<int:week_number>', methods=['GET'])
+@conditional_get(_latest_plan_etag)
+def get_workout_plan_week(profile_id, week_number):
+    """
+    Return one week of the profile's latest workout plan.
+    """
+    try:
+        from ..models.user_profile import UserProfile
+
+        profile = UserProfile.query.filter_by(uuid=str(profile_id)).first()
+        if not profile:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        plan = _get_latest_plan(profile)
+        if not plan:
+            return jsonify({'error': 'No workout plan found'}), 404
+
+        week = get_plan_week(plan, week_number)
+        if not week:
+            return jsonify({'error': 'Week not found'}), 404
+        return jsonify({'workout_plan_id': plan.id, **week})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/profiles/<uuid:profile_id>/workout-plan/days/<int:plan_day>', methods=['GET'])
+@conditional_get(_latest_plan_etag)
+def get_workout_plan_day(profile_id, plan_day):
+    """
+    Return one workout day of the profile's latest workout plan, counting days
+    across weeks from 1.
+    """
+    try:
+        from ..models.user_profile import UserProfile
+
+        profile = UserProfile.query.filter_by(uuid=str(profile_id)).first()
+        if not profile:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        plan = _get_latest_plan(profile)
+        if not plan:
+            return jsonify({'error': 'No workout plan found'}), 404
+
+        day = get_plan_day(plan, plan_day)
+        if not day:
+            return jsonify({'error': 'Day not found'}), 404
+        return jsonify({'workout_plan_id': plan.id, **day})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 
 @api.route('/profile', methods=['POST'])
 def create_user_profile():
@@ -95,12 +374,13 @@ def create_user_profile():
         return jsonify({'error': str(e)}), 500
 
 @api.route('/profile/<uuid:session_token>', methods=['GET'])
+@conditional_get(_profile_etag)
 def get_user_profile(session_token: str):
     """
     Retrieve user profile using session token.
     """
     try:
-        profile = fitness_profile_agent.get_profile(session_token)
+        profile = fitness_profile_agent.get_profile(str(session_token))
         if not profile:
             return jsonify({'error': 'Profile not found'}), 404
         return jsonify(profile)
@@ -114,7 +394,7 @@ def update_user_profile(session_token: str):
     """
     try:
         profile_data = request.get_json()
-        profile = fitness_profile_agent.update_profile(session_token, profile_data)
+        profile = fitness_profile_agent.update_profile(str(session_token), profile_data)
         if not profile:
             return jsonify({'error': 'Profile not found'}), 404
         return jsonify(profile)
@@ -126,32 +406,187 @@ def get_dynamic_fitness_options():
     """
     Returns personalized fitness options based on user's age and previous selections,
     sent via a POST request.
+
+    The optional `mode` (body or query string) picks "llm", "rules" or "hybrid";
+    the X-Options-Source header tells where the response came from.
     """
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'Invalid JSON body'}), 400
+        user_age, user_selections, mode = parse_options_request(request.get_json(silent=True), request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        user_age = data.get('age')
-        if not user_age:
-            return jsonify({'error': 'Age parameter is required'}), 400
-            
-        user_selections = data.get('selections', [])
-        
-        # Generate personalized options using the agent
-        options = fitness_options_agent.generate_personalized_options(user_age, user_selections)
-        return jsonify(options)
-        
-    except ValidationError as e:
+    try:
+        # Generate personalized options using the agent, the rules engine, or both
+        options, source = fitness_options_agent.get_options(user_age, user_selections, mode)
+        response = jsonify(options)
+        response.headers['X-Options-Source'] = source
+        return response
+    except Exception as e:
+        body, status = _options_error(e)
+        return jsonify(body), status
+
+async def get_dynamic_fitness_options_async(data, args):
+    """
+    POST /api/options served natively by the ASGI adapter (utils/asgi.py):
+    the LLM call is awaited, so waiting on it holds no thread.
+
+    Args:
+        data: The parsed JSON body
+        args: The query string arguments
+
+    Returns:
+        Tuple[Dict, int, Dict]: The JSON body, status code and headers
+    """
+    try:
+        user_age, user_selections, mode = parse_options_request(data, args)
+    except ValueError as e:
+        return {'error': str(e)}, 400, {}
+
+    try:
+        options, source = await fitness_options_agent.aget_options(user_age, user_selections, mode)
+        return options, 200, {'X-Options-Source': source}
+    except Exception as e:
+        body, status = _options_error(e)
+        return body, status, {}
+
+def parse_options_request(data, args):
+    """
+    Validate an /options request body and query string.
+
+    Returns:
+        Tuple: (age, selections, mode)
+
+    Raises:
+        ValueError: With the message of the 400 response
+    """
+    if not data:
+        raise ValueError('Invalid JSON body')
+
+    user_age = data.get('age')
+    if not user_age:
+        raise ValueError('Age parameter is required')
+
+    mode = data.get('mode') or args.get('mode')
+    if mode and mode not in OPTIONS_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(OPTIONS_MODES)}")
+    return user_age, data.get('selections', []), mode
+
+def _options_error(e):
+    """The 500 response body and status for an options generation error."""
+    if isinstance(e, ValidationError):
         # Handle Pydantic validation errors from the agent
-        return jsonify({
-            'error': 'Invalid data structure from AI model',
-            'details': str(e)
-        }), 500
+        return {'error': 'Invalid data structure from AI model', 'details': str(e)}, 500
+    logger.exception("Error in /options endpoint: %s", e)
+    return {'error': 'Failed to generate fitness options', 'details': str(e)}, 500
+
+# Routes the ASGI adapter serves natively, by (method, path)
+ASYNC_ROUTES = {
+    ('POST', '/api/options'): get_dynamic_fitness_options_async,
+}
+
+@api.route('/options/static', methods=['GET'])
+def get_static_fitness_options():
+    """
+    Returns the static fitness options catalog.
+
+    The payload is serialized and gzipped once at startup; clients that
+    accept gzip get the compressed bytes, and If-None-Match with the
+    catalog's ETag returns 304.
+    """
+    catalog = options_catalog
+    if request.if_none_match.contains_weak(catalog.etag):
+        response = Response(status=304)
+    elif 'gzip' in request.accept_encodings:
+        response = Response(catalog.gzip_bytes, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(catalog.json_bytes, mimetype='application/json')
+    response.set_etag(catalog.etag)
+    response.headers['Cache-Control'] = f"public, max-age={STATIC_OPTIONS_MAX_AGE}"
+    response.vary.add('Accept-Encoding')
+    return response
+
+@api.route('/options/cache/stats', methods=['GET'])
+def get_options_cache_stats():
+    """
+    Returns hit/miss counters for the fitness options response cache.
+    """
+    return jsonify(options_cache.stats())
+
+@api.route('/workout-plan-templates/stats', methods=['GET'])
+def get_workout_plan_template_stats():
+    """
+    Returns hit/miss counters and totals for the workout plan template store.
+    """
+    try:
+        return jsonify(plan_template_store.stats())
     except Exception as e:
-        # Handle other potential errors
-        print(f"Error in /options endpoint: {str(e)}")
-        return jsonify({
-            'error': 'Failed to generate fitness options',
-            'details': str(e)
-        }), 500
+        logger.exception("Error getting workout plan template stats: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/workout-plans/batch', methods=['POST'])
+def create_batch_workout_plans():
+    """
+    Start batch plan generation for `profile_uuids` or for every profile matching
+    `filter` ({"fitness_goal": ..., "experience_level": ...}; empty for all).
+    Returns the run to poll.
+    """
+    from ..utils.batch_generation import PROFILE_FILTERS, create_batch_run, start_batch_run
+
+    try:
+        data = request.get_json() or {}
+        profile_uuids = data.get('profile_uuids')
+        filters = data.get('filter') or {}
+        if profile_uuids is not None and (not isinstance(profile_uuids, list)
+                                          or not all(isinstance(item, str) for item in profile_uuids)):
+            return jsonify({'error': 'profile_uuids must be a list of strings'}), 400
+        unsupported = [field for field in filters if field not in PROFILE_FILTERS]
+        if unsupported:
+            return jsonify({'error': f"Unsupported filter: {', '.join(unsupported)}"}), 400
+
+        run, missing = create_batch_run(profile_uuids, filters)
+        start_batch_run(current_app._get_current_object(), run.id)
+        response = jsonify({**run.to_dict(), 'missing_profile_uuids': missing})
+        response.headers['Location'] = url_for('api.get_batch_workout_plans', run_id=run.id)
+        return response, 202
+    except Exception as e:
+        logger.exception("Error starting batch plan generation: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/workout-plans/batch/<uuid:run_id>', methods=['GET'])
+def get_batch_workout_plans(run_id):
+    """
+    Report progress, throughput (plans/minute) and ETA of a batch run.
+    """
+    from ..models.batch_run import BatchRun
+
+    try:
+        run = db.session.get(BatchRun, str(run_id))
+        if not run:
+            return jsonify({'error': 'Batch run not found'}), 404
+        return jsonify(run.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/workout-plans/batch/<uuid:run_id>/resume', methods=['POST'])
+def resume_batch_workout_plans(run_id):
+    """
+    Resume an interrupted batch run; only its pending profiles are generated.
+    """
+    from ..models.batch_run import BatchRun, BATCH_RUNNING
+    from ..utils.batch_generation import is_stale, start_batch_run
+
+    try:
+        run = db.session.get(BatchRun, str(run_id))
+        if not run:
+            return jsonify({'error': 'Batch run not found'}), 404
+        if run.status == BATCH_RUNNING and not is_stale(run):
+            return jsonify({'error': 'Batch run is already running'}), 409
+
+        start_batch_run(current_app._get_current_object(), run.id)
+        response = jsonify(run.to_dict())
+        response.headers['Location'] = url_for('api.get_batch_workout_plans', run_id=run.id)
+        return response, 202
+    except Exception as e:
+        logger.exception("Error resuming batch run: %s", e)
+        return jsonify({'error': str(e)}), 500
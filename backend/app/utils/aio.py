@@ -0,0 +1,104 @@
+"""
+Helpers for the async generation paths (see README "Async Serving").
+
+LLM calls are awaited on an event loop (chain.ainvoke), so a process can hold
+hundreds of generations in flight on one thread. Everything that touches the
+database is blocking, so it runs on a small thread pool instead, each call in
+a fresh app context (and therefore its own SQLAlchemy session):
+
+    profile = await run_in_app_context(load_profile, profile_uuid)
+
+EventLoopThread runs the loop that async jobs are submitted to from the
+synchronous parts of the app (the job queue and the ASGI adapter's startup).
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Coroutine, Optional
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Threads running database work for the event loop; keep below the connection pool size
+ASYNC_DB_WORKERS = int(os.environ.get("ASYNC_DB_WORKERS", 8))
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+_db_executor_lock = threading.Lock()
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(max_workers=ASYNC_DB_WORKERS, thread_name_prefix='async-db')
+    return _db_executor
+
+
+async def run_in_app_context(func: Callable, *args, app=None, **kwargs):
+    """
+    Run a blocking call on the database thread pool, in a new app context.
+
+    Tracing context is carried over, so spans opened by func nest under the
+    caller's.
+
+    Args:
+        func: The blocking function
+        app: The Flask app (default: current_app)
+    """
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+
+    def call():
+        with app.app_context():
+            return func(*args, **kwargs)
+
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), functools.partial(context.run, call))
+
+
+class EventLoopThread:
+    """An asyncio event loop running in a daemon thread, accepting coroutines from any thread."""
+
+    def __init__(self, name: str = 'event-loop'):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self.loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+        return self.loop
+
+    def submit(self, coroutine: Coroutine) -> Future:
+        """Schedule a coroutine on the loop, starting it first if needed."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.start())
+
+    def stop(self, wait: bool = True) -> None:
+        """Cancel running coroutines (when not waiting for them) and stop the loop."""
+        with self._lock:
+            loop, thread = self.loop, self._thread
+            self.loop = self._thread = None
+        if loop is None:
+            return
+
+        async def drain():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if not wait:
+                for task in tasks:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(drain(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
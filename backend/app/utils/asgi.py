@@ -0,0 +1,108 @@
+"""
+ASGI adapter for serving the API from an ASGI server:
+
+    uvicorn asgi:app --workers 2
+
+The routes in routes/api.py ASYNC_ROUTES (POST /api/options, the one route
+that waits on the LLM within the request) are served natively: their
+handlers await the LLM on the server's event loop, so a worker holds many
+of them in flight without a thread each. Every other request goes to the
+Flask app through asgiref's WsgiToAsgi, which streams responses as they are
+produced (so Server-Sent Events arrive as they are sent).
+
+Plan generation runs as background jobs; set WORKOUT_JOB_RUNNER=async to run
+them as coroutines too (see job_queue.py).
+"""
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+import asyncio
+import json
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+from .metrics import HTTP_REQUEST_DURATION
+from .tracing import tracer
+
+# handler(json_body, query_args) -> (json_body, status, headers)
+AsyncHandler = Callable[[Optional[Dict], Dict], Awaitable[Tuple[Dict, int, Dict]]]
+
+
+class AsgiApp:
+    """An ASGI application serving native async routes and delegating the rest to a Flask app."""
+
+    def __init__(self, flask_app, routes: Optional[Dict[Tuple[str, str], AsyncHandler]] = None):
+        self.flask_app = flask_app
+        self.routes = dict(routes or {})
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is not None:
+            await self._call_native(handler, scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        from .job_queue import job_queue
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.to_thread(job_queue.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _call_native(self, handler: AsyncHandler, scope, receive, send):
+        method, path = scope['method'], scope['path']
+        start = time.perf_counter()
+        with tracer.span(f"{method} {path}", **{
+            'http.method': method, 'http.route': path, 'http.target': path, 'asgi': True,
+        }) as span:
+            body = await _read_body(receive)
+            args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                data = None
+            with self.flask_app.app_context():
+                payload, status, headers = await handler(data, args)
+            if span is not None:
+                span.set_attribute('http.status_code', status)
+                if status >= 500:
+                    span.status = 'ERROR'
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=method, route=path, status=status)
+
+        content = json.dumps(payload).encode('utf-8')
+        response_headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(content)).encode('latin-1')),
+            # As flask-cors does for the Flask routes
+            (b'access-control-allow-origin', b'*'),
+        ] + [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def create_asgi_app(flask_app) -> AsgiApp:
+    """Wrap a Flask app created by create_app() with the API's native async routes."""
+    from ..routes.api import ASYNC_ROUTES
+
+    return AsgiApp(flask_app, ASYNC_ROUTES)
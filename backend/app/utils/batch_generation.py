@@ -0,0 +1,327 @@
+"""
+Batch workout plan generation for cohorts of profiles.
+
+A batch run snapshots its profiles into batch_run_items, grouped by the
+plan template fingerprint (see plan_templates.py), so profiles that would get
+the same plan share one generation. Generations run concurrently under an
+adaptive token-bucket rate limiter that backs off on quota errors. Plans are
+written in batched commits together with their items' status, which is the
+run's checkpoint: running a run again only generates what is still pending.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import bindparam
+
+from ..models.user_profile import UserProfile, db
+from ..models.batch_run import (
+    BatchRun, BatchRunItem, BATCH_PENDING, BATCH_RUNNING, BATCH_DONE, BATCH_FAILED
+)
+from ..models.latest_workout_plan import LatestWorkoutPlan
+from .plan_templates import plan_template_store, profile_fingerprint
+from .exercise_names import EXERCISE_NAMES_ENABLED, canonicalize_plan
+from .llm_registry import WORKOUT_PLAN_MODEL_ID
+from .metrics import LLM_RETRIES
+from .rate_limiter import AdaptiveRateLimiter, is_quota_error
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 8))
+BATCH_REQUESTS_PER_MINUTE = float(os.environ.get("BATCH_REQUESTS_PER_MINUTE", 60))
+BATCH_COMMIT_SIZE = int(os.environ.get("BATCH_COMMIT_SIZE", 200))
+BATCH_MAX_ATTEMPTS = int(os.environ.get("BATCH_MAX_ATTEMPTS", 5))
+# A run still marked running after this long is assumed dead and may be resumed
+BATCH_STALE_SECONDS = int(os.environ.get("BATCH_STALE_SECONDS", 10 * 60))
+
+# Profile filters accepted by create_batch_run
+PROFILE_FILTERS = ('fitness_goal', 'experience_level')
+
+_SELECT_CHUNK = 500
+
+
+def _profile_columns():
+    return (UserProfile.id, UserProfile.uuid, UserProfile.age, UserProfile.fitness_goal,
+            UserProfile.equipment, UserProfile.workout_types, UserProfile.experience_level)
+
+
+def _snapshot(row) -> SimpleNamespace:
+    """Detached copy of the profile fields plan generation reads, safe to use from worker threads."""
+    return SimpleNamespace(
+        id=row.id, uuid=row.uuid, name='', age=row.age, fitness_goal=row.fitness_goal,
+        equipment=list(row.equipment), workout_types=list(row.workout_types),
+        experience_level=row.experience_level
+    )
+
+
+def _select_profiles(profile_uuids: Optional[List[str]], filters: Optional[Dict]) -> Iterable:
+    if profile_uuids is not None:
+        for start in range(0, len(profile_uuids), _SELECT_CHUNK):
+            chunk = profile_uuids[start:start + _SELECT_CHUNK]
+            yield from db.session.execute(db.select(*_profile_columns()).where(UserProfile.uuid.in_(chunk)))
+        return
+
+    query = db.select(*_profile_columns()).order_by(UserProfile.id)
+    for field, value in (filters or {}).items():
+        if field not in PROFILE_FILTERS:
+            raise ValueError(f"Unsupported filter: {field}")
+        query = query.where(getattr(UserProfile, field) == value)
+    yield from db.session.execute(query.execution_options(yield_per=1000))
+
+
+def create_batch_run(profile_uuids: Optional[List[str]] = None, filters: Optional[Dict] = None) -> Tuple[BatchRun, List[str]]:
+    """
+    Create a batch run for a list of profile uuids or for every profile matching filters.
+
+    Args:
+        profile_uuids: Profiles to generate plans for; takes precedence over filters
+        filters: Equality filters on PROFILE_FILTERS fields (no filters: every profile)
+
+    Returns:
+        Tuple[BatchRun, List[str]]: The run and any requested uuids that don't exist
+    """
+    if profile_uuids is not None:
+        profile_uuids = list(dict.fromkeys(profile_uuids))
+
+    run = BatchRun(status=BATCH_PENDING)
+    db.session.add(run)
+    db.session.flush()
+
+    found = set()
+    items = []
+    for row in _select_profiles(profile_uuids, filters):
+        found.add(row.uuid)
+        items.append({'run_id': run.id, 'user_profile_id': row.id, 'fingerprint': profile_fingerprint(row),
+                      'status': BATCH_PENDING, 'updated_at': datetime.utcnow()})
+    for start in range(0, len(items), BATCH_COMMIT_SIZE * 5):
+        db.session.execute(BatchRunItem.__table__.insert(), items[start:start + BATCH_COMMIT_SIZE * 5])
+
+    run.total = len(items)
+    db.session.commit()
+    missing = [profile_uuid for profile_uuid in (profile_uuids or []) if profile_uuid not in found]
+    return run, missing
+
+
+def is_stale(run: BatchRun) -> bool:
+    """Whether a run marked running has stopped checkpointing (its worker died)."""
+    return run.updated_at is None or run.updated_at < datetime.utcnow() - timedelta(seconds=BATCH_STALE_SECONDS)
+
+
+def _default_generate(profile):
+    from .search import generate_structured_workout_plan
+    return generate_structured_workout_plan(profile)
+
+
+class BatchGenerator:
+    """
+    Generates the pending plans of a batch run.
+
+    Args:
+        max_concurrency: Generations running at the same time
+        requests_per_minute: Target generation rate for the token bucket
+        commit_size: Plans written per transaction
+        max_attempts: Attempts per generation when the provider returns quota errors
+        generate: Called with a profile to generate plan data (default: the LLM)
+        progress: Called with the run's to_dict() after every checkpoint
+    """
+
+    def __init__(self,
+                 max_concurrency: int = BATCH_MAX_CONCURRENCY,
+                 requests_per_minute: float = BATCH_REQUESTS_PER_MINUTE,
+                 commit_size: int = BATCH_COMMIT_SIZE,
+                 max_attempts: int = BATCH_MAX_ATTEMPTS,
+                 generate: Optional[Callable] = None,
+                 progress: Optional[Callable[[Dict], None]] = None,
+                 limiter: Optional[AdaptiveRateLimiter] = None):
+        self.max_concurrency = max_concurrency
+        self.commit_size = commit_size
+        self.max_attempts = max_attempts
+        self.generate = generate or _default_generate
+        self.progress = progress
+        self.limiter = limiter or AdaptiveRateLimiter(max_rate=requests_per_minute / 60)
+
+    def run(self, run_id: str) -> Dict:
+        """
+        Generate every pending item of a run, resuming where a previous attempt stopped.
+
+        Raises:
+            ValueError: If the run doesn't exist or is already running elsewhere
+        """
+        if not self._claim(run_id):
+            if not db.session.get(BatchRun, run_id):
+                raise ValueError("Batch run not found")
+            raise ValueError("Batch run is already running")
+
+        run = db.session.get(BatchRun, run_id)
+        self._session_started = time.monotonic()
+        self._session_completed = 0
+        try:
+            groups = self._pending_groups(run_id)
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='batch-plan') as executor:
+                futures = {}
+                for fingerprint, (representative, members) in groups.items():
+                    template = plan_template_store.lookup_template(representative)
+                    if template is not None:
+                        self._write_group(run, fingerprint, members, template)
+                    else:
+                        futures[executor.submit(self._generate_with_backoff, representative)] = fingerprint
+
+                for future in as_completed(futures):
+                    fingerprint = futures[future]
+                    representative, members = groups[fingerprint]
+                    try:
+                        plan_data = future.result()
+                    except Exception as e:
+                        logger.warning("Batch generation for %d profiles failed: %s", len(members), e,
+                                       extra={'run_id': run_id})
+                        self._fail_group(run, fingerprint, members, str(e))
+                        continue
+                    run.llm_calls += 1
+                    plan_template_store.store(representative, plan_data)
+                    self._write_group(run, fingerprint, members, plan_data)
+
+            run.status = BATCH_DONE
+            run.eta_seconds = 0.0
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Batch run failed", extra={'run_id': run_id})
+            run = db.session.get(BatchRun, run_id)
+            run.status = BATCH_FAILED
+            run.error = str(e)
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+        self._report(run)
+        return run.to_dict()
+
+    def _claim(self, run_id: str) -> bool:
+        """Atomically mark a run as running unless a live worker already owns it."""
+        stale_before = datetime.utcnow() - timedelta(seconds=BATCH_STALE_SECONDS)
+        now = datetime.utcnow()
+        result = db.session.execute(
+            db.update(BatchRun)
+            .where(BatchRun.id == run_id,
+                   db.or_(BatchRun.status != BATCH_RUNNING, BatchRun.updated_at < stale_before))
+            .values(status=BATCH_RUNNING, started_at=db.func.coalesce(BatchRun.started_at, now),
+                    finished_at=None, error=None, updated_at=now)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _pending_groups(self, run_id: str) -> "OrderedDict[str, Tuple[SimpleNamespace, List[SimpleNamespace]]]":
+        """Pending items grouped by fingerprint, with one representative profile per group."""
+        rows = db.session.execute(
+            db.select(BatchRunItem.fingerprint, *_profile_columns())
+            .join(UserProfile, UserProfile.id == BatchRunItem.user_profile_id)
+            .where(BatchRunItem.run_id == run_id, BatchRunItem.status == BATCH_PENDING)
+            .order_by(BatchRunItem.fingerprint, BatchRunItem.id)
+        )
+        groups = OrderedDict()
+        for row in rows:
+            profile = _snapshot(row)
+            if row.fingerprint not in groups:
+                groups[row.fingerprint] = (profile, [])
+            groups[row.fingerprint][1].append(profile)
+        return groups
+
+    def _generate_with_backoff(self, profile) -> Dict:
+        """Generate one plan under the rate limiter, backing off and retrying on quota errors."""
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire()
+            try:
+                plan_data = self.generate(profile)
+                self.limiter.on_success()
+                return plan_data
+            except Exception as e:
+                if not is_quota_error(e) or attempt == self.max_attempts - 1:
+                    raise
+                delay = self.limiter.on_quota_error(attempt)
+                LLM_RETRIES.inc(model=WORKOUT_PLAN_MODEL_ID, reason='quota')
+                logger.info("Quota error, retrying in %.1fs at %.1f req/min: %s", delay, self.limiter.rate * 60, e)
+                time.sleep(delay)
+
+    def _write_group(self, run: BatchRun, fingerprint: str, members: List, plan_data: Dict) -> None:
+        """Save a plan for every member of a group, one transaction per commit_size plans."""
+        from ..agents.workout_generator_agent import WorkoutGeneratorAgent
+
+        if EXERCISE_NAMES_ENABLED:
+            plan_data, _ = canonicalize_plan(plan_data)
+
+        table = BatchRunItem.__table__
+        mark_done = (
+            table.update()
+            .where(table.c.run_id == run.id, table.c.user_profile_id == bindparam('item_profile_id'))
+            .values(status=BATCH_DONE, workout_plan_id=bindparam('item_plan_id'), updated_at=bindparam('item_updated_at'))
+        )
+        for start in range(0, len(members), self.commit_size):
+            chunk = members[start:start + self.commit_size]
+            plans = [
+                WorkoutGeneratorAgent.build_workout_plan(member.id, plan_template_store.personalize(plan_data, member.uuid))
+                for member in chunk
+            ]
+            db.session.add_all(plans)
+            db.session.flush()
+            now = datetime.utcnow()
+            for member, plan in zip(chunk, plans):
+                LatestWorkoutPlan.point_to(member.id, plan.id)
+            db.session.execute(mark_done, [
+                {'item_profile_id': member.id, 'item_plan_id': plan.id, 'item_updated_at': now}
+                for member, plan in zip(chunk, plans)
+            ])
+            run.completed += len(chunk)
+            self._session_completed += len(chunk)
+            self._checkpoint(run)
+
+    def _fail_group(self, run: BatchRun, fingerprint: str, members: List, error: str) -> None:
+        db.session.execute(
+            db.update(BatchRunItem)
+            .where(BatchRunItem.run_id == run.id, BatchRunItem.fingerprint == fingerprint,
+                   BatchRunItem.status == BATCH_PENDING)
+            .values(status=BATCH_FAILED, error=error, updated_at=datetime.utcnow())
+        )
+        run.failed += len(members)
+        self._checkpoint(run)
+
+    def _checkpoint(self, run: BatchRun) -> None:
+        """Update throughput and ETA, commit, and report progress."""
+        elapsed = time.monotonic() - self._session_started
+        if elapsed > 0 and self._session_completed:
+            run.plans_per_minute = self._session_completed / elapsed * 60
+            remaining = run.total - run.completed - run.failed
+            run.eta_seconds = remaining / (run.plans_per_minute / 60)
+        run.updated_at = datetime.utcnow()
+        db.session.commit()
+        self._report(run)
+
+    def _report(self, run: BatchRun) -> None:
+        if self.progress:
+            self.progress(run.to_dict())
+
+
+def start_batch_run(app, run_id: str, **generator_options) -> threading.Thread:
+    """Run a batch in a background thread with its own app context."""
+    def target():
+        with app.app_context():
+            try:
+                BatchGenerator(**generator_options).run(run_id)
+            except ValueError as e:
+                logger.warning("Batch run not started: %s", e, extra={'run_id': run_id})
+
+    thread = threading.Thread(target=target, name=f'batch-run-{run_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def format_progress(run: Dict) -> str:
+    """One-line progress summary of a batch run."""
+    done = run['completed'] + run['failed']
+    percent = (done / run['total'] * 100) if run['total'] else 100.0
+    rate = f"{run['plans_per_minute']:.0f} plans/min" if run['plans_per_minute'] else "-- plans/min"
+    eta = f"ETA {timedelta(seconds=round(run['eta_seconds']))}" if run['eta_seconds'] is not None else "ETA --"
+    return (f"[{run['status']}] {done}/{run['total']} ({percent:.1f}%) "
+            f"{run['failed']} failed, {run['llm_calls']} generations, {rate}, {eta}")
@@ -0,0 +1,81 @@
+"""
+Database engine configuration.
+
+The database URL comes from DATABASE_URL (SQLite under app/instance by
+default). PostgreSQL and other server databases get a tuned connection pool;
+SQLite connections get WAL journaling, synchronous=NORMAL and a busy timeout
+so concurrent writers wait for the lock instead of failing with
+"database is locked".
+"""
+from typing import Dict
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def database_config(default_uri: str) -> Dict:
+    """Return the database settings for app.config, read from the environment."""
+    uri = os.environ.get("DATABASE_URL", default_uri)
+    # Some hosts still hand out the postgres:// scheme SQLAlchemy no longer accepts
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'DB_POOL_SIZE': int(os.environ.get("DB_POOL_SIZE", 10)),
+        'DB_MAX_OVERFLOW': int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        'DB_POOL_TIMEOUT': int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        'DB_POOL_RECYCLE': int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        'SQLITE_JOURNAL_MODE': os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        'SQLITE_SYNCHRONOUS': os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        'SQLITE_BUSY_TIMEOUT_MS': int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 30000)),
+    }
+
+
+def redact_uri(uri: str) -> str:
+    """Return the database URL with its password masked, for logging."""
+    return make_url(uri).render_as_string(hide_password=True)
+
+
+def is_sqlite(uri: str) -> bool:
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(config) -> Dict:
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    Args:
+        config: The app config (see database_config for the keys used)
+    """
+    if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        # The driver-level timeout is how long a connection waits for a lock
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def configure_sqlite(engine, config) -> None:
+    """Apply the SQLite pragmas from config to every new connection of engine."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+    ]
+    journal_mode = config['SQLITE_JOURNAL_MODE']
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # journal_mode is persistent and needs no lock when already set
+            if cursor.execute("PRAGMA journal_mode").fetchone()[0].lower() != journal_mode.lower():
+                cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,319 @@
+"""
+Local exercise library: harvested exercises with inverted indexes.
+
+Every generated plan used to have the LLM invent exercise names,
+instructions and equipment lists from scratch, which is most of a plan's
+output tokens. The library collects the exercises of stored plans and of
+backend/workout_plan.json (`flask --app run exercises seed`) into the
+exercise_library table, and ExerciseLibrary indexes them in memory by
+equipment, workout type and experience level so candidate exercises for a
+profile are found by set operations instead of a scan:
+
+- equipment: exercises whose equipment is all available (an exercise is a
+  candidate once every item it needs has been counted)
+- workout types and experience level: unions of the matching posting sets,
+  intersected with the equipment candidates; exercises without a recorded
+  level match every level
+
+With EXERCISE_LIBRARY_ENABLED, single-call plan generation lists the
+candidates in the prompt, the model answers with exercise ids plus sets and
+reps, and hydrate_plan() fills in the rest from the library (see search.py).
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from ..models.exercise_library import ExerciseLibraryEntry
+from ..models.user_profile import db
+
+logger = logging.getLogger(__name__)
+
+EXERCISE_LIBRARY_ENABLED = os.environ.get("EXERCISE_LIBRARY_ENABLED", "true").lower() in ("1", "true", "yes")
+# Fewest candidate exercises for a profile to generate its plan from the library
+EXERCISE_LIBRARY_MIN_CANDIDATES = int(os.environ.get("EXERCISE_LIBRARY_MIN_CANDIDATES", 12))
+# Most candidates listed in a prompt, by how often they were planned
+EXERCISE_LIBRARY_MAX_CANDIDATES = int(os.environ.get("EXERCISE_LIBRARY_MAX_CANDIDATES", 60))
+# Seconds before the in-memory index is reloaded, so other workers' seeds are picked up
+EXERCISE_LIBRARY_REFRESH_SECONDS = float(os.environ.get("EXERCISE_LIBRARY_REFRESH_SECONDS", 300))
+
+SAMPLE_PLAN_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'workout_plan.json')
+
+# Equipment names that mean no equipment is needed
+NO_EQUIPMENT = {'', 'none', 'no equipment', 'bodyweight', 'body weight'}
+_NON_SLUG = re.compile(r'[^a-z0-9]+')
+
+
+def _key(value) -> str:
+    return str(value).strip().lower()
+
+
+def exercise_id(name: str) -> str:
+    """Library id of an exercise name, e.g. "Dumbbell Rows" -> "dumbbell-rows"."""
+    return _NON_SLUG.sub('-', _key(name)).strip('-')
+
+
+def _equipment(values) -> List[str]:
+    equipment = []
+    for value in values or []:
+        value = str(value).strip()
+        if _key(value) not in NO_EQUIPMENT and value not in equipment:
+            equipment.append(value)
+    return equipment
+
+
+def harvest_exercises(plans: Iterable[Tuple[Dict, Optional[str]]]) -> Dict[str, Dict]:
+    """
+    Collect the distinct exercises of plans.
+
+    Args:
+        plans: (plan_data, experience_level) pairs; the level is None when unknown
+
+    Returns:
+        Dict[str, Dict]: Library entries by id. The first occurrence of an
+        exercise provides its details; levels and usage counts are merged.
+    """
+    entries: Dict[str, Dict] = {}
+    for plan_data, experience_level in plans:
+        for week in (plan_data or {}).get('weeks', []):
+            for day in week.get('days', []):
+                for exercise in day.get('exercises', []):
+                    if not exercise.get('name') or not exercise.get('type'):
+                        continue
+                    entry_id = exercise_id(exercise['name'])
+                    if not entry_id:
+                        continue
+                    entry = entries.get(entry_id)
+                    if entry is None:
+                        entry = entries[entry_id] = {
+                            'id': entry_id,
+                            'name': exercise['name'].strip(),
+                            'type': exercise['type'].strip(),
+                            'instructions': exercise.get('instructions'),
+                            'equipment': _equipment(exercise.get('equipment')),
+                            'experience_levels': [],
+                            'sets': exercise.get('sets'),
+                            'reps': exercise.get('reps'),
+                            'duration': exercise.get('duration'),
+                            'usage_count': 0,
+                        }
+                    entry['usage_count'] += 1
+                    if experience_level and _key(experience_level) not in entry['experience_levels']:
+                        entry['experience_levels'].append(_key(experience_level))
+    return entries
+
+
+def _stored_plans(batch_size: int = 500):
+    """Yield (plan_data, experience_level) of every stored workout plan."""
+    from ..models.user_profile import UserProfile
+    from ..models.workout_plan import WorkoutPlan
+
+    query = (
+        db.session.query(WorkoutPlan, UserProfile.experience_level)
+        .join(UserProfile, UserProfile.id == WorkoutPlan.user_profile_id)
+        .options(db.undefer(WorkoutPlan.plan_data))
+        .order_by(WorkoutPlan.id)
+    )
+    for plan, experience_level in query.yield_per(batch_size):
+        yield plan.get_plan_data(), experience_level
+
+
+def _sample_plans(path: str = SAMPLE_PLAN_PATH):
+    with open(path) as f:
+        yield json.load(f)['plan_data'], None
+
+
+def seed_exercise_library(include_stored_plans: bool = True, sample_path: Optional[str] = SAMPLE_PLAN_PATH) -> Dict:
+    """
+    Harvest exercises into the exercise_library table and reload the index.
+
+    Re-running is idempotent: usage counts are recomputed from the sources,
+    experience levels are merged with the stored ones, and the details of
+    existing entries are kept.
+
+    Returns:
+        Dict: Counts of plans scanned and entries added and updated
+    """
+    scanned = Counter()
+
+    def sources():
+        if sample_path:
+            for plan in _sample_plans(sample_path):
+                scanned['plans'] += 1
+                yield plan
+        if include_stored_plans:
+            for plan in _stored_plans():
+                scanned['plans'] += 1
+                yield plan
+
+    harvested = harvest_exercises(sources())
+    existing = {entry.id: entry for entry in ExerciseLibraryEntry.query.all()}
+    added = updated = 0
+    try:
+        for entry_id, fields in harvested.items():
+            entry = existing.get(entry_id)
+            if entry is None:
+                db.session.add(ExerciseLibraryEntry(**fields))
+                added += 1
+                continue
+            levels = list(entry.experience_levels or [])
+            levels += [level for level in fields['experience_levels'] if level not in levels]
+            if entry.usage_count != fields['usage_count'] or levels != entry.experience_levels:
+                entry.usage_count = fields['usage_count']
+                entry.experience_levels = levels
+                updated += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    exercise_library.load()
+    return {'plans': scanned['plans'], 'exercises': len(harvested), 'added': added, 'updated': updated,
+            'total': len(exercise_library)}
+
+
+class ExerciseLibrary:
+    """In-memory exercise library with inverted indexes on equipment, type and level."""
+
+    def __init__(self, entries: Iterable[Dict] = ()):
+        self._lock = threading.Lock()
+        self._source = None
+        self._loaded_at = 0.0
+        self._build(entries)
+
+    def _build(self, entries: Iterable[Dict]) -> None:
+        by_id: Dict[str, Dict] = {}
+        by_equipment: Dict[str, Set[str]] = {}
+        by_type: Dict[str, Set[str]] = {}
+        by_level: Dict[str, Set[str]] = {}
+        no_equipment: Set[str] = set()
+        any_level: Set[str] = set()
+        equipment_counts: Dict[str, int] = {}
+        for entry in entries:
+            by_id[entry['id']] = entry
+            equipment = {_key(item) for item in entry['equipment']}
+            equipment_counts[entry['id']] = len(equipment)
+            if not equipment:
+                no_equipment.add(entry['id'])
+            for item in equipment:
+                by_equipment.setdefault(item, set()).add(entry['id'])
+            by_type.setdefault(_key(entry['type']), set()).add(entry['id'])
+            levels = entry.get('experience_levels') or []
+            if not levels:
+                any_level.add(entry['id'])
+            for level in levels:
+                by_level.setdefault(_key(level), set()).add(entry['id'])
+        # Swap in the new indexes together so readers never see a partial build
+        (self.by_id, self.by_equipment, self.by_type, self.by_level, self.no_equipment, self.any_level,
+         self._equipment_counts) = (by_id, by_equipment, by_type, by_level, no_equipment, any_level,
+                                    equipment_counts)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def load(self) -> None:
+        """(Re)build the indexes from the exercise_library table; needs an app context."""
+        entries = [entry.to_dict() for entry in ExerciseLibraryEntry.query.all()]
+        with self._lock:
+            self._build(entries)
+            self._source = str(db.engine.url)
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self) -> None:
+        """Load the library on first use, for another database, or once it is older than the refresh interval."""
+        if (self._source != str(db.engine.url)
+                or time.monotonic() - self._loaded_at > EXERCISE_LIBRARY_REFRESH_SECONDS):
+            self.load()
+
+    def get(self, entry_id: str) -> Optional[Dict]:
+        """Return the exercise with this id, or None."""
+        return self.by_id.get(entry_id)
+
+    def query(self, equipment: Optional[Iterable[str]] = None, workout_types: Optional[Iterable[str]] = None,
+              experience_level: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Find exercises matching a profile.
+
+        Args:
+            equipment: Available equipment; only exercises needing nothing else
+                match. None matches any equipment
+            workout_types: Workout types to include; None or empty for all
+            experience_level: Level to match; exercises without levels match any
+            limit: Most results to return
+
+        Returns:
+            List[Dict]: Matching entries, most used first
+        """
+        if equipment is None:
+            matches = set(self.by_id)
+        else:
+            # Count the available items of each exercise; it matches when all of them are available
+            available = Counter()
+            for item in {_key(item) for item in equipment}:
+                available.update(self.by_equipment.get(item, ()))
+            matches = self.no_equipment | {
+                entry_id for entry_id, count in available.items() if count == self._equipment_counts[entry_id]
+            }
+        if workout_types:
+            matches &= set().union(*(self.by_type.get(_key(value), set()) for value in workout_types))
+        if experience_level:
+            matches &= self.by_level.get(_key(experience_level), set()) | self.any_level
+
+        results = sorted((self.by_id[entry_id] for entry_id in matches),
+                         key=lambda entry: (-entry.get('usage_count', 0), entry['name']))
+        return results[:limit] if limit is not None else results
+
+    def candidates(self, profile, limit: int = EXERCISE_LIBRARY_MAX_CANDIDATES) -> List[Dict]:
+        """
+        Exercises to offer for a profile's plan: its equipment, level and
+        workout types, widened to every workout type when too few match.
+        """
+        candidates = self.query(profile.equipment, profile.workout_types, profile.experience_level, limit)
+        if len(candidates) < EXERCISE_LIBRARY_MIN_CANDIDATES:
+            candidates = self.query(profile.equipment, None, profile.experience_level, limit)
+        return candidates
+
+
+def hydrate_exercise(reference: Dict, entry: Dict) -> Dict:
+    """Build an Exercise from a library entry and the sets, reps and duration the model chose."""
+    return {
+        'name': entry['name'],
+        'type': entry['type'],
+        'sets': reference.get('sets') if reference.get('sets') is not None else entry.get('sets'),
+        'reps': reference.get('reps') or entry.get('reps'),
+        'duration': reference.get('duration') or entry.get('duration'),
+        'instructions': entry.get('instructions'),
+        'equipment': list(entry['equipment']),
+    }
+
+
+def hydrate_plan(plan_data: Dict, library: 'ExerciseLibrary') -> Tuple[Dict, List[str]]:
+    """
+    Replace the exercise references of a LibraryWorkoutPlan with full exercises.
+
+    Returns:
+        Tuple[Dict, List[str]]: The WorkoutPlanData-shaped plan and the ids
+        that are not in the library (their exercises are dropped)
+    """
+    unknown = []
+    weeks = []
+    for week in plan_data.get('weeks', []):
+        days = []
+        for day in week.get('days', []):
+            exercises = []
+            for reference in day.get('exercises', []):
+                entry = library.get(reference.get('id'))
+                if entry is None:
+                    unknown.append(reference.get('id'))
+                    continue
+                exercises.append(hydrate_exercise(reference, entry))
+            days.append({'day_number': day['day_number'], 'focus': day['focus'], 'exercises': exercises})
+        weeks.append({'week_number': week['week_number'], 'days': days})
+    return {'weeks': weeks}, unknown
+
+
+exercise_library = ExerciseLibrary()
@@ -0,0 +1,434 @@
+"""
+Canonical exercise names for generated plans.
+
+The model names the same exercise in many ways ("DB Bench Press",
+"Dumbbell Bench Press", "dumbbell bench press (flat)"), which multiplies the
+distinct names stored in plans and splits anything keyed on them. Before a
+plan is saved, canonicalize_plan() maps every exercise name to a canonical
+exercise and rewrites it to the canonical name:
+
+1. Names are normalized to tokens: lower case, abbreviations expanded (db,
+   bb, kb, ...), plurals singularized and qualifiers such as "flat" or
+   "standard" dropped. Names with the same tokens, in any order or without
+   spaces ("Push-Ups", "pushups"), are the same exercise.
+2. Misspelled words are corrected to the closest word of the canonical
+   names through an inverted trigram index over that vocabulary, which stays
+   small however many names there are. Names that still have no exact match
+   are compared by the Jaccard similarity of their word trigrams (as in
+   PostgreSQL's pg_trgm), at least EXERCISE_NAME_MATCH_THRESHOLD, with the
+   canonical names sharing their rarest words. A lookup stays well under a
+   millisecond with tens of thousands of names.
+3. Names that match nothing become new canonical exercises.
+
+Canonical exercises are the exercise library entries (so ids are library
+ids) plus the names that introduced new exercises. Names that were not an
+exact match are saved as ExerciseAliases, so they are exact matches from then
+on, in every worker.
+`flask --app run exercises canonicalize` rewrites the names of stored plans.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional, Tuple
+import copy
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+from ..models.exercise_alias import ExerciseAlias
+from ..models.exercise_library import ExerciseLibraryEntry
+from ..models.user_profile import db
+from .exercise_library import EXERCISE_LIBRARY_REFRESH_SECONDS, exercise_id
+from .metrics import EXERCISE_NAME_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+EXERCISE_NAMES_ENABLED = os.environ.get("EXERCISE_NAMES_ENABLED", "true").lower() in ("1", "true", "yes")
+# Least trigram similarity (0-1) for a name to match a canonical exercise
+EXERCISE_NAME_MATCH_THRESHOLD = float(os.environ.get("EXERCISE_NAME_MATCH_THRESHOLD", 0.75))
+# Least trigram similarity for a misspelled word to be corrected to a known one
+TOKEN_MATCH_THRESHOLD = 0.4
+
+ABBREVIATIONS = {
+    'db': 'dumbbell', 'dbs': 'dumbbell',
+    'bb': 'barbell',
+    'kb': 'kettlebell', 'kbs': 'kettlebell',
+    'bw': 'bodyweight',
+    'rdl': 'romanian deadlift', 'rdls': 'romanian deadlift',
+    'ohp': 'overhead press',
+    'alt': 'alternating',
+    'ext': 'extension',
+}
+# Closed compounds written as two words elsewhere
+COMPOUND_WORDS = {
+    'pushup': 'push up', 'pushups': 'push up',
+    'pullup': 'pull up', 'pullups': 'pull up',
+    'situp': 'sit up', 'situps': 'sit up',
+    'chinup': 'chin up', 'chinups': 'chin up',
+}
+# Words that don't change which exercise a name refers to
+QUALIFIERS = {'a', 'an', 'the', 'with', 'on', 'of', 'flat', 'standard', 'basic', 'regular', 'classic',
+              'traditional', 'normal', 'simple', 'exercise'}
+_WORD = re.compile(r'[a-z0-9]+')
+_SPACES = re.compile(r'\s+')
+_ABBREVIATION = re.compile(r'\b(?:' + '|'.join(sorted(ABBREVIATIONS, key=len, reverse=True)) + r')\b', re.IGNORECASE)
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 2 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith(('sses', 'shes', 'ches', 'xes')):
+        return word[:-2]
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    return word[:-1] if word.endswith('s') else word
+
+
+def name_tokens(name: str) -> Tuple[str, ...]:
+    """Normalized words of an exercise name, e.g. "DB Bench Presses (flat)" -> ("dumbbell", "bench", "press")."""
+    tokens = []
+    for word in _WORD.findall(str(name).lower()):
+        for token in ABBREVIATIONS.get(word, COMPOUND_WORDS.get(word, word)).split():
+            token = _singular(token)
+            if token not in QUALIFIERS:
+                tokens.append(token)
+    return tuple(tokens)
+
+
+def display_name(name: str) -> str:
+    """Name for a new canonical exercise: abbreviations spelled out and whitespace collapsed."""
+    def expand(match):
+        word = match.group(0)
+        expansion = ABBREVIATIONS[word.lower()]
+        return expansion.title() if word[0].isupper() else expansion
+
+    return _SPACES.sub(' ', _ABBREVIATION.sub(expand, str(name))).strip()
+
+
+def name_key(name: str) -> str:
+    """Key of a name's normalized words, used for exact matches and as the ExerciseAlias key."""
+    return ' '.join(name_tokens(name))
+
+
+def _exact_keys(tokens: Tuple[str, ...]) -> Tuple[str, ...]:
+    # The words in order, in any order, and without spaces ("push up" / "pushup")
+    return ' '.join(tokens), ' '.join(sorted(tokens)), ''.join(tokens)
+
+
+def trigrams(tokens: Iterable[str]) -> FrozenSet[str]:
+    """Trigrams of each word padded with two spaces in front and one behind, as in pg_trgm."""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two trigram sets."""
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if a or b else 0.0
+
+
+class Canonical(NamedTuple):
+    """The canonical exercise for a name and how it was found: exact, fuzzy or new."""
+    exercise_id: str
+    name: str
+    match: str
+    score: float
+
+
+class ExerciseNameIndex:
+    """Canonical exercise names with exact keys and an inverted trigram index."""
+
+    def __init__(self, threshold: float = EXERCISE_NAME_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._source = None
+        self._loaded_at = 0.0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.names: Dict[str, str] = {}  # Canonical id -> name
+        self.keys: Dict[str, str] = {}  # Exact key -> canonical id
+        self.grams: Dict[str, FrozenSet[str]] = {}  # Canonical id -> trigrams of its name
+        self.token_ids: Dict[str, set] = {}  # Word -> canonical ids whose name has it
+        self.token_postings: Dict[str, set] = {}  # Trigram -> words of canonical names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, canonical_id: Optional[str] = None) -> str:
+        """Add a canonical exercise (id defaults to the slug of its normalized name) and return its id."""
+        tokens = name_tokens(name)
+        canonical_id = canonical_id or exercise_id(' '.join(tokens) or name)
+        with self._lock:
+            if canonical_id in self.names:
+                self.alias(name, canonical_id)
+                return canonical_id
+            self.names[canonical_id] = name
+            self.alias(name, canonical_id)
+            self.grams[canonical_id] = trigrams(tokens)
+            for token in tokens:
+                if token not in self.token_ids:
+                    for gram in trigrams((token,)):
+                        self.token_postings.setdefault(gram, set()).add(token)
+                self.token_ids.setdefault(token, set()).add(canonical_id)
+        return canonical_id
+
+    def alias(self, name_or_key: str, canonical_id: str) -> None:
+        """Make a name (or a name_key) an exact match for a canonical exercise."""
+        with self._lock:
+            for key in _exact_keys(name_tokens(name_or_key)):
+                if key:
+                    self.keys.setdefault(key, canonical_id)
+
+    def load(self) -> None:
+        """(Re)build the index from the exercise library and saved aliases; needs an app context."""
+        library = db.session.query(ExerciseLibraryEntry.id, ExerciseLibraryEntry.name).order_by(ExerciseLibraryEntry.id).all()
+        aliases = db.session.query(ExerciseAlias.key, ExerciseAlias.exercise_id, ExerciseAlias.name).order_by(
+            ExerciseAlias.created_at, ExerciseAlias.key).all()
+        with self._lock:
+            self._reset()
+            for entry_id, name in library:
+                self.add(name, entry_id)
+            for key, canonical_id, name in aliases:
+                if canonical_id not in self.names:
+                    self.add(name, canonical_id)
+                self.alias(key, canonical_id)
+            self._source = str(db.engine.url)
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self) -> None:
+        """Load the index on first use, for another database, or once it is older than the refresh interval."""
+        if (self._source != str(db.engine.url)
+                or time.monotonic() - self._loaded_at > EXERCISE_LIBRARY_REFRESH_SECONDS):
+            self.load()
+
+    def _correct(self, token: str) -> str:
+        """The word of the canonical names closest to token, for typos; token itself if none is close."""
+        if token in self.token_ids:
+            return token
+        grams = trigrams((token,))
+        candidates = set().union(*(self.token_postings.get(gram, set()) for gram in grams))
+        best, best_score = token, 0.0
+        for candidate in candidates:
+            # Misspellings rarely change the first letter
+            if candidate[0] != token[0]:
+                continue
+            score = similarity(grams, trigrams((candidate,)))
+            if score >= TOKEN_MATCH_THRESHOLD and (score, best) > (best_score, candidate):
+                best, best_score = candidate, score
+        return best
+
+    def match(self, name: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the canonical exercise for a name.
+
+        Words that are not in any canonical name are corrected to the closest
+        word that is (with the same first letter), by trigram similarity over
+        the (small) vocabulary. A corrected name with the words of a canonical
+        name matches it; otherwise it is compared with the canonical names
+        that share its rarest words.
+
+        Returns:
+            Optional[Tuple[str, float]]: The canonical id and trigram
+            similarity (1.0 for exact matches), or None when nothing reaches
+            the threshold
+        """
+        tokens = name_tokens(name)
+        if not tokens:
+            return None
+        for key in _exact_keys(tokens):
+            if key in self.keys:
+                return self.keys[key], 1.0
+
+        grams = trigrams(tokens)
+        corrected = tuple(self._correct(token) for token in tokens)
+        if corrected != tokens:
+            # Only misspelled: the same words as a canonical name once corrected
+            for key in _exact_keys(corrected):
+                candidate = self.keys.get(key)
+                if candidate is not None:
+                    return candidate, similarity(grams, self.grams[candidate])
+
+        # A close name shares most words: candidates have one of the rarest
+        # len - ceil(threshold * len) + 1 words, as with prefix filtering
+        known = sorted({token for token in corrected if token in self.token_ids},
+                       key=lambda token: len(self.token_ids[token]))
+        prefix = len(corrected) - math.ceil(self.threshold * len(corrected)) + 1
+        candidates = set().union(*(self.token_ids[token] for token in known[:prefix]))
+
+        best = None
+        for candidate in candidates:
+            other = self.grams[candidate]
+            # Sets of too different sizes can't reach the threshold
+            if not self.threshold * len(other) <= len(grams) <= len(other) / self.threshold:
+                continue
+            score = similarity(grams, other)
+            if score >= self.threshold and (best is None or (score, best[0]) > (best[1], candidate)):
+                best = (candidate, score)
+        return best
+
+    def canonicalize(self, name: str) -> Optional[Canonical]:
+        """Map a name to its canonical exercise, adding it as a new one when nothing matches."""
+        name = _SPACES.sub(' ', str(name)).strip()
+        if not name_tokens(name):
+            return None
+        found = self.match(name)
+        if found is None:
+            canonical_id = self.add(display_name(name))
+            return Canonical(canonical_id, self.names[canonical_id], 'new', 1.0)
+        canonical_id, score = found
+        if score < 1.0:
+            self.alias(name, canonical_id)
+        return Canonical(canonical_id, self.names[canonical_id], 'exact' if score == 1.0 else 'fuzzy', score)
+
+
+def _plan_exercises(plan_data: Dict) -> Iterable[Dict]:
+    for week in plan_data.get('weeks', []):
+        for day in week.get('days', []):
+            yield from day.get('exercises', [])
+
+
+def canonicalize_names(names: Iterable[str], index: Optional[ExerciseNameIndex] = None,
+                       persist: bool = True) -> Dict[str, Canonical]:
+    """
+    Canonicalize distinct exercise names.
+
+    Args:
+        names: Exercise names
+        index: Index to use (default: the shared one, loaded from the database)
+        persist: Save new aliases in the current transaction
+
+    Returns:
+        Dict[str, Canonical]: The canonical exercise of each name that has one
+    """
+    if index is None:
+        index = exercise_names
+        index.ensure_loaded()
+    canonical = {}
+    for name in dict.fromkeys(names):
+        result = index.canonicalize(name)
+        if result is None:
+            continue
+        EXERCISE_NAME_LOOKUPS.inc(match=result.match)
+        # Exact matches are library names or aliases that were saved when first seen
+        if persist and result.match != 'exact':
+            stored_id, stored_name = ExerciseAlias.record(name_key(name), result.exercise_id, result.name, result.score)
+            if stored_id != result.exercise_id:
+                # Another worker mapped this name first; follow it
+                logger.debug("Exercise name %r is already mapped to %s", name, stored_id)
+                index.alias(name, stored_id)
+                result = Canonical(stored_id, stored_name, result.match, result.score)
+        canonical[name] = result
+    return canonical
+
+
+def canonicalize_plan(plan_data: Dict, index: Optional[ExerciseNameIndex] = None,
+                      persist: bool = True) -> Tuple[Dict, Dict]:
+    """
+    Rewrite the exercise names of a plan to their canonical names.
+
+    Returns:
+        Tuple[Dict, Dict]: A canonicalized copy of the plan and counts of its
+        exercises, renamed exercises and exact, fuzzy and new matches
+    """
+    plan = copy.deepcopy(plan_data)
+    exercises = list(_plan_exercises(plan))
+    canonical = canonicalize_names((exercise['name'] for exercise in exercises), index, persist)
+    stats = Counter({'exercises': len(exercises), 'renamed': 0})
+    for exercise in exercises:
+        result = canonical.get(exercise['name'])
+        if result is None:
+            continue
+        stats[result.match] += 1
+        if exercise['name'] != result.name:
+            exercise['name'] = result.name
+            stats['renamed'] += 1
+    return plan, dict(stats)
+
+
+def canonicalize_stored_plans(batch_size: int = 500, dry_run: bool = False) -> Dict:
+    """
+    Rewrite the exercise names of every stored workout plan, in both storage modes.
+
+    JSON plans are read and updated batch_size at a time by id, one
+    transaction per batch; normalized plans are updated with one UPDATE per
+    distinct name that changes. Every rewritten plan gets a new updated_at in
+    the same transaction, so its ETag changes. With dry_run nothing is saved.
+
+    Returns:
+        Dict: Counts of plans scanned and updated, exercises renamed and
+        distinct exercise names before and after
+    """
+    from ..models.workout_plan import WorkoutPlan
+    from ..models.workout_plan_detail import WorkoutPlanDay, WorkoutPlanExercise
+
+    exercise_names.ensure_loaded()
+    stats = Counter()
+    names_before, names_after = set(), set()
+    last_id = 0
+    while True:
+        plans = (
+            WorkoutPlan.query.options(db.undefer(WorkoutPlan.plan_data))
+            .filter(WorkoutPlan.id > last_id)
+            .order_by(WorkoutPlan.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not plans:
+            break
+        last_id = plans[-1].id
+        for plan in plans:
+            stats['plans'] += 1
+            if plan.plan_data is None:
+                continue
+            names_before.update(exercise['name'] for exercise in _plan_exercises(plan.plan_data))
+            plan_data, plan_stats = canonicalize_plan(plan.plan_data, persist=not dry_run)
+            names_after.update(exercise['name'] for exercise in _plan_exercises(plan_data))
+            if plan_stats['renamed']:
+                plan.plan_data = plan_data
+                plan.updated_at = datetime.utcnow()
+                stats['plans_updated'] += 1
+                stats['exercises_renamed'] += plan_stats['renamed']
+        _finish_batch(dry_run)
+
+    rows = [name for name, in db.session.query(WorkoutPlanExercise.name).distinct()]
+    canonical = canonicalize_names(rows, persist=not dry_run)
+    names_before.update(rows)
+    names_after.update(canonical[name].name if name in canonical else name for name in rows)
+    renames = {name: result.name for name, result in canonical.items() if name != result.name}
+    if renames:
+        renamed_plans = (
+            db.select(WorkoutPlanDay.workout_plan_id)
+            .join(WorkoutPlanExercise, WorkoutPlanExercise.day_id == WorkoutPlanDay.id)
+            .where(WorkoutPlanExercise.name.in_(renames))
+        )
+        stats['plans_updated'] += db.session.execute(
+            db.update(WorkoutPlan).where(WorkoutPlan.id.in_(renamed_plans)).values(updated_at=datetime.utcnow())
+        ).rowcount
+    for name, new_name in renames.items():
+        updated = db.session.execute(
+            db.update(WorkoutPlanExercise).where(WorkoutPlanExercise.name == name).values(name=new_name)
+        ).rowcount
+        stats['exercises_renamed'] += updated
+    _finish_batch(dry_run)
+
+    return {'plans': stats['plans'], 'plans_updated': stats['plans_updated'],
+            'exercises_renamed': stats['exercises_renamed'],
+            'names_before': len(names_before), 'names_after': len(names_after)}
+
+
+def _finish_batch(dry_run: bool) -> None:
+    if dry_run:
+        db.session.rollback()
+        # Forget what the rolled back batch taught the index
+        exercise_names.load()
+    else:
+        db.session.commit()
+
+
+exercise_names = ExerciseNameIndex()
@@ -0,0 +1,264 @@
+"""
+Deterministic fake LLM backend for tests and benchmarks.
+
+Selected with LLM_BACKEND=fake. FakeLLM answers every prompt the app sends
+with a schema-valid payload (FitnessOptions, WorkoutPlanData, WeeklyWorkout,
+WorkoutPlanSkeleton or DayRevision) built from the static options catalog
+and the sample plan in backend/workout_plan.json, after an artificial
+latency. No network calls are made.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from types import SimpleNamespace
+import asyncio
+import copy
+import json
+import os
+import random
+import re
+import time
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+from .fitness_options import get_fitness_options
+
+SAMPLE_PLAN_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'workout_plan.json')
+
+FAKE_LLM_LATENCY_MS = float(os.environ.get("FAKE_LLM_LATENCY_MS", 0))
+# Exercises per day in generated plans; controls output size (0 keeps the sample's)
+FAKE_LLM_EXERCISES_PER_DAY = int(os.environ.get("FAKE_LLM_EXERCISES_PER_DAY", 0))
+FAKE_LLM_STREAM_CHUNK_CHARS = int(os.environ.get("FAKE_LLM_STREAM_CHUNK_CHARS", 200))
+# Output tokens generated per second on top of the fixed latency (0: latency only)
+FAKE_LLM_TOKENS_PER_SECOND = float(os.environ.get("FAKE_LLM_TOKENS_PER_SECOND", 0))
+
+# Exercise list lines of library plan prompts, "    - dumbbell-rows: Dumbbell Rows (...)"
+LIBRARY_EXERCISE = re.compile(r'^\s*- ([a-z0-9-]+): ', re.MULTILINE)
+
+_sample_plan = None
+
+OPTION_NOTE_FIELDS = {
+    'fitness_goals': ('age_specific_notes', 'Suitable for your age with gradual progression.'),
+    'equipment_options': ('safety_considerations', 'Start light and focus on proper form.'),
+    'workout_types': ('intensity_recommendation', 'Moderate intensity, building up over several weeks.'),
+    'experience_levels': ('progression_timeline', 'Expect noticeable progress in 4-8 weeks.'),
+}
+
+
+def load_sample_plan() -> Dict:
+    """Return the sample plan_data from backend/workout_plan.json."""
+    global _sample_plan
+    if _sample_plan is None:
+        with open(SAMPLE_PLAN_PATH) as f:
+            _sample_plan = json.load(f)['plan_data']
+    return copy.deepcopy(_sample_plan)
+
+
+def fake_fitness_options(seed: int = 0) -> Dict:
+    """Build a FitnessOptions payload from the static catalog."""
+    rng = random.Random(seed)
+    options = copy.deepcopy(get_fitness_options())
+    for category, (field, note) in OPTION_NOTE_FIELDS.items():
+        for option in options[category]:
+            option[field] = note
+            option['relevance_score'] = rng.randint(1, 10)
+    return options
+
+
+def fake_workout_plan(exercises_per_day: int = 0) -> Dict:
+    """Build a WorkoutPlanData payload from the sample plan."""
+    plan = load_sample_plan()
+    for week in plan['weeks']:
+        for day in week['days']:
+            day['exercises'] = _resize(day['exercises'], exercises_per_day)
+    return plan
+
+
+def fake_week(week_number: int, exercises_per_day: int = 0) -> Dict:
+    """Build a WeeklyWorkout payload for one week."""
+    weeks = fake_workout_plan(exercises_per_day)['weeks']
+    week = weeks[(week_number - 1) % len(weeks)]
+    week['week_number'] = week_number
+    return week
+
+
+def fake_day(week_number: int, day_number: int, exercises_per_day: int = 0) -> Dict:
+    """Build a DailyWorkout payload for one day."""
+    days = fake_week(week_number, exercises_per_day)['days']
+    day = days[(day_number - 1) % len(days)]
+    day['day_number'] = day_number
+    return day
+
+
+def fake_day_revision(replacements: int, additions: int, equipment: List[str]) -> Dict:
+    """Build a DayRevision payload whose exercises use only the given equipment."""
+    exercises = [exercise for week in load_sample_plan()['weeks'] for day in week['days'] for exercise in day['exercises']]
+    revised = []
+    for index in range(replacements + additions):
+        exercise = copy.deepcopy(exercises[index % len(exercises)])
+        exercise['name'] = f"{exercise['name']} (revised)"
+        exercise['equipment'] = equipment[:1]
+        revised.append(exercise)
+    return {'replacements': revised[:replacements], 'additions': revised[replacements:]}
+
+
+def fake_library_plan(exercise_ids: List[str], exercises_per_day: int = 0) -> Dict:
+    """Build a LibraryWorkoutPlan payload shaped like the sample plan, cycling through exercise_ids."""
+    plan = fake_workout_plan(exercises_per_day)
+    ids = iter(exercise_ids * sum(len(day['exercises']) for week in plan['weeks'] for day in week['days']))
+    for week in plan['weeks']:
+        for day in week['days']:
+            day['exercises'] = [
+                {'id': next(ids), 'sets': exercise.get('sets'), 'reps': exercise.get('reps'),
+                 'duration': exercise.get('duration')}
+                for exercise in day['exercises']
+            ]
+    return plan
+
+
+def fake_library_week(week_number: int, exercise_ids: List[str], exercises_per_day: int = 0) -> Dict:
+    """Build a LibraryWeeklyWorkout payload for one week."""
+    weeks = fake_library_plan(exercise_ids, exercises_per_day)['weeks']
+    week = weeks[(week_number - 1) % len(weeks)]
+    week['week_number'] = week_number
+    return week
+
+
+def fake_skeleton() -> Dict:
+    """Build a WorkoutPlanSkeleton payload from the sample plan."""
+    return {
+        'weeks': [
+            {
+                'week_number': week['week_number'],
+                'focus': f"Week {week['week_number']} foundation",
+                'progression': 'Add one set or a few reps to the main lifts',
+                'day_focuses': [day['focus'] for day in week['days']],
+            }
+            for week in load_sample_plan()['weeks']
+        ]
+    }
+
+
+def _resize(items: List, size: int) -> List:
+    if size <= 0 or not items:
+        return items
+    return [copy.deepcopy(items[i % len(items)]) for i in range(size)]
+
+
+class FakeLLM(LLM):
+    """LangChain LLM that returns schema-valid JSON for the app's prompts."""
+
+    model_id: str = "fake"
+    latency_seconds: float = FAKE_LLM_LATENCY_MS / 1000
+    exercises_per_day: int = FAKE_LLM_EXERCISES_PER_DAY
+    stream_chunk_chars: int = FAKE_LLM_STREAM_CHUNK_CHARS
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND
+    seed: int = 0
+    # Native JSON mode settings, as on VertexAI (see prompt_compiler)
+    response_mime_type: Optional[str] = None
+    response_schema: Optional[Dict[str, Any]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def respond(self, prompt: str) -> str:
+        """Return the JSON response for a prompt, chosen by the schema it asks for."""
+        categories = [category for category in OPTION_NOTE_FIELDS if category in prompt]
+        if len(categories) == len(OPTION_NOTE_FIELDS):
+            payload = fake_fitness_options(self.seed)
+        elif categories:
+            # Re-prompt of a single options category
+            options = fake_fitness_options(self.seed)
+            payload = {category: options[category] for category in categories}
+        elif '"replacements"' in prompt:
+            # Revision of one day after a profile update
+            replace = re.search(r'Replace these (\d+) exercise', prompt)
+            add = re.search(r'Add (\d+) new exercise', prompt)
+            equipment = re.search(r'Available Equipment: (.*)', prompt)
+            payload = fake_day_revision(
+                int(replace.group(1)) if replace else 0,
+                int(add.group(1)) if add else 0,
+                [item.strip() for item in equipment.group(1).split(',') if item.strip()] if equipment else [],
+            )
+        elif '"weeks"' in prompt and LIBRARY_EXERCISE.search(prompt):
+            # Plan referencing the listed library exercises by id
+            payload = fake_library_plan(LIBRARY_EXERCISE.findall(prompt), self.exercises_per_day)
+        elif '"days"' in prompt and LIBRARY_EXERCISE.search(prompt):
+            # Re-prompt of a single week of a library plan
+            match = re.search(r'week (\d+)', prompt, re.IGNORECASE)
+            payload = fake_library_week(int(match.group(1)) if match else 1,
+                                        LIBRARY_EXERCISE.findall(prompt), self.exercises_per_day)
+        elif 'day_focuses' in prompt:
+            payload = fake_skeleton()
+        elif '"weeks"' in prompt:
+            payload = fake_workout_plan(self.exercises_per_day)
+        elif '"days"' not in prompt and '"day_number"' in prompt:
+            # Re-prompt of a single day
+            match = re.search(r'day (\d+) of week (\d+)', prompt, re.IGNORECASE)
+            day_number, week_number = (int(match.group(1)), int(match.group(2))) if match else (1, 1)
+            payload = fake_day(week_number, day_number, self.exercises_per_day)
+        else:
+            match = re.search(r'week (\d+)', prompt, re.IGNORECASE)
+            payload = fake_week(int(match.group(1)) if match else 1, self.exercises_per_day)
+        return json.dumps(payload)
+
+    def _with_response_schema(self, prompt: str, kwargs: Dict[str, Any]) -> str:
+        """In native JSON mode the schema is not in the prompt; append it so respond() can route on it."""
+        schema = kwargs.get('response_schema', self.response_schema)
+        return prompt if schema is None else f"{prompt}\n{json.dumps(schema)}"
+
+    def generation_seconds(self, text: str) -> float:
+        """Simulated time to produce a response: the fixed latency plus its tokens at tokens_per_second."""
+        if self.tokens_per_second <= 0:
+            return self.latency_seconds
+        return self.latency_seconds + len(text) / 4 / self.tokens_per_second
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        text = self.respond(self._with_response_schema(prompt, kwargs))
+        time.sleep(self.generation_seconds(text))
+        return text
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        text = self.respond(self._with_response_schema(prompt, kwargs))
+        await asyncio.sleep(self.generation_seconds(text))
+        return text
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        text = self.respond(self._with_response_schema(prompt, kwargs))
+        chunk_count = max(1, -(-len(text) // self.stream_chunk_chars))
+        delay = self.generation_seconds(text) / chunk_count
+        for start in range(0, len(text), self.stream_chunk_chars):
+            time.sleep(delay)
+            chunk = GenerationChunk(text=text[start:start + self.stream_chunk_chars])
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class FakeGenAIClient:
+    """Stand-in for genai.Client used by search_workout_exercises."""
+
+    def __init__(self, latency_seconds: float = FAKE_LLM_LATENCY_MS / 1000):
+        self.latency_seconds = latency_seconds
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        # The async client, as genai.Client.aio
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._agenerate_content))
+
+    def _generate_content(self, model: str, contents: str, config=None):
+        time.sleep(self.latency_seconds)
+        return self._response()
+
+    async def _agenerate_content(self, model: str, contents: str, config=None):
+        await asyncio.sleep(self.latency_seconds)
+        return self._response()
+
+    def _response(self):
+        names = sorted({
+            exercise['name']
+            for week in load_sample_plan()['weeks']
+            for day in week['days']
+            for exercise in day['exercises']
+        })
+        text = "\n".join(f"- {name}" for name in names)
+        part = SimpleNamespace(text=text)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
@@ -0,0 +1,69 @@
+"""
+Conditional GET support for the api blueprint.
+
+Views decorated with conditional_get() get a strong ETag computed from a
+cheap version lookup (row id and updated_at) before the view runs. When the
+request's If-None-Match matches, a 304 is returned without calling the view,
+so the full row (e.g. a workout plan's plan_data) is never loaded or
+serialized.
+"""
+from functools import wraps
+from typing import Callable, Optional
+import hashlib
+import os
+
+from flask import Response, make_response, request
+
+from .metrics import HTTP_CONDITIONAL_REQUESTS
+
+# Seconds clients may reuse a response without revalidating (0: always revalidate)
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", 0))
+
+
+def make_etag(*parts) -> str:
+    """Return an (unquoted) strong ETag for the given version parts."""
+    version = "|".join(str(part) for part in parts)
+    return hashlib.sha256(version.encode('utf-8')).hexdigest()[:32]
+
+
+def cache_control_header(max_age: int) -> str:
+    # Responses are per-user, so shared caches must not store them
+    if max_age > 0:
+        return f"private, max-age={max_age}"
+    return "private, no-cache"
+
+
+def conditional_get(compute_etag: Callable[..., Optional[str]], max_age: Optional[int] = None):
+    """
+    Decorate a GET view with ETag and Cache-Control handling.
+
+    Args:
+        compute_etag: Called with the view's URL arguments; returns the
+            resource's current ETag, or None if it does not exist (the view
+            then runs normally, e.g. to return a 404)
+        max_age: Cache-Control max-age in seconds; defaults to HTTP_CACHE_MAX_AGE
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = compute_etag(**kwargs)
+            if etag is None:
+                return view(*args, **kwargs)
+
+            cache_control = cache_control_header(HTTP_CACHE_MAX_AGE if max_age is None else max_age)
+            if request.if_none_match.contains_weak(etag):
+                HTTP_CONDITIONAL_REQUESTS.inc(result='not_modified')
+                response = Response(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = cache_control
+                return response
+
+            if request.if_none_match:
+                HTTP_CONDITIONAL_REQUESTS.inc(result='modified')
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,265 @@
+"""
+Background job queue for long-running workout plan generation.
+
+Jobs are persisted through a JobStore (by default the application database,
+so the queue works on SQLite without Redis) and executed inside the web
+process, by a thread pool or (WORKOUT_JOB_RUNNER=async) as coroutines on an
+event loop thread, which holds hundreds of generations in flight without a
+thread for each. Each worker claims a job atomically before running it, so
+several processes sharing one database never run the same job twice.
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+from ..models.user_profile import db
+from ..models.generation_job import (
+    GenerationJob, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, ACTIVE_JOB_STATUSES
+)
+from .aio import EventLoopThread, run_in_app_context
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("WORKOUT_JOB_WORKERS", 4))
+DEFAULT_STALE_AFTER_SECONDS = int(os.environ.get("WORKOUT_JOB_STALE_SECONDS", 15 * 60))
+# "threads": one pool thread per running job; "async": coroutines on one event loop thread
+WORKOUT_JOB_RUNNER = os.environ.get("WORKOUT_JOB_RUNNER", "threads").lower()
+# Jobs in flight at once with the async runner
+WORKOUT_JOB_ASYNC_CONCURRENCY = int(os.environ.get("WORKOUT_JOB_ASYNC_CONCURRENCY", 500))
+JOB_RUNNERS = ('threads', 'async')
+
+
+class JobStore(ABC):
+    """
+    Persistence interface used by JobQueue.
+
+    Implementations must make create_job deduplicate active jobs per profile
+    and make claim_job atomic across processes.
+    """
+
+    @abstractmethod
+    def create_job(self, profile_uuid: str) -> Tuple[Dict, bool]:
+        """Create a queued job, or return the active one. Returns (job, created)."""
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def claim_job(self, job_id: str) -> Optional[Dict]:
+        """Move a queued job to running. Returns None if another worker claimed it."""
+
+    @abstractmethod
+    def complete_job(self, job_id: str, workout_plan_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def fail_job(self, job_id: str, error: str) -> None:
+        ...
+
+    @abstractmethod
+    def pending_job_ids(self, stale_after_seconds: int) -> List[str]:
+        """Return queued job ids, requeueing running jobs that have gone stale."""
+
+
+class DatabaseJobStore(JobStore):
+    """JobStore backed by the generation_jobs table of the application database."""
+
+    def create_job(self, profile_uuid):
+        active = self._active_job(profile_uuid)
+        if active:
+            return active.to_dict(), False
+
+        job = GenerationJob(profile_uuid=profile_uuid, status=JOB_QUEUED)
+        try:
+            db.session.add(job)
+            db.session.commit()
+            return job.to_dict(), True
+        except IntegrityError:
+            # Another request created the active job for this profile first
+            db.session.rollback()
+            active = self._active_job(profile_uuid)
+            if not active:
+                raise
+            return active.to_dict(), False
+
+    def get_job(self, job_id):
+        job = db.session.get(GenerationJob, job_id)
+        return job.to_dict() if job else None
+
+    def claim_job(self, job_id):
+        result = db.session.execute(
+            db.update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.status == JOB_QUEUED)
+            .values(status=JOB_RUNNING, started_at=datetime.utcnow(), updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        if result.rowcount != 1:
+            return None
+        return self.get_job(job_id)
+
+    def complete_job(self, job_id, workout_plan_id):
+        self._finish(job_id, JOB_DONE, workout_plan_id=workout_plan_id)
+
+    def fail_job(self, job_id, error):
+        self._finish(job_id, JOB_FAILED, error=error)
+
+    def pending_job_ids(self, stale_after_seconds):
+        stale_before = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+        db.session.execute(
+            db.update(GenerationJob)
+            .where(GenerationJob.status == JOB_RUNNING, GenerationJob.started_at < stale_before)
+            .values(status=JOB_QUEUED, started_at=None, updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        rows = db.session.execute(
+            db.select(GenerationJob.id)
+            .where(GenerationJob.status == JOB_QUEUED)
+            .order_by(GenerationJob.created_at)
+        )
+        return [row.id for row in rows]
+
+    def _active_job(self, profile_uuid):
+        return GenerationJob.query.filter(
+            GenerationJob.profile_uuid == profile_uuid,
+            GenerationJob.status.in_(ACTIVE_JOB_STATUSES)
+        ).first()
+
+    def _finish(self, job_id, status, workout_plan_id=None, error=None):
+        job = db.session.get(GenerationJob, job_id)
+        if not job:
+            return
+        job.status = status
+        job.workout_plan_id = workout_plan_id
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+class JobQueue:
+    """
+    Runs workout plan generation jobs on a bounded thread pool, or with
+    runner="async" as coroutines on an event loop thread (at most
+    async_concurrency at a time).
+
+    Follows the Flask extension pattern: create the queue at import time and
+    bind it to an application with init_app().
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                 runner: str = WORKOUT_JOB_RUNNER, async_concurrency: int = WORKOUT_JOB_ASYNC_CONCURRENCY):
+        if runner not in JOB_RUNNERS:
+            raise ValueError(f"Unknown job runner: {runner}")
+        self.store = store or DatabaseJobStore()
+        self.max_workers = max_workers
+        self.runner = runner
+        self.async_concurrency = async_concurrency
+        self.stale_after_seconds = DEFAULT_STALE_AFTER_SECONDS
+        self.app = None
+        self._executor = None
+        self._loop_thread = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, resume: bool = True) -> None:
+        """Bind the queue to an app and resubmit jobs left queued by a previous process."""
+        self.app = app
+        app.extensions['job_queue'] = self
+        if resume:
+            with app.app_context():
+                for job_id in self.store.pending_job_ids(self.stale_after_seconds):
+                    self._submit(job_id)
+
+    def enqueue_workout_plan(self, profile_uuid: str) -> Tuple[Dict, bool]:
+        """
+        Queue a workout plan generation for a profile.
+
+        Args:
+            profile_uuid: UUID of the profile to generate a plan for
+
+        Returns:
+            Tuple[Dict, bool]: The job and whether it was newly created. An
+            already queued or running job for the same profile is returned
+            instead of creating a duplicate.
+        """
+        job, created = self.store.create_job(profile_uuid)
+        if created:
+            self._submit(job['id'])
+        return job, created
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        return self.store.get_job(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+            loop_thread, self._loop_thread = self._loop_thread, None
+            self._semaphore = None
+        if loop_thread:
+            loop_thread.stop(wait=wait)
+
+    def _submit(self, job_id: str) -> None:
+        if self.runner == 'async':
+            with self._lock:
+                if self._loop_thread is None:
+                    self._loop_thread = EventLoopThread('workout-job-loop')
+                loop_thread = self._loop_thread
+            loop_thread.submit(self._arun(job_id))
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='workout-job'
+                )
+            self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str) -> None:
+        from ..agents.workout_generator_agent import WorkoutGeneratorAgent
+
+        with self.app.app_context(), tracer.span('job workout_plan', **{'job.id': job_id}) as span:
+            job = self.store.claim_job(job_id)
+            if not job:
+                return
+            try:
+                plan = WorkoutGeneratorAgent.generate_workout_plan(job['profile_uuid'])
+                self.store.complete_job(job_id, plan['id'])
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Workout plan job failed: %s", e, extra={'job_id': job_id})
+                self.store.fail_job(job_id, str(e))
+                if span is not None:
+                    span.record_exception(e)
+
+    async def _arun(self, job_id: str) -> None:
+        """Run a job as a coroutine; its database work runs on the aio thread pool."""
+        from ..agents.workout_generator_agent import WorkoutGeneratorAgent
+
+        if self._semaphore is None:
+            # Created on the loop thread, which is the only one using it
+            self._semaphore = asyncio.Semaphore(self.async_concurrency)
+        async with self._semaphore:
+            with self.app.app_context(), tracer.span('job workout_plan', **{'job.id': job_id}) as span:
+                job = await run_in_app_context(self.store.claim_job, job_id)
+                if not job:
+                    return
+                try:
+                    plan = await WorkoutGeneratorAgent.agenerate_workout_plan(job['profile_uuid'])
+                    await run_in_app_context(self.store.complete_job, job_id, plan['id'])
+                except Exception as e:
+                    logger.exception("Workout plan job failed: %s", e, extra={'job_id': job_id})
+                    await run_in_app_context(self.store.fail_job, job_id, str(e))
+                    if span is not None:
+                        span.record_exception(e)
+
+
+job_queue = JobQueue()
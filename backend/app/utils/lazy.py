@@ -0,0 +1,34 @@
+"""
+Lazy construction of expensive service objects.
+"""
+from typing import Callable
+import threading
+
+
+class LazyObject:
+    """
+    Proxy that builds its target with factory() on first attribute access.
+
+    Lets modules keep a module-level service name (e.g. an agent) without
+    paying for its imports and client setup until a request actually uses it.
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._target is not None
+
+    def get(self):
+        """Return the target, creating it if needed."""
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
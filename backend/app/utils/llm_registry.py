@@ -0,0 +1,236 @@
+"""
+Shared registry of LLM clients, output parsers and compiled chains.
+
+Creating a VertexAI LLM or a genai.Client sets up authentication and a new
+connection pool, and building a chain recomputes the parser's format
+instructions. The registry creates each of these once per process (keyed by
+model id and location) and hands the same instance to every request.
+"""
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "your-default-project-id")
+LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1")
+
+# "vertex" calls Vertex AI; "fake" uses the deterministic local backend in fake_llm.py
+LLM_BACKENDS = ("vertex", "fake")
+_backend = os.environ.get("LLM_BACKEND", "vertex")
+# Keyword arguments for FakeLLM, e.g. latency_seconds or exercises_per_day
+_fake_llm_options: Dict[str, object] = {}
+
+# Model ids of workout plan generation and of the fitness options agent
+WORKOUT_PLAN_MODEL_ID = "gemini-2.5-flash"
+FITNESS_OPTIONS_MODEL_ID = "gemini-2.0-flash-lite"
+
+# Models warmed up by warm_up() when LLM_WARMUP is enabled
+WARMUP_MODEL_IDS = (WORKOUT_PLAN_MODEL_ID, FITNESS_OPTIONS_MODEL_ID)
+
+_lock = threading.RLock()
+_llms: Dict[Tuple[str, str], object] = {}
+_genai_clients: Dict[Tuple[str, str], object] = {}
+_parsers: Dict[type, object] = {}
+_chains: Dict[Tuple[Hashable, str, str], object] = {}
+
+# Optional override for creating LLMs, e.g. a local stub in benchmarks
+_llm_factory: Optional[Callable[[str, str], object]] = None
+
+
+def _create_vertex_llm(model_id: str, location: str):
+    from langchain_google_vertexai import VertexAI
+    return VertexAI(model_name=model_id, location=location)
+
+
+def _create_fake_llm(model_id: str, location: str):
+    from .fake_llm import FakeLLM
+    return FakeLLM(model_id=model_id, **_fake_llm_options)
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def set_backend(backend: str, **fake_llm_options) -> None:
+    """
+    Select the LLM backend and drop cached instances.
+
+    Args:
+        backend: "vertex" or "fake"
+        fake_llm_options: FakeLLM settings such as latency_seconds, used by the fake backend
+    """
+    global _backend, _fake_llm_options
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    with _lock:
+        if backend != _backend or fake_llm_options != _fake_llm_options:
+            _backend = backend
+            _fake_llm_options = fake_llm_options
+            clear()
+
+
+def set_llm_factory(factory: Optional[Callable[[str, str], object]]) -> None:
+    """Replace how LLMs are created (None restores Vertex AI) and drop cached instances."""
+    global _llm_factory
+    with _lock:
+        _llm_factory = factory
+        clear()
+
+
+def get_llm(model_id: str, location: str = LOCATION):
+    """Return the shared LLM client for a model id and location."""
+    key = (model_id, location)
+    llm = _llms.get(key)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                factory = _llm_factory or (_create_fake_llm if _backend == "fake" else _create_vertex_llm)
+                llm = factory(model_id, location)
+                _attach_metrics(llm, model_id)
+                _llms[key] = llm
+    return llm
+
+
+def _attach_metrics(llm, model_id: str) -> None:
+    """Record call latency and token counts of a LangChain LLM in the metrics registry."""
+    from .metrics import llm_callback_handler
+    try:
+        llm.callbacks = list(getattr(llm, 'callbacks', None) or []) + [llm_callback_handler(model_id)]
+    except (AttributeError, TypeError, ValueError):
+        # Not a LangChain model (e.g. a stub from set_llm_factory)
+        pass
+
+
+def get_genai_client(location: str = LOCATION, project: str = PROJECT_ID):
+    """Return the shared google-genai client for a project and location."""
+    key = (project, location)
+    client = _genai_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _genai_clients.get(key)
+            if client is None:
+                if _backend == "fake":
+                    from .fake_llm import FakeGenAIClient
+                    client = FakeGenAIClient()
+                else:
+                    from google import genai
+                    client = genai.Client(vertexai=True, project=project, location=location)
+                _genai_clients[key] = client
+    return client
+
+
+def get_parser(pydantic_object: type):
+    """Return a shared JsonOutputParser for a pydantic model."""
+    parser = _parsers.get(pydantic_object)
+    if parser is None:
+        with _lock:
+            parser = _parsers.get(pydantic_object)
+            if parser is None:
+                parser = _parser_class()(pydantic_object=pydantic_object)
+                _parsers[pydantic_object] = parser
+    return parser
+
+
+_RepairingJsonOutputParser = None
+
+
+def _parser_class():
+    """
+    JsonOutputParser that repairs malformed JSON (see output_repair.repair_json).
+
+    Repairs are counted in LLM_OUTPUT_REPAIRS and outputs that cannot be
+    repaired in LLM_PARSE_FAILURES.
+    """
+    global _RepairingJsonOutputParser
+    if _RepairingJsonOutputParser is None:
+        from langchain_core.exceptions import OutputParserException
+        from langchain_core.output_parsers import JsonOutputParser
+        from .metrics import LLM_OUTPUT_REPAIRS, LLM_PARSE_FAILURES
+        from .output_repair import parse_json_output
+
+        class RepairingJsonOutputParser(JsonOutputParser):
+            def parse_result(self, result, *, partial: bool = False):
+                if partial:
+                    return super().parse_result(result, partial=partial)
+                schema = self.pydantic_object.__name__ if self.pydantic_object else 'json'
+                text = result[0].text
+                try:
+                    data, repairs = parse_json_output(text)
+                except ValueError as e:
+                    LLM_PARSE_FAILURES.inc(schema=schema, kind='json')
+                    raise OutputParserException(f"Invalid json output: {text}", llm_output=text) from e
+                for repair in repairs:
+                    LLM_OUTPUT_REPAIRS.inc(schema=schema, repair=repair)
+                return data
+
+        _RepairingJsonOutputParser = RepairingJsonOutputParser
+    return _RepairingJsonOutputParser
+
+
+def get_chain(name: Hashable, builder: Callable[[object], object], model_id: str, location: str = LOCATION):
+    """
+    Return a compiled chain, building it on first use.
+
+    Args:
+        name: Identifies the chain (prompt and parser) independently of the model
+        builder: Called with the shared LLM to build the chain
+        model_id: Model the chain runs on
+        location: Vertex AI location of the model
+
+    Returns:
+        The cached chain for (name, model_id, location)
+    """
+    key = (name, model_id, location)
+    chain = _chains.get(key)
+    if chain is None:
+        with _lock:
+            chain = _chains.get(key)
+            if chain is None:
+                chain = builder(get_llm(model_id, location))
+                _chains[key] = chain
+    return chain
+
+
+def warm_up(model_ids=WARMUP_MODEL_IDS, location: str = LOCATION) -> Dict[str, float]:
+    """
+    Create the shared clients ahead of the first request.
+
+    Failures are reported but not raised, so an unreachable backend does not
+    prevent the app from starting.
+
+    Returns:
+        Dict[str, float]: Seconds spent initializing each client
+    """
+    timings = {}
+    for model_id in model_ids:
+        start = time.perf_counter()
+        try:
+            get_llm(model_id, location)
+            timings[model_id] = time.perf_counter() - start
+        except Exception as e:
+            logger.warning("LLM warm-up failed for %s: %s", model_id, e)
+
+    start = time.perf_counter()
+    try:
+        get_genai_client(location)
+        timings["genai"] = time.perf_counter() - start
+    except Exception as e:
+        logger.warning("LLM warm-up failed for genai client: %s", e)
+    return timings
+
+
+def clear() -> None:
+    """Drop all cached clients, parsers and chains."""
+    with _lock:
+        _llms.clear()
+        _genai_clients.clear()
+        _parsers.clear()
+        _chains.clear()
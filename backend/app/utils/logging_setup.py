@@ -0,0 +1,75 @@
+"""
+Level-gated, structured logging for the backend.
+
+Modules log through `logging.getLogger(__name__)`, so everything under the
+`app` package is configured here: LOG_LEVEL sets the threshold and
+LOG_FORMAT picks "text" (one line, with `extra` fields appended as
+key=value) or "json" (one JSON object per line, `extra` fields included).
+"""
+from typing import Optional
+import json
+import logging
+import os
+import sys
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Plain text lines with extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            line += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the message, logger, level and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_handler: Optional[logging.Handler] = None
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """
+    Configure the `app` logger (safe to call again, e.g. once per create_app()).
+
+    Args:
+        level: Log level name; defaults to LOG_LEVEL
+        fmt: "text" or "json"; defaults to LOG_FORMAT
+    """
+    global _handler
+    logger = logging.getLogger('app')
+    if _handler is not None:
+        logger.removeHandler(_handler)
+
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == 'json' else KeyValueFormatter())
+    logger.addHandler(_handler)
+    logger.setLevel((level or LOG_LEVEL).upper())
@@ -0,0 +1,357 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are defined here, next to the registry, so every
+module records into the same series. Collectors are called on each scrape
+to report values other components already keep (e.g. cache hit counters).
+metrics.init_app() times every request, hooks SQLAlchemy query timing and
+serves everything at GET /metrics.
+
+The metrics are per process: with several workers each one reports its own,
+as the Prometheus client library does without its multiprocess mode.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import bisect
+import math
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Latency buckets in seconds: sub-millisecond cache hits up to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 8000, 16000)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with _sum and _count, one series per label combination."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = ('le', _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# A collector returns (name, type, help, [(labels dict, value), ...]) tuples
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict, float]]]]]
+
+
+class MetricsRegistry:
+    """Holds metrics and collectors and renders them for /metrics."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route template.', ('method', 'route', 'status'))
+LLM_CALL_DURATION = registry.histogram(
+    'llm_call_duration_seconds', 'LLM call latency by model id.', ('model', 'status'))
+LLM_TOKENS = registry.counter(
+    'llm_tokens_total', 'LLM tokens by model id; estimated at 4 characters per token when the provider reports none.',
+    ('model', 'kind'))
+LLM_RETRIES = registry.counter(
+    'llm_retries_total', 'LLM calls retried, by model id and reason.', ('model', 'reason'))
+LLM_PARSE_FAILURES = registry.counter(
+    'llm_parse_failures_total', 'LLM outputs that were not valid JSON or failed schema validation.',
+    ('schema', 'kind'))
+LLM_OUTPUT_REPAIRS = registry.counter(
+    'llm_output_repairs_total', 'Malformed or invalid LLM outputs repaired instead of regenerated, by schema and repair.',
+    ('schema', 'repair'))
+LLM_REPAIR_SAVED_TOKENS = registry.counter(
+    'llm_repair_saved_tokens_total', 'Estimated output tokens a full regeneration would have cost beyond the repairs.',
+    ('schema',))
+LLM_REPAIR_SAVED_SECONDS = registry.counter(
+    'llm_repair_saved_seconds_total', 'Estimated seconds a full regeneration would have taken beyond the repairs.',
+    ('schema',))
+LLM_PROMPT_TOKENS = registry.histogram(
+    'llm_prompt_tokens', 'Estimated prompt tokens per LLM call, by chain (see prompt_compiler.estimate_tokens).',
+    ('chain',), TOKEN_BUCKETS)
+EXERCISE_NAME_LOOKUPS = registry.counter(
+    'exercise_name_lookups_total', 'Exercise names canonicalized, by match: exact, fuzzy or new.', ('match',))
+DB_QUERY_DURATION = registry.histogram(
+    'db_query_duration_seconds', 'Database statement latency by statement type.', ('operation',), DB_BUCKETS)
+HTTP_CONDITIONAL_REQUESTS = registry.counter(
+    'http_conditional_requests_total', 'Conditional GETs by result (not_modified is a cache hit).', ('result',))
+
+
+def _cache_collector():
+    """Hit/miss counters of the in-process caches."""
+    from .options_cache import options_cache
+    from .plan_templates import plan_template_store
+
+    caches = {
+        'options': (options_cache.hits, options_cache.misses),
+        'plan_templates': (plan_template_store.hits, plan_template_store.misses),
+    }
+    yield 'cache_hits_total', 'counter', 'Cache hits by cache.', [({'cache': n}, h) for n, (h, _) in caches.items()]
+    yield 'cache_misses_total', 'counter', 'Cache misses by cache.', [({'cache': n}, m) for n, (_, m) in caches.items()]
+    yield 'cache_hit_ratio', 'gauge', 'Cache hits / lookups since start, by cache.', [
+        ({'cache': name}, hits / (hits + misses) if hits + misses else 0.0) for name, (hits, misses) in caches.items()
+    ]
+
+
+registry.register_collector(_cache_collector)
+
+_DB_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT',
+                  'RELEASE', 'CREATE', 'DROP', 'ALTER', 'WITH'}
+
+
+def _statement_operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    operation = words[0].upper() if words else ''
+    return operation if operation in _DB_OPERATIONS else 'OTHER'
+
+
+_db_hooked = False
+
+
+def instrument_sqlalchemy() -> None:
+    """Time every statement executed by any SQLAlchemy engine (installed once per process)."""
+    global _db_hooked
+    if _db_hooked:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start_time')
+        if starts:
+            DB_QUERY_DURATION.observe(time.perf_counter() - starts.pop(), operation=_statement_operation(statement))
+
+    _db_hooked = True
+
+
+def init_app(app) -> None:
+    """Time requests and serve GET /metrics on an app (no-op with METRICS_ENABLED=false)."""
+    if not app.config.get('METRICS_ENABLED', METRICS_ENABLED):
+        return
+    from flask import Response, g, request
+
+    instrument_sqlalchemy()
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start_time = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop('metrics_start_time', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=request.method, route=route,
+                                          status=response.status_code)
+        return response
+
+    def metrics_view():
+        return Response(registry.render(), mimetype=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
+
+
+def llm_callback_handler(model_id: str):
+    """
+    Return a LangChain callback handler recording LLM_CALL_DURATION and LLM_TOKENS for a model.
+
+    Imported lazily by the LLM registry so langchain_core is only loaded with the first LLM.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsHandler(BaseCallbackHandler):
+        def __init__(self):
+            self._calls: Dict[object, Tuple[float, int]] = {}
+            self._lock = threading.Lock()
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            with self._lock:
+                self._calls[run_id] = (time.perf_counter(), sum(len(prompt) for prompt in prompts))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            with self._lock:
+                start, prompt_chars = self._calls.pop(run_id, (None, 0))
+            if start is not None:
+                LLM_CALL_DURATION.observe(time.perf_counter() - start, model=model_id, status='ok')
+            prompt_tokens, completion_tokens = token_counts(response, prompt_chars)
+            LLM_TOKENS.inc(prompt_tokens, model=model_id, kind='prompt')
+            LLM_TOKENS.inc(completion_tokens, model=model_id, kind='completion')
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            with self._lock:
+                start, _ = self._calls.pop(run_id, (None, 0))
+            if start is not None:
+                LLM_CALL_DURATION.observe(time.perf_counter() - start, model=model_id, status='error')
+
+    return LLMMetricsHandler()
+
+
+def _usage_counts(usage) -> Tuple[Optional[int], Optional[int]]:
+    if not isinstance(usage, dict):
+        return None, None
+    prompt = usage.get('prompt_token_count', usage.get('prompt_tokens', usage.get('input_tokens')))
+    completion = usage.get('candidates_token_count', usage.get('completion_tokens', usage.get('output_tokens')))
+    return prompt, completion
+
+
+def _token_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt, completion) token counts reported by the provider in an LLMResult, if any."""
+    llm_output = response.llm_output or {}
+    for key in ('usage_metadata', 'token_usage'):
+        prompt, completion = _usage_counts(llm_output.get(key))
+        if prompt is not None or completion is not None:
+            return prompt, completion
+
+    # Otherwise add up what each generation reports
+    prompt = completion = None
+    for generations in response.generations:
+        for generation in generations:
+            reported_prompt, reported_completion = _usage_counts((generation.generation_info or {}).get('usage_metadata'))
+            if reported_prompt is not None:
+                prompt = (prompt or 0) + reported_prompt
+            if reported_completion is not None:
+                completion = (completion or 0) + reported_completion
+    return prompt, completion
+
+
+def token_counts(response, prompt_chars: int) -> Tuple[int, int]:
+    """
+    (prompt, completion) token counts of an LLMResult.
+
+    Uses the provider's counts when it reports them and estimates about four
+    characters per token otherwise (e.g. the fake backend).
+    """
+    prompt_tokens, completion_tokens = _token_usage(response)
+    if prompt_tokens is None:
+        prompt_tokens = prompt_chars // 4
+    if completion_tokens is None:
+        completion_tokens = sum(len(g.text) for gens in response.generations for g in gens) // 4
+    return prompt_tokens, completion_tokens
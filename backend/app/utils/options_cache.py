@@ -0,0 +1,102 @@
+"""
+In-memory response cache for personalized fitness options.
+
+Options are keyed on the user's age group (see app/prompts/fitness_options_prompt.py)
+and a canonical form of their current selections, so that users in the same
+age group with the same selections share one LLM generation.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import copy
+import os
+import threading
+import time
+
+from ..prompts.fitness_options_prompt import get_age_group
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("OPTIONS_CACHE_TTL_SECONDS", 6 * 60 * 60))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("OPTIONS_CACHE_MAX_ENTRIES", 1024))
+
+
+def make_options_cache_key(user_age, user_selections: Optional[List[Dict]] = None) -> Tuple:
+    """
+    Build the cache key for an options request.
+
+    Args:
+        user_age: The age of the user
+        user_selections: List of previous user selections with their types
+
+    Returns:
+        Tuple: (age group, sorted tuple of (type, id, name) selections)
+    """
+    try:
+        age_band = get_age_group(int(user_age))
+    except (TypeError, ValueError):
+        age_band = f"age:{user_age}"
+
+    selections = tuple(sorted(
+        (str(s.get('type', '')), str(s.get('id', '')), str(s.get('name', '')))
+        for s in (user_selections or [])
+    ))
+    return age_band, selections
+
+
+class OptionsCache:
+    """Thread-safe LRU cache with per-entry TTL for generated fitness options."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        """Return a copy of the cached options for key, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+
+    def set(self, key: Tuple, value: Dict) -> None:
+        """Store a copy of value under key, evicting the least recently used entries."""
+        value = copy.deepcopy(value)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+            }
+
+
+# Shared by FitnessOptionsAgent and the cache stats endpoint
+options_cache = OptionsCache()
@@ -0,0 +1,56 @@
+"""
+Precomputed index of the static fitness options catalog.
+
+The catalog in fitness_options.py is indexed once at import: an id -> option
+dict per category, the mapping from selection types to categories, and the
+GET /api/options/static payload, serialized, gzipped and hashed into an ETag
+up front so serving it costs no JSON encoding or compression per request.
+
+options_rules.py ranks the catalog into FitnessOptions responses.
+"""
+from typing import Dict, List, Optional
+import copy
+import gzip
+import hashlib
+import json
+import os
+
+from .fitness_options import get_fitness_options
+
+# Seconds browsers and CDNs may cache GET /api/options/static (the catalog only changes on deploy)
+STATIC_OPTIONS_MAX_AGE = int(os.environ.get("STATIC_OPTIONS_MAX_AGE", 60 * 60))
+
+# Selection type (as sent by the onboarding wizard) -> options category
+SELECTION_CATEGORIES = {
+    'goal': 'fitness_goals',
+    'equipment': 'equipment_options',
+    'workout': 'workout_types',
+    'level': 'experience_levels',
+}
+
+
+class OptionsCatalog:
+    """Indexes and pre-serialized payloads of the static fitness options."""
+
+    def __init__(self, options: Optional[Dict[str, List[Dict]]] = None):
+        self.options = copy.deepcopy(options or get_fitness_options())
+        self.by_id = {
+            category: {option['id']: option for option in category_options}
+            for category, category_options in self.options.items()
+        }
+        self.json_bytes = json.dumps(self.options, separators=(',', ':')).encode('utf-8')
+        # mtime=0 keeps the compressed bytes (and so the ETag) stable across restarts
+        self.gzip_bytes = gzip.compress(self.json_bytes, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(self.json_bytes).hexdigest()[:32]
+
+    def get(self, category: str, option_id: str) -> Optional[Dict]:
+        """Return the catalog option with this id in a category, or None."""
+        return self.by_id.get(category, {}).get(option_id)
+
+    def get_selection(self, selection: Dict) -> Optional[Dict]:
+        """Return the catalog option a wizard selection ({'type', 'id', ...}) refers to, or None."""
+        category = SELECTION_CATEGORIES.get(selection.get('type'))
+        return self.get(category, selection.get('id')) if category else None
+
+
+options_catalog = OptionsCatalog()
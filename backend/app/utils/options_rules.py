@@ -0,0 +1,234 @@
+"""
+Rule-based ranking of the static fitness options catalog.
+
+The rules below encode the age-group guidance from
+app/prompts/fitness_options_prompt.py as data: per age band, relevance
+adjustments and note texts for the catalog options, plus relevance boosts
+triggered by the user's current selections. They are compiled once per age
+band at import, so ranking a request only copies the band's prepared options,
+applies the selection boosts and sorts: a valid FitnessOptions in
+microseconds, with no LLM call.
+
+Used by POST /api/options in "rules" mode, as the immediate answer in
+"hybrid" mode and as the catalog fallback when the LLM fails.
+"""
+from typing import Dict, List, Optional, Tuple
+import os
+
+from .options_catalog import SELECTION_CATEGORIES, options_catalog
+from ..prompts.fitness_options_prompt import AGE_GROUPS, get_age_group
+
+# POST /api/options modes: "llm" asks the model (falling back to the rules on failure),
+# "rules" uses the rules only, "hybrid" answers with the rules and refines with the LLM in the background
+OPTIONS_MODES = ('llm', 'rules', 'hybrid')
+OPTIONS_MODE = os.environ.get("OPTIONS_MODE", "llm").lower()
+
+DEFAULT_RELEVANCE = 5
+SELECTED_RELEVANCE = 10
+
+# Category -> the category-specific field of its FitnessOptions model
+CATEGORY_NOTE_FIELDS = {
+    'fitness_goals': 'age_specific_notes',
+    'equipment_options': 'safety_considerations',
+    'workout_types': 'intensity_recommendation',
+    'experience_levels': 'progression_timeline',
+}
+
+# Notes used when neither the band nor the option has its own
+DEFAULT_NOTES = {
+    'fitness_goals': 'Suitable for most adults; adjust volume to your recovery.',
+    'equipment_options': 'Learn proper form with light resistance first.',
+    'workout_types': 'Start at a moderate intensity and progress gradually.',
+    'experience_levels': 'Expect noticeable progress within 6-12 weeks.',
+}
+
+# Age band rules:
+#   relevance: option id -> adjustment to DEFAULT_RELEVANCE
+#   notes:     category -> note for every option in the category
+#   option_notes: option id -> note for that option (overrides notes)
+AGE_BAND_RULES = {
+    'teens': {
+        'relevance': {
+            'general_fitness': 3, 'build_muscle': 1, 'calisthenics': 3, 'jump_rope': 2,
+            'functional_training': 2, 'beginner': 2, 'crossfit': -2, 'advanced': -2,
+        },
+        'notes': {
+            'fitness_goals': 'Focus on proper form and habits; bodyweight work before heavy loads.',
+            'equipment_options': 'Use with supervision and light weights while learning technique.',
+            'workout_types': 'Keep most sessions moderate and prioritize technique over load.',
+            'experience_levels': 'Progress comes quickly; add load only once form is consistent.',
+        },
+        'option_notes': {
+            'build_muscle': 'Build strength with bodyweight and light loads; avoid max-effort lifts while growing.',
+            'lose_weight': 'Focus on activity and sport rather than calorie restriction.',
+            'pull_up_bar': 'Start with assisted or negative pull-ups.',
+            'crossfit': 'Only with qualified coaching and scaled loads.',
+        },
+    },
+    'young adults': {
+        'relevance': {
+            'build_muscle': 3, 'lose_weight': 2, 'hiit': 3, 'strength_training': 3,
+            'dumbbells': 2, 'crossfit': 1, 'pull_up_bar': 1,
+        },
+        'notes': {
+            'fitness_goals': 'A good time to build a strength and cardio base that lasts.',
+            'equipment_options': 'Progress load steadily and keep a spotter for heavy lifts.',
+            'workout_types': 'Balance strength, cardio and flexibility through the week.',
+            'experience_levels': 'Expect noticeable progress within 4-8 weeks of consistent training.',
+        },
+        'option_notes': {
+            'hiit': 'Two or three sessions a week, with a rest day in between.',
+        },
+    },
+    'adults': {
+        'relevance': {
+            'lose_weight': 3, 'general_fitness': 2, 'hiit': 2, 'strength_training': 2,
+            'dumbbells': 2, 'resistance_bands': 1, 'yoga': 1,
+        },
+        'notes': {
+            'fitness_goals': 'Time-efficient training that also helps manage stress.',
+            'equipment_options': 'Warm up thoroughly and favor controlled repetitions.',
+            'workout_types': 'Short, focused sessions; include recovery and stress management.',
+            'experience_levels': 'Expect noticeable progress within 6-10 weeks.',
+        },
+        'option_notes': {
+            'yoga': 'Useful for mobility and stress relief alongside harder sessions.',
+        },
+    },
+    'mature adults': {
+        'relevance': {
+            'general_fitness': 3, 'increase_flexibility': 2, 'improve_endurance': 2, 'yoga': 3,
+            'pilates': 2, 'functional_training': 2, 'resistance_bands': 3, 'stationary_bike': 2,
+            'foam_roller': 2, 'crossfit': -3, 'hiit': -1, 'jump_rope': -2, 'advanced': -1,
+        },
+        'notes': {
+            'fitness_goals': 'Favor joint-friendly training that preserves strength and mobility.',
+            'equipment_options': 'Choose controlled movements and warm up joints thoroughly.',
+            'workout_types': 'Prefer low-impact options; keep high-intensity work short.',
+            'experience_levels': 'Allow extra recovery time; expect progress within 8-12 weeks.',
+        },
+        'option_notes': {
+            'hiit': 'Low-impact intervals (bike, rower) with longer recovery between efforts.',
+            'jump_rope': 'High impact on knees and ankles; choose a bike or brisk walking instead.',
+            'build_muscle': 'Strength training slows age-related muscle loss; progress load gradually.',
+        },
+    },
+    'seniors': {
+        'relevance': {
+            'general_fitness': 4, 'increase_flexibility': 4, 'yoga': 4, 'pilates': 3,
+            'functional_training': 3, 'resistance_bands': 4, 'stationary_bike': 3, 'yoga_mat': 2,
+            'beginner': 3, 'crossfit': -4, 'hiit': -3, 'calisthenics': -2, 'jump_rope': -4,
+            'pull_up_bar': -3, 'build_muscle': -1, 'advanced': -3,
+        },
+        'notes': {
+            'fitness_goals': 'Emphasize balance, mobility and everyday function.',
+            'equipment_options': 'Use stable, low-impact equipment and support when balancing.',
+            'workout_types': 'Keep intensity low to moderate; check with a doctor before strenuous exercise.',
+            'experience_levels': 'Progress slowly; expect steady gains over 12 weeks or more.',
+        },
+        'option_notes': {
+            'functional_training': 'Sit-to-stand, step-ups and carries support independence in daily life.',
+            'treadmill': 'Use the handrails and a slow start; walking is ideal.',
+            'crossfit': 'Not recommended; choose functional or low-impact strength training.',
+            'jump_rope': 'Not recommended because of fall and joint risk.',
+        },
+    },
+}
+
+# Selection rules: a selected (type, id) adds these adjustments to related options
+SELECTION_RULES = {
+    ('goal', 'lose_weight'): {'hiit': 2, 'cardio': 2, 'jump_rope': 1, 'treadmill': 1, 'stationary_bike': 1},
+    ('goal', 'build_muscle'): {'strength_training': 3, 'dumbbells': 2, 'bench': 2, 'pull_up_bar': 1, 'calisthenics': 1},
+    ('goal', 'improve_endurance'): {'cardio': 3, 'hiit': 1, 'treadmill': 2, 'stationary_bike': 2, 'jump_rope': 1},
+    ('goal', 'increase_flexibility'): {'yoga': 3, 'pilates': 2, 'yoga_mat': 2, 'foam_roller': 2},
+    ('goal', 'general_fitness'): {'functional_training': 2, 'cardio': 1, 'resistance_bands': 1},
+    ('goal', 'tone_body'): {'pilates': 2, 'strength_training': 1, 'resistance_bands': 2, 'dumbbells': 1},
+    ('level', 'beginner'): {'resistance_bands': 1, 'yoga_mat': 1, 'crossfit': -2},
+    ('level', 'advanced'): {'crossfit': 2, 'hiit': 1, 'pull_up_bar': 1},
+    ('equipment', 'dumbbells'): {'strength_training': 1},
+    ('equipment', 'kettlebell'): {'functional_training': 1, 'strength_training': 1},
+    ('equipment', 'pull_up_bar'): {'calisthenics': 2},
+    ('equipment', 'yoga_mat'): {'yoga': 1, 'pilates': 1},
+    ('equipment', 'treadmill'): {'cardio': 1},
+    ('equipment', 'stationary_bike'): {'cardio': 1},
+    ('workout', 'strength_training'): {'dumbbells': 1, 'bench': 1},
+    ('workout', 'yoga'): {'yoga_mat': 2},
+    ('workout', 'cardio'): {'treadmill': 1, 'stationary_bike': 1, 'jump_rope': 1},
+}
+
+
+def _clamp(score: int) -> int:
+    return max(1, min(10, score))
+
+
+class OptionsRulesEngine:
+    """
+    Ranks the catalog with AGE_BAND_RULES and SELECTION_RULES.
+
+    Args:
+        catalog: OptionsCatalog to rank (default: the static catalog)
+    """
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog or options_catalog
+        # Age band (None: no band) -> category -> [(base score, option dict with its note)]
+        self._bands = {band: self._compile(band) for _, band in AGE_GROUPS}
+        self._bands[None] = self._compile(None)
+
+    def _compile(self, band: Optional[str]) -> Dict[str, List[Tuple[int, Dict]]]:
+        rules = AGE_BAND_RULES.get(band, {})
+        relevance = rules.get('relevance', {})
+        notes = rules.get('notes', {})
+        option_notes = rules.get('option_notes', {})
+
+        compiled = {}
+        for category, options in self.catalog.options.items():
+            field = CATEGORY_NOTE_FIELDS[category]
+            note = notes.get(category, DEFAULT_NOTES[category])
+            compiled[category] = [
+                (DEFAULT_RELEVANCE + relevance.get(option['id'], 0),
+                 {**option, field: option_notes.get(option['id'], note)})
+                for option in options
+            ]
+        return compiled
+
+    def rank(self, user_age=None, user_selections: Optional[List[Dict]] = None) -> Dict:
+        """
+        Score and order the catalog for an age and the current selections.
+
+        Args:
+            user_age: The age of the user; None or an invalid age applies no age band
+            user_selections: Current selections; catalog options among them score 10
+                and boost related options
+
+        Returns:
+            Dict: FitnessOptions-shaped options per category, most relevant first
+        """
+        try:
+            band = get_age_group(int(user_age))
+        except (TypeError, ValueError):
+            band = None
+
+        selected = set()
+        boosts = {}
+        for selection in user_selections or []:
+            key = (selection.get('type'), selection.get('id'))
+            selected.add((SELECTION_CATEGORIES.get(key[0]), key[1]))
+            for option_id, boost in SELECTION_RULES.get(key, {}).items():
+                boosts[option_id] = boosts.get(option_id, 0) + boost
+
+        ranked = {}
+        for category, options in self._bands[band].items():
+            scored = []
+            for base, option in options:
+                if (category, option['id']) in selected:
+                    score = SELECTED_RELEVANCE
+                else:
+                    score = _clamp(base + boosts.get(option['id'], 0))
+                scored.append({**option, 'relevance_score': score})
+            # sorted() is stable, so ties keep their catalog order
+            ranked[category] = sorted(scored, key=lambda option: -option['relevance_score'])
+        return ranked
+
+
+options_rules = OptionsRulesEngine()
@@ -0,0 +1,403 @@
+"""
+Repair of malformed or invalid structured LLM output.
+
+A plan or options response that failed to parse or validate used to fail the
+whole request, and the client retried the entire generation. The pipeline here
+salvages the output in increasing order of cost:
+
+1. repair_json(): tolerant parsing of code fences, surrounding prose,
+   comments, trailing commas, raw control characters in strings and
+   truncated output (open strings and containers are closed)
+2. coerce_to_schema(): field-level coercion to the pydantic schema, e.g.
+   "3 sets" -> 3 for an int field, 12 -> "12" for a str field, a single value
+   -> [value] for a list field and a missing Optional field -> None
+3. repair_structured_output(): validates, and re-prompts only the subtrees
+   (a day, a week, an options category) that still fail validation
+
+llm_output_repairs_total counts the repairs. llm_repair_saved_tokens_total and
+llm_repair_saved_seconds_total estimate what regenerating the whole output
+would have cost beyond the repairs.
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union, get_args, get_origin
+import json
+import logging
+import os
+import re
+import time
+
+from pydantic import BaseModel, ValidationError
+
+from .metrics import LLM_OUTPUT_REPAIRS, LLM_PARSE_FAILURES, LLM_REPAIR_SAVED_SECONDS, LLM_REPAIR_SAVED_TOKENS
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Rounds of subtree re-prompts before giving up (0 disables re-prompts)
+LLM_REPAIR_MAX_ROUNDS = int(os.environ.get("LLM_REPAIR_MAX_ROUNDS", 2))
+
+_CLOSERS = {'{': '}', '[': ']'}
+_CONTROL_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+# Incomplete literal at the end of truncated output, e.g. `tru` or `12.`
+_PARTIAL_LITERAL = re.compile(r'(?:t|tr|tru|f|fa|fal|fals|n|nu|nul|-|[-0-9.]*[.eE][-+]?)$')
+_LEADING_INT = re.compile(r'\s*(-?\d+)')
+
+
+class RepairedJson(NamedTuple):
+    """Parsed JSON and the names of the repairs needed to parse it."""
+    data: Any
+    repairs: Tuple[str, ...]
+
+
+def parse_json_output(text: str) -> RepairedJson:
+    """
+    Parse LLM output as JSON, repairing it only when it is not valid as is.
+
+    Raises:
+        ValueError: When the output has no JSON object or array to salvage
+    """
+    try:
+        return RepairedJson(json.loads(text), ())
+    except (json.JSONDecodeError, TypeError):
+        return repair_json(text)
+
+
+def repair_json(text: str) -> RepairedJson:
+    """
+    Parse malformed JSON from an LLM.
+
+    Skips text around the first top-level object or array (e.g. a ```json
+    fence), drops comments and trailing commas, escapes raw control characters
+    in strings, and closes output that was cut off. An incomplete last member
+    of a truncated container is kept when it parses (a dangling key gets a null
+    value) and dropped otherwise, so schema validation can flag what is missing.
+
+    Raises:
+        ValueError: When the output has no JSON object or array to salvage
+    """
+    starts = [pos for pos in (text.find('{'), text.find('[')) if pos >= 0]
+    if not starts:
+        raise ValueError("No JSON object or array in the output")
+    start = min(starts)
+    repairs = []
+    if start and text[:start].strip():
+        repairs.append('code_fence' if '```' in text[:start] else 'surrounding_text')
+
+    out: List[str] = []
+    # Open containers: [opening bracket, length of out after its last ',' or opening bracket]
+    stack: List[List] = []
+    in_string = escape = False
+    pos, end = start, len(text)
+    while pos < end:
+        char = text[pos]
+        pos += 1
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char < ' ':
+                out.append(_CONTROL_ESCAPES.get(char, f"\\u{ord(char):04x}"))
+                if 'control_character' not in repairs:
+                    repairs.append('control_character')
+                continue
+            out.append(char)
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char in _CLOSERS:
+            out.append(char)
+            stack.append([char, len(out)])
+        elif char in '}]':
+            if _strip_trailing_comma(out) and 'trailing_comma' not in repairs:
+                repairs.append('trailing_comma')
+            opening = stack.pop()[0] if stack else None
+            if opening is None:
+                break
+            out.append(_CLOSERS[opening])
+            if not stack:
+                if text[pos:].strip().strip('`').strip():
+                    if 'surrounding_text' not in repairs:
+                        repairs.append('surrounding_text')
+                elif '```' in text[pos:] and 'code_fence' not in repairs:
+                    repairs.append('code_fence')
+                break
+        elif char == ',':
+            out.append(char)
+            if stack:
+                stack[-1][1] = len(out)
+        elif char == '/' and text[pos:pos + 1] in ('/', '*'):
+            # Comments are not JSON
+            close = '\n' if text[pos] == '/' else '*/'
+            found = text.find(close, pos + 1)
+            pos = end if found < 0 else found + len(close)
+            if 'comment' not in repairs:
+                repairs.append('comment')
+        else:
+            out.append(char)
+
+    if not stack:
+        data = _loads(''.join(out))
+        if data is None:
+            raise ValueError("Output is not repairable JSON")
+        return RepairedJson(data, tuple(repairs))
+
+    # Cut off: close the open string and containers, dropping incomplete members if needed
+    repairs.append('truncated')
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    while stack:
+        data = _loads(_close(out, stack))
+        if data is not None:
+            return RepairedJson(data, tuple(repairs))
+        # Drop the incomplete last member of the innermost container
+        del out[stack[-1][1]:]
+        data = _loads(_close(out, stack))
+        if data is not None:
+            return RepairedJson(data, tuple(repairs))
+        stack.pop()
+        # Drop the innermost container itself (it is a member of its parent)
+        del out[(stack[-1][1] if stack else 0):]
+    raise ValueError("Output is not repairable JSON")
+
+
+def _strip_trailing_comma(out: List[str]) -> bool:
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ',':
+        del out[index]
+        return True
+    return False
+
+
+def _close(out: List[str], stack: List[List]) -> str:
+    text = ''.join(out).rstrip()
+    if not text.endswith(('true', 'false', 'null')):
+        text = _PARTIAL_LITERAL.sub('', text).rstrip()
+    if text.endswith(','):
+        text = text[:-1]
+    elif text.endswith(':'):
+        text += ' null'
+    return text + ''.join(_CLOSERS[opening] for opening, _ in reversed(stack))
+
+
+def _loads(text: str):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def _unwrap_optional(annotation) -> Tuple[Any, bool]:
+    """(annotation without None, whether None is allowed)."""
+    if get_origin(annotation) is Union:
+        args = get_args(annotation)
+        non_none = [arg for arg in args if arg is not type(None)]
+        if len(non_none) == 1:
+            return non_none[0], len(non_none) < len(args)
+    return annotation, False
+
+
+def _coerce(value, annotation, counts: List[int]):
+    annotation, nullable = _unwrap_optional(annotation)
+    if value is None:
+        return value
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _coerce_model(value, annotation, counts) if isinstance(value, dict) else value
+    if get_origin(annotation) in (list, List):
+        (item,) = get_args(annotation) or (Any,)
+        if not isinstance(value, list):
+            counts[0] += 1
+            value = [value]
+        return [_coerce(element, item, counts) for element in value]
+    if annotation is int and not isinstance(value, bool):
+        if isinstance(value, float) and value.is_integer():
+            counts[0] += 1
+            return int(value)
+        if isinstance(value, str):
+            match = _LEADING_INT.match(value)
+            if match:
+                counts[0] += 1
+                return int(match.group(1))
+    elif annotation is str and isinstance(value, (int, float)) and not isinstance(value, bool):
+        counts[0] += 1
+        return str(value)
+    return value
+
+
+def _coerce_model(data: Dict, model, counts: List[int]) -> Dict:
+    for name, field in model.model_fields.items():
+        if name in data:
+            data[name] = _coerce(data[name], field.annotation, counts)
+        elif field.is_required() and _unwrap_optional(field.annotation)[1]:
+            # Optional[...] fields without a default are required by pydantic; the model allows None
+            data[name] = None
+            counts[0] += 1
+    return data
+
+
+def coerce_to_schema(data, annotation) -> Tuple[Any, int]:
+    """
+    Coerce parsed output in place towards a pydantic model or type annotation.
+
+    Returns:
+        Tuple[Any, int]: The data and the number of values coerced
+    """
+    counts = [0]
+    return _coerce(data, annotation, counts), counts[0]
+
+
+def annotation_at(model, path: Sequence) -> Any:
+    """Type annotation of the value at a path (keys and list indexes) in a model."""
+    annotation = model
+    for key in path:
+        annotation, _ = _unwrap_optional(annotation)
+        if isinstance(key, int):
+            (annotation,) = get_args(annotation) or (Any,)
+        else:
+            annotation = annotation.model_fields[key].annotation
+    return annotation
+
+
+def get_path(data, path: Sequence):
+    """Value at a path, or None when the path does not exist."""
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+
+def set_path(data, path: Sequence, value) -> None:
+    """Set the value at a path; an index one past the end of a list appends."""
+    parent = get_path(data, path[:-1])
+    key = path[-1]
+    if isinstance(parent, list) and key == len(parent):
+        parent.append(value)
+    else:
+        parent[key] = value
+
+
+def subtree_of(loc: Sequence, units: Sequence[Tuple]) -> Tuple:
+    """
+    The repairable subtree a validation error location falls in.
+
+    Args:
+        loc: Location of a pydantic error, e.g. ('weeks', 0, 'days', 2, 'exercises')
+        units: Subtree patterns, most specific first; `int` matches any list index
+            and `str` any key, e.g. (('weeks', int, 'days', int), ('weeks', int))
+
+    Returns:
+        Tuple: The matching prefix of loc, or () for the whole output
+    """
+    for unit in units:
+        if len(loc) >= len(unit) and all(
+            isinstance(part, pattern) if isinstance(pattern, type) else part == pattern
+            for part, pattern in zip(loc, unit)
+        ):
+            return tuple(loc[:len(unit)])
+    return ()
+
+
+def format_errors(errors: List[Dict]) -> str:
+    """One line per pydantic error, for re-prompts and logs."""
+    return "\n".join(f"- {'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in errors)
+
+
+# regenerate(whole output, path, errors at the path) -> the new value of the subtree at the path
+Regenerate = Callable[[Any, Tuple, List[Dict]], Any]
+
+
+def repair_structured_output(text: str, model, schema: Optional[str] = None, units: Sequence[Tuple] = (),
+                             regenerate: Optional[Regenerate] = None,
+                             prepare: Optional[Callable[[Any], Any]] = None,
+                             missing: Optional[Callable[[Any], List[Tuple]]] = None,
+                             generation_seconds: float = 0.0,
+                             max_rounds: int = LLM_REPAIR_MAX_ROUNDS) -> BaseModel:
+    """
+    Parse, coerce and validate LLM output, re-prompting only invalid subtrees.
+
+    Args:
+        text: Raw output of the LLM
+        model: Pydantic model the output must validate against
+        schema: Name used in metrics; defaults to the model name
+        units: Subtree patterns that can be regenerated on their own (see subtree_of)
+        regenerate: Produces a new value for an invalid (or missing) subtree; the
+            current value is get_path(data, path), None when missing
+        prepare: Adjusts the parsed data before validation (e.g. sets a known week number)
+        missing: Returns paths of subtrees the output lacks (e.g. weeks after a
+            truncation); they are generated like invalid ones
+        generation_seconds: How long the original generation took, for the savings metrics
+        max_rounds: Rounds of re-prompts before giving up
+
+    Returns:
+        BaseModel: The validated output
+
+    Raises:
+        OutputParserException: When the output cannot be parsed at all
+        ValidationError: When the output is still invalid after the repairs
+    """
+    from langchain_core.exceptions import OutputParserException
+
+    schema = schema or model.__name__
+    with tracer.span('output.parse', schema=schema) as span:
+        try:
+            data, repairs = parse_json_output(text)
+        except ValueError as e:
+            LLM_PARSE_FAILURES.inc(schema=schema, kind='json')
+            raise OutputParserException(f"Invalid json output: {e}", llm_output=text) from e
+        data, coerced = coerce_to_schema(data, model)
+        if span is not None:
+            span.set_attributes({'repairs': list(repairs), 'coerced': coerced})
+    for repair in repairs:
+        LLM_OUTPUT_REPAIRS.inc(schema=schema, repair=repair)
+    if coerced:
+        LLM_OUTPUT_REPAIRS.inc(coerced, schema=schema, repair='coercion')
+    if prepare is not None:
+        data = prepare(data)
+
+    regenerated = 0
+    regenerate_seconds = 0.0
+    regenerate_chars = 0
+    for round_number in range(max_rounds + 1):
+        paths = {path: [] for path in (missing(data) if missing else [])}
+        try:
+            with tracer.span('output.validate', schema=schema):
+                result = model.model_validate(data)
+            if not paths or round_number == max_rounds or regenerate is None:
+                break
+        except ValidationError as e:
+            if round_number == 0:
+                LLM_PARSE_FAILURES.inc(schema=schema, kind='validation')
+            errors = e.errors()
+            for error in errors:
+                paths.setdefault(subtree_of(error['loc'], units), []).append(error)
+            if () in paths or regenerate is None or round_number == max_rounds:
+                raise
+            logger.info("Re-prompting %d invalid subtrees of %s", len(paths), schema,
+                        extra={'paths': ['.'.join(map(str, path)) for path in paths]})
+
+        # A regenerated subtree replaces everything below it
+        paths = {path: errors for path, errors in paths.items()
+                 if not any(path[:len(other)] == other for other in paths if other != path)}
+        for path, errors in sorted(paths.items()):
+            with tracer.span('output.regenerate', schema=schema, path='.'.join(map(str, path))):
+                start = time.perf_counter()
+                value = regenerate(data, path, errors)
+                regenerate_seconds += time.perf_counter() - start
+            regenerate_chars += len(json.dumps(value, default=str))
+            value, _ = coerce_to_schema(value, annotation_at(model, path))
+            set_path(data, path, value)
+            regenerated += 1
+            LLM_OUTPUT_REPAIRS.inc(schema=schema, repair='subtree')
+
+    if repairs or coerced or regenerated:
+        # A full regeneration would cost about as much as the original output again
+        LLM_REPAIR_SAVED_TOKENS.inc(max(0, (len(text) - regenerate_chars) // 4), schema=schema)
+        LLM_REPAIR_SAVED_SECONDS.inc(max(0.0, generation_seconds - regenerate_seconds), schema=schema)
+    return result
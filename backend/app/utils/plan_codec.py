@@ -0,0 +1,375 @@
+"""
+Compressed encoding of workout plan documents.
+
+Every saved plan version keeps its whole plan_data, about 15-25 KB of JSON
+that repeats the same keys, exercise names and instructions across weeks and
+plans. WorkoutPlan.plan_data is stored through the CompressedJSON type
+(models/types.py), which encodes documents with this module:
+
+    tag (1 byte) | dictionary id (4 bytes, big-endian) | payload
+
+- tag: b'Z' zstd, b'D' raw deflate (zlib) or b'J' uncompressed JSON
+- dictionary id: content hash of the compression dictionary, 0 for none
+
+Compact JSON is compressed with a shared dictionary, so the strings every
+plan repeats cost a few bytes. The built-in dictionary is the sample plan
+(workout_plan.json); `flask --app run plans compress --train` trains one from
+stored plans (zstd dictionary training, or the most frequent strings for
+zlib) and re-encodes the rows with it. Dictionaries are kept in
+plan_data_dictionaries, since rows need theirs to be read back.
+
+PLAN_DATA_CODEC picks the codec for new rows: zstd (default; needs the
+zstandard package, otherwise zlib is used), zlib or none. Rows written before
+compression (JSON text) are still read.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODECS = ('zstd', 'zlib', 'none')
+PLAN_DATA_CODEC = os.environ.get("PLAN_DATA_CODEC", "zstd").lower()
+PLAN_DATA_COMPRESSION_LEVEL = int(os.environ.get("PLAN_DATA_COMPRESSION_LEVEL", 9))
+# Size of trained dictionaries; zlib only uses the last 32 KB
+PLAN_DATA_DICTIONARY_BYTES = int(os.environ.get("PLAN_DATA_DICTIONARY_BYTES", 64 * 1024))
+
+SAMPLE_PLAN_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'workout_plan.json')
+
+TAGS = {'zstd': b'Z', 'zlib': b'D', 'none': b'J'}
+CODEC_BY_TAG = {tag: codec for codec, tag in TAGS.items()}
+HEADER_BYTES = 5
+ZLIB_WINDOW = 32 * 1024
+
+
+class PlanCodecError(ValueError):
+    """Raised when stored plan data can't be decoded."""
+
+
+def effective_codec(codec: Optional[str] = None) -> str:
+    """The codec to write with: zstd falls back to zlib without the zstandard package."""
+    codec = (codec or PLAN_DATA_CODEC).lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown plan data codec: {codec}")
+    if codec == 'zstd' and zstandard is None:
+        return 'zlib'
+    return codec
+
+
+def dictionary_id(data: bytes) -> int:
+    """Content hash of a dictionary, as stored in the header of the rows using it."""
+    return int.from_bytes(hashlib.sha256(data).digest()[:4], 'big') or 1
+
+
+def serialize(document) -> bytes:
+    return json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class DictionaryRegistry:
+    """Compression dictionaries by id, and the one new rows are written with."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.dictionaries: Dict[int, bytes] = {}
+        self.current: Optional[int] = None
+
+    def register(self, data: bytes, current: bool = False) -> int:
+        entry_id = dictionary_id(data)
+        with self._lock:
+            self.dictionaries[entry_id] = data
+            if current:
+                self.current = entry_id
+        return entry_id
+
+    def get(self, entry_id: int) -> bytes:
+        data = self.dictionaries.get(entry_id)
+        if data is None:
+            data = _fetch_dictionary(entry_id)
+            if data is None:
+                raise PlanCodecError(f"Unknown plan data dictionary {entry_id:#010x}")
+            self.register(data)
+        return data
+
+    def _cache(self) -> Dict:
+        # zstd (de)compressors must not be shared between threads
+        cache = getattr(self._local, 'cache', None)
+        if cache is None:
+            cache = self._local.cache = {}
+        return cache
+
+    def compressor(self, entry_id: int, level: int):
+        key = ('c', entry_id, level)
+        cache = self._cache()
+        if key not in cache:
+            data = self.get(entry_id) if entry_id else None
+            cache[key] = zstandard.ZstdCompressor(
+                level=level, dict_data=zstandard.ZstdCompressionDict(data) if data else None)
+        return cache[key]
+
+    def decompressor(self, entry_id: int):
+        key = ('d', entry_id)
+        cache = self._cache()
+        if key not in cache:
+            data = self.get(entry_id) if entry_id else None
+            cache[key] = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(data) if data else None)
+        return cache[key]
+
+
+def builtin_dictionary() -> bytes:
+    """The built-in dictionary: the sample plan as compact JSON."""
+    with open(SAMPLE_PLAN_PATH) as f:
+        return serialize(json.load(f)['plan_data'])
+
+
+registry = DictionaryRegistry()
+
+
+def _current_dictionary() -> int:
+    if registry.current is None:
+        registry.register(builtin_dictionary(), current=True)
+    return registry.current
+
+
+def encode(document, codec: Optional[str] = None, dictionary: Optional[int] = None,
+           level: int = PLAN_DATA_COMPRESSION_LEVEL) -> bytes:
+    """
+    Encode a JSON document.
+
+    Args:
+        document: The JSON-serializable document
+        codec: zstd, zlib or none (default: PLAN_DATA_CODEC)
+        dictionary: Id of a registered dictionary (default: the current one, 0 for none)
+        level: Compression level
+    """
+    codec = effective_codec(codec)
+    raw = serialize(document)
+    if codec == 'none':
+        return TAGS['none'] + bytes(4) + raw
+    entry_id = _current_dictionary() if dictionary is None else dictionary
+    if codec == 'zstd':
+        payload = registry.compressor(entry_id, level).compress(raw)
+    else:
+        options = {'zdict': registry.get(entry_id)[-ZLIB_WINDOW:]} if entry_id else {}
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, **options)
+        payload = compressor.compress(raw) + compressor.flush()
+    return TAGS[codec] + entry_id.to_bytes(4, 'big') + payload
+
+
+def decode(data) -> object:
+    """Decode a document written by encode(), or JSON text written before compression."""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        return json.loads(data)
+    data = bytes(data)
+    codec = CODEC_BY_TAG.get(data[:1])
+    if codec is None:
+        # Plain JSON from before compression
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError as e:
+            raise PlanCodecError(f"Unrecognized plan data encoding: {e}")
+    entry_id = int.from_bytes(data[1:HEADER_BYTES], 'big')
+    payload = data[HEADER_BYTES:]
+    if codec == 'zstd':
+        if zstandard is None:
+            raise PlanCodecError("Plan data is zstd-compressed; install the zstandard package to read it")
+        raw = registry.decompressor(entry_id).decompress(payload)
+    elif codec == 'zlib':
+        options = {'zdict': registry.get(entry_id)[-ZLIB_WINDOW:]} if entry_id else {}
+        decompressor = zlib.decompressobj(-15, **options)
+        raw = decompressor.decompress(payload) + decompressor.flush()
+    else:
+        raw = payload
+    return json.loads(raw.decode('utf-8'))
+
+
+def describe(data) -> Tuple[str, int]:
+    """The codec and dictionary id of encoded data ('json', 0 for data from before compression)."""
+    if data is None or isinstance(data, str) or bytes(data[:1]) not in CODEC_BY_TAG:
+        return 'json', 0
+    return CODEC_BY_TAG[bytes(data[:1])], int.from_bytes(bytes(data[1:HEADER_BYTES]), 'big')
+
+
+def _strings(document, counts: Counter) -> None:
+    if isinstance(document, dict):
+        for key, value in document.items():
+            counts[json.dumps(key) + ':'] += 1
+            _strings(value, counts)
+    elif isinstance(document, list):
+        for value in document:
+            _strings(value, counts)
+    elif isinstance(document, str):
+        counts[json.dumps(document, ensure_ascii=False)] += 1
+
+
+def train_dictionary(documents: List, codec: Optional[str] = None,
+                     size: int = PLAN_DATA_DICTIONARY_BYTES) -> bytes:
+    """
+    Build a compression dictionary from sample documents.
+
+    zstd dictionaries are trained with zstandard; for zlib, or when there are
+    too few samples to train, the dictionary is the most frequent keys and
+    strings, the most valuable last (closest to the data, which deflate
+    prefers). It is limited to 32 KB for zlib.
+    """
+    codec = effective_codec(codec)
+    samples = [serialize(document) for document in documents]
+    if codec == 'zstd' and samples:
+        try:
+            return zstandard.train_dictionary(size, samples).as_bytes()
+        except zstandard.ZstdError as e:
+            logger.info("Training a zstd dictionary from %d plans failed (%s); using frequent strings", len(samples), e)
+
+    counts = Counter()
+    for document in documents:
+        _strings(document, counts)
+    limit = min(size, ZLIB_WINDOW) if codec == 'zlib' else size
+    chosen, total = [], 0
+    for fragment, count in sorted(counts.items(), key=lambda item: (-item[1] * len(item[0]), item[0])):
+        encoded = fragment.encode('utf-8')
+        if count < 2 or total + len(encoded) > limit:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b''.join(reversed(chosen))
+
+
+def _fetch_dictionary(entry_id: int) -> Optional[bytes]:
+    """Read a dictionary written by another process; needs an app context."""
+    from flask import has_app_context
+    from ..models.plan_data_dictionary import PlanDataDictionary
+    from ..models.user_profile import db
+
+    if not has_app_context():
+        return None
+    # A separate connection: this runs while a result row is being processed
+    with db.engine.connect() as connection:
+        return connection.execute(
+            db.select(PlanDataDictionary.data).where(PlanDataDictionary.id == entry_id)
+        ).scalar()
+
+
+def save_dictionary(data: bytes, codec: str, samples: int = 0) -> int:
+    """Store a dictionary (if new) in the current transaction and register it; returns its id."""
+    from sqlalchemy.exc import IntegrityError
+    from ..models.plan_data_dictionary import PlanDataDictionary
+    from ..models.user_profile import db
+
+    entry_id = registry.register(data)
+    if db.session.get(PlanDataDictionary, entry_id) is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(PlanDataDictionary(id=entry_id, codec=codec, data=data, samples=samples))
+        except IntegrityError:
+            pass  # Another worker stored the same dictionary
+    return entry_id
+
+
+def init_app(app) -> None:
+    """
+    Make the newest stored dictionary current for new rows, storing the
+    built-in one first if there is none.
+    """
+    from ..models.plan_data_dictionary import PlanDataDictionary
+    from ..models.user_profile import db
+
+    codec = effective_codec()
+    if PLAN_DATA_CODEC == 'zstd' and codec != 'zstd':
+        logger.warning("zstandard is not installed; compressing plan data with zlib")
+    with app.app_context():
+        latest = (
+            PlanDataDictionary.query.filter(PlanDataDictionary.codec.in_((codec, 'builtin')))
+            .order_by(PlanDataDictionary.created_at.desc(), PlanDataDictionary.id.desc())
+            .first()
+        )
+        data = latest.data if latest is not None else builtin_dictionary()
+        if latest is None:
+            save_dictionary(data, 'builtin')
+            db.session.commit()
+        registry.register(data, current=True)
+
+
+def _plan_batches(batch_size: int) -> Iterable[List]:
+    """Yield (id, raw plan_data) rows of workout_plans, batch_size at a time by id."""
+    from ..models.user_profile import db
+
+    table = db.metadata.tables['workout_plans']
+    raw = db.column('plan_data', db.LargeBinary)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, raw).select_from(table)
+            .where(table.c.id > last_id, raw.isnot(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def compress_stored_plans(batch_size: int = 500, train: bool = False, samples: int = 1000,
+                          codec: Optional[str] = None) -> Dict:
+    """
+    Re-encode stored plans with the current codec and dictionary, optionally
+    training a new dictionary from up to `samples` stored plans first.
+
+    Rows already encoded with the current codec and dictionary are skipped;
+    one transaction per batch_size rows.
+
+    Returns:
+        Dict: Counts of rows scanned and re-encoded, bytes before and after,
+        and the dictionary id used
+    """
+    from ..models.user_profile import db
+
+    codec = effective_codec(codec)
+    if train:
+        documents = []
+        for rows in _plan_batches(min(batch_size, samples)):
+            documents.extend(doc for doc in (decode(data) for _, data in rows) if doc is not None)
+            if len(documents) >= samples:
+                break
+        if documents:
+            data = train_dictionary(documents[:samples], codec)
+            entry_id = save_dictionary(data, codec, samples=len(documents[:samples]))
+            db.session.commit()
+            registry.register(data, current=True)
+    entry_id = _current_dictionary() if codec != 'none' else 0
+
+    table = db.metadata.tables['workout_plans']
+    stats = Counter()
+    for rows in _plan_batches(batch_size):
+        updates = []
+        for plan_id, data in rows:
+            stats['plans'] += 1
+            stats['bytes_before'] += len(data)
+            if describe(data) == (codec, entry_id):
+                stats['bytes_after'] += len(data)
+                continue
+            encoded = encode(decode(data), codec, entry_id)
+            stats['bytes_after'] += len(encoded)
+            stats['recompressed'] += 1
+            updates.append({'plan_id': plan_id, 'plan_data': encoded})
+        if updates:
+            db.session.execute(
+                table.update().where(table.c.id == db.bindparam('plan_id'))
+                .values(plan_data=db.bindparam('plan_data', type_=db.LargeBinary)),
+                updates,
+            )
+        db.session.commit()
+    return {'plans': stats['plans'], 'recompressed': stats['recompressed'], 'bytes_before': stats['bytes_before'],
+            'bytes_after': stats['bytes_after'], 'dictionary': f"{entry_id:#010x}", 'codec': codec}
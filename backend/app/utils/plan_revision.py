@@ -0,0 +1,223 @@
+"""
+Incremental revision of a workout plan after a profile update.
+
+Changing one profile field used to require a new full 3-week plan. When only
+equipment or workout types changed, most of the latest plan is still valid,
+so revise_plan() re-prompts only the affected days, and only for the
+exercises that change:
+
+- exercises that need removed equipment, or are of a removed workout type,
+  are replaced
+- newly available equipment and newly preferred workout types are added as
+  one exercise to one workout day per week (the day with the fewest
+  exercises, spreading several additions over different days)
+
+The model's answers are checked before they are saved: a replacement that
+still needs removed equipment or is of a removed workout type is dropped (the
+exercise it replaced is removed), as is an addition needing equipment the
+profile doesn't have. Both are counted in the revision summary.
+
+Each affected day costs one small LLM call (its DayRevision), run
+concurrently up to WORKOUT_PLAN_MAX_CONCURRENCY. Changes to the age, fitness
+goal or experience level affect every exercise, so they still need a full
+plan (see needs_full_regeneration()).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple
+import copy
+import logging
+
+from ..models.workout_exercise import WorkoutPlanData
+from .search import PLAN_MAX_CONCURRENCY, revise_workout_day
+from .tracing import tracer, wrap
+
+logger = logging.getLogger(__name__)
+
+# Profile fields that change every exercise of a plan
+PLAN_WIDE_FIELDS = ('age', 'fitness_goal', 'experience_level')
+# Profile fields handled by revising individual days
+REVISABLE_FIELDS = ('equipment', 'workout_types')
+# Equipment names meaning no equipment, always available
+NO_EQUIPMENT = frozenset({'bodyweight', 'body weight', 'none', 'no equipment'})
+
+
+class DayEdit(NamedTuple):
+    """Exercises of one day to replace (index, reason) and additions to make (reason)."""
+    week_index: int
+    day_index: int
+    replace: Tuple[Tuple[int, str], ...]
+    add: Tuple[str, ...]
+
+
+def _normalized(values) -> Dict[str, str]:
+    return {str(value).strip().lower(): str(value).strip() for value in values or []}
+
+
+def _removed(changes: Dict[str, Tuple]) -> Tuple[set, set]:
+    """Normalized equipment and workout types that net profile changes removed."""
+    old_equipment, new_equipment = (_normalized(values) for values in changes.get('equipment', ((), ())))
+    old_types, new_types = (_normalized(values) for values in changes.get('workout_types', ((), ())))
+    return old_equipment.keys() - new_equipment.keys(), old_types.keys() - new_types.keys()
+
+
+def _uses_removed(exercise: Dict, removed_equipment: set, removed_types: set) -> bool:
+    return (any(str(item).strip().lower() in removed_equipment for item in exercise.get('equipment') or [])
+            or str(exercise.get('type', '')).strip().lower() in removed_types)
+
+
+def _needs_unavailable(exercise: Dict, available_equipment: set) -> bool:
+    return any(str(item).strip().lower() not in available_equipment | NO_EQUIPMENT
+               for item in exercise.get('equipment') or [])
+
+
+def needs_full_regeneration(changes: Dict[str, Tuple]) -> bool:
+    """Whether net profile changes ({field: (old, new)}) need a new full plan."""
+    return any(field in changes for field in PLAN_WIDE_FIELDS)
+
+
+def plan_day_edits(plan_data: Dict, changes: Dict[str, Tuple]) -> List[DayEdit]:
+    """
+    Find the days of a plan affected by equipment and workout type changes.
+
+    Args:
+        plan_data: WorkoutPlanData-shaped plan
+        changes: Net profile changes, {field: (old_value, new_value)}
+
+    Returns:
+        List[DayEdit]: One edit per affected day, in plan order
+    """
+    old_equipment, new_equipment = (_normalized(values) for values in changes.get('equipment', ((), ())))
+    old_types, new_types = (_normalized(values) for values in changes.get('workout_types', ((), ())))
+    removed_equipment, removed_types = _removed(changes)
+    additions = (
+        [f"one that uses the newly available {name}"
+         for key, name in new_equipment.items() if key not in old_equipment]
+        + [f"one of the newly preferred workout type {name}"
+           for key, name in new_types.items() if key not in old_types]
+    )
+
+    edits = {}
+    for week_index, week in enumerate(plan_data.get('weeks', [])):
+        days = week.get('days', [])
+        for day_index, day in enumerate(days):
+            for exercise_index, exercise in enumerate(day.get('exercises', [])):
+                missing = [item for item in exercise.get('equipment') or []
+                           if str(item).strip().lower() in removed_equipment]
+                if missing:
+                    reason = f"needs {', '.join(missing)}, which is no longer available"
+                elif str(exercise.get('type', '')).strip().lower() in removed_types:
+                    reason = f"is {exercise['type']}, which is no longer a preferred workout type"
+                else:
+                    continue
+                edit = edits.setdefault((week_index, day_index), ([], []))
+                edit[0].append((exercise_index, reason))
+
+        # Spread the additions over the workout days with the fewest exercises
+        workout_days = [day_index for day_index, day in enumerate(days) if day.get('exercises')]
+        for addition in additions:
+            if not workout_days:
+                break
+            day_index = min(workout_days, key=lambda index: (
+                len(edits.get((week_index, index), ((), ()))[1]), len(days[index]['exercises']), index
+            ))
+            edits.setdefault((week_index, day_index), ([], []))[1].append(addition)
+
+    return [
+        DayEdit(week_index, day_index, tuple(replace), tuple(add))
+        for (week_index, day_index), (replace, add) in sorted(edits.items())
+    ]
+
+
+def _format_exercises(exercises: List[Dict]) -> str:
+    lines = []
+    for index, exercise in enumerate(exercises, start=1):
+        amount = exercise.get('duration') or f"{exercise.get('sets')} x {exercise.get('reps')}"
+        equipment = ', '.join(exercise.get('equipment') or []) or 'no equipment'
+        lines.append(f"    {index}. {exercise['name']} ({exercise['type']}; {equipment}; {amount})")
+    return "\n".join(lines)
+
+
+def _format_edits(day: Dict, edit: DayEdit) -> str:
+    lines = []
+    if edit.replace:
+        lines.append(f"Replace these {len(edit.replace)} exercises, in order:")
+        lines.extend(f"    - {day['exercises'][index]['name']}: {reason}" for index, reason in edit.replace)
+    else:
+        lines.append("Replace no exercises (leave replacements empty).")
+    if edit.add:
+        lines.append(f"    Add {len(edit.add)} new exercises:")
+        lines.extend(f"    - {reason}" for reason in edit.add)
+    else:
+        lines.append("    Add no exercises (leave additions empty).")
+    return "\n".join(lines)
+
+
+def _revise_day(profile, plan_data: Dict, edit: DayEdit):
+    week = plan_data['weeks'][edit.week_index]
+    day = week['days'][edit.day_index]
+    return revise_workout_day(
+        profile, week['week_number'], day, _format_exercises(day['exercises']), _format_edits(day, edit)
+    )
+
+
+def revise_plan(profile, plan_data: Dict, changes: Dict[str, Tuple]) -> Tuple[Dict, Dict]:
+    """
+    Revise a plan for equipment and workout type changes of its profile.
+
+    Args:
+        profile: The updated profile
+        plan_data: The latest plan, left unmodified
+        changes: Net profile changes, {field: (old_value, new_value)}
+
+    Returns:
+        Tuple[Dict, Dict]: The revised plan and a summary of the days and
+        exercises that were regenerated, and of the model's replacements and
+        additions that were rejected
+    """
+    plan_data = copy.deepcopy(plan_data)
+    edits = plan_day_edits(plan_data, changes)
+    removed_equipment, removed_types = _removed(changes)
+    available_equipment = set(_normalized(getattr(profile, 'equipment', None)))
+    summary = {'days': len(edits), 'exercises_replaced': 0, 'exercises_removed': 0, 'exercises_added': 0,
+               'replacements_rejected': 0, 'additions_rejected': 0}
+
+    with tracer.span('workout_plan.revise', **{'revise.fields': sorted(changes), 'revise.days': len(edits)}) as span:
+        if edits:
+            max_workers = max(1, min(PLAN_MAX_CONCURRENCY, len(edits)))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plan-revise') as executor:
+                # wrap() keeps the day spans in this trace
+                revisions = list(executor.map(wrap(lambda edit: _revise_day(profile, plan_data, edit)), edits))
+
+            for edit, revision in zip(edits, revisions):
+                exercises = plan_data['weeks'][edit.week_index]['days'][edit.day_index]['exercises']
+                replacements = [exercise.model_dump() for exercise in revision.replacements]
+                # Exercises without a usable replacement need equipment or a type the profile no longer has
+                unreplaced = set()
+                for position, (index, _) in enumerate(edit.replace):
+                    replacement = replacements[position] if position < len(replacements) else None
+                    if replacement is not None and _uses_removed(replacement, removed_equipment, removed_types):
+                        summary['replacements_rejected'] += 1
+                        replacement = None
+                    if replacement is None:
+                        unreplaced.add(index)
+                    else:
+                        exercises[index] = replacement
+                        summary['exercises_replaced'] += 1
+                exercises[:] = [exercise for index, exercise in enumerate(exercises) if index not in unreplaced]
+
+                for addition in revision.additions[:len(edit.add)]:
+                    addition = addition.model_dump()
+                    if (_uses_removed(addition, removed_equipment, removed_types)
+                            or _needs_unavailable(addition, available_equipment)):
+                        summary['additions_rejected'] += 1
+                        continue
+                    exercises.append(addition)
+                    summary['exercises_added'] += 1
+                summary['exercises_removed'] += len(unreplaced)
+
+        if span is not None:
+            span.set_attributes({f'revise.{key}': value for key, value in summary.items()})
+        with tracer.span('output.validate', schema='WorkoutPlanData'):
+            plan = WorkoutPlanData.model_validate(plan_data)
+    logger.debug("Revised %d days of a workout plan for changes to %s", len(edits), ', '.join(sorted(changes)))
+    return plan.model_dump(), summary
@@ -0,0 +1,130 @@
+"""
+Storage of workout plan content as JSON or as normalized week/day/exercise rows.
+
+WORKOUT_PLAN_STORAGE selects how newly saved plans are stored:
+
+- json (default): the whole plan in WorkoutPlan.plan_data
+- normalized: one row per week, day and exercise, so a single week or day
+  can be read without loading the rest of the plan
+
+Reads work for both, so plans saved before switching modes stay readable.
+A plan is stored in exactly one form: normalized plans have no plan_data
+(the d8a3e61c5f07 migration clears it for the plans it moves into rows), so
+the two copies cannot drift apart.
+"""
+from typing import Dict, List, Optional
+import os
+
+from ..models.user_profile import db
+from ..models.workout_plan_detail import WorkoutPlanDay, WorkoutPlanExercise, WorkoutPlanWeek
+
+PLAN_STORAGE_MODES = ("json", "normalized")
+WORKOUT_PLAN_STORAGE = os.environ.get("WORKOUT_PLAN_STORAGE", "json").lower()
+
+
+def build_plan_weeks(plan_data: Dict, workout_plan_id: Optional[int] = None) -> List[WorkoutPlanWeek]:
+    """
+    Build week, day and exercise rows for plan data.
+
+    Args:
+        plan_data: WorkoutPlanData-shaped plan
+        workout_plan_id: Plan the rows belong to; may be left unset when the
+            weeks are attached through WorkoutPlan.weeks
+
+    Returns:
+        List[WorkoutPlanWeek]: Unsaved week rows with their days and exercises
+    """
+    weeks = []
+    plan_day = 0
+    for week_position, week in enumerate(plan_data.get('weeks', [])):
+        week_row = WorkoutPlanWeek(
+            workout_plan_id=workout_plan_id,
+            position=week_position,
+            week_number=week['week_number']
+        )
+        for day_position, day in enumerate(week.get('days', [])):
+            plan_day += 1
+            day_row = WorkoutPlanDay(
+                workout_plan_id=workout_plan_id,
+                position=day_position,
+                plan_day=plan_day,
+                day_number=day['day_number'],
+                focus=day['focus']
+            )
+            day_row.exercises = [
+                WorkoutPlanExercise(
+                    position=exercise_position,
+                    name=exercise['name'],
+                    type=exercise['type'],
+                    sets=exercise.get('sets'),
+                    reps=exercise.get('reps'),
+                    duration=exercise.get('duration'),
+                    instructions=exercise.get('instructions'),
+                    equipment=exercise.get('equipment') or []
+                )
+                for exercise_position, exercise in enumerate(day.get('exercises', []))
+            ]
+            week_row.days.append(day_row)
+        weeks.append(week_row)
+    return weeks
+
+
+def attach_plan_content(workout_plan, plan_data: Dict, storage: Optional[str] = None) -> None:
+    """Store plan data on an unsaved WorkoutPlan using the given (or configured) storage mode."""
+    storage = storage or WORKOUT_PLAN_STORAGE
+    if storage not in PLAN_STORAGE_MODES:
+        raise ValueError(f"Unknown workout plan storage mode: {storage}")
+
+    if storage == 'normalized':
+        workout_plan.plan_data = None
+        workout_plan.weeks = build_plan_weeks(plan_data)
+        # Days carry the plan id too so a single day can be looked up directly
+        for week in workout_plan.weeks:
+            for day in week.days:
+                day.plan = workout_plan
+    else:
+        workout_plan.plan_data = plan_data
+
+
+def get_plan_week(workout_plan, week_number: int) -> Optional[Dict]:
+    """
+    Return one week of a plan, reading only that week's rows when normalized.
+
+    Returns:
+        Optional[Dict]: WeeklyWorkout-shaped week, or None if the plan has no such week
+    """
+    week = (
+        WorkoutPlanWeek.query
+        .filter_by(workout_plan_id=workout_plan.id, week_number=week_number)
+        .order_by(WorkoutPlanWeek.position)
+        .first()
+    )
+    if week:
+        return week.to_dict()
+
+    for week in (workout_plan.plan_data or {}).get('weeks', []):
+        if week.get('week_number') == week_number:
+            return week
+    return None
+
+
+def get_plan_day(workout_plan, plan_day: int) -> Optional[Dict]:
+    """
+    Return the plan_day-th workout day of a plan (1-based, counted across weeks).
+
+    Returns:
+        Optional[Dict]: DailyWorkout-shaped day plus its week_number and
+        plan_day, or None if the plan has fewer days
+    """
+    day = WorkoutPlanDay.query.filter_by(workout_plan_id=workout_plan.id, plan_day=plan_day).first()
+    if day:
+        week_number = db.session.query(WorkoutPlanWeek.week_number).filter_by(id=day.week_id).scalar()
+        return {'week_number': week_number, 'plan_day': plan_day, **day.to_dict()}
+
+    count = 0
+    for week in (workout_plan.plan_data or {}).get('weeks', []):
+        for day in week.get('days', []):
+            count += 1
+            if count == plan_day:
+                return {'week_number': week.get('week_number'), 'plan_day': plan_day, **day}
+    return None
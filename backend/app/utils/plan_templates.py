@@ -0,0 +1,204 @@
+"""
+Content-addressed store of generated workout plans.
+
+Profiles with the same experience level, fitness goal, equipment, workout
+types and age group get the same plan from the LLM, so generated plan data
+is stored as a template keyed by a hash of those normalized fields and
+reused for later profiles with the same fingerprint.
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+import copy
+import hashlib
+import json
+import os
+import random
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+from ..models.user_profile import db
+from ..models.workout_plan_template import WorkoutPlanTemplate
+from ..prompts.fitness_options_prompt import get_age_group
+from .tracing import tracer
+
+PLAN_TEMPLATES_ENABLED = os.environ.get("PLAN_TEMPLATES_ENABLED", "true").lower() in ("1", "true", "yes")
+PLAN_TEMPLATE_MAX_AGE_DAYS = float(os.environ.get("PLAN_TEMPLATE_MAX_AGE_DAYS", 30))
+PLAN_TEMPLATE_MAX_ENTRIES = int(os.environ.get("PLAN_TEMPLATE_MAX_ENTRIES", 5000))
+PLAN_TEMPLATE_VARIATION = os.environ.get("PLAN_TEMPLATE_VARIATION", "true").lower() in ("1", "true", "yes")
+
+
+def _normalize_values(values):
+    return sorted({str(value).strip().lower() for value in (values or [])})
+
+
+def normalize_profile(profile) -> Dict:
+    """Return the profile fields that determine a generated plan, normalized."""
+    return {
+        'experience_level': str(profile.experience_level).strip().lower(),
+        'fitness_goal': str(profile.fitness_goal).strip().lower(),
+        'equipment': _normalize_values(profile.equipment),
+        'workout_types': _normalize_values(profile.workout_types),
+        'age_group': get_age_group(int(profile.age)),
+    }
+
+
+def profile_fingerprint(profile) -> str:
+    """Return the SHA-256 fingerprint of a profile's normalized plan fields."""
+    canonical = json.dumps(normalize_profile(profile), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def apply_variation(plan_data: Dict, seed: str) -> Dict:
+    """
+    Return a copy of a template with light per-user variation.
+
+    Exercise order within each day is shuffled deterministically from seed,
+    so the same user always sees the same plan.
+    """
+    plan = copy.deepcopy(plan_data)
+    rng = random.Random(seed)
+    for week in plan.get('weeks', []):
+        for day in week.get('days', []):
+            rng.shuffle(day.get('exercises', []))
+    return plan
+
+
+class PlanTemplateStore:
+    """Looks up, stores and evicts workout plan templates in the database."""
+
+    def __init__(self,
+                 enabled: bool = PLAN_TEMPLATES_ENABLED,
+                 max_age_days: float = PLAN_TEMPLATE_MAX_AGE_DAYS,
+                 max_entries: int = PLAN_TEMPLATE_MAX_ENTRIES,
+                 variation: bool = PLAN_TEMPLATE_VARIATION):
+        self.enabled = enabled
+        self.max_age = timedelta(days=max_age_days)
+        self.max_entries = max_entries
+        self.variation = variation
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def lookup(self, profile) -> Optional[Dict]:
+        """
+        Return plan data from a fresh template for this profile, or None.
+
+        Templates older than the max age count as misses so they are regenerated.
+        """
+        plan_data = self.lookup_template(profile)
+        return self.personalize(plan_data, profile.uuid) if plan_data is not None else None
+
+    def personalize(self, plan_data: Dict, profile_uuid: str) -> Dict:
+        """Return a copy of template plan data for one user, varied if variation is on."""
+        return apply_variation(plan_data, profile_uuid) if self.variation else copy.deepcopy(plan_data)
+
+    def lookup_template(self, profile) -> Optional[Dict]:
+        """Like lookup(), but return the shared template data without per-user variation."""
+        if not self.enabled:
+            return None
+
+        template = WorkoutPlanTemplate.query.filter_by(fingerprint=profile_fingerprint(profile)).first()
+        if template is None or datetime.utcnow() - template.created_at > self.max_age:
+            with self._lock:
+                self.misses += 1
+                if template is not None:
+                    self.stale += 1
+            return None
+
+        template.hit_count += 1
+        template.last_used_at = datetime.utcnow()
+        db.session.commit()
+        with self._lock:
+            self.hits += 1
+
+        return template.plan_data
+
+    def store(self, profile, plan_data: Dict) -> None:
+        """Insert or refresh the template for this profile's fingerprint."""
+        if not self.enabled:
+            return
+
+        fingerprint = profile_fingerprint(profile)
+        now = datetime.utcnow()
+        template = WorkoutPlanTemplate.query.filter_by(fingerprint=fingerprint).first()
+        try:
+            if template:
+                template.plan_data = plan_data
+                template.created_at = now
+                template.last_used_at = now
+            else:
+                db.session.add(WorkoutPlanTemplate(
+                    fingerprint=fingerprint,
+                    profile_key=normalize_profile(profile),
+                    plan_data=plan_data,
+                    created_at=now,
+                    last_used_at=now
+                ))
+            db.session.commit()
+        except IntegrityError:
+            # Another worker stored a template for this fingerprint first
+            db.session.rollback()
+            return
+        self._evict()
+
+    def get_plan_data(self, profile, generate: Callable[[object], Dict]) -> Dict:
+        """
+        Return plan data for a profile, generating and storing it on a miss.
+
+        Args:
+            profile: UserProfile to get a plan for
+            generate: Called with the profile to generate plan data on a miss
+        """
+        with tracer.span('plan_template.lookup') as span:
+            plan_data = self.lookup(profile)
+            if span is not None:
+                span.set_attribute('plan_template.hit', plan_data is not None)
+        if plan_data is not None:
+            return plan_data
+
+        plan_data = generate(profile)
+        with tracer.span('plan_template.store'):
+            self.store(profile, plan_data)
+        return plan_data
+
+    def _evict(self) -> None:
+        """Delete the least recently used templates beyond max_entries."""
+        count = WorkoutPlanTemplate.query.count()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        stale_ids = [
+            row.id for row in db.session.execute(
+                db.select(WorkoutPlanTemplate.id)
+                .order_by(WorkoutPlanTemplate.last_used_at)
+                .limit(excess)
+            )
+        ]
+        db.session.execute(db.delete(WorkoutPlanTemplate).where(WorkoutPlanTemplate.id.in_(stale_ids)))
+        db.session.commit()
+        with self._lock:
+            self.evictions += len(stale_ids)
+
+    def stats(self) -> Dict:
+        """Return in-process hit/miss counters and persisted template totals."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+            }
+        stats['templates'] = WorkoutPlanTemplate.query.count()
+        stats['total_template_hits'] = db.session.query(
+            db.func.coalesce(db.func.sum(WorkoutPlanTemplate.hit_count), 0)
+        ).scalar()
+        return stats
+
+
+plan_template_store = PlanTemplateStore()
@@ -0,0 +1,265 @@
+"""
+Bulk import and export of user profiles as NDJSON or CSV.
+
+Imports are read as a stream, validated and inserted in chunks with one
+executemany INSERT and one transaction per chunk. Invalid rows are reported
+with their row number and skipped without aborting the rest of the import.
+Exports stream rows from the database in batches instead of loading every
+profile at once.
+
+Rows use the same keys as POST /api/profile (name, age, fitnessGoal,
+equipment, workoutTypes, experienceLevel) plus an optional uuid. In CSV,
+equipment and workoutTypes are JSON arrays or ';'-separated lists.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import csv
+import io
+import json
+import uuid
+
+from ..models.user_profile import UserProfile, db
+
+BULK_FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ['uuid', 'name', 'age', 'fitnessGoal', 'equipment', 'workoutTypes', 'experienceLevel', 'createdAt']
+DEFAULT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+# Per-row errors beyond this are counted but not listed
+MAX_REPORTED_ERRORS = 1000
+
+_STRING_LIMITS = {'name': 100, 'fitnessGoal': 50, 'experienceLevel': 20}
+
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """Guess the bulk format from a file name or Content-Type, defaulting to NDJSON."""
+    if (filename and filename.lower().endswith('.csv')) or (content_type and 'csv' in content_type):
+        return 'csv'
+    return 'ndjson'
+
+
+def read_rows(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Dict, Optional[str]]]:
+    """
+    Parse NDJSON or CSV lines into rows.
+
+    Yields:
+        (row number, row dict, parse error or None); rows are numbered from 1
+        and blank lines are skipped
+    """
+    if fmt not in BULK_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            yield number, row, None
+        return
+
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, {}, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield number, {}, "Row must be a JSON object"
+            continue
+        yield number, row, None
+
+
+def _parse_list(value, field):
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('['):
+            value = json.loads(value)
+        else:
+            value = [item.strip() for item in value.split(';') if item.strip()]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{field} must be a list of strings")
+    return value
+
+
+def validate_row(row: Dict, now: Optional[datetime] = None) -> Dict:
+    """
+    Validate an import row and convert it to a user_profiles insert mapping.
+
+    Raises:
+        ValueError: If the row is missing fields or has invalid values
+    """
+    missing = [field for field in ('name', 'age', 'fitnessGoal', 'equipment', 'workoutTypes', 'experienceLevel')
+               if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    for field, limit in _STRING_LIMITS.items():
+        if not isinstance(row[field], str) or len(row[field]) > limit:
+            raise ValueError(f"{field} must be a string of at most {limit} characters")
+
+    try:
+        age = int(row['age'])
+    except (TypeError, ValueError):
+        raise ValueError("age must be an integer")
+    if not 1 <= age <= 120:
+        raise ValueError("age must be between 1 and 120")
+
+    try:
+        equipment = _parse_list(row['equipment'], 'equipment')
+        workout_types = _parse_list(row['workoutTypes'], 'workoutTypes')
+    except json.JSONDecodeError:
+        raise ValueError("equipment and workoutTypes must be valid JSON arrays")
+
+    profile_uuid = row.get('uuid') or str(uuid.uuid4())
+    try:
+        profile_uuid = str(uuid.UUID(str(profile_uuid)))
+    except ValueError:
+        raise ValueError("uuid must be a valid UUID")
+
+    now = now or datetime.utcnow()
+    return {
+        'uuid': profile_uuid,
+        'name': row['name'],
+        'age': age,
+        'fitness_goal': row['fitnessGoal'],
+        'equipment': equipment,
+        'workout_types': workout_types,
+        'experience_level': row['experienceLevel'],
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+class ImportResult:
+    """Counts, created profile uuids and per-row errors of a bulk import."""
+
+    def __init__(self, collect_uuids: bool = True):
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.created: Optional[List[Dict]] = [] if collect_uuids else None
+
+    def add_error(self, row_number: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': error})
+
+    def add_created(self, chunk: List[Tuple[int, Dict]]) -> None:
+        self.imported += len(chunk)
+        if self.created is not None:
+            self.created.extend({'row': number, 'uuid': mapping['uuid']} for number, mapping in chunk)
+
+    def to_dict(self) -> Dict:
+        result = {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+        if self.created is not None:
+            result['created'] = self.created
+        return result
+
+
+def _insert_chunk(chunk: List[Tuple[int, Dict]], result: ImportResult) -> None:
+    """Insert a chunk in one transaction, retrying row by row if the chunk fails."""
+    table = UserProfile.__table__
+    try:
+        db.session.execute(table.insert(), [mapping for _, mapping in chunk])
+        db.session.commit()
+        result.add_created(chunk)
+        return
+    except Exception:
+        db.session.rollback()
+
+    # Isolate the failing rows (e.g. a duplicate uuid) so the rest still import
+    for number, mapping in chunk:
+        try:
+            db.session.execute(table.insert(), [mapping])
+            db.session.commit()
+            result.add_created([(number, mapping)])
+        except Exception as e:
+            db.session.rollback()
+            result.add_error(number, str(getattr(e, 'orig', e)))
+
+
+def import_profiles(rows: Iterable[Tuple[int, Dict, Optional[str]]],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    collect_uuids: bool = True) -> ImportResult:
+    """
+    Validate and insert profiles in chunks.
+
+    Args:
+        rows: Rows from read_rows()
+        chunk_size: Rows per INSERT and transaction
+        collect_uuids: Whether to return the uuid created for every row
+
+    Returns:
+        ImportResult: Imported/failed counts, created uuids and per-row errors
+    """
+    result = ImportResult(collect_uuids)
+    chunk = []
+    now = datetime.utcnow()
+    for number, row, error in rows:
+        if error is None:
+            try:
+                chunk.append((number, validate_row(row, now)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            result.add_error(number, error)
+        if len(chunk) >= chunk_size:
+            _insert_chunk(chunk, result)
+            chunk = []
+            now = datetime.utcnow()
+    if chunk:
+        _insert_chunk(chunk, result)
+    return result
+
+
+def _export_record(row) -> Dict:
+    return {
+        'uuid': row.uuid,
+        'name': row.name,
+        'age': row.age,
+        'fitnessGoal': row.fitness_goal,
+        'equipment': row.equipment,
+        'workoutTypes': row.workout_types,
+        'experienceLevel': row.experience_level,
+        'createdAt': row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def export_profiles(fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """
+    Stream every profile as NDJSON lines or CSV text, in id order.
+
+    Rows are fetched batch_size at a time, so memory use does not grow with
+    the number of profiles.
+    """
+    if fmt not in BULK_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    table = UserProfile.__table__
+    rows = db.session.execute(
+        db.select(table).order_by(table.c.id).execution_options(yield_per=batch_size)
+    )
+
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(_export_record(row)) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        record = _export_record(row)
+        record['equipment'] = json.dumps(record['equipment'])
+        record['workoutTypes'] = json.dumps(record['workoutTypes'])
+        writer.writerow(record)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,238 @@
+"""
+Prompt compiler: schema instructions, token estimates and token budgets.
+
+Every structured prompt used to embed parser.get_format_instructions(), the
+full pydantic JSON schema with titles and descriptions (1.5-4.4k characters
+per prompt). Input tokens add latency and cost to every call, so
+build_chain() compiles prompts with the schema instructions selected by
+PROMPT_SCHEMA_MODE:
+
+- "full": the JSON schema from parser.get_format_instructions()
+- "compact" (default): a one-line JSON shape of the schema, e.g.
+  {"weeks":[{"week_number":int,"days":[...]}]}; field semantics are already
+  spelled out in the prompt text
+- "native": no schema in the prompt; the schema is passed to models that
+  support a response schema (Vertex AI's response_mime_type/response_schema
+  JSON mode) and the compact shape is used for models that do not
+
+Prompt tokens are estimated locally by estimate_tokens() (no tokenizer or
+API call), observed in llm_prompt_tokens and recorded on prompt.build spans.
+With PROMPT_TOKEN_BUDGET set, prompts over the budget fail with
+PromptBudgetExceeded before the LLM is called.
+"""
+from typing import Any, Dict, Optional, Sequence
+import json
+import logging
+import os
+import re
+
+from .llm_registry import get_parser
+from .metrics import LLM_PROMPT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_MODES = ("full", "compact", "native")
+PROMPT_SCHEMA_MODE = os.environ.get("PROMPT_SCHEMA_MODE", "compact").lower()
+# Maximum estimated prompt tokens per LLM call (0 disables the budget)
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 0))
+
+_TYPE_NAMES = {'string': 'str', 'integer': 'int', 'number': 'float', 'boolean': 'bool', 'null': 'null'}
+# Word pieces of a BPE tokenizer, roughly: letter runs, digit groups, punctuation and whitespace runs
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d{1,3}|\s*\n\s*| {2,}|[^\sA-Za-z\d]+")
+# Letters per token of a long word and punctuation characters per token (e.g. `{"`, `":`)
+_LETTERS_PER_TOKEN = 6
+_SYMBOLS_PER_TOKEN = 2
+
+
+class PromptBudgetExceeded(ValueError):
+    """A compiled prompt is estimated to exceed PROMPT_TOKEN_BUDGET."""
+
+    def __init__(self, name: str, tokens: int, budget: int):
+        super().__init__(f"Prompt {name} has ~{tokens} tokens, over the budget of {budget}")
+        self.name = name
+        self.tokens = tokens
+        self.budget = budget
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the tokens of a text without a tokenizer.
+
+    Counts a token per group of up to 3 digits, run of indentation or
+    newlines and 2 punctuation characters, and a token per 6 letters of a
+    word, which approximates how BPE tokenizers split English prose and JSON.
+    It is meant for comparing prompt variants and enforcing budgets, not for
+    billing.
+    """
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text or ''):
+        if piece[0].isalpha():
+            tokens += -(-len(piece) // _LETTERS_PER_TOKEN)
+        elif piece[0].isspace() or piece[0].isdigit():
+            tokens += 1
+        else:
+            tokens += -(-len(piece) // _SYMBOLS_PER_TOKEN)
+    return tokens
+
+
+def _resolve(node: Dict, defs: Dict) -> Dict:
+    ref = node.get('$ref')
+    return defs[ref.rsplit('/', 1)[-1]] if ref else node
+
+
+def _nullable(node: Dict):
+    """Split `anyOf: [X, null]` into (X, True)."""
+    options = node.get('anyOf')
+    if options:
+        non_null = [option for option in options if option.get('type') != 'null']
+        if len(non_null) == 1:
+            return non_null[0], len(non_null) < len(options)
+    return node, False
+
+
+def _shape(node: Dict, defs: Dict) -> str:
+    node, nullable = _nullable(_resolve(node, defs))
+    node = _resolve(node, defs)
+    if 'enum' in node:
+        shape = '|'.join(json.dumps(value) for value in node['enum'])
+    elif node.get('type') == 'array':
+        shape = f"[{_shape(node.get('items', {}), defs)}]"
+    elif node.get('type') == 'object' or 'properties' in node:
+        required = set(node.get('required', ()))
+        fields = []
+        for name, field in node.get('properties', {}).items():
+            field_shape = _shape(field, defs)
+            if name not in required and not field_shape.endswith('?'):
+                field_shape += '?'
+            fields.append(f'"{name}":{field_shape}')
+        shape = '{' + ','.join(fields) + '}'
+    else:
+        shape = _TYPE_NAMES.get(node.get('type'), 'any')
+    return shape + '?' if nullable else shape
+
+
+def compact_schema(model: type) -> str:
+    """
+    One-line JSON shape of a pydantic model, e.g. {"name":str,"sets":int?}.
+
+    `?` marks fields that may be null or omitted; titles, descriptions and
+    defaults are left out.
+    """
+    schema = model.model_json_schema()
+    return _shape(schema, schema.get('$defs', {}))
+
+
+def _response_schema(node: Dict, defs: Dict) -> Dict:
+    node, nullable = _nullable(_resolve(node, defs))
+    node = _resolve(node, defs)
+    result: Dict[str, Any] = {}
+    if 'enum' in node:
+        result.update(type=node.get('type', 'string'), enum=node['enum'])
+    elif node.get('type') == 'array':
+        result.update(type='array', items=_response_schema(node.get('items', {}), defs))
+    elif node.get('type') == 'object' or 'properties' in node:
+        result.update(
+            type='object',
+            properties={name: _response_schema(field, defs) for name, field in node.get('properties', {}).items()},
+        )
+        if node.get('required'):
+            result['required'] = list(node['required'])
+    else:
+        result['type'] = node.get('type', 'string')
+    if nullable:
+        result['nullable'] = True
+    return result
+
+
+def response_schema(model: type) -> Dict:
+    """
+    OpenAPI-style response schema of a pydantic model for native JSON mode.
+
+    References are inlined and `anyOf: [X, null]` becomes `nullable`, since
+    the Vertex AI response schema supports neither; titles and descriptions
+    are left out.
+    """
+    schema = model.model_json_schema()
+    return _response_schema(schema, schema.get('$defs', {}))
+
+
+def supports_response_schema(llm) -> bool:
+    """Whether an LLM accepts response_mime_type and response_schema (e.g. VertexAI)."""
+    fields = getattr(type(llm), 'model_fields', {})
+    return 'response_schema' in fields and 'response_mime_type' in fields
+
+
+def schema_mode(mode: Optional[str] = None) -> str:
+    mode = (mode or PROMPT_SCHEMA_MODE).lower()
+    if mode not in SCHEMA_MODES:
+        raise ValueError(f"Unknown prompt schema mode: {mode}")
+    return mode
+
+
+def format_instructions(model: type, mode: Optional[str] = None, native: bool = False) -> str:
+    """
+    Schema instructions for a prompt.
+
+    Args:
+        model: Pydantic model of the expected output
+        mode: "full", "compact" or "native"; defaults to PROMPT_SCHEMA_MODE
+        native: Whether the model is given the schema as a response schema
+    """
+    mode = schema_mode(mode)
+    if mode == "full":
+        return get_parser(model).get_format_instructions()
+    if mode == "native" and native:
+        return "Respond with a single JSON object in the given response schema."
+    return f"Respond with only a JSON object of this shape (? = may be null):\n{compact_schema(model)}"
+
+
+def budget_guard(name: str, budget: Optional[int] = None):
+    """
+    Runnable that records the estimated tokens of a prompt and enforces the budget.
+
+    Args:
+        name: Chain name used as the metric label
+        budget: Maximum estimated tokens; defaults to PROMPT_TOKEN_BUDGET, 0 disables it
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def check(prompt_value):
+        tokens = estimate_tokens(prompt_value.to_string())
+        LLM_PROMPT_TOKENS.observe(tokens, chain=name)
+        limit = PROMPT_TOKEN_BUDGET if budget is None else budget
+        if limit and tokens > limit:
+            logger.warning("Prompt %s has ~%d tokens, over the budget of %d", name, tokens, limit)
+            raise PromptBudgetExceeded(name, tokens, limit)
+        return prompt_value
+
+    return RunnableLambda(check, name='prompt_budget')
+
+
+def build_chain(llm, name: str, template: str, input_variables: Sequence[str], model: type,
+                parse: bool = False, mode: Optional[str] = None, budget: Optional[int] = None):
+    """
+    Compile a `prompt | budget guard | llm [| parser]` chain for structured output.
+
+    Args:
+        llm: Shared LLM from the registry
+        name: Chain name for metrics and budget errors
+        template: Prompt template with a {format_instructions} placeholder
+        input_variables: Template variables supplied on invoke
+        model: Pydantic model of the expected output
+        parse: Append the shared JSON parser; otherwise the chain returns text
+        mode: Schema mode; defaults to PROMPT_SCHEMA_MODE
+        budget: Token budget; defaults to PROMPT_TOKEN_BUDGET
+    """
+    from langchain_core.prompts import PromptTemplate
+
+    mode = schema_mode(mode)
+    native = mode == "native" and supports_response_schema(llm)
+    prompt = PromptTemplate(
+        template=template,
+        input_variables=list(input_variables),
+        partial_variables={"format_instructions": format_instructions(model, mode, native=native)},
+    )
+    if native:
+        llm = llm.bind(response_mime_type="application/json", response_schema=response_schema(model))
+    chain = prompt | budget_guard(name, budget) | llm
+    return chain | get_parser(model) if parse else chain
@@ -0,0 +1,109 @@
+"""
+Token-bucket rate limiting with adaptive backoff for LLM calls.
+
+AdaptiveRateLimiter hands out tokens at a target rate. When the provider
+reports a quota error the rate is halved and callers back off exponentially
+(with jitter) before retrying; every success raises the rate again by a small
+step until the configured maximum is reached (AIMD).
+"""
+from typing import Optional
+import random
+import threading
+import time
+
+# Exception class names / message fragments that mean "slow down" rather than "failed"
+QUOTA_ERROR_NAMES = ('ResourceExhausted', 'TooManyRequests', 'RateLimitError')
+QUOTA_ERROR_MARKERS = ('429', 'resource_exhausted', 'resource exhausted', 'quota', 'rate limit')
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """Return True if an exception looks like a provider quota / rate-limit error."""
+    if type(error).__name__ in QUOTA_ERROR_NAMES:
+        return True
+    if getattr(error, 'code', None) == 429 or getattr(error, 'status_code', None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in QUOTA_ERROR_MARKERS)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until tokens are available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose rate adapts to quota errors.
+
+    Args:
+        max_rate: Target (and maximum) calls per second
+        min_rate: Floor the rate never drops below
+        increase: Calls per second added back after each success
+        base_backoff: First retry delay in seconds after a quota error
+        max_backoff: Upper bound of the retry delay
+    """
+
+    def __init__(self, max_rate: float, min_rate: Optional[float] = None, increase: Optional[float] = None,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.max_rate = max_rate
+        self.min_rate = min_rate if min_rate is not None else max_rate / 20
+        self.increase = increase if increase is not None else max_rate / 20
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(max_rate)
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def acquire(self) -> float:
+        return self.bucket.acquire()
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.bucket.rate < self.max_rate:
+                self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.increase))
+
+    def on_quota_error(self, attempt: int) -> float:
+        """
+        Halve the rate and return how long the caller should wait before retrying.
+
+        Args:
+            attempt: 0-based retry attempt of the failing call
+        """
+        with self._lock:
+            self.throttled += 1
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
@@ -1,28 +1,54 @@
+import asyncio
+import logging
 import os
-from google import genai
-from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain_google_vertexai import VertexAI
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
-from ..models.workout_exercise import Exercise, DailyWorkout, WeeklyWorkout, WorkoutPlanData
+from flask import has_app_context
+from pydantic import ValidationError
+from langchain_core.exceptions import OutputParserException
+from ..models.workout_exercise import (
+    Exercise, DailyWorkout, DayRevision, LibraryWeeklyWorkout, LibraryWorkoutPlan, WeeklyWorkout, WorkoutPlanData,
+    WorkoutPlanSkeleton
+)
+from .stream_parser import IncrementalPlanParser
+from .exercise_library import (
+    EXERCISE_LIBRARY_ENABLED, EXERCISE_LIBRARY_MAX_CANDIDATES, EXERCISE_LIBRARY_MIN_CANDIDATES,
+    exercise_library, hydrate_plan
+)
+from .llm_registry import WORKOUT_PLAN_MODEL_ID, get_chain, get_genai_client, get_parser
+from .metrics import LLM_PARSE_FAILURES, LLM_RETRIES
+from .output_repair import format_errors, get_path, repair_structured_output
+from .prompt_compiler import build_chain
+from .tracing import langchain_config, tracer, wrap
 
 load_dotenv()  # Load environment variables from .env file
 
+logger = logging.getLogger(__name__)
+
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "your-default-project-id")
-print(f"Loaded PROJECT_ID: {PROJECT_ID}")  # Debugging line to check the project ID
+logger.debug("Loaded PROJECT_ID: %s", PROJECT_ID)
 
 # Add a check for the project ID
 if PROJECT_ID == "your-default-project-id":
-    print("Warning: Using default project ID. Please set the GOOGLE_CLOUD_PROJECT environment variable.")
+    logger.info("Using default project ID. Please set the GOOGLE_CLOUD_PROJECT environment variable.")
 
 LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1")  # Set your default location
 
-model_id = "gemini-2.5-flash"
+model_id = WORKOUT_PLAN_MODEL_ID
 
-google_search_tool = Tool(
-    google_search = GoogleSearch()
-)
+# "single" generates the whole plan in one call; "parallel" generates a plan
+# skeleton first and then each week concurrently
+PLAN_GENERATION_MODE = os.environ.get("WORKOUT_PLAN_GENERATION_MODE", "single")
+PLAN_MAX_CONCURRENCY = int(os.environ.get("WORKOUT_PLAN_MAX_CONCURRENCY", 3))
+PLAN_WEEK_MAX_ATTEMPTS = int(os.environ.get("WORKOUT_PLAN_WEEK_MAX_ATTEMPTS", 3))
+
+PLAN_WEEKS = 3
+# Subtrees re-prompted on their own when they fail validation: a day, else its week
+PLAN_REPAIR_UNITS = (('weeks', int, 'days', int), ('weeks', int))
+WEEK_REPAIR_UNITS = (('days', int),)
+# Library plans are re-prompted a week at a time
+LIBRARY_REPAIR_UNITS = (('weeks', int),)
 
 class UserProfile:
     def __init__(self, name, age, fitness_goal, equipment, workout_types, experience_level):
@@ -37,10 +63,63 @@ def search_workout_exercises(profile):
     """
     Get personalized workout recommendations using Google GenAI
     
+    Exercises from the local exercise library are returned instead when it
+    has at least EXERCISE_LIBRARY_MIN_CANDIDATES matches for the profile.
+
+    Args:
+        profile: UserProfile object containing user preferences and details
+    """
+    matches = library_exercises(profile, widen=False)
+    if len(matches) >= EXERCISE_LIBRARY_MIN_CANDIDATES:
+        return _format_library_matches(matches)
+
+    # Imported here so google-genai is only loaded when a search is made
+    from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
+
+    client = get_genai_client(location=LOCATION, project=PROJECT_ID)
+    response = client.models.generate_content(
+        model=model_id,
+        contents=_exercise_search_text(profile),
+        config=GenerateContentConfig(
+            tools=[Tool(google_search=GoogleSearch())],
+            response_modalities=["TEXT"],
+        )
+    )
+    return _search_response_texts(response)
+
+async def asearch_workout_exercises(profile, matches=None):
+    """
+    Like search_workout_exercises, with the genai async client (client.aio).
+
     Args:
         profile: UserProfile object containing user preferences and details
+        matches: Library exercises for the profile, looked up by the caller off the event loop
     """
-    search_text = f"""
+    if matches and len(matches) >= EXERCISE_LIBRARY_MIN_CANDIDATES:
+        return _format_library_matches(matches)
+
+    from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
+
+    client = get_genai_client(location=LOCATION, project=PROJECT_ID)
+    response = await client.aio.models.generate_content(
+        model=model_id,
+        contents=_exercise_search_text(profile),
+        config=GenerateContentConfig(
+            tools=[Tool(google_search=GoogleSearch())],
+            response_modalities=["TEXT"],
+        )
+    )
+    return _search_response_texts(response)
+
+def _format_library_matches(matches):
+    return [
+        f"{match['name']} ({match['type']}; {', '.join(match['equipment']) or 'no equipment'}): "
+        f"{match['instructions'] or ''}".rstrip(': ')
+        for match in matches
+    ]
+
+def _exercise_search_text(profile):
+    return f"""
     Find specific workout exercises suitable for a {profile.experience_level} level person 
     with the following preferences:
     - Fitness Goal: {profile.fitness_goal}
@@ -52,18 +131,9 @@ def search_workout_exercises(profile):
     2. Achievable with their available equipment
     3. Aligned with their fitness goals
     """
-    
-    client = genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
-    response = client.models.generate_content(
-        model=model_id,
-        contents=search_text,
-        config=GenerateContentConfig(
-            tools=[google_search_tool],
-            response_modalities=["TEXT"],
-        )
-    )
 
-    print(f"search_workout_exercises response-----> {response}")
+def _search_response_texts(response):
+    logger.debug("search_workout_exercises response: %s", response)
     
     # Extract exercise recommendations from the response
     exercises = []
@@ -73,21 +143,23 @@ def search_workout_exercises(profile):
     
     return exercises
 
-def generate_structured_workout_plan(profile):
+def library_exercises(profile, widen=True):
     """
-    Generate a structured workout plan using LangChain and Pydantic models
-    
-    Args:
-        profile: UserProfile object containing user preferences and details
+    Candidate library exercises for a profile, or [] when the library is
+    disabled or there is no app context (and so no database) to load it from.
     """
-    # Connect to Google Cloud resources
-    llm = VertexAI(model_name="gemini-2.5-flash", location=LOCATION)
-    
-    # Create parser for structured output
-    parser = JsonOutputParser(pydantic_object=WorkoutPlanData)
-    
-    # Create prompt template
-    instruction = f"""
+    if not EXERCISE_LIBRARY_ENABLED or not has_app_context():
+        return []
+    exercise_library.ensure_loaded()
+    if widen:
+        return exercise_library.candidates(profile)
+    return exercise_library.query(
+        profile.equipment, profile.workout_types, profile.experience_level, EXERCISE_LIBRARY_MAX_CANDIDATES
+    )
+
+def _build_workout_plan_instruction(profile):
+    """Build the plan generation instruction for a profile."""
+    return f"""
     Create a comprehensive 3-week workout plan for a {profile.experience_level} level person with the following details:
     - Age: {profile.age}
     - Fitness Goal: {profile.fitness_goal}
@@ -104,19 +176,610 @@ def generate_structured_workout_plan(profile):
     
     Make sure all exercises are safe, effective, and aligned with their fitness goals.
     """
+
+WORKOUT_PLAN_TEMPLATE = "Generate a structured workout plan\n{format_instructions}\n{instruction}\n"
+
+def _build_workout_plan_chain(llm):
+    """Build the chain that generates (or streams) the raw text of a complete plan."""
+    return build_chain(llm, "workout_plan", WORKOUT_PLAN_TEMPLATE, ["instruction"], WorkoutPlanData)
+
+LIBRARY_PLAN_TEMPLATE = """Generate a structured workout plan
+{format_instructions}
+{instruction}
+Only use exercises from this exercise list and reference them by id. Give sets and reps,
+or a duration for timed exercises, suited to the day and the person:
+{exercise_list}
+"""
+
+def _build_library_plan_chain(llm):
+    """Build the chain that generates the raw text of a LibraryWorkoutPlan."""
+    return build_chain(
+        llm, "workout_plan_library", LIBRARY_PLAN_TEMPLATE, ["instruction", "exercise_list"], LibraryWorkoutPlan
+    )
+
+def _format_exercise_list(candidates):
+    return "\n".join(
+        f"    - {entry['id']}: {entry['name']} ({entry['type']}; {', '.join(entry['equipment']) or 'no equipment'})"
+        for entry in candidates
+    )
+
+def generate_library_workout_plan(profile, candidates):
+    """
+    Generate a plan whose exercises are picked from the exercise library.
+
+    The model answers with exercise ids, sets and reps only; names, types,
+    instructions and equipment are hydrated from the library. References to
+    unknown ids are dropped and counted in llm_parse_failures_total. Weeks
+    that are missing, invalid or have a day made up only of unknown ids are
+    re-prompted on their own.
+
+    Args:
+        profile: UserProfile object containing user preferences and details
+        candidates: Library entries the model may choose from
+
+    Returns:
+        Dict: WorkoutPlanData-shaped plan
+
+    Raises:
+        OutputParserException: When a day's exercises are still all unknown ids after the re-prompts
+    """
+    chain = get_chain("workout_plan_library", _build_library_plan_chain, model_id, LOCATION)
+    start = time.perf_counter()
+    text = chain.invoke(_library_plan_inputs(profile, candidates),
+                        config=langchain_config('workout_plan.library_chain', model_id))
+    return _hydrate_library_plan(profile, candidates, text, time.perf_counter() - start)
+
+async def agenerate_library_workout_plan(profile, candidates):
+    """Like generate_library_workout_plan, awaiting the LLM with chain.ainvoke."""
+    chain = get_chain("workout_plan_library", _build_library_plan_chain, model_id, LOCATION)
+    start = time.perf_counter()
+    text = await chain.ainvoke(_library_plan_inputs(profile, candidates),
+                               config=langchain_config('workout_plan.library_chain', model_id))
+    return await asyncio.to_thread(_hydrate_library_plan, profile, candidates, text, time.perf_counter() - start)
+
+def _library_plan_inputs(profile, candidates):
+    return {
+        "instruction": _build_workout_plan_instruction(profile),
+        "exercise_list": _format_exercise_list(candidates),
+    }
+
+def _hydrate_library_plan(profile, candidates, text, generation_seconds):
+    """Parse a LibraryWorkoutPlan, re-prompting weeks it lacks, and hydrate it into a validated WorkoutPlanData dict."""
+    references = repair_structured_output(
+        text, LibraryWorkoutPlan,
+        units=LIBRARY_REPAIR_UNITS,
+        regenerate=lambda data, path, errors: _regenerate_library_week(profile, candidates, data, path),
+        missing=_library_weeks_to_regenerate,
+        generation_seconds=generation_seconds,
+    )
+    plan_data, unknown = hydrate_plan(references.model_dump(), exercise_library)
+    if unknown:
+        LLM_PARSE_FAILURES.inc(len(unknown), schema='LibraryWorkoutPlan', kind='unknown_id')
+        logger.warning("Dropped %d exercises with unknown library ids: %s", len(unknown), ', '.join(map(str, unknown)))
+    # Rest days have no exercises; a day whose every reference is unknown lost them all
+    empty = [f"week {week.week_number} day {day.day_number}"
+             for week in references.weeks for day in week.days
+             if day.exercises and all(exercise_library.get(reference.id) is None for reference in day.exercises)]
+    if empty:
+        LLM_PARSE_FAILURES.inc(len(empty), schema='LibraryWorkoutPlan', kind='empty_day')
+        raise OutputParserException(f"No library exercises left for {', '.join(empty)}", llm_output=text)
+    with tracer.span('output.validate', schema='WorkoutPlanData'):
+        return WorkoutPlanData.model_validate(plan_data).model_dump()
+
+def _library_weeks_to_regenerate(data):
+    """Paths of the weeks a library plan is missing, or with a day whose exercises are all unknown ids."""
+    paths = _missing_weeks(data)
+    weeks = data.get("weeks") if isinstance(data, dict) else None
+    for index, week in enumerate(weeks if isinstance(weeks, list) else []):
+        days = week.get("days") if isinstance(week, dict) else None
+        if any(isinstance(day, dict) and day.get("exercises") and not any(
+                isinstance(reference, dict) and exercise_library.get(reference.get("id")) is not None
+                for reference in day["exercises"])
+               for day in days or []):
+            paths.append(("weeks", index))
+    return paths
+
+def _build_library_week_chain(llm):
+    """Build the chain that regenerates a single LibraryWeeklyWorkout."""
+    return build_chain(
+        llm, "workout_plan_library_week",
+        """Create week {week_number} of a 3-week workout plan for a person with the following details:
+    {profile_summary}
+    Plan outline:
+    {plan_outline}
+    Workout day focuses, in order: {day_focuses}
+
+    Only use exercises from this exercise list and reference them by id. Give sets and reps,
+    or a duration for timed exercises, suited to the day and the person:
+    {exercise_list}
+    {format_instructions}
+    """,
+        ["week_number", "profile_summary", "plan_outline", "day_focuses", "exercise_list"],
+        LibraryWeeklyWorkout, parse=True,
+    )
+
+def _regenerate_library_week(profile, candidates, data, path):
+    """Regenerate the invalid, missing or empty-day week at path of a library plan."""
+    week_index = path[1]
+    week = get_path(data, ("weeks", week_index))
+    week = week if isinstance(week, dict) else {}
+    day_focuses = [day.get("focus") for day in week.get("days") or [] if isinstance(day, dict) and day.get("focus")]
+    chain = get_chain("workout_plan_library_week", _build_library_week_chain, model_id, LOCATION)
+    week = chain.invoke({
+        "week_number": week_index + 1,
+        "profile_summary": _build_profile_summary(profile),
+        "plan_outline": _plan_outline(data),
+        "day_focuses": ", ".join(day_focuses) or "5 workout days with a specific focus each",
+        "exercise_list": _format_exercise_list(candidates),
+    }, config=langchain_config('workout_plan.library_week_chain', model_id))
+    if isinstance(week, dict):
+        week["week_number"] = week_index + 1
+    return week
+
+def generate_structured_workout_plan(profile, mode=None):
+    """
+    Generate a structured workout plan using LangChain and Pydantic models
+    
+    Args:
+        profile: UserProfile object containing user preferences and details
+        mode: "single" or "parallel"; defaults to WORKOUT_PLAN_GENERATION_MODE
+    """
+    mode = mode or PLAN_GENERATION_MODE
+    with tracer.span('workout_plan.generate', mode=mode, **{'llm.model': model_id}) as span:
+        if mode == "parallel":
+            return generate_parallel_workout_plan(profile)
+
+        # Pick exercises from the local library when it covers the profile
+        candidates = library_exercises(profile)
+        if len(candidates) >= EXERCISE_LIBRARY_MIN_CANDIDATES:
+            try:
+                response = generate_library_workout_plan(profile, candidates)
+                if span is not None:
+                    span.set_attributes({'plan.source': 'library', 'plan.weeks': len(response["weeks"])})
+                return response
+            except (OutputParserException, ValidationError) as e:
+                logger.warning("Library plan generation failed, generating the full plan: %s", e)
+
+        instruction = _build_workout_plan_instruction(profile)
+
+        # Reuse the shared LLM client and compiled chain
+        chain = get_chain("workout_plan", _build_workout_plan_chain, model_id, LOCATION)
+        start = time.perf_counter()
+        text = chain.invoke({"instruction": instruction}, config=langchain_config('workout_plan.chain', model_id))
+
+        response = _repair_workout_plan(profile, text, time.perf_counter() - start)
+        if span is not None:
+            span.set_attributes({'plan.source': 'llm', 'plan.weeks': len(response["weeks"])})
+        logger.debug("Generated workout plan with %d weeks", len(response["weeks"]))
+        return response
+
+async def agenerate_structured_workout_plan(profile, mode=None, candidates=None):
+    """
+    Like generate_structured_workout_plan, awaiting the LLM calls with
+    chain.ainvoke so the event loop can run many generations at once.
+
+    The library candidates are passed in rather than looked up, since loading
+    the library touches the database (see aio.run_in_app_context). Re-prompts
+    of invalid days or weeks are rare and run synchronously in a worker thread.
+
+    Args:
+        profile: UserProfile object containing user preferences and details
+        mode: "single" or "parallel"; defaults to WORKOUT_PLAN_GENERATION_MODE
+        candidates: Library exercises for the profile (see library_exercises)
+    """
+    mode = mode or PLAN_GENERATION_MODE
+    with tracer.span('workout_plan.generate', mode=mode, **{'llm.model': model_id, 'async': True}) as span:
+        if mode == "parallel":
+            return await agenerate_parallel_workout_plan(profile)
+
+        if candidates and len(candidates) >= EXERCISE_LIBRARY_MIN_CANDIDATES:
+            try:
+                response = await agenerate_library_workout_plan(profile, candidates)
+                if span is not None:
+                    span.set_attributes({'plan.source': 'library', 'plan.weeks': len(response["weeks"])})
+                return response
+            except (OutputParserException, ValidationError) as e:
+                logger.warning("Library plan generation failed, generating the full plan: %s", e)
+
+        chain = get_chain("workout_plan", _build_workout_plan_chain, model_id, LOCATION)
+        start = time.perf_counter()
+        text = await chain.ainvoke({"instruction": _build_workout_plan_instruction(profile)},
+                                   config=langchain_config('workout_plan.chain', model_id))
+
+        response = await asyncio.to_thread(_repair_workout_plan, profile, text, time.perf_counter() - start)
+        if span is not None:
+            span.set_attributes({'plan.source': 'llm', 'plan.weeks': len(response["weeks"])})
+        return response
+
+def _repair_workout_plan(profile, text, generation_seconds):
+    """Repair malformed plan output and re-prompt only invalid days or weeks."""
+    plan = repair_structured_output(
+        text, WorkoutPlanData,
+        units=PLAN_REPAIR_UNITS,
+        regenerate=lambda data, path, errors: _regenerate_plan_subtree(profile, data, path, errors),
+        missing=_missing_weeks,
+        generation_seconds=generation_seconds,
+    )
+    return plan.model_dump()
+
+def _missing_weeks(data):
+    """Paths of the weeks a (e.g. truncated) plan is missing."""
+    weeks = data.get("weeks") if isinstance(data, dict) else None
+    if not isinstance(weeks, list):
+        return []
+    return [("weeks", index) for index in range(len(weeks), PLAN_WEEKS)]
+
+def _plan_outline(data):
+    """Outline the weeks of a partially valid plan by their day focuses."""
+    lines = []
+    for index, week in enumerate(get_path(data, ("weeks",)) or []):
+        days = week.get("days") if isinstance(week, dict) else None
+        focuses = [day.get("focus") for day in days or [] if isinstance(day, dict) and day.get("focus")]
+        lines.append(f"    Week {index + 1}: {', '.join(focuses) or 'to be generated'}")
+    return "\n".join(lines)
+
+def _regenerate_plan_subtree(profile, data, path, errors):
+    """Regenerate the invalid or missing day or week at path of a single-call plan."""
+    week_index = path[1]
+    week = get_path(data, ("weeks", week_index))
+    week = week if isinstance(week, dict) else {}
+    plan_outline = _plan_outline(data)
+
+    if len(path) == 4:
+        day = get_path(data, path)
+        day = day if isinstance(day, dict) else {}
+        return generate_workout_day(
+            profile, week_index + 1, path[3] + 1, day.get("focus") or "Full body", plan_outline, errors
+        )
+
+    day_focuses = [day.get("focus") for day in week.get("days") or [] if isinstance(day, dict) and day.get("focus")]
+    return _invoke_week_chain(profile, {
+        "week_number": week_index + 1,
+        "plan_outline": plan_outline,
+        "week_focus": "Continue the progression of the plan outline",
+        "week_progression": "Progress gradually from the previous week",
+        "day_focuses": ", ".join(day_focuses) or "5 workout days with a specific focus each",
+    }, parse=True)
+
+def _build_profile_summary(profile):
+    """Describe a profile for the skeleton and per-week prompts."""
+    return f"""
+    - Experience Level: {profile.experience_level}
+    - Age: {profile.age}
+    - Fitness Goal: {profile.fitness_goal}
+    - Available Equipment: {', '.join(profile.equipment)}
+    - Preferred Workout Types: {', '.join(profile.workout_types)}
+    """
+
+def _build_skeleton_chain(llm):
+    """Build the chain that generates a WorkoutPlanSkeleton."""
+    return build_chain(
+        llm, "workout_plan_skeleton",
+        """Outline a 3-week workout plan with 5 workout days per week for a person with the following details:
+    {profile_summary}
+    For each week give its training focus, how it progresses from the previous week,
+    and the focus of each of its 5 workout days. Do not list exercises.
+    {format_instructions}
+    """,
+        ["profile_summary"], WorkoutPlanSkeleton, parse=True,
+    )
+
+def generate_workout_plan_skeleton(profile):
+    """
+    Generate a compact outline of a 3-week plan: the focus, progression and
+    day focuses of each week, without any exercises.
+    """
+    chain = get_chain("workout_plan_skeleton", _build_skeleton_chain, model_id, LOCATION)
+    response = chain.invoke({"profile_summary": _build_profile_summary(profile)},
+                            config=langchain_config('workout_plan.skeleton', model_id))
+    return _validate_skeleton(response)
+
+async def agenerate_workout_plan_skeleton(profile):
+    """Like generate_workout_plan_skeleton, awaiting the LLM with chain.ainvoke."""
+    chain = get_chain("workout_plan_skeleton", _build_skeleton_chain, model_id, LOCATION)
+    response = await chain.ainvoke({"profile_summary": _build_profile_summary(profile)},
+                                   config=langchain_config('workout_plan.skeleton', model_id))
+    return _validate_skeleton(response)
+
+def _validate_skeleton(response):
+    with tracer.span('output.validate', schema='WorkoutPlanSkeleton'):
+        try:
+            return WorkoutPlanSkeleton.model_validate(response)
+        except ValidationError:
+            LLM_PARSE_FAILURES.inc(schema='WorkoutPlanSkeleton', kind='validation')
+            raise
+
+def _build_week_chain(llm):
+    """Build the chain that generates a single WeeklyWorkout."""
+    return build_chain(
+        llm, "workout_plan_week",
+        """Create week {week_number} of a 3-week workout plan for a person with the following details:
+    {profile_summary}
+    Plan outline:
+    {plan_outline}
+    This week's focus: {week_focus}
+    Progression: {week_progression}
+    Workout day focuses, in order: {day_focuses}
     
-    prompt = PromptTemplate(
-        template="Generate a structured workout plan\n{format_instructions}\n{instruction}\n",
-        input_variables=["instruction"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
+    Each day should include appropriate exercises with sets, reps, and instructions that are
+    safe for their experience level and only use their available equipment.
+    {format_instructions}
+    """,
+        [
+            "week_number", "profile_summary", "plan_outline",
+            "week_focus", "week_progression", "day_focuses"
+        ],
+        WeeklyWorkout,
     )
+
+def _invoke_week_chain(profile, inputs, parse=False):
+    """Generate one week; returns the raw text, or the parsed JSON with parse=True."""
+    chain = get_chain("workout_plan_week", _build_week_chain, model_id, LOCATION)
+    text = chain.invoke(
+        {"profile_summary": _build_profile_summary(profile), **inputs},
+        config=langchain_config('workout_plan.week_chain', model_id),
+    )
+    return get_parser(WeeklyWorkout).parse(text) if parse else text
+
+async def _ainvoke_week_chain(profile, inputs):
+    """Like _invoke_week_chain, returning the raw text of chain.ainvoke."""
+    chain = get_chain("workout_plan_week", _build_week_chain, model_id, LOCATION)
+    return await chain.ainvoke(
+        {"profile_summary": _build_profile_summary(profile), **inputs},
+        config=langchain_config('workout_plan.week_chain', model_id),
+    )
+
+def _build_day_chain(llm):
+    """Build the chain that regenerates a single DailyWorkout."""
+    return build_chain(
+        llm, "workout_plan_day",
+        """Create day {day_number} of week {week_number} of a 3-week workout plan for a person with the following details:
+    {profile_summary}
+    Plan outline:
+    {plan_outline}
+    This day's focus: {day_focus}
+    A previous attempt at this day was invalid:
+    {errors}
+
+    Include appropriate exercises with sets, reps, and instructions that are
+    safe for their experience level and only use their available equipment.
+    {format_instructions}
+    """,
+        ["day_number", "week_number", "profile_summary", "plan_outline", "day_focus", "errors"],
+        DailyWorkout, parse=True,
+    )
+
+def generate_workout_day(profile, week_number, day_number, day_focus, plan_outline, errors=()):
+    """
+    Regenerate one day of a plan whose output failed validation.
+
+    Returns:
+        Dict: The parsed day (validated by the caller)
+    """
+    chain = get_chain("workout_plan_day", _build_day_chain, model_id, LOCATION)
+    day = chain.invoke({
+        "day_number": day_number,
+        "week_number": week_number,
+        "profile_summary": _build_profile_summary(profile),
+        "plan_outline": plan_outline,
+        "day_focus": day_focus,
+        "errors": format_errors(errors) if errors else "- missing",
+    }, config=langchain_config('workout_plan.day_chain', model_id))
+    if isinstance(day, dict):
+        day["day_number"] = day_number
+    return day
+
+def _build_day_revision_chain(llm):
+    """Build the chain that returns the raw text of a DayRevision."""
+    return build_chain(
+        llm, "workout_plan_day_revision",
+        """Revise day {day_number} of week {week_number} of a 3-week workout plan for a person whose profile was just updated:
+    {profile_summary}
+    This day's focus: {day_focus}
+    Current exercises:
+    {current_exercises}
+    {edits}
+
+    Match the sets, reps and difficulty of the rest of the day, keep every exercise safe
+    for their experience level and only use their available equipment.
+    {format_instructions}
+    """,
+        ["day_number", "week_number", "profile_summary", "day_focus", "current_exercises", "edits"],
+        DayRevision,
+    )
+
+def revise_workout_day(profile, week_number, day, current_exercises, edits):
+    """
+    Generate the replacement and additional exercises for one day of an existing plan.
+
+    Args:
+        profile: The updated profile
+        week_number: Week of the day in the plan
+        day: DailyWorkout-shaped day being revised
+        current_exercises: The day's exercises, formatted for the prompt
+        edits: Which exercises to replace and what to add, formatted for the prompt
+
+    Returns:
+        DayRevision: The validated replacements and additions
+    """
+    chain = get_chain("workout_plan_day_revision", _build_day_revision_chain, model_id, LOCATION)
+    text = chain.invoke({
+        "day_number": day["day_number"],
+        "week_number": week_number,
+        "profile_summary": _build_profile_summary(profile),
+        "day_focus": day["focus"],
+        "current_exercises": current_exercises,
+        "edits": edits,
+    }, config=langchain_config('workout_plan.day_revision_chain', model_id))
+    return repair_structured_output(text, DayRevision)
+
+def generate_workout_week(profile, outline, skeleton, max_attempts=PLAN_WEEK_MAX_ATTEMPTS):
+    """
+    Generate a single week of a plan from its outline. Malformed output is
+    repaired and invalid days are re-prompted on their own; the whole week is
+    retried only when the output cannot be parsed or repaired.
+    
+    Returns:
+        Dict: The validated week
+    """
+    plan_outline = _skeleton_outline(skeleton)
+
+    with tracer.span('workout_plan.week', week_number=outline.week_number) as span:
+        last_error = None
+        for attempt in range(1, max_attempts + 1):
+            if span is not None:
+                span.set_attribute('retries', attempt - 1)
+            try:
+                start = time.perf_counter()
+                text = _invoke_week_chain(profile, _week_inputs(outline, plan_outline))
+                return _repair_week(profile, outline, plan_outline, text, time.perf_counter() - start)
+            except (OutputParserException, ValidationError) as e:
+                last_error = _week_attempt_failed(outline, attempt, max_attempts, e)
+        raise ValueError(f"Failed to generate week {outline.week_number}: {str(last_error)}")
+
+async def agenerate_workout_week(profile, outline, skeleton, max_attempts=PLAN_WEEK_MAX_ATTEMPTS):
+    """Like generate_workout_week, awaiting the LLM with chain.ainvoke."""
+    plan_outline = _skeleton_outline(skeleton)
+
+    with tracer.span('workout_plan.week', week_number=outline.week_number) as span:
+        last_error = None
+        for attempt in range(1, max_attempts + 1):
+            if span is not None:
+                span.set_attribute('retries', attempt - 1)
+            try:
+                start = time.perf_counter()
+                text = await _ainvoke_week_chain(profile, _week_inputs(outline, plan_outline))
+                return await asyncio.to_thread(
+                    _repair_week, profile, outline, plan_outline, text, time.perf_counter() - start
+                )
+            except (OutputParserException, ValidationError) as e:
+                last_error = _week_attempt_failed(outline, attempt, max_attempts, e)
+        raise ValueError(f"Failed to generate week {outline.week_number}: {str(last_error)}")
+
+def _skeleton_outline(skeleton):
+    return "\n".join(
+        f"    Week {week.week_number}: {week.focus} ({week.progression})" for week in skeleton.weeks
+    )
+
+def _week_inputs(outline, plan_outline):
+    return {
+        "week_number": outline.week_number,
+        "plan_outline": plan_outline,
+        "week_focus": outline.focus,
+        "week_progression": outline.progression,
+        "day_focuses": ", ".join(outline.day_focuses),
+    }
+
+def _repair_week(profile, outline, plan_outline, text, generation_seconds):
+    """Repair malformed week output and re-prompt only invalid days."""
+    week = repair_structured_output(
+        text, WeeklyWorkout,
+        units=WEEK_REPAIR_UNITS,
+        regenerate=lambda data, path, errors: generate_workout_day(
+            profile, outline.week_number, path[1] + 1, _day_focus(outline, path[1]), plan_outline, errors
+        ),
+        prepare=lambda data: _with_week_number(data, outline.week_number),
+        generation_seconds=generation_seconds,
+    )
+    return week.model_dump()
+
+def _week_attempt_failed(outline, attempt, max_attempts, error):
+    if attempt < max_attempts:
+        LLM_RETRIES.inc(model=model_id, reason='invalid_output')
+    logger.warning("Week %s attempt %s failed: %s", outline.week_number, attempt, error)
+    return error
+
+def _day_focus(outline, day_index):
+    if day_index < len(outline.day_focuses):
+        return outline.day_focuses[day_index]
+    return outline.focus
+
+def _with_week_number(data, week_number):
+    # The outline's week number wins over whatever the model wrote
+    if isinstance(data, dict):
+        data["week_number"] = week_number
+    return data
+
+def generate_parallel_workout_plan(profile):
+    """
+    Generate a structured workout plan by fanning out one LLM call per week
     
-    # Create and execute the chain
-    chain = prompt | llm | parser
-    response = chain.invoke({"instruction": instruction})
+    A compact plan skeleton is generated first so the weeks stay consistent
+    with each other, then every week is generated concurrently (bounded by
+    WORKOUT_PLAN_MAX_CONCURRENCY) and validated on its own. Wall-clock time
+    is close to the skeleton plus the slowest week.
     
-    print(f"Generated workout plan: {response}")
-    return response
+    Args:
+        profile: UserProfile object containing user preferences and details
+    """
+    skeleton = generate_workout_plan_skeleton(profile)
+
+    max_workers = max(1, min(PLAN_MAX_CONCURRENCY, len(skeleton.weeks)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plan-week') as executor:
+        # wrap() keeps the week spans in this trace
+        weeks = list(executor.map(
+            wrap(lambda outline: generate_workout_week(profile, outline, skeleton)),
+            skeleton.weeks
+        ))
+
+    return _combine_weeks(weeks, skeleton)
+
+async def agenerate_parallel_workout_plan(profile):
+    """
+    Like generate_parallel_workout_plan, with the weeks generated as
+    concurrent tasks on the event loop (at most WORKOUT_PLAN_MAX_CONCURRENCY
+    at a time) instead of threads.
+    """
+    skeleton = await agenerate_workout_plan_skeleton(profile)
+    semaphore = asyncio.Semaphore(max(1, PLAN_MAX_CONCURRENCY))
+
+    async def week(outline):
+        async with semaphore:
+            return await agenerate_workout_week(profile, outline, skeleton)
+
+    return _combine_weeks(await asyncio.gather(*(week(outline) for outline in skeleton.weeks)), skeleton)
+
+def _combine_weeks(weeks, skeleton):
+    with tracer.span('output.validate', schema='WorkoutPlanData'):
+        # Every week of the skeleton must be in the plan, once
+        expected = sorted(outline.week_number for outline in skeleton.weeks)
+        week_numbers = sorted(week["week_number"] for week in weeks)
+        if week_numbers != expected:
+            LLM_PARSE_FAILURES.inc(schema='WorkoutPlanData', kind='missing_weeks')
+            raise ValueError(f"Generated weeks {week_numbers} do not match the plan skeleton's weeks {expected}")
+        plan = WorkoutPlanData.model_validate({"weeks": sorted(weeks, key=lambda week: week["week_number"])})
+    return plan.model_dump()
+
+def stream_structured_workout_plan(profile):
+    """
+    Generate a structured workout plan, yielding weeks and days as they are streamed
+    
+    Args:
+        profile: UserProfile object containing user preferences and details
+        
+    Yields:
+        Tuple[str, Dict]: ('day', {'week_index', 'day'}) and ('week', week) events as
+        soon as each object is complete, then ('plan', plan) with the full plan,
+        validated and repaired as by generate_structured_workout_plan
+    """
+    instruction = _build_workout_plan_instruction(profile)
+
+    with tracer.span('workout_plan.generate', mode='stream', **{'llm.model': model_id}) as span:
+        # Stream raw text so completed objects can be emitted before the plan is finished
+        chain = get_chain("workout_plan", _build_workout_plan_chain, model_id, LOCATION)
+        stream_parser = IncrementalPlanParser()
+        start = time.perf_counter()
+        for chunk in chain.stream({"instruction": instruction},
+                                  config=langchain_config('workout_plan.chain', model_id)):
+            for event in stream_parser.feed(chunk):
+                yield event
+
+        # A truncated or malformed stream is repaired like a blocking generation
+        response = _repair_workout_plan(profile, stream_parser.text, time.perf_counter() - start)
+        if span is not None:
+            span.set_attributes({'plan.source': 'llm', 'plan.weeks': len(response["weeks"])})
+
+    yield 'plan', response
 
 # if __name__ == '__main__':
 #     # Create a mock user profile for testing
@@ -0,0 +1,109 @@
+"""
+Cold-start report for the Flask application.
+
+Runs `create_app()` in a fresh interpreter with `python -X importtime` and
+summarizes where the startup time goes, so import-time regressions (e.g. an
+LLM SDK imported at module level) are easy to spot.
+"""
+from typing import Dict, List
+import json
+import os
+import subprocess
+import sys
+
+_STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+done = time.perf_counter()
+print(json.dumps({"import_seconds": imported - start, "create_app_seconds": done - imported}))
+"""
+
+# Packages whose presence at startup means an LLM SDK was imported eagerly
+LLM_SDK_PACKAGES = ("google.genai", "langchain_google_vertexai", "vertexai", "google.cloud.aiplatform", "langchain_core")
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """
+    Parse `-X importtime` stderr lines into records.
+
+    Returns:
+        List[Dict]: One record per imported module with self/cumulative
+        microseconds and its nesting depth (0 for top-level imports)
+    """
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            records.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+            })
+        except ValueError:
+            continue
+    return records
+
+
+def collect_startup_report(top: int = 15) -> Dict:
+    """
+    Measure application startup in a subprocess.
+
+    Args:
+        top: Number of slowest packages to include
+
+    Returns:
+        Dict: Wall-clock timings, the slowest packages (by the cumulative time
+        of their outermost import) and any LLM SDK packages imported during
+        startup
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    records = parse_importtime(result.stderr)
+
+    # Cumulative time of a package's outermost import covers all of its submodules
+    packages = {}
+    for record in records:
+        package = record['module'].split('.')[0]
+        if package not in packages or record['cumulative_us'] > packages[package]['cumulative_us']:
+            packages[package] = {**record, 'module': package}
+    slowest = sorted(packages.values(), key=lambda r: r['cumulative_us'], reverse=True)
+    modules = {r['module'] for r in records}
+    return {
+        **timings,
+        'total_import_us': sum(r['cumulative_us'] for r in records if r['depth'] == 0),
+        'module_count': len(records),
+        'slowest_packages': slowest[:top],
+        'llm_sdks_imported': sorted(p for p in LLM_SDK_PACKAGES if p in modules),
+    }
+
+
+def format_startup_report(report: Dict) -> str:
+    """Render a startup report as a text table."""
+    lines = [
+        f"import app:        {report['import_seconds'] * 1000:8.1f} ms",
+        f"create_app():      {report['create_app_seconds'] * 1000:8.1f} ms",
+        f"modules imported:  {report['module_count']:8d}",
+        "",
+        f"{'cumulative (ms)':>16}  package",
+    ]
+    for record in report['slowest_packages']:
+        lines.append(f"{record['cumulative_us'] / 1000:16.1f}  {record['module']}")
+    lines.append("")
+    if report['llm_sdks_imported']:
+        lines.append(f"LLM SDKs imported at startup: {', '.join(report['llm_sdks_imported'])}")
+    else:
+        lines.append("No LLM SDKs imported at startup")
+    return "\n".join(lines)
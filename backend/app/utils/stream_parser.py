@@ -0,0 +1,130 @@
+"""
+Incremental JSON parser for streamed workout plans.
+
+The LLM streams the WorkoutPlanData JSON as text chunks. IncrementalPlanParser
+scans the chunks as they arrive and emits every DailyWorkout and WeeklyWorkout
+object as soon as its closing brace has been received, without waiting for
+the rest of the plan.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+
+WEEK_PATH = ('weeks',)
+DAY_PATH = ('weeks', 'days')
+
+
+class _Container:
+    __slots__ = ('kind', 'start', 'name', 'last_key', 'expect_key', 'items')
+
+    def __init__(self, kind, start, name):
+        self.kind = kind          # '{' or '['
+        self.start = start        # offset of the opening bracket
+        self.name = name          # key or index of this container in its parent
+        self.last_key = None      # most recent key (objects only)
+        self.expect_key = kind == '{'
+        self.items = 0            # number of separators seen (arrays only)
+
+
+class IncrementalPlanParser:
+    """
+    Feed text chunks with feed() and receive ('day', ...) and ('week', ...) events.
+
+    Day events carry {'week_index': i, 'day': {...}}; week events carry the
+    complete week dict. Text before the first '{' (e.g. a ```json code fence)
+    and after the top-level object is ignored.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._stack: List[_Container] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, Dict]]:
+        """Append a chunk of streamed text and yield any objects it completes."""
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            pos = self._pos
+            char = text[pos]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._end_string(pos)
+                continue
+
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._stack.append(_Container('{', pos, None))
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in '{[':
+                parent = self._stack[-1]
+                name = parent.last_key if parent.kind == '{' else parent.items
+                self._stack.append(_Container(char, pos, name))
+            elif char in '}]':
+                container = self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                    continue
+                if char == '}':
+                    event = self._completed_event(container, pos)
+                    if event:
+                        yield event
+            elif char == ',':
+                parent = self._stack[-1]
+                if parent.kind == '[':
+                    parent.items += 1
+                else:
+                    parent.expect_key = True
+
+    def _end_string(self, end: int) -> None:
+        container = self._stack[-1] if self._stack else None
+        if container is not None and container.kind == '{' and container.expect_key:
+            try:
+                container.last_key = json.loads(self.text[self._string_start:end + 1])
+            except json.JSONDecodeError:
+                # A malformed key: its value emits no events and is repaired once the plan is complete
+                container.last_key = None
+            container.expect_key = False
+
+    def _object_path(self) -> Tuple[Tuple, List[int]]:
+        """
+        Return the key path (without indexes) of the innermost container and its
+        array indexes. A None key (malformed) stays in the path, so it matches nothing.
+        """
+        keys, indexes = [], []
+        for container in self._stack[1:]:
+            if isinstance(container.name, int):
+                indexes.append(container.name)
+            else:
+                keys.append(container.name)
+        return tuple(keys), indexes
+
+    def _completed_event(self, container: _Container, end: int) -> Optional[Tuple[str, Dict]]:
+        if not isinstance(container.name, int):
+            return None
+        keys, indexes = self._object_path()
+        try:
+            value = json.loads(self.text[container.start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        if keys == WEEK_PATH:
+            return 'week', value
+        if keys == DAY_PATH:
+            return 'day', {'week_index': indexes[0], 'day': value}
+        return None
@@ -0,0 +1,546 @@
+"""
+In-process tracing of requests, jobs and their generation stages.
+
+Spans follow the OpenTelemetry model (trace and span ids, parent ids,
+attributes, status and exception events) and are kept in a context variable,
+so `with tracer.span(...)` nests under whatever request or job is running.
+LangChain runs are traced through a callback handler (`langchain_config()`),
+which splits a `prompt | llm | parser` chain into prompt build, LLM call and
+parse spans.
+
+Finished traces go to the exporters named in TRACING_EXPORTERS:
+
+- "memory": the last TRACING_MAX_TRACES traces, served by GET /debug/traces
+- "file": one JSON object per span appended to TRACING_FILE, in the layout of
+  the OpenTelemetry SDK's `ReadableSpan.to_json()`
+- "otel": replayed through the opentelemetry-api package (when installed) so
+  a configured OpenTelemetry SDK exports them
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACING_EXPORTERS = os.environ.get("TRACING_EXPORTERS", "memory")
+# Defaults to instance/traces.jsonl next to the SQLite database
+TRACING_FILE = os.environ.get("TRACING_FILE")
+TRACING_MAX_TRACES = int(os.environ.get("TRACING_MAX_TRACES", 200))
+# Traces at least this long are listed by GET /debug/traces by default
+TRACING_SLOW_MS = float(os.environ.get("TRACING_SLOW_MS", 500))
+# Serve GET /debug/traces (always served when the app runs in debug mode)
+TRACING_DEBUG_VIEW = os.environ.get("TRACING_DEBUG_VIEW", "false").lower() in ("1", "true", "yes")
+
+# Unfinished traces kept while waiting for their root span to end
+MAX_PENDING_TRACES = 1000
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+def _attribute_value(value):
+    # OpenTelemetry attributes are primitives (or sequences of them)
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(item, (bool, int, float, str)) for item in value):
+        return list(value)
+    return str(value)
+
+
+def _iso_time(time_ns: Optional[int]) -> Optional[str]:
+    if time_ns is None:
+        return None
+    timestamp = datetime.fromtimestamp(time_ns / 1e9, tz=timezone.utc)
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class Span:
+    """A timed operation in a trace."""
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional['Span'] = None,
+                 kind: str = 'INTERNAL', attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = {}
+        self.events: List[Dict] = []
+        self.status = 'UNSET'
+        self.status_message: Optional[str] = None
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        if attributes:
+            self.set_attributes(attributes)
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent_id is None
+
+    def set_attribute(self, key: str, value) -> None:
+        if value is not None:
+            self.attributes[key] = _attribute_value(value)
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, error: BaseException) -> None:
+        """Add an exception event and mark the span as failed."""
+        self.events.append({
+            'name': 'exception',
+            'timestamp': _iso_time(time.time_ns()),
+            'attributes': {'exception.type': type(error).__name__, 'exception.message': str(error)},
+        })
+        self.status = 'ERROR'
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        if self.end_time_ns is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.end_time_ns = self.start_time_ns + int(self.duration_ms * 1e6)
+        if self.status == 'UNSET':
+            self.status = 'OK'
+        self.tracer._on_end(self)
+
+    def to_dict(self) -> Dict:
+        """The span as `ReadableSpan.to_json()` of the OpenTelemetry SDK lays it out, plus its duration."""
+        status = {'status_code': self.status}
+        if self.status_message:
+            status['description'] = self.status_message
+        return {
+            'name': self.name,
+            'context': {'trace_id': f"0x{self.trace_id}", 'span_id': f"0x{self.span_id}", 'trace_state': '[]'},
+            'kind': f"SpanKind.{self.kind}",
+            'parent_id': f"0x{self.parent_id}" if self.parent_id else None,
+            'start_time': _iso_time(self.start_time_ns),
+            'end_time': _iso_time(self.end_time_ns),
+            'duration_ms': round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            'status': status,
+            'attributes': dict(self.attributes),
+            'events': list(self.events),
+        }
+
+
+class InMemorySpanExporter:
+    """Keeps the most recent finished traces."""
+
+    def __init__(self, max_traces: int = TRACING_MAX_TRACES):
+        self._traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        with self._lock:
+            self._traces.append(spans)
+
+    def traces(self) -> List[List[Span]]:
+        """Finished traces, oldest first."""
+        with self._lock:
+            return list(self._traces)
+
+    def slow_traces(self, min_duration_ms: float = 0, limit: int = 20) -> List[List[Span]]:
+        """The most recent traces whose root span took at least min_duration_ms, newest first."""
+        slow = [spans for spans in reversed(self.traces())
+                if spans[0].is_root and spans[0].duration_ms >= min_duration_ms]
+        return slow[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+class FileSpanExporter:
+    """Appends every span of a finished trace to a file as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+
+class OpenTelemetrySpanExporter:
+    """Replays finished traces through the opentelemetry-api tracer."""
+
+    def __init__(self):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(__name__)
+
+    def export(self, spans: List[Span]) -> None:
+        trace = self._trace
+        started = {}
+        for span in spans:
+            parent = started.get(span.parent_id)
+            otel_span = self._tracer.start_span(
+                span.name,
+                context=trace.set_span_in_context(parent) if parent is not None else None,
+                kind=getattr(trace.SpanKind, span.kind, trace.SpanKind.INTERNAL),
+                attributes=span.attributes,
+                start_time=span.start_time_ns,
+            )
+            if span.status == 'ERROR':
+                otel_span.set_status(trace.Status(trace.StatusCode.ERROR, span.status_message))
+            started[span.span_id] = otel_span
+        for span in spans:
+            started[span.span_id].end(end_time=span.end_time_ns)
+
+
+def create_exporters(names: str, file_path: Optional[str] = None, max_traces: int = TRACING_MAX_TRACES) -> List:
+    """
+    Create exporters from a comma-separated list of "memory", "file" and "otel".
+
+    Args:
+        names: Exporter names, e.g. "memory,file"
+        file_path: JSON lines file of the "file" exporter
+        max_traces: Traces kept by the "memory" exporter
+
+    Returns:
+        List: The exporters; "otel" is skipped with a warning when opentelemetry-api is not installed
+    """
+    exporters = []
+    for name in (name.strip().lower() for name in names.split(',')):
+        if name == 'memory':
+            exporters.append(InMemorySpanExporter(max_traces))
+        elif name == 'file':
+            exporters.append(FileSpanExporter(file_path or 'traces.jsonl'))
+        elif name == 'otel':
+            try:
+                exporters.append(OpenTelemetrySpanExporter())
+            except ImportError:
+                logger.warning("TRACING_EXPORTERS includes otel but opentelemetry-api is not installed")
+        elif name and name != 'none':
+            raise ValueError(f"Unknown trace exporter: {name}")
+    return exporters
+
+
+class Tracer:
+    """
+    Creates spans and hands each finished trace to the exporters.
+
+    Spans are buffered per trace until the root span ends, so exporters see
+    whole traces. Spans that end after their root (e.g. an LLM call that
+    outlived a request's timeout) are exported on their own.
+    """
+
+    def __init__(self, exporters: Optional[List] = None, enabled: bool = TRACING_ENABLED):
+        self.enabled = enabled
+        self.exporters = exporters if exporters is not None else [InMemorySpanExporter()]
+        self._pending: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def memory(self) -> Optional[InMemorySpanExporter]:
+        """The in-memory exporter, if one is configured."""
+        return next((e for e in self.exporters if isinstance(e, InMemorySpanExporter)), None)
+
+    def configure(self, exporters: List, enabled: bool = True) -> None:
+        with self._lock:
+            self.exporters = exporters
+            self.enabled = enabled
+            self._pending.clear()
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, kind: str = 'INTERNAL',
+                   attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """
+        Start a span without making it current; the caller ends it.
+
+        Returns:
+            Optional[Span]: The span, or None when tracing is disabled
+        """
+        if not self.enabled:
+            return None
+        span = Span(self, name, parent, kind, attributes)
+        if span.is_root:
+            with self._lock:
+                if len(self._pending) >= MAX_PENDING_TRACES:
+                    # Drop the oldest unfinished trace rather than grow without bound
+                    self._pending.pop(next(iter(self._pending)))
+                self._pending[span.trace_id] = []
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """
+        Run a block in a span that is a child of the current span.
+
+        Exceptions are recorded on the span and re-raised. Yields None when
+        tracing is disabled, so callers check before setting attributes.
+        """
+        span = self.start_span(name, parent=_current_span.get(), attributes=attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def _on_end(self, span: Span) -> None:
+        with self._lock:
+            spans = self._pending.get(span.trace_id)
+            if spans is None:
+                finished = [span]
+            else:
+                spans.append(span)
+                finished = None
+                if span.is_root:
+                    # The root ends last; list it first
+                    finished = [span] + spans[:-1]
+                    del self._pending[span.trace_id]
+            exporters = list(self.exporters)
+
+        if finished:
+            for exporter in exporters:
+                try:
+                    exporter.export(finished)
+                except Exception as e:
+                    logger.warning("Trace exporter %s failed: %s", type(exporter).__name__, e)
+
+
+tracer = Tracer()
+
+
+def wrap(fn: Callable) -> Callable:
+    """Bind fn to the current span, so spans it starts in another thread join this trace."""
+    parent = _current_span.get()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+
+    return run
+
+
+def langchain_config(name: str, model: Optional[str] = None) -> Dict:
+    """
+    RunnableConfig that traces a chain run under the current span.
+
+    The chain becomes a span called `name`, with a "prompt.build" span for the
+    prompt template (prompt.chars, prompt.tokens), an "llm.call" span for the model
+    (llm.model, llm.prompt_tokens, llm.output_tokens) and an "output.parse"
+    span for the output parser.
+
+    Args:
+        name: Span name of the whole chain run
+        model: Model id recorded on LLM spans
+
+    Returns:
+        Dict: {'callbacks': [handler]}, or {} when tracing is disabled
+    """
+    if not tracer.enabled:
+        return {}
+    return {'callbacks': [_langchain_handler_class()(name, model, _current_span.get())]}
+
+
+@functools.lru_cache(maxsize=None)
+def _langchain_handler_class():
+    # Imported lazily so langchain_core is only loaded with the first chain run
+    from langchain_core.callbacks import BaseCallbackHandler
+    from .metrics import token_counts
+    from .prompt_compiler import estimate_tokens
+
+    class LangChainTracingHandler(BaseCallbackHandler):
+        def __init__(self, name: str, model: Optional[str], parent: Optional[Span]):
+            self.name = name
+            self.model = model
+            self.parent = parent
+            self._spans: Dict[Any, Span] = {}
+            self._prompt_chars: Dict[Any, int] = {}
+            self._lock = threading.Lock()
+
+        def _start(self, run_id, parent_run_id, name, attributes=None):
+            with self._lock:
+                parent = self._spans.get(parent_run_id, self.parent)
+            span = tracer.start_span(name, parent=parent, attributes=attributes)
+            if span is not None:
+                with self._lock:
+                    self._spans[run_id] = span
+
+        def _end(self, run_id, error=None, attributes=None):
+            with self._lock:
+                span = self._spans.pop(run_id, None)
+                prompt_chars = self._prompt_chars.pop(run_id, 0)
+            if span is None:
+                return prompt_chars, None
+            if attributes:
+                span.set_attributes(attributes)
+            if error is not None:
+                span.record_exception(error)
+            return prompt_chars, span
+
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+            run_type = kwargs.get('run_type')
+            if parent_run_id is None:
+                name = self.name
+            elif run_type == 'prompt':
+                name = 'prompt.build'
+            elif run_type == 'parser':
+                name = 'output.parse'
+            else:
+                name = f"chain.{kwargs.get('name') or 'step'}"
+            self._start(run_id, parent_run_id, name, {'langchain.runnable': kwargs.get('name')})
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            attributes = None
+            if hasattr(outputs, 'to_string'):
+                text = outputs.to_string()
+                attributes = {'prompt.chars': len(text), 'prompt.tokens': estimate_tokens(text)}
+            _, span = self._end(run_id, attributes=attributes)
+            if span is not None:
+                span.end()
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            _, span = self._end(run_id, error=error)
+            if span is not None:
+                span.end()
+
+        def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+            prompt_chars = sum(len(prompt) for prompt in prompts)
+            self._start(run_id, parent_run_id, 'llm.call', {'llm.model': self.model, 'llm.prompt_chars': prompt_chars})
+            with self._lock:
+                self._prompt_chars[run_id] = prompt_chars
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            prompt_chars, span = self._end(run_id)
+            if span is not None:
+                prompt_tokens, output_tokens = token_counts(response, prompt_chars)
+                span.set_attributes({'llm.prompt_tokens': prompt_tokens, 'llm.output_tokens': output_tokens})
+                span.end()
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            _, span = self._end(run_id, error=error)
+            if span is not None:
+                span.end()
+
+    return LangChainTracingHandler
+
+
+def _span_tree(spans: List[Span]) -> Dict:
+    children: Dict[Optional[str], List[Span]] = {}
+    for span in spans:
+        children.setdefault(span.parent_id, []).append(span)
+
+    def build(span):
+        node = span.to_dict()
+        node['children'] = [build(child) for child in sorted(children.get(span.span_id, []),
+                                                            key=lambda child: child.start_time_ns)]
+        return node
+
+    return build(spans[0])
+
+
+def _format_trace(spans: List[Span]) -> List[str]:
+    """Indented one-line-per-span rendering of a trace."""
+    lines = []
+
+    def render(node, depth):
+        attributes = " ".join(f"{key}={value}" for key, value in node['attributes'].items())
+        status = " ERROR" if node['status']['status_code'] == 'ERROR' else ""
+        lines.append(f"{node['duration_ms']:10.1f} ms  {'  ' * depth}{node['name']}{status}  {attributes}".rstrip())
+        for child in node['children']:
+            render(child, depth + 1)
+
+    render(_span_tree(spans), 0)
+    return lines
+
+
+def init_app(app) -> None:
+    """
+    Configure the tracer from the app config, trace every request and serve
+    GET /debug/traces when TRACING_DEBUG_VIEW is set or the app is in debug mode.
+    """
+    enabled = app.config.get('TRACING_ENABLED', TRACING_ENABLED)
+    file_path = app.config.get('TRACING_FILE', TRACING_FILE) or os.path.join(app.root_path, 'instance', 'traces.jsonl')
+    exporters = create_exporters(app.config.get('TRACING_EXPORTERS', TRACING_EXPORTERS), file_path,
+                                 app.config.get('TRACING_MAX_TRACES', TRACING_MAX_TRACES))
+    tracer.configure(exporters, enabled=enabled)
+    if not enabled:
+        return
+    from flask import g, jsonify, request
+
+    @app.before_request
+    def start_request_span():
+        if request.endpoint in ('metrics', 'debug_traces'):
+            return
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        span = tracer.start_span(f"{request.method} {route}", kind='SERVER', attributes={
+            'http.method': request.method, 'http.route': route, 'http.target': request.path,
+        })
+        if span is not None:
+            g.trace_span = span
+            g.trace_previous_span = _current_span.set(span)
+
+    @app.after_request
+    def record_status(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.status = 'ERROR'
+        return response
+
+    @app.teardown_request
+    def end_request_span(error):
+        span = g.pop('trace_span', None)
+        if span is None:
+            return
+        token = g.pop('trace_previous_span', None)
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Reset from another context (e.g. after a streamed response)
+            _current_span.set(None)
+        if error is not None:
+            span.record_exception(error)
+        span.end()
+
+    if not (app.config.get('TRACING_DEBUG_VIEW', TRACING_DEBUG_VIEW) or app.debug):
+        return
+
+    def debug_traces():
+        memory = tracer.memory
+        if memory is None:
+            return jsonify({'error': 'The memory trace exporter is not enabled'}), 404
+        min_ms = request.args.get('min_ms', TRACING_SLOW_MS, type=float)
+        limit = request.args.get('limit', 20, type=int)
+        traces = memory.slow_traces(min_ms, limit)
+        if request.args.get('format') == 'text':
+            lines = []
+            for spans in traces:
+                lines.append(f"trace {spans[0].trace_id}  {_iso_time(spans[0].start_time_ns)}")
+                lines.extend(_format_trace(spans))
+                lines.append("")
+            return "\n".join(lines), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        return jsonify({'min_ms': min_ms, 'traces': [_span_tree(spans) for spans in traces]})
+
+    app.add_url_rule('/debug/traces', 'debug_traces', debug_traces, methods=['GET'])
@@ -0,0 +1,5 @@
+from app import create_app
+from app.utils.asgi import create_asgi_app
+
+# ASGI entry point: uvicorn asgi:app
+app = create_asgi_app(create_app())
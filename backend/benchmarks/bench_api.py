@@ -0,0 +1,206 @@
+"""
+Load-testing benchmark for the /api endpoints.
+
+Drives profile creation, fitness options and workout plan generation at a
+configurable concurrency and reports p50/p95/p99 latency and throughput per
+scenario. By default the app runs in-process behind the Flask test client with
+the fake LLM backend and a temporary SQLite database; pass --base-url to
+benchmark a running server instead (start it with LLM_BACKEND=fake).
+
+The workout-plan scenario measures end to end: queueing the job, polling
+until it is done and fetching the plan.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_api --concurrency 16 --requests 200 --latency-ms 50
+    python -m benchmarks.bench_api --base-url http://127.0.0.1:5002 --scenarios options
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+PROFILE_DATA = {
+    "name": "Bench User",
+    "age": 30,
+    "fitnessGoal": "Build Muscle",
+    "equipment": ["Dumbbells", "Bench"],
+    "workoutTypes": ["Strength Training"],
+    "experienceLevel": "Beginner"
+}
+
+SCENARIOS = ('profile', 'options', 'workout-plan')
+
+
+class TestClientTransport:
+    """Sends requests through one Flask test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpTransport:
+    """Sends requests to a running server."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(req) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+def create_profile(transport):
+    status, body = transport.request('POST', '/api/profile', PROFILE_DATA)
+    if status != 201:
+        raise RuntimeError(f"POST /api/profile returned {status}")
+    return body['session_token']
+
+
+def run_options(transport, rng):
+    from app.utils.fitness_options import EQUIPMENT_OPTIONS, FITNESS_GOALS
+
+    selections = [{'type': 'goal', **rng.choice(FITNESS_GOALS)}]
+    selections += [{'type': 'equipment', **option} for option in rng.sample(EQUIPMENT_OPTIONS, rng.randint(0, 2))]
+    status, _ = transport.request('POST', '/api/options', {'age': rng.randint(13, 85), 'selections': selections})
+    if status != 200:
+        raise RuntimeError(f"POST /api/options returned {status}")
+
+
+def run_workout_plan(transport, token, poll_interval=0.01):
+    status, job = transport.request('POST', f'/api/profiles/{token}/workout-plan')
+    if status != 202:
+        raise RuntimeError(f"POST workout-plan returned {status}")
+    while job['status'] in ('queued', 'running'):
+        time.sleep(poll_interval)
+        _, job = transport.request('GET', f"/api/jobs/{job['id']}")
+    if job['status'] != 'done':
+        raise RuntimeError(f"Job failed: {job['error']}")
+    status, _ = transport.request('GET', f'/api/profiles/{token}/workout-plan')
+    if status != 200:
+        raise RuntimeError(f"GET workout-plan returned {status}")
+
+
+def run_scenario(name, transport, total, concurrency, seed=0):
+    """Run one scenario and return its latency and throughput statistics."""
+    tokens = []
+    if name == 'workout-plan':
+        # One profile per request, since jobs are deduplicated per profile
+        tokens = [create_profile(transport) for _ in range(total)]
+
+    def one(i):
+        rng = random.Random(seed + i)
+        start = time.perf_counter()
+        try:
+            if name == 'profile':
+                create_profile(transport)
+            elif name == 'options':
+                run_options(transport, rng)
+            else:
+                run_workout_plan(transport, tokens[i])
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, str(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, error in results if error is None)
+    errors = [error for _, error in results if error is not None]
+    return {
+        'scenario': name,
+        'requests': total,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': (statistics.fmean(latencies) * 1000) if latencies else 0.0,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+def format_results(results):
+    lines = [f"{'scenario':<14}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"]
+    for r in results:
+        lines.append(
+            f"{r['scenario']:<14}{r['requests']:>9}{r['errors']:>8}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['throughput_rps']:>10.1f}"
+        )
+        if r['first_error']:
+            lines.append(f"  first error: {r['first_error']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', help='Benchmark a running server instead of the in-process test client')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=100, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=50, help='Fake LLM latency (in-process mode only)')
+    parser.add_argument('--as-json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        if args.base_url:
+            transport = HttpTransport(args.base_url)
+        else:
+            from app import create_app
+
+            tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                app = create_app({
+                    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+                    'LLM_BACKEND': 'fake',
+                    'FAKE_LLM_LATENCY_MS': args.latency_ms,
+                })
+            transport = TestClientTransport(app)
+
+        results = []
+        for name in args.scenarios:
+            # Keep the app's own logging out of the report
+            with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                results.append(run_scenario(name, transport, args.requests, args.concurrency))
+
+        if not args.base_url:
+            from app.utils.job_queue import job_queue
+            job_queue.shutdown(wait=True)
+
+    print(json.dumps(results, indent=2) if args.as_json else format_results(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+In-flight workout plan generations per process: thread pool vs async job runner.
+
+Queues one plan generation job per profile (--jobs distinct profiles, plan
+templates off) against a fake LLM that takes --latency-ms per call, and runs
+them with:
+
+- threads: the default job runner, one pool thread per running job
+  (--workers, as WORKOUT_JOB_WORKERS)
+- async: WORKOUT_JOB_RUNNER=async, coroutines awaiting chain.ainvoke on one
+  event loop thread (at most --concurrency at a time), with database work on
+  the ASYNC_DB_WORKERS thread pool
+
+Reports the peak number of LLM calls in flight, wall time, plans per minute
+and the process's peak thread count. The thread runner is timed on
+--thread-jobs jobs, as it only runs --workers at a time.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_async_generation --jobs 500 --latency-ms 2000
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from typing import ClassVar
+
+GOALS = ['Build Muscle', 'Lose Weight', 'Improve Endurance', 'Increase Flexibility', 'General Fitness']
+LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+
+
+def profile_rows(count):
+    # Distinct ages keep every profile's fingerprint (and so its plan) separate
+    for number in range(1, count + 1):
+        yield number, {'name': f'Member {number}', 'age': 18 + number % 60, 'fitnessGoal': GOALS[number % len(GOALS)],
+                       'equipment': ['Dumbbells'], 'workoutTypes': ['Strength Training'],
+                       'experienceLevel': LEVELS[number % len(LEVELS)]}, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=500)
+    parser.add_argument('--thread-jobs', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=2000)
+    parser.add_argument('--workers', type=int, default=4, help='Threads of the thread runner')
+    parser.add_argument('--concurrency', type=int, default=500, help='Jobs in flight with the async runner')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models.generation_job import GenerationJob, JOB_DONE, JOB_FAILED
+    from app.models.user_profile import UserProfile, db
+    from app.utils import llm_registry
+    from app.utils.fake_llm import FakeLLM
+    from app.utils.job_queue import JobQueue
+    from app.utils.plan_templates import plan_template_store
+    from app.utils.profile_bulk import import_profiles
+
+    class CountingLLM(FakeLLM):
+        lock: ClassVar[threading.Lock] = threading.Lock()
+        in_flight: ClassVar[int] = 0
+        peak: ClassVar[int] = 0
+
+        @classmethod
+        def enter(cls):
+            with cls.lock:
+                cls.in_flight += 1
+                cls.peak = max(cls.peak, cls.in_flight)
+
+        @classmethod
+        def leave(cls):
+            with cls.lock:
+                cls.in_flight -= 1
+
+        def _call(self, *args, **kwargs):
+            self.enter()
+            try:
+                return super()._call(*args, **kwargs)
+            finally:
+                self.leave()
+
+        async def _acall(self, *args, **kwargs):
+            self.enter()
+            try:
+                return await super()._acall(*args, **kwargs)
+            finally:
+                self.leave()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(open(os.devnull, 'w')):
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            'LLM_BACKEND': 'fake',
+            'METRICS_ENABLED': False,
+            'TRACING_ENABLED': False,
+        })
+        llm_registry.set_llm_factory(lambda model, location: CountingLLM(
+            model_id=model, latency_seconds=args.latency_ms / 1000))
+        plan_template_store.enabled = False
+        with app.app_context():
+            import_profiles(profile_rows(args.jobs), collect_uuids=False)
+            uuids = [uuid for (uuid,) in UserProfile.query.with_entities(UserProfile.uuid).order_by(UserProfile.id)]
+
+        for runner, count in (('threads', min(args.thread_jobs, args.jobs)), ('async', args.jobs)):
+            queue = JobQueue(runner=runner, max_workers=args.workers, async_concurrency=args.concurrency)
+            queue.init_app(app, resume=False)
+            CountingLLM.peak = 0
+            peak_threads = threading.active_count()
+            with app.app_context():
+                db.session.execute(db.delete(GenerationJob))
+                db.session.commit()
+                start = time.perf_counter()
+                for profile_uuid in uuids[:count]:
+                    queue.enqueue_workout_plan(profile_uuid)
+                while True:
+                    finished = dict(db.session.execute(
+                        db.select(GenerationJob.status, db.func.count())
+                        .where(GenerationJob.status.in_((JOB_DONE, JOB_FAILED)))
+                        .group_by(GenerationJob.status)
+                    ).all())
+                    db.session.commit()
+                    peak_threads = max(peak_threads, threading.active_count())
+                    if sum(finished.values()) >= count:
+                        break
+                    time.sleep(0.05)
+                elapsed = time.perf_counter() - start
+            queue.shutdown()
+            results[runner] = (count, finished.get(JOB_FAILED, 0), CountingLLM.peak, elapsed, peak_threads)
+
+    print(f"Fake LLM latency {args.latency_ms / 1000:.1f}s per call")
+    print(f"{'runner':<9}{'jobs':>6}{'failed':>8}{'in flight':>11}{'seconds':>9}{'plans/min':>11}{'threads':>9}")
+    for runner, (count, failed, peak, elapsed, threads) in results.items():
+        print(f"{runner:<9}{count:>6}{failed:>8}{peak:>11}{elapsed:>9.1f}{count / elapsed * 60:>11.0f}{threads:>9}")
+
+
+if __name__ == '__main__':
+    main()
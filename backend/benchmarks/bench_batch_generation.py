@@ -0,0 +1,108 @@
+"""
+Benchmark of batch workout plan generation against the fake LLM backend.
+
+Imports --profiles profiles spread over --cohorts distinct fitness profiles and
+generates a plan for each, comparing:
+
+- serial: WorkoutGeneratorAgent.generate_workout_plan per profile (templates off)
+- batch: BatchGenerator, sharing one generation per fingerprint group and
+  running --concurrency generations at a time under the rate limiter
+
+--quota-error-rate makes that fraction of generation calls fail with a quota
+error first, to exercise the backoff path. The serial run is sampled on
+--serial-sample profiles and extrapolated.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_batch_generation --profiles 2000 --cohorts 40 --latency-ms 500
+"""
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import threading
+import time
+
+GOALS = ['Build Muscle', 'Lose Weight', 'Improve Endurance', 'Increase Flexibility', 'General Fitness']
+LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+EQUIPMENT = [['Dumbbells'], ['Barbell', 'Bench'], ['Bodyweight'], ['Kettlebells'], ['Resistance Bands'],
+             ['Dumbbells', 'Pull-up Bar'], ['Treadmill'], ['Cable Machine']]
+
+
+class QuotaExceeded(Exception):
+    code = 429
+
+
+def cohort_rows(profiles, cohorts, seed=0):
+    rng = random.Random(seed)
+    shapes = [(GOALS[i % len(GOALS)], LEVELS[(i // len(GOALS)) % len(LEVELS)],
+               EQUIPMENT[(i // (len(GOALS) * len(LEVELS))) % len(EQUIPMENT)]) for i in range(cohorts)]
+    for number in range(1, profiles + 1):
+        goal, level, equipment = shapes[rng.randrange(cohorts)]
+        yield number, {'name': f'Member {number}', 'age': 30, 'fitnessGoal': goal, 'equipment': equipment,
+                       'workoutTypes': ['Strength Training'], 'experienceLevel': level}, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', type=int, default=2000)
+    parser.add_argument('--cohorts', type=int, default=40, help='Distinct profile fingerprints')
+    parser.add_argument('--latency-ms', type=float, default=500, help='Fake LLM latency per generation')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rpm', type=float, default=600, help='Generations per minute for the batch run')
+    parser.add_argument('--quota-error-rate', type=float, default=0.0)
+    parser.add_argument('--serial-sample', type=int, default=20)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.agents.workout_generator_agent import WorkoutGeneratorAgent
+    from app.models.user_profile import UserProfile
+    from app.utils.batch_generation import BatchGenerator, create_batch_run
+    from app.utils.plan_templates import plan_template_store
+    from app.utils.profile_bulk import import_profiles
+    from app.utils.search import generate_structured_workout_plan
+
+    rng = random.Random(1)
+    lock = threading.Lock()
+
+    def generate(profile):
+        with lock:
+            fail = rng.random() < args.quota_error_rate
+        if fail:
+            raise QuotaExceeded('429 Resource has been exhausted (e.g. check quota).')
+        return generate_structured_workout_plan(profile)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(open(os.devnull, 'w')):
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            'LLM_BACKEND': 'fake',
+            'FAKE_LLM_LATENCY_MS': args.latency_ms,
+        })
+        with app.app_context():
+            import_profiles(cohort_rows(args.profiles, args.cohorts), collect_uuids=False)
+
+            plan_template_store.enabled = False
+            sample = [uuid for (uuid,) in UserProfile.query.with_entities(UserProfile.uuid).limit(args.serial_sample)]
+            start = time.perf_counter()
+            for profile_uuid in sample:
+                WorkoutGeneratorAgent.generate_workout_plan(profile_uuid)
+            serial_per_plan = (time.perf_counter() - start) / len(sample)
+
+            plan_template_store.enabled = True
+            run, _ = create_batch_run()
+            generator = BatchGenerator(max_concurrency=args.concurrency, requests_per_minute=args.rpm,
+                                       generate=generate)
+            start = time.perf_counter()
+            result = generator.run(run.id)
+            batch = time.perf_counter() - start
+
+    serial = serial_per_plan * args.profiles
+    print(f"serial: {60 / serial_per_plan:10.0f} plans/min  (~{serial:.0f}s for {args.profiles} profiles, extrapolated)")
+    print(f"batch:  {args.profiles / batch * 60:10.0f} plans/min  ({batch:.1f}s, {result['completed']} done, "
+          f"{result['failed']} failed, {result['llm_calls']} generations, "
+          f"{generator.limiter.throttled} quota errors)")
+    print(f"speedup: {serial / batch:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
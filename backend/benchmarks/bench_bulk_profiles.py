@@ -0,0 +1,76 @@
+"""
+Benchmark of bulk profile import and export on SQLite.
+
+Generates --profiles NDJSON rows in memory, imports them through
+POST /api/profiles/bulk into a temporary SQLite database, exports them again
+as NDJSON and CSV, and compares the import rate with one POST /api/profile
+per profile for a --single-sample subset.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_bulk_profiles --profiles 100000
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_api import PROFILE_DATA
+
+
+def generate_rows(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        json.dumps({**PROFILE_DATA, 'name': f"Member {i}", 'age': rng.randint(16, 80)})
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', type=int, default=100_000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--single-sample', type=int, default=1000,
+                        help='Profiles created one request at a time for comparison')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    body = "\n".join(generate_rows(args.profiles))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+                'LLM_BACKEND': 'fake',
+            })
+        client = app.test_client()
+
+        start = time.perf_counter()
+        for _ in range(args.single_sample):
+            client.post('/api/profile', json=PROFILE_DATA)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post(f'/api/profiles/bulk?chunk_size={args.chunk_size}', data=body,
+                               content_type='application/x-ndjson')
+        bulk = time.perf_counter() - start
+        result = response.get_json()
+
+        exports = {}
+        for fmt in ('ndjson', 'csv'):
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in client.get(f'/api/profiles/export?format={fmt}').response)
+            exports[fmt] = (time.perf_counter() - start, size)
+
+    print(f"single POST /api/profile: {args.single_sample / single:10.0f} profiles/s")
+    print(f"bulk import:              {result['imported'] / bulk:10.0f} profiles/s "
+          f"({result['imported']} in {bulk:.1f}s, {result['failed']} failed)")
+    for fmt, (elapsed, size) in exports.items():
+        print(f"export {fmt:<6}:            {(args.profiles + args.single_sample) / elapsed:10.0f} profiles/s "
+              f"({size / 1e6:.1f} MB in {elapsed:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Concurrency benchmark for profile writes against a local SQLite file.
+
+Forks --writers processes (like gunicorn workers), each creating and then
+updating --ops profiles through the Flask test client at the same time, and
+reports throughput, latency and failed requests (e.g. "database is locked")
+for two engine configurations:
+
+- baseline: rollback journal, synchronous=FULL and a --baseline-timeout-ms
+  lock wait (the previous defaults)
+- tuned: the app defaults (WAL, synchronous=NORMAL, SQLITE_BUSY_TIMEOUT_MS)
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_db_writers --writers 64 --ops 20
+"""
+from multiprocessing import get_context
+import argparse
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_api import PROFILE_DATA
+
+CONFIGS = {
+    'baseline': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'tuned': {},
+}
+
+_app = None
+
+
+def writer(args):
+    """Create and update profiles; runs in a forked worker process."""
+    ops, start_at = args
+    from app.models.user_profile import db
+
+    # Connections must not be shared with the parent process
+    with _app.app_context():
+        db.engine.dispose(close=False)
+    client = _app.test_client()
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    latencies, errors = [], 0
+    for _ in range(ops):
+        start = time.perf_counter()
+        response = client.post('/api/profile', json=PROFILE_DATA)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 201:
+            errors += 1
+            continue
+        token = response.get_json()['session_token']
+
+        start = time.perf_counter()
+        response = client.put(f'/api/profile/{token}', json={'age': 31})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors += 1
+    return latencies, errors
+
+
+def run(name, writers, ops, baseline_timeout_ms):
+    global _app
+    from app import create_app
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            'LLM_BACKEND': 'fake',
+            **CONFIGS[name],
+        }
+        if name == 'baseline':
+            config['SQLITE_BUSY_TIMEOUT_MS'] = baseline_timeout_ms
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            _app = create_app(config)
+
+        start_at = time.time() + 0.5
+        with get_context('fork').Pool(writers) as pool:
+            results = pool.map(writer, [(ops, start_at)] * writers)
+            elapsed = time.time() - start_at
+
+    latencies = sorted(latency for latencies, _ in results for latency in latencies)
+    errors = sum(errors for _, errors in results)
+    requests = writers * ops * 2
+    return {
+        'config': name,
+        'requests': requests,
+        'errors': errors,
+        'writes_per_s': (requests - errors) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=64)
+    parser.add_argument('--ops', type=int, default=20, help='Profiles created and updated per writer')
+    parser.add_argument('--baseline-timeout-ms', type=int, default=5000,
+                        help="Lock wait for the baseline (5000 is Python's sqlite3 default)")
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    args = parser.parse_args()
+
+    print(f"{'config':<10}{'requests':>9}{'errors':>8}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>10}")
+    for name in args.configs:
+        r = run(name, args.writers, args.ops, args.baseline_timeout_ms)
+        print(f"{r['config']:<10}{r['requests']:>9}{r['errors']:>8}{r['writes_per_s']:>10.0f}"
+              f"{r['p50_ms']:>9.1f}{r['p99_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
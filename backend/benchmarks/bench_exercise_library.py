@@ -0,0 +1,120 @@
+"""
+Exercise library: indexed queries and id-based plan generation.
+
+1. Candidate lookup for random profiles over a synthetic library of
+   --exercises entries: ExerciseLibrary.query (inverted indexes and set
+   intersections) vs a linear scan applying the same filters.
+2. Plan generation with a fake LLM whose latency grows with output size
+   (--latency-ms plus --tokens-per-second): full plans (the model writes every
+   name, instruction and equipment list) vs library plans (the model writes
+   exercise ids, sets and reps, hydrated from the library). Reports seconds
+   and estimated prompt and output tokens per plan.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_exercise_library --exercises 20000 --queries 500 --plans 5
+"""
+import argparse
+import random
+import time
+from typing import ClassVar
+
+EQUIPMENT = ['Dumbbells', 'Barbell', 'Kettlebell', 'Resistance Bands', 'Pull-up Bar', 'Bench',
+             'Treadmill', 'Stationary Bike', 'Jump Rope', 'Yoga Mat', 'Medicine Ball', 'Cable Machine']
+TYPES = ['Strength Training', 'HIIT', 'Cardio', 'Yoga', 'Pilates', 'Mobility', 'Calisthenics', 'CrossFit']
+LEVELS = ['beginner', 'intermediate', 'advanced']
+
+
+def synthetic_entries(count, rng):
+    for index in range(count):
+        yield {
+            'id': f'exercise-{index}',
+            'name': f'Exercise {index}',
+            'type': rng.choice(TYPES),
+            'instructions': 'Keep a neutral spine and control the movement.',
+            'equipment': rng.sample(EQUIPMENT, rng.choice([0, 1, 1, 2])),
+            'experience_levels': rng.sample(LEVELS, rng.choice([0, 1, 2])),
+            'usage_count': rng.randint(0, 100),
+        }
+
+
+def linear_query(entries, equipment, workout_types, experience_level):
+    available = {item.lower() for item in equipment}
+    types = {value.lower() for value in workout_types}
+    level = experience_level.lower()
+    matches = [
+        entry for entry in entries
+        if all(item.lower() in available for item in entry['equipment'])
+        and entry['type'].lower() in types
+        and (not entry['experience_levels'] or level in entry['experience_levels'])
+    ]
+    return sorted(matches, key=lambda entry: (-entry['usage_count'], entry['name']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exercises', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--plans', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--tokens-per-second', type=float, default=4000)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models.user_profile import db
+    from app.utils import llm_registry
+    from app.utils.exercise_library import ExerciseLibrary, seed_exercise_library
+    from app.utils.fake_llm import FakeLLM
+    from app.utils.prompt_compiler import estimate_tokens
+    from app.utils.search import UserProfile, generate_structured_workout_plan
+
+    rng = random.Random(0)
+    entries = list(synthetic_entries(args.exercises, rng))
+    library = ExerciseLibrary(entries)
+    profiles = [(rng.sample(EQUIPMENT, 3), rng.sample(TYPES, 2), rng.choice(LEVELS)) for _ in range(args.queries)]
+
+    timings = {}
+    for name, query in (('linear scan', lambda profile: linear_query(entries, *profile)),
+                        ('indexed', lambda profile: library.query(*profile))):
+        start = time.perf_counter()
+        matched = sum(len(query(profile)) for profile in profiles)
+        timings[name] = (time.perf_counter() - start) / args.queries * 1000
+    print(f"{args.queries} queries over {args.exercises} exercises ({matched / args.queries:.0f} matches each)")
+    for name, ms in timings.items():
+        print(f"  {name:<13}{ms:>8.2f} ms/query")
+
+    class CountingLLM(FakeLLM):
+        prompt_tokens: ClassVar[int] = 0
+        output_tokens: ClassVar[int] = 0
+
+        def respond(self, prompt):
+            text = super().respond(prompt)
+            CountingLLM.prompt_tokens += estimate_tokens(prompt)
+            CountingLLM.output_tokens += estimate_tokens(text)
+            return text
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'LLM_BACKEND': 'fake'})
+    llm_registry.set_llm_factory(lambda model, location: CountingLLM(
+        model_id=model, latency_seconds=args.latency_ms / 1000, tokens_per_second=args.tokens_per_second))
+    profile = UserProfile('Bench', 30, 'Build Muscle', ['Dumbbells'], ['Strength Training'], 'Beginner')
+
+    results = {}
+    with app.app_context():
+        db.create_all()
+        for name in ('full', 'library'):
+            if name == 'library':
+                seed_exercise_library(include_stored_plans=False)
+            CountingLLM.prompt_tokens = CountingLLM.output_tokens = 0
+            start = time.perf_counter()
+            for _ in range(args.plans):
+                generate_structured_workout_plan(profile, mode='single')
+            results[name] = ((time.perf_counter() - start) / args.plans,
+                             CountingLLM.prompt_tokens / args.plans, CountingLLM.output_tokens / args.plans)
+
+    print(f"{args.plans} plans")
+    print(f"  {'mode':<13}{'s/plan':>8}{'prompt tok':>12}{'output tok':>12}")
+    for name, (seconds, prompt_tokens, output_tokens) in results.items():
+        print(f"  {name:<13}{seconds:>8.2f}{prompt_tokens:>12.0f}{output_tokens:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Exercise name canonicalization: lookup latency and distinct names saved.
+
+Builds --names synthetic canonical exercise names (equipment x variation x
+movement) and looks up --queries variants of them: abbreviations, plurals,
+reordered words, qualifiers and one-letter typos. Reports microseconds per
+lookup and the share matched to the right exercise for:
+
+- indexed: ExerciseNameIndex.match (exact keys, then the inverted trigram
+  index with prefix filtering)
+- linear scan: trigram similarity against every canonical name
+
+Then canonicalizes a corpus of --plans sample plans, with the sample plan's
+exercises as the canonical names (as after `flask exercises seed`), whose
+exercise names are randomly replaced by variants and reports the distinct
+names before and after.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_exercise_names --names 30000 --queries 2000
+"""
+import argparse
+import random
+import time
+
+EQUIPMENT = ['Dumbbell', 'Barbell', 'Kettlebell', 'Cable', 'Band', 'Smith Machine', 'Landmine', 'Trap Bar', 'Bodyweight']
+VARIATIONS = ['', 'Incline', 'Decline', 'Seated', 'Standing', 'Single-Arm', 'Single-Leg', 'Alternating', 'Reverse-Grip',
+              'Wide-Grip', 'Close-Grip', 'Pause', 'Tempo', 'Deficit', 'Banded', 'Isometric', 'Split', 'Sumo',
+              'Kneeling', 'Half-Kneeling', 'Lying', 'Bent-Over', 'Elevated', 'Plyometric', 'Staggered']
+MOVEMENTS = ['Bench Press', 'Row', 'Overhead Press', 'Squat', 'Deadlift', 'Lunge', 'Curl', 'Triceps Extension',
+             'Lateral Raise', 'Front Raise', 'Fly', 'Pullover', 'Shrug', 'Hip Thrust', 'Glute Bridge', 'Calf Raise',
+             'Step-Up', 'Good Morning', 'Swing', 'Clean', 'Snatch', 'Thruster', 'Woodchopper', 'Face Pull',
+             'Pallof Press', 'Rollout', 'Carry', 'Hip Hinge', 'Split Squat', 'Chest Press', 'Reverse Fly', 'Upright Row',
+             'Skull Crusher', 'Preacher Curl', 'Hammer Curl', 'Romanian Deadlift', 'Floor Press', 'Push Press',
+             'Good Morning Squat', 'Cossack Squat', 'Goblet Squat', 'Zercher Squat', 'Jefferson Curl', 'Z Press',
+             'Arnold Press', 'Bradford Press', 'Scaption', 'Y Raise', 'Rear Delt Raise', 'Pull-Through',
+             'Windmill', 'Turkish Get-Up', 'Halo', 'Around The World', 'Kickback', 'Drag Curl', 'Zottman Curl',
+             'Spider Curl', 'Concentration Curl', 'Tate Press', 'JM Press', 'Pendlay Row', 'Seal Row', 'Meadows Row',
+             'Kroc Row', 'Renegade Row', 'Inverted Row', 'Hack Squat', 'Sissy Squat', 'Nordic Curl', 'Leg Curl',
+             'Leg Extension', 'Adductor Squeeze', 'Abductor Raise', 'Donkey Kick', 'Fire Hydrant', 'Clamshell',
+             'Frog Pump', 'Bird Dog', 'Dead Bug', 'Plank Drag', 'Suitcase Carry', 'Farmer Walk', 'Overhead Carry',
+             'Waiter Walk', 'Bottoms-Up Press', 'Sots Press', 'Muscle Snatch', 'Hang Clean', 'High Pull',
+             'Jump Squat', 'Broad Jump', 'Box Jump', 'Step-Down', 'Lateral Lunge', 'Curtsy Lunge', 'Walking Lunge',
+             'Reverse Lunge', 'Bulgarian Split Squat', 'Pistol Squat', 'Shrimp Squat', 'Wall Sit', 'Hollow Hold',
+             'V-Up', 'Toe Touch', 'Russian Twist', 'Side Bend', 'Oblique Crunch', 'Crunch', 'Sit-Up', 'Leg Raise',
+             'Flutter Kick', 'Scissor Kick', 'Mountain Climber', 'Bear Crawl', 'Crab Walk', 'Inchworm',
+             'Push-Up', 'Pike Push-Up', 'Dip', 'Chin-Up', 'Pull-Up', 'Muscle-Up', 'Hanging Knee Raise']
+ABBREVIATED = {'Dumbbell': 'DB', 'Barbell': 'BB', 'Kettlebell': 'KB'}
+
+
+def canonical_names(count, rng):
+    names = []
+    for equipment in EQUIPMENT:
+        for variation in VARIATIONS:
+            for movement in MOVEMENTS:
+                names.append(' '.join(part for part in (variation, equipment, movement) if part))
+    rng.shuffle(names)
+    return names[:count]
+
+
+def variant(name, rng):
+    """A way the model might write name, or None to keep it."""
+    kind = rng.randrange(5)
+    words = name.split()
+    if kind == 0:
+        words = [ABBREVIATED.get(word, word) for word in words]
+    elif kind == 1:
+        if not words[-1].endswith('s'):
+            words[-1] = words[-1] + ('es' if words[-1].endswith(('sh', 'ch')) else 's')
+    elif kind == 2:
+        words = words[-2:] + words[:-2]
+    elif kind == 3:
+        words.append(rng.choice(['(flat)', '(standard)', '- basic']))
+    else:
+        longest = max(range(len(words)), key=lambda i: len(words[i]))
+        word = words[longest]
+        position = rng.randrange(1, len(word) - 1)
+        words[longest] = word[:position] + word[position + 1:]
+    return ' '.join(words).lower() if rng.random() < 0.3 else ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=30000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--plans', type=int, default=1000)
+    parser.add_argument('--threshold', type=float, default=0.75)
+    args = parser.parse_args()
+
+    from app.utils.exercise_names import ExerciseNameIndex, canonicalize_plan, name_tokens, similarity, trigrams
+    from app.utils.fake_llm import fake_workout_plan
+
+    rng = random.Random(0)
+    names = canonical_names(args.names, rng)
+    start = time.perf_counter()
+    index = ExerciseNameIndex(args.threshold)
+    ids = [index.add(name) for name in names]
+    print(f"Indexed {len(index)} canonical names in {time.perf_counter() - start:.2f}s")
+
+    queries = [(variant(names[i], rng), ids[i]) for i in (rng.randrange(len(names)) for _ in range(args.queries))]
+    grams = {canonical_id: trigrams(name_tokens(name)) for canonical_id, name in index.names.items()}
+
+    def linear_match(name):
+        query = trigrams(name_tokens(name))
+        best = max(grams, key=lambda canonical_id: similarity(query, grams[canonical_id]))
+        return best if similarity(query, grams[best]) >= args.threshold else None
+
+    def indexed_match(name):
+        found = index.match(name)
+        return found[0] if found else None
+
+    print(f"{'lookup':<13}{'us/name':>9}{'correct':>9}")
+    for label, match in (('linear scan', linear_match), ('indexed', indexed_match)):
+        sample = queries if label == 'indexed' else queries[:max(1, args.queries // 20)]
+        start = time.perf_counter()
+        correct = sum(match(query) == expected for query, expected in sample)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<13}{elapsed / len(sample) * 1e6:>9.0f}{correct / len(sample):>9.1%}")
+
+    # Canonical names start out as the library's, harvested from the sample plan
+    index = ExerciseNameIndex(args.threshold)
+    for week in fake_workout_plan()['weeks']:
+        for day in week['days']:
+            for exercise in day['exercises']:
+                index.add(exercise['name'])
+    before, after = set(), set()
+    for _ in range(args.plans):
+        plan = fake_workout_plan()
+        for week in plan['weeks']:
+            for day in week['days']:
+                for exercise in day['exercises']:
+                    if rng.random() < 0.5:
+                        exercise['name'] = variant(exercise['name'], rng)
+                    before.add(exercise['name'])
+        plan, _ = canonicalize_plan(plan, index, persist=False)
+        after.update(exercise['name'] for week in plan['weeks'] for day in week['days'] for exercise in day['exercises'])
+    print(f"{args.plans} plans: {len(before)} distinct exercise names before canonicalization, {len(after)} after")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark of repeated polling with and without conditional GETs.
+
+Creates a profile and a workout plan in-process (fake LLM backend, temporary
+SQLite database), then polls GET /api/profile/<token> and
+GET /api/profiles/<id>/workout-plan the way mobile clients do: once without
+validators (every response is a full 200) and once sending the last ETag in
+If-None-Match (unchanged resources return an empty 304). Reports latency and
+bytes on the wire per poll.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_http_cache --polls 500
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_api import PROFILE_DATA
+
+
+def header_bytes(response):
+    status_line = f"HTTP/1.1 {response.status}\r\n"
+    headers = "".join(f"{name}: {value}\r\n" for name, value in response.headers.items())
+    return len(status_line) + len(headers) + 2
+
+
+def poll(client, url, polls, conditional):
+    timings = []
+    wire_bytes = 0
+    statuses = {}
+    etag = None
+    for _ in range(polls):
+        headers = {'If-None-Match': etag} if conditional and etag else {}
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        body = response.get_data()
+        timings.append((time.perf_counter() - start) * 1000)
+        etag = response.headers.get('ETag', etag)
+        wire_bytes += header_bytes(response) + len(body)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    timings.sort()
+    return {
+        'mean_ms': statistics.fmean(timings),
+        'p50_ms': timings[len(timings) // 2],
+        'p99_ms': timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        'bytes_per_poll': wire_bytes / polls,
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--polls', type=int, default=500)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.utils.job_queue import job_queue
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+                'LLM_BACKEND': 'fake',
+            })
+            client = app.test_client()
+            token = client.post('/api/profile', json=PROFILE_DATA).get_json()['session_token']
+            job = client.post(f'/api/profiles/{token}/workout-plan').get_json()
+            while job['status'] in ('queued', 'running'):
+                time.sleep(0.01)
+                job = client.get(f"/api/jobs/{job['id']}").get_json()
+        job_queue.shutdown(wait=True)
+
+        print(f"{'endpoint':<16}{'mode':<14}{'mean ms':>9}{'p50 ms':>9}{'p99 ms':>9}{'bytes/poll':>12}  statuses")
+        for name, url in (('profile', f'/api/profile/{token}'), ('workout-plan', f'/api/profiles/{token}/workout-plan')):
+            for conditional in (False, True):
+                result = poll(client, url, args.polls, conditional)
+                mode = 'If-None-Match' if conditional else 'unconditional'
+                print(f"{name:<16}{mode:<14}{result['mean_ms']:>9.3f}{result['p50_ms']:>9.3f}"
+                      f"{result['p99_ms']:>9.3f}{result['bytes_per_poll']:>12.0f}  {result['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark of the latest-workout-plan lookup at large history sizes.
+
+Fills a temporary SQLite database with --plans workout plans spread over
+--profiles profiles, then times the lookup behind
+GET /api/profiles/<id>/workout-plan three ways:
+
+- scan: ORDER BY created_at on workout_plans without the composite index
+  (the previous schema)
+- index: the same query using ix_workout_plans_user_profile_id_created_at
+- pointer: primary-key join through latest_workout_plans
+
+and prints SQLite's query plan for each.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_latest_plan --plans 1000000 --profiles 10000
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.models.user_profile import db, UserProfile
+from app.models.workout_plan import WorkoutPlan
+from app.models.latest_workout_plan import LatestWorkoutPlan
+
+QUERIES = {
+    'scan': (
+        "SELECT * FROM workout_plans NOT INDEXED WHERE user_profile_id = :pid "
+        "ORDER BY created_at DESC, id DESC LIMIT 1"
+    ),
+    'index': (
+        "SELECT * FROM workout_plans WHERE user_profile_id = :pid "
+        "ORDER BY created_at DESC, id DESC LIMIT 1"
+    ),
+    'pointer': (
+        "SELECT workout_plans.* FROM workout_plans JOIN latest_workout_plans "
+        "ON latest_workout_plans.workout_plan_id = workout_plans.id "
+        "WHERE latest_workout_plans.user_profile_id = :pid"
+    ),
+}
+
+
+def populate(engine, plans, profiles, blob_bytes, batch_size=20000):
+    """Insert profiles, plans (with a plan_data blob of about blob_bytes) and latest pointers."""
+    db.metadata.create_all(engine, tables=[
+        UserProfile.__table__, WorkoutPlan.__table__, LatestWorkoutPlan.__table__
+    ])
+    rng = random.Random(0)
+    plan_data = json.dumps({'weeks': [], 'padding': 'x' * blob_bytes})
+    start = datetime(2024, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(UserProfile.__table__.insert(), [
+            {'id': i, 'uuid': f'{i:036d}', 'name': 'Bench', 'age': 30, 'fitness_goal': 'Build Muscle',
+             'equipment': [], 'workout_types': [], 'experience_level': 'Beginner'}
+            for i in range(1, profiles + 1)
+        ])
+
+        latest = {}
+        for offset in range(0, plans, batch_size):
+            rows = []
+            for plan_id in range(offset + 1, min(plans, offset + batch_size) + 1):
+                profile_id = rng.randint(1, profiles)
+                created_at = start + timedelta(minutes=plan_id)
+                latest[profile_id] = plan_id
+                timestamp = created_at.isoformat(' ')
+                rows.append((plan_id, profile_id, timestamp, timestamp, plan_data, timestamp, timestamp))
+            conn.exec_driver_sql(
+                "INSERT INTO workout_plans (id, user_profile_id, start_date, end_date, plan_data, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        conn.execute(LatestWorkoutPlan.__table__.insert(), [
+            {'user_profile_id': profile_id, 'workout_plan_id': plan_id} for profile_id, plan_id in latest.items()
+        ])
+
+
+def time_query(conn, sql, profile_ids):
+    timings = []
+    for profile_id in profile_ids:
+        start = time.perf_counter()
+        conn.execute(text(sql), {'pid': profile_id}).first()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'mean_ms': statistics.fmean(timings),
+        'p50_ms': timings[len(timings) // 2],
+        'p99_ms': timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+    }
+
+
+def query_plan(conn, sql):
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), {'pid': 1}).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plans', type=int, default=1_000_000)
+    parser.add_argument('--profiles', type=int, default=10_000)
+    parser.add_argument('--blob-bytes', type=int, default=512, help='Approximate plan_data size per row')
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--scan-lookups', type=int, default=5, help='Lookups for the unindexed scan')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+
+        start = time.perf_counter()
+        populate(engine, args.plans, args.profiles, args.blob_bytes)
+        print(f"populated {args.plans} plans for {args.profiles} profiles in {time.perf_counter() - start:.1f} s")
+
+        rng = random.Random(1)
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+            print(f"{'lookup':<10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}  query plan")
+            for name, sql in QUERIES.items():
+                count = args.scan_lookups if name == 'scan' else args.lookups
+                profile_ids = [rng.randint(1, args.profiles) for _ in range(count)]
+                result = time_query(conn, sql, profile_ids)
+                print(f"{name:<10}{result['mean_ms']:>10.3f}{result['p50_ms']:>10.3f}"
+                      f"{result['p99_ms']:>10.3f}  {query_plan(conn, sql)}")
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
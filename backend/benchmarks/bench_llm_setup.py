@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of per-request LLM chain setup overhead.
+
+Compares building the LLM, JsonOutputParser, format instructions and prompt
+chain on every request (the previous behaviour of
+generate_structured_workout_plan) with fetching the compiled chain from the
+LLM registry. A local stub LLM is used so no network calls are made; with
+Vertex AI the per-request cost is higher still because every new client
+also re-runs authentication and opens a new connection pool.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_llm_setup --iterations 2000
+"""
+import argparse
+import statistics
+import time
+
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from app.models.workout_exercise import WorkoutPlanData
+from app.utils import llm_registry
+from app.utils.search import WORKOUT_PLAN_TEMPLATE, _build_workout_plan_chain
+
+
+def stub_llm(model_id, location):
+    return FakeListLLM(responses=['{"weeks": []}'])
+
+
+def setup_per_request():
+    llm = stub_llm("stub", "local")
+    parser = JsonOutputParser(pydantic_object=WorkoutPlanData)
+    prompt = PromptTemplate(
+        template=WORKOUT_PLAN_TEMPLATE,
+        input_variables=["instruction"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+    )
+    return prompt | llm | parser
+
+
+def setup_with_registry():
+    return llm_registry.get_chain("workout_plan", _build_workout_plan_chain, "stub", "local")
+
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        'mean_us': statistics.fmean(timings),
+        'p50_us': timings[len(timings) // 2],
+        'p99_us': timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    llm_registry.set_llm_factory(stub_llm)
+    try:
+        before = measure(setup_per_request, args.iterations)
+        after = measure(setup_with_registry, args.iterations)
+    finally:
+        llm_registry.set_llm_factory(None)
+
+    print(f"{'setup':<20}{'mean (us)':>12}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, result in (('per request', before), ('registry', after)):
+        print(f"{name:<20}{result['mean_us']:>12.1f}{result['p50_us']:>12.1f}{result['p99_us']:>12.1f}")
+    print(f"speedup: {before['mean_us'] / after['mean_us']:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Latency benchmark of the fitness options endpoints with a slow LLM.
+
+Runs in-process against the fake LLM backend with --latency-ms per call and
+reports p50/p99 latency and response size of:
+
+- static: GET /api/options/static (pre-serialized, gzipped catalog)
+- static-304: the same with If-None-Match
+- llm: POST /api/options with a distinct age/selection each time (cache miss)
+- fallback: POST /api/options with OPTIONS_LLM_TIMEOUT_SECONDS=--timeout-ms,
+  served from the catalog once the LLM is slower than the timeout
+- rules: POST /api/options?mode=rules (rules engine, no LLM call)
+- hybrid: POST /api/options?mode=hybrid on a cache miss (rules answer while
+  the LLM refines in the background)
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_options_catalog --latency-ms 2000 --timeout-ms 300
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+
+SELECTIONS = [{'id': option_id, 'name': option_id, 'type': 'equipment'}
+              for option_id in ('dumbbells', 'kettlebell', 'bench', 'treadmill', 'jump_rope', 'foam_roller')]
+
+
+def measure(send, requests):
+    latencies, sizes = [], []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = send(i)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(response.data))
+    latencies.sort()
+    return {
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'bytes': statistics.fmean(sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=2000)
+    parser.add_argument('--timeout-ms', type=float, default=300)
+    parser.add_argument('--requests', type=int, default=500, help='Requests for the static endpoint')
+    parser.add_argument('--llm-requests', type=int, default=5, help='Requests for the LLM and fallback paths')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.agents import fitness_options_agent as agent_module
+    from app.utils.options_cache import options_cache
+
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(open(os.devnull, 'w')):
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            'LLM_BACKEND': 'fake',
+            'FAKE_LLM_LATENCY_MS': args.latency_ms,
+        })
+        client = app.test_client()
+        etag = client.get('/api/options/static').headers['ETag']
+
+        def options_request(i, mode='llm'):
+            options_cache.clear()
+            return client.post(f'/api/options?mode={mode}',
+                               json={'age': 20 + i % 60, 'selections': SELECTIONS[:i % len(SELECTIONS)]})
+
+        results = {
+            'static': measure(lambda i: client.get('/api/options/static', headers={'Accept-Encoding': 'gzip'}),
+                              args.requests),
+            'static-304': measure(lambda i: client.get('/api/options/static', headers={'If-None-Match': etag}),
+                                  args.requests),
+        }
+        agent_module.OPTIONS_LLM_TIMEOUT_SECONDS = 3600
+        results['llm'] = measure(options_request, args.llm_requests)
+        agent_module.OPTIONS_LLM_TIMEOUT_SECONDS = args.timeout_ms / 1000
+        results['fallback'] = measure(options_request, args.llm_requests)
+        results['rules'] = measure(lambda i: options_request(i, 'rules'), args.requests)
+        results['hybrid'] = measure(lambda i: options_request(i, 'hybrid'), args.llm_requests)
+
+        # Let the generations that outlived the timeout finish while output is redirected
+        from app.routes.api import fitness_options_agent
+        fitness_options_agent.get().executor.shutdown(wait=True)
+
+    print(f"{'endpoint':<12}{'p50 ms':>10}{'p99 ms':>10}{'bytes':>10}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['bytes']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
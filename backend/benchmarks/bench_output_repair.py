@@ -0,0 +1,101 @@
+"""
+Cost of malformed plan outputs: repair pipeline vs full regeneration.
+
+Generates --plans workout plans in single mode with a fake LLM whose latency
+grows with output size (--latency-ms plus --tokens-per-second), corrupting a
+--fault-rate share of the full plan outputs in one of three ways: malformed
+JSON (code fence and trailing commas), one invalid day, or truncation in the
+last week. Reports seconds and LLM output tokens per valid plan for:
+
+- regenerate: strict parsing and validation, regenerating the whole plan on failure
+- repair: generate_structured_workout_plan (tolerant parsing, coercion and
+  re-prompting only the invalid day or week)
+
+plus the savings the repair pipeline reports in its metrics.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_output_repair --plans 10 --fault-rate 0.5
+"""
+import argparse
+import json
+import random
+import time
+from typing import ClassVar
+
+
+def corrupt(text, rng):
+    plan = json.loads(text)
+    kind = rng.choice(('json', 'day', 'truncated'))
+    if kind == 'json':
+        return "```json\n" + json.dumps(plan, indent=1).replace('\n }', ',\n }') + "\n```"
+    if kind == 'day':
+        day = rng.choice([day for week in plan['weeks'] for day in week['days'] if day['exercises']])
+        del day['exercises'][0]['name']
+        return json.dumps(plan)
+    return text[:int(len(text) * 0.9)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plans', type=int, default=10)
+    parser.add_argument('--fault-rate', type=float, default=0.5)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--tokens-per-second', type=float, default=4000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from pydantic import ValidationError
+    from app.models.workout_exercise import WorkoutPlanData
+    from app.utils import llm_registry
+    from app.utils.fake_llm import FakeLLM
+    from app.utils.metrics import LLM_REPAIR_SAVED_SECONDS, LLM_REPAIR_SAVED_TOKENS
+    from app.utils.search import (
+        LOCATION, UserProfile, _build_workout_plan_chain, generate_structured_workout_plan, model_id
+    )
+
+    class FaultyLLM(FakeLLM):
+        rng: ClassVar = random.Random(args.seed)
+        output_chars: ClassVar[int] = 0
+
+        def respond(self, prompt):
+            text = super().respond(prompt)
+            if '"weeks"' in prompt and FaultyLLM.rng.random() < args.fault_rate:
+                text = corrupt(text, FaultyLLM.rng)
+            FaultyLLM.output_chars += len(text)
+            return text
+
+    llm_registry.set_backend('fake')
+    llm_registry.set_llm_factory(lambda model, location: FaultyLLM(
+        model_id=model, latency_seconds=args.latency_ms / 1000, tokens_per_second=args.tokens_per_second))
+    profile = UserProfile('Bench', 30, 'Build Muscle', ['Dumbbells'], ['Strength Training'], 'Beginner')
+
+    def regenerate_until_valid():
+        chain = llm_registry.get_chain("workout_plan", _build_workout_plan_chain, model_id, LOCATION)
+        while True:
+            text = chain.invoke({"instruction": "bench"})
+            try:
+                return WorkoutPlanData.model_validate(json.loads(text)).model_dump()
+            except (ValueError, ValidationError):
+                continue
+
+    results = {}
+    for name, generate in (('regenerate', regenerate_until_valid),
+                           ('repair', lambda: generate_structured_workout_plan(profile, mode='single'))):
+        FaultyLLM.rng = random.Random(args.seed)
+        FaultyLLM.output_chars = 0
+        start = time.perf_counter()
+        for _ in range(args.plans):
+            generate()
+        elapsed = time.perf_counter() - start
+        results[name] = (elapsed / args.plans, FaultyLLM.output_chars / 4 / args.plans)
+
+    print(f"{args.plans} plans, fault rate {args.fault_rate:.0%}")
+    print(f"{'mode':<12}{'s/plan':>10}{'tokens/plan':>14}")
+    for name, (seconds, tokens) in results.items():
+        print(f"{name:<12}{seconds:>10.2f}{tokens:>14.0f}")
+    print(f"repair metrics: saved {LLM_REPAIR_SAVED_TOKENS.value(schema='WorkoutPlanData'):.0f} tokens, "
+          f"{LLM_REPAIR_SAVED_SECONDS.value(schema='WorkoutPlanData'):.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Plan data codecs: stored size and encode/decode throughput.
+
+Generates --plans synthetic plans shaped like generated ones (3 weeks of 5
+days, 4-8 exercises a day drawn from the sample plan's exercises and a few
+hundred synthetic ones, with random sets, reps and rest), trains
+dictionaries on the first --train of them and encodes the rest with:
+
+- json: compact JSON text, as stored before compression
+- zlib / zstd: without a dictionary
+- zlib+dict / zstd+dict: with the built-in (sample plan) dictionary and with
+  a trained one, as after `flask --app run plans compress --train`
+
+Reports mean bytes per plan, the ratio to JSON, and encode and decode
+throughput in plans per second and MB/s of JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_plan_codec --plans 2000 --train 500
+"""
+import argparse
+import random
+import time
+
+EQUIPMENT = [[], ['Dumbbells'], ['Barbell'], ['Kettlebell'], ['Resistance Bands'], ['Dumbbells', 'Bench']]
+MOVEMENTS = ['Bench Press', 'Row', 'Overhead Press', 'Squat', 'Deadlift', 'Lunge', 'Curl', 'Lateral Raise',
+             'Hip Thrust', 'Calf Raise', 'Swing', 'Thruster', 'Face Pull', 'Split Squat', 'Push Press', 'Fly']
+VARIATIONS = ['', 'Incline', 'Seated', 'Standing', 'Single-Arm', 'Alternating', 'Pause', 'Tempo']
+FOCUSES = ['Upper Body Strength', 'Lower Body Strength', 'Full Body', 'Push', 'Pull', 'Legs', 'Core and Conditioning']
+
+
+def exercise_pool(sample_plan, rng):
+    pool = [exercise for week in sample_plan['weeks'] for day in week['days'] for exercise in day['exercises']]
+    for variation in VARIATIONS:
+        for movement in MOVEMENTS:
+            equipment = rng.choice(EQUIPMENT)
+            name = ' '.join(part for part in (variation, equipment[0][:-1] if equipment else '', movement) if part)
+            pool.append({
+                'name': name,
+                'instructions': f"Set up for the {name.lower()} with a braced core. Move through the full range "
+                                f"of motion under control and stop the set with one or two reps in reserve.",
+                'equipment': equipment,
+            })
+    return pool
+
+
+def synthetic_plan(pool, rng):
+    weeks = []
+    for week_number in range(1, 4):
+        days = []
+        for day_number in range(1, 6):
+            exercises = []
+            for exercise in rng.sample(pool, rng.randint(4, 8)):
+                exercises.append({**exercise, 'sets': rng.randint(2, 5),
+                                  'reps': rng.choice(['8-10', '10-12', '12-15', '5', '30 seconds', 'AMRAP']),
+                                  'rest_seconds': rng.choice([30, 45, 60, 90, 120])})
+            days.append({'day_number': day_number, 'focus': rng.choice(FOCUSES), 'exercises': exercises})
+        weeks.append({'week_number': week_number, 'days': days, 'rest_days': [6, 7]})
+    return {'weeks': weeks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plans', type=int, default=2000)
+    parser.add_argument('--train', type=int, default=500)
+    parser.add_argument('--level', type=int, default=None, help='Compression level (default: PLAN_DATA_COMPRESSION_LEVEL)')
+    args = parser.parse_args()
+
+    from app.utils import plan_codec
+    from app.utils.fake_llm import fake_workout_plan
+
+    rng = random.Random(0)
+    pool = exercise_pool(fake_workout_plan(), rng)
+    plans = [synthetic_plan(pool, rng) for _ in range(args.plans)]
+    training, plans = plans[:args.train], plans[args.train:]
+    level = args.level if args.level is not None else plan_codec.PLAN_DATA_COMPRESSION_LEVEL
+    json_bytes = sum(len(plan_codec.serialize(plan)) for plan in plans)
+
+    builtin = plan_codec.registry.register(plan_codec.builtin_dictionary())
+    codecs = [('json', 'none', 0), ('zlib', 'zlib', 0), ('zlib+builtin', 'zlib', builtin)]
+    start = time.perf_counter()
+    codecs.append(('zlib+trained', 'zlib', plan_codec.registry.register(plan_codec.train_dictionary(training, 'zlib'))))
+    print(f"{len(training)} training plans; zlib dictionary in {time.perf_counter() - start:.2f}s", end='')
+    if plan_codec.zstandard is not None:
+        start = time.perf_counter()
+        trained = plan_codec.registry.register(plan_codec.train_dictionary(training, 'zstd'))
+        print(f", zstd dictionary in {time.perf_counter() - start:.2f}s", end='')
+        codecs += [('zstd', 'zstd', 0), ('zstd+builtin', 'zstd', builtin), ('zstd+trained', 'zstd', trained)]
+    print(f"\n{len(plans)} plans, {json_bytes / len(plans):.0f} bytes of JSON each, level {level}")
+
+    print(f"{'codec':<14}{'bytes':>8}{'ratio':>8}{'enc/s':>9}{'enc MB/s':>10}{'dec/s':>9}{'dec MB/s':>10}")
+    for label, codec, dictionary in codecs:
+        start = time.perf_counter()
+        encoded = [plan_codec.encode(plan, codec, dictionary, level) for plan in plans]
+        encode_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for data in encoded:
+            plan_codec.decode(data)
+        decode_seconds = time.perf_counter() - start
+        stored = sum(map(len, encoded))
+        print(f"{label:<14}{stored / len(plans):>8.0f}{json_bytes / stored:>7.1f}x"
+              f"{len(plans) / encode_seconds:>9.0f}{json_bytes / encode_seconds / 1e6:>10.1f}"
+              f"{len(plans) / decode_seconds:>9.0f}{json_bytes / decode_seconds / 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Cost of updating a plan after an equipment change: full plan vs incremental revision.
+
+Starts from a generated plan for a profile with Dumbbells and applies an
+equipment change (--removed and --added) with a fake LLM whose latency grows
+with output size (--latency-ms plus --tokens-per-second). Reports seconds,
+LLM calls and estimated prompt and output tokens per updated plan for:
+
+- full: generate_structured_workout_plan for the updated profile
+- incremental: plan_revision.revise_plan (only the affected exercises)
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_plan_revision --plans 5 --removed Dumbbells --added Kettlebell
+"""
+import argparse
+import time
+from typing import ClassVar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plans', type=int, default=5)
+    parser.add_argument('--removed', nargs='*', default=['Dumbbells'])
+    parser.add_argument('--added', nargs='*', default=['Kettlebell'])
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--tokens-per-second', type=float, default=4000)
+    args = parser.parse_args()
+
+    from app.utils import llm_registry
+    from app.utils.fake_llm import FakeLLM, fake_workout_plan
+    from app.utils.plan_revision import revise_plan
+    from app.utils.prompt_compiler import estimate_tokens
+    from app.utils.search import UserProfile, generate_structured_workout_plan
+
+    class CountingLLM(FakeLLM):
+        calls: ClassVar[int] = 0
+        prompt_tokens: ClassVar[int] = 0
+        output_tokens: ClassVar[int] = 0
+
+        def respond(self, prompt):
+            text = super().respond(prompt)
+            CountingLLM.calls += 1
+            CountingLLM.prompt_tokens += estimate_tokens(prompt)
+            CountingLLM.output_tokens += estimate_tokens(text)
+            return text
+
+    llm_registry.set_backend('fake')
+    llm_registry.set_llm_factory(lambda model, location: CountingLLM(
+        model_id=model, latency_seconds=args.latency_ms / 1000, tokens_per_second=args.tokens_per_second))
+
+    old_equipment = ['Dumbbells', 'Treadmill', 'Yoga Mat'] + args.removed
+    new_equipment = [item for item in old_equipment if item not in args.removed] + args.added
+    profile = UserProfile('Bench', 30, 'Build Muscle', new_equipment, ['Strength Training'], 'Beginner')
+    changes = {'equipment': (old_equipment, new_equipment)}
+    base_plan = fake_workout_plan()
+
+    results = {}
+    summary = None
+    for name in ('full', 'incremental'):
+        CountingLLM.calls = CountingLLM.prompt_tokens = CountingLLM.output_tokens = 0
+        start = time.perf_counter()
+        for _ in range(args.plans):
+            if name == 'full':
+                generate_structured_workout_plan(profile, mode='single')
+            else:
+                _, summary = revise_plan(profile, base_plan, changes)
+        elapsed = time.perf_counter() - start
+        results[name] = (elapsed / args.plans, CountingLLM.calls / args.plans,
+                         CountingLLM.prompt_tokens / args.plans, CountingLLM.output_tokens / args.plans)
+
+    print(f"{args.plans} updates: removed {', '.join(args.removed) or '-'}, added {', '.join(args.added) or '-'}")
+    print(f"incremental revision: {summary}")
+    print(f"{'mode':<13}{'s/plan':>8}{'calls':>7}{'prompt tok':>12}{'output tok':>12}")
+    for name, (seconds, calls, prompt_tokens, output_tokens) in results.items():
+        print(f"{name:<13}{seconds:>8.2f}{calls:>7.1f}{prompt_tokens:>12.0f}{output_tokens:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Prompt sizes of the workout plan and fitness options chains by schema mode.
+
+Compiles every structured prompt the app sends with PROMPT_SCHEMA_MODE set to
+full (parser.get_format_instructions(), the previous behaviour), compact and
+native, renders it for a sample profile and reports its characters and
+estimated tokens (prompt_compiler.estimate_tokens). In native mode the
+response schema sent next to the prompt is reported separately, since
+Vertex AI counts it as input as well.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_prompt_size
+"""
+import argparse
+import json
+
+MODES = ('full', 'compact', 'native')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    from app.agents.fitness_options_agent import FitnessOptionsAgent
+    from app.utils import llm_registry, prompt_compiler
+    from app.utils.prompt_compiler import estimate_tokens
+    from app.utils.search import (
+        UserProfile, _build_day_chain, _build_profile_summary, _build_skeleton_chain, _build_week_chain,
+        _build_workout_plan_chain, _build_workout_plan_instruction,
+    )
+
+    llm_registry.set_backend('fake')
+    profile = UserProfile('Bench', 30, 'Build Muscle', ['Dumbbells', 'Resistance Bands'],
+                          ['Strength Training', 'HIIT'], 'Beginner')
+    summary = _build_profile_summary(profile)
+    outline = "    Week 1: Upper Body, Lower Body, Cardio, Full Body, Core"
+    agent = FitnessOptionsAgent()
+    selections = agent._format_selections_for_prompt([{'id': 'yoga', 'name': 'Yoga', 'type': 'workout'}])
+
+    prompts = {
+        'workout_plan': (_build_workout_plan_chain, {"instruction": _build_workout_plan_instruction(profile)}),
+        'workout_plan_skeleton': (_build_skeleton_chain, {"profile_summary": summary}),
+        'workout_plan_week': (_build_week_chain, {
+            "week_number": 2, "profile_summary": summary, "plan_outline": outline,
+            "week_focus": "Build volume", "week_progression": "Add a set to each exercise",
+            "day_focuses": "Upper Body, Lower Body, Cardio, Full Body, Core",
+        }),
+        'workout_plan_day': (_build_day_chain, {
+            "day_number": 2, "week_number": 1, "profile_summary": summary, "plan_outline": outline,
+            "day_focus": "Lower Body", "errors": "- exercises: Field required",
+        }),
+        'fitness_options': (lambda llm: agent.chain, {"user_age": 45, "user_selections_formatted": selections}),
+        'fitness_options_category': (lambda llm: agent._category_chain('equipment_options'), {
+            "category_name": "equipment options", "user_age": 45, "user_selections_formatted": selections,
+            "errors": "- equipment_options: Field required",
+        }),
+    }
+
+    results = {}
+    for mode in MODES:
+        prompt_compiler.PROMPT_SCHEMA_MODE = mode
+        llm_registry.clear()
+        llm = llm_registry.get_llm(llm_registry.WORKOUT_PLAN_MODEL_ID)
+        for name, (build, inputs) in prompts.items():
+            chain = build(llm)
+            text = chain.first.format(**inputs)
+            schema = next((step.kwargs['response_schema'] for step in chain.steps
+                           if 'response_schema' in getattr(step, 'kwargs', {})), None)
+            schema_tokens = estimate_tokens(json.dumps(schema)) if schema else 0
+            results[name, mode] = (len(text), estimate_tokens(text), schema_tokens)
+
+    print(f"{'prompt':<26}{'mode':<9}{'chars':>7}{'tokens':>8}{'schema':>8}{'saved':>8}")
+    for name in prompts:
+        full_tokens = results[name, 'full'][1]
+        for mode in MODES:
+            chars, tokens, schema_tokens = results[name, mode]
+            saved = 1 - (tokens + schema_tokens) / full_tokens
+            print(f"{name:<26}{mode:<9}{chars:>7}{tokens:>8}{schema_tokens:>8}{saved:>8.0%}")
+
+
+if __name__ == '__main__':
+    main()
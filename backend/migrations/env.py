@@ -2,6 +2,9 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
+import os
+
+from app.utils.database import database_config
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -12,12 +15,24 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Use the same database as the app when DATABASE_URL is set
+if os.environ.get("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", database_config("")['SQLALCHEMY_DATABASE_URI'])
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from app.models.user_profile import db
 from app.models.workout_plan import WorkoutPlan
+from app.models.latest_workout_plan import LatestWorkoutPlan
+from app.models.generation_job import GenerationJob
+from app.models.workout_plan_template import WorkoutPlanTemplate
+from app.models.batch_run import BatchRun, BatchRunItem
+from app.models.profile_change import ProfileChange
+from app.models.exercise_library import ExerciseLibraryEntry
+from app.models.exercise_alias import ExerciseAlias
+from app.models.plan_data_dictionary import PlanDataDictionary
 
 target_metadata = db.metadata
 
@@ -0,0 +1,46 @@
+"""add_generation_jobs
+
+Revision ID: 3c9a1d2e7b41
+Revises: fbff7c23a080
+Create Date: 2026-10-18 09:12:04.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1d2e7b41'
+down_revision: Union[str, None] = 'fbff7c23a080'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('generation_jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('profile_uuid', sa.String(length=36), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('workout_plan_id', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['profile_uuid'], ['user_profiles.uuid'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_generation_jobs_status'), 'generation_jobs', ['status'], unique=False)
+    op.create_index('ix_generation_jobs_active_profile', 'generation_jobs', ['profile_uuid'], unique=True,
+                    sqlite_where=sa.text("status IN ('queued', 'running')"),
+                    postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_generation_jobs_active_profile', table_name='generation_jobs')
+    op.drop_index(op.f('ix_generation_jobs_status'), table_name='generation_jobs')
+    op.drop_table('generation_jobs')
@@ -0,0 +1,60 @@
+"""add_batch_runs
+
+Revision ID: 5f1d8c3a9e62
+Revises: e2c7b95a1d46
+Create Date: 2026-10-18 16:05:41.218733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1d8c3a9e62'
+down_revision: Union[str, None] = 'e2c7b95a1d46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('batch_runs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('llm_calls', sa.Integer(), nullable=False),
+    sa.Column('plans_per_minute', sa.Float(), nullable=True),
+    sa.Column('eta_seconds', sa.Float(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('batch_run_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.String(length=36), nullable=False),
+    sa.Column('user_profile_id', sa.Integer(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('workout_plan_id', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['batch_runs.id'], ),
+    sa.ForeignKeyConstraint(['user_profile_id'], ['user_profiles.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id', 'user_profile_id')
+    )
+    op.create_index('ix_batch_run_items_run_status_fingerprint', 'batch_run_items', ['run_id', 'status', 'fingerprint'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_batch_run_items_run_status_fingerprint', table_name='batch_run_items')
+    op.drop_table('batch_run_items')
+    op.drop_table('batch_runs')
@@ -0,0 +1,40 @@
+"""add_workout_plan_templates
+
+Revision ID: 7e5b2c9f4a18
+Revises: 3c9a1d2e7b41
+Create Date: 2026-10-18 11:40:27.503214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e5b2c9f4a18'
+down_revision: Union[str, None] = '3c9a1d2e7b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('workout_plan_templates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('profile_key', sa.JSON(), nullable=False),
+    sa.Column('plan_data', sa.JSON(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('fingerprint')
+    )
+    op.create_index(op.f('ix_workout_plan_templates_last_used_at'), 'workout_plan_templates', ['last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_workout_plan_templates_last_used_at'), table_name='workout_plan_templates')
+    op.drop_table('workout_plan_templates')
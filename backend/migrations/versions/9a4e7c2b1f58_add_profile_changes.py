@@ -0,0 +1,44 @@
+"""add_profile_changes
+
+Revision ID: 9a4e7c2b1f58
+Revises: 5f1d8c3a9e62
+Create Date: 2026-10-18 18:42:10.573214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e7c2b1f58'
+down_revision: Union[str, None] = '5f1d8c3a9e62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_TYPE = sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('profile_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_profile_id', sa.Integer(), nullable=False),
+    sa.Column('field', sa.String(length=50), nullable=False),
+    sa.Column('old_value', JSON_TYPE, nullable=True),
+    sa.Column('new_value', JSON_TYPE, nullable=True),
+    sa.Column('workout_plan_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_profile_id'], ['user_profiles.id'], ),
+    sa.ForeignKeyConstraint(['workout_plan_id'], ['workout_plans.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_profile_changes_user_profile_id_workout_plan_id', 'profile_changes', ['user_profile_id', 'workout_plan_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_profile_changes_user_profile_id_workout_plan_id', table_name='profile_changes')
+    op.drop_table('profile_changes')
@@ -0,0 +1,79 @@
+"""index_latest_workout_plan
+
+Revision ID: b41f6a0d2c93
+Revises: 7e5b2c9f4a18
+Create Date: 2026-10-18 14:05:51.220937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f6a0d2c93'
+down_revision: Union[str, None] = '7e5b2c9f4a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The original foreign key was created without a name; give SQLite's copy of
+# it a predictable one so batch mode can drop it
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _profile_fk_name(referred_table):
+    if op.get_bind().dialect.name == 'sqlite':
+        return f"fk_workout_plans_user_profile_id_{referred_table}"
+    return "workout_plans_user_profile_id_fkey"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows written with a profile uuid instead of its id are mapped to the id
+    op.execute(
+        "UPDATE workout_plans SET user_profile_id = "
+        "(SELECT id FROM user_profiles WHERE user_profiles.uuid = workout_plans.user_profile_id) "
+        "WHERE user_profile_id IN (SELECT uuid FROM user_profiles)"
+    )
+
+    with op.batch_alter_table('workout_plans', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(_profile_fk_name('user_profiles'), type_='foreignkey')
+        batch_op.alter_column('user_profile_id',
+                              existing_type=sa.String(length=36),
+                              type_=sa.Integer(),
+                              existing_nullable=False,
+                              postgresql_using='user_profile_id::integer')
+        batch_op.create_foreign_key('fk_workout_plans_user_profile_id_user_profiles',
+                                    'user_profiles', ['user_profile_id'], ['id'])
+        batch_op.create_index('ix_workout_plans_user_profile_id_created_at',
+                              ['user_profile_id', 'created_at'], unique=False)
+
+    op.create_table('latest_workout_plans',
+    sa.Column('user_profile_id', sa.Integer(), nullable=False),
+    sa.Column('workout_plan_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_profile_id'], ['user_profiles.id'], ),
+    sa.ForeignKeyConstraint(['workout_plan_id'], ['workout_plans.id'], ),
+    sa.PrimaryKeyConstraint('user_profile_id')
+    )
+    op.execute(
+        "INSERT INTO latest_workout_plans (user_profile_id, workout_plan_id) "
+        "SELECT user_profile_id, (SELECT id FROM workout_plans AS newest "
+        "WHERE newest.user_profile_id = plans.user_profile_id "
+        "ORDER BY newest.created_at DESC, newest.id DESC LIMIT 1) "
+        "FROM workout_plans AS plans GROUP BY user_profile_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('latest_workout_plans')
+    with op.batch_alter_table('workout_plans', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_index('ix_workout_plans_user_profile_id_created_at')
+        batch_op.drop_constraint('fk_workout_plans_user_profile_id_user_profiles', type_='foreignkey')
+        batch_op.alter_column('user_profile_id',
+                              existing_type=sa.Integer(),
+                              type_=sa.String(length=36),
+                              existing_nullable=False)
+        batch_op.create_foreign_key(_profile_fk_name('user_profiles'),
+                                    'user_profiles', ['user_profile_id'], ['uuid'])
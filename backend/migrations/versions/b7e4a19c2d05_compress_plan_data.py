@@ -0,0 +1,182 @@
+"""compress_plan_data
+
+Revision ID: b7e4a19c2d05
+Revises: f3b8d1e6a274
+Create Date: 2026-10-18 22:41:12.083517
+
+"""
+from datetime import datetime
+from typing import Dict, Sequence, Union
+import base64
+import hashlib
+import json
+import os
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4a19c2d05'
+down_revision: Union[str, None] = 'f3b8d1e6a274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+# The plan data format as of this revision (app/utils/plan_codec.py), copied
+# so later changes to the codec don't change what this migration writes:
+# tag (b'Z' zstd, b'D' raw deflate, b'J' JSON) | dictionary id (4 bytes) | payload
+TAGS = {'zstd': b'Z', 'zlib': b'D', 'none': b'J'}
+CODEC_BY_TAG = {tag: codec for codec, tag in TAGS.items()}
+HEADER_BYTES = 5
+ZLIB_WINDOW = 32 * 1024
+
+# The built-in dictionary (the sample plan as compact JSON), zlib-compressed
+BUILTIN_DICTIONARY = zlib.decompress(base64.b64decode(
+    'eNrtWttuGzcQ/RVinyXBugWB3+qkreO4qGG7KIoiCCjtaJcxtdyQ3CpGkH/vDLlXXRzZluwo3gfDWpEzyzlzOBwe6GuwALgxwfG/'
+    'X4OQ35YfPibZfAI6OO53AvgCeioM5IOZ5laoJDhOMilx9HMm0jkkFkeDt2g1ASlN0An+URFnf3AbfOgEIjFWZ1OyQy/BuQCmEnar'
+    'Ms0mfHpDD5xNIJnGbCFs7EdmAJbNJLc0bGPAz0rpHjtVMsTpYf4uJhIGHC1jnoTenLMEMqu5ZJEWaY+dqwVo56IwMswq/5ZpDMZ2'
+    'aDBhqQZj6OPcLytLaRrZGcu1FUnEUmUEhdHDCBM+B4ymCJqduAAuyAmOakgp1v5Rtz/ARwMWH4edwN6mZHVlNSQRLvZac5Gg6+Bb'
+    'Z2t0VyG9smX0FXgmVpkMQXcXIiRYUgyiw2LEj0LZAGGP4kCArQs8FqnpsBuAlEyqjOHLuYhii+CCXYIWvUQI3ILr0NQTd4EhLU31'
+    'CNcT0XgVyIlaGDaVykA5caLC23XwX+LUA8adEC8MWQwe3IuCkU3M1H+gY+BhzltZ8DvnbagWyTbM/TN38xNw9pJjhfJuuJ4bpjJb'
+    'IiBCMOuJZSTBLG+p9tj1deJegJ5zC1R23GrqgA66/fFhAfom02s3q9/Vzn3h2Wy9ax+P8ImYQuoW9/Tw3nnw0B98sVQ6KxYWVZLx'
+    'CW5ZP+D3bcoljs/4lOJ0XhSGrjcgBLEo/Lr9OnGMDZcQ77FflxfgsN0C1mtNuBrvwLh4H4IuYjZT08ysG2Vd9leaYmwnyASfiFqf'
+    'MdjcZwTDI2ZgqpKQFtXI1rVGNOZCyjXZ+hsBIMrOlGZjNhdJZgEhukq1SCwVW45HDpcSV+lA4VNwc6u3dfBZUm11gFffMzVjWDCx'
+    'L9HMFRD2SUXkBMsQpICuyQ9H3C3WApz8immVoWED8Hzl+YJqeDfC9aC/KkE/fffu+rss3rIyWBUBkc5x19EFl+53NpXMHjvL5mlt'
+    'visdbBELCQyTakr6+YqbHya52d3My4GqAUJGNOUM7WpgDI7WMO+BIFxmCe3ZVGKqO2yCsEdlCDcJwGqFcz2Jh83tUWMhra35FJPP'
+    '3pPlndkb7iB7CLyhHDqWXX3OMFOuZFLqXEB5deCOn41++b3ATFRZdIlBxilkKFomN7WsvHVfZibuZulK+ouMVi/ClTheIWz07xPO'
+    'X5PZk0ynDYj6m3NaKyD0BXuDuRBqpVoMm9WiZnWJCVuZPrrPJeYRx2pRvcsDz+cIiwdhWnKNemqPJvltFHJHQ0wZHqdrmm0333My'
+    'c0jbTG91ajrC7KXB2xItDLkJ1DW/AeQabSiqlrTnajbaRTtTyocsl1DNEitkfaaNaScKg1VcU0mXBSjlzcPgATubrX8FztXfgbIo'
+    '7PnOcme1q5L15i9LIngikFdu0FVgvpJRQ+uw23SLPhczW6MjgVOO1gF2gGOG6HSoiChFgnO1mi91gmV9yIlc2w8V67ft9X6XeGSz'
+    'Ey3CaD/N9EPJ6y8bdA9L8jAmnPo0POpLq2bsAPdtdN9wOVu9R4y7aw/E+7difnFrW7Hx3a1Y3kndpxU7U5FvuFy31GF4PGKzYJxT'
+    '7JDqrVfRp9W2lSPcme+wSih8Mj0O/RKH+nFRLbo/3rToOzSqC9DEeiI9aAEuuTgBLNXf6v6UtwXu+6X2scd+owSU+zTmc5yIRmiO'
+    '9Zj6y4gYjv/Lul6v2d7p9kHXMv4LhoH3jUtcCAJ968aoY/2Ya3xDfCbhr5L5chK0AuDuBcDDu/v/HALgoeH+IwmAh8fZH1wA3P7g'
+    'bgXABwiATwPvSxUAd9Z1vlQB8PVjBcDXrQDoZJzDFABHrQDYFAAHG6FpBcCnEQCfXUN5CQLgHkF+0QLgzrq9gxMAB0fdwfhZBcDx'
+    'XgXAcSsAPo8AOGgFwKcRAEetAPgsAuCoFQAfLACOWgFwtwLgqBUA9ykAjloBcI8C4KgVAO8tAPaPHqsA9o9aCdBdTQ5TAhy3EmBT'
+    'AhxvhKaVAJ9GAtzZkdlKgJslwD2C/JIlwKYONnpREuC4O9xNM/ZACXC0198AjtrfAD6TBDj89uHb/79n4ak='
+))
+BUILTIN_DICTIONARY_ID = 0x72616010
+
+workout_plans = sa.table('workout_plans', sa.column('id', sa.Integer), sa.column('plan_data'))
+plan_data_dictionaries = sa.table(
+    'plan_data_dictionaries', sa.column('id', sa.BigInteger), sa.column('codec', sa.String),
+    sa.column('data', sa.LargeBinary), sa.column('samples', sa.Integer), sa.column('created_at', sa.DateTime),
+)
+
+
+def _dictionary_id(data: bytes) -> int:
+    return int.from_bytes(hashlib.sha256(data).digest()[:4], 'big') or 1
+
+
+def _serialize(document) -> bytes:
+    return json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _codec() -> str:
+    codec = os.environ.get("PLAN_DATA_CODEC", "zstd").lower()
+    if codec not in TAGS:
+        raise ValueError(f"Unknown plan data codec: {codec}")
+    return 'zlib' if codec == 'zstd' and zstandard is None else codec
+
+
+def _encode(document, codec: str, dictionary: bytes) -> bytes:
+    raw = _serialize(document)
+    if codec == 'none':
+        return TAGS['none'] + bytes(4) + raw
+    level = int(os.environ.get("PLAN_DATA_COMPRESSION_LEVEL", 9))
+    if codec == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=level, dict_data=zstandard.ZstdCompressionDict(dictionary))
+        payload = compressor.compress(raw)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary[-ZLIB_WINDOW:])
+        payload = compressor.compress(raw) + compressor.flush()
+    return TAGS[codec] + _dictionary_id(dictionary).to_bytes(4, 'big') + payload
+
+
+def _decode(data, dictionaries: Dict[int, bytes]):
+    if isinstance(data, str):
+        return json.loads(data)
+    data = bytes(data)
+    codec = CODEC_BY_TAG.get(data[:1])
+    if codec is None:
+        return json.loads(data.decode('utf-8'))
+    entry_id = int.from_bytes(data[1:HEADER_BYTES], 'big')
+    dictionary = dictionaries[entry_id] if entry_id else None
+    payload = data[HEADER_BYTES:]
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Plan data is zstd-compressed; install the zstandard package to read it")
+        options = {'dict_data': zstandard.ZstdCompressionDict(dictionary)} if dictionary else {}
+        raw = zstandard.ZstdDecompressor(**options).decompress(payload)
+    elif codec == 'zlib':
+        decompressor = zlib.decompressobj(-15, **({'zdict': dictionary[-ZLIB_WINDOW:]} if dictionary else {}))
+        raw = decompressor.decompress(payload) + decompressor.flush()
+    else:
+        raw = payload
+    return json.loads(raw.decode('utf-8'))
+
+
+def _rewrite_plan_data(transform) -> None:
+    """Rewrite every non-NULL plan_data with transform(value), BATCH_SIZE rows at a time."""
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(workout_plans.c.id, workout_plans.c.plan_data)
+            .where(workout_plans.c.id > last_id, workout_plans.c.plan_data.isnot(None))
+            .order_by(workout_plans.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        connection.execute(
+            workout_plans.update().where(workout_plans.c.id == sa.bindparam('plan_id'))
+            .values(plan_data=sa.bindparam('value', type_=sa.LargeBinary)),
+            [{'plan_id': plan_id, 'value': transform(value)} for plan_id, value in rows],
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('plan_data_dictionaries',
+    sa.Column('id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('codec', sa.String(length=10), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('workout_plans') as batch_op:
+        batch_op.alter_column('plan_data', existing_type=sa.JSON(), type_=sa.LargeBinary(), existing_nullable=True,
+                              postgresql_using="convert_to(plan_data::text, 'UTF8')")
+
+    # Recompress the existing plans with the built-in dictionary
+    if _dictionary_id(BUILTIN_DICTIONARY) != BUILTIN_DICTIONARY_ID:
+        raise RuntimeError("The built-in plan data dictionary is corrupt")
+    op.bulk_insert(plan_data_dictionaries, [
+        {'id': BUILTIN_DICTIONARY_ID, 'codec': 'builtin', 'data': BUILTIN_DICTIONARY, 'samples': 0,
+         'created_at': datetime.utcnow()}
+    ])
+    codec = _codec()
+    _rewrite_plan_data(lambda value: _encode(_decode(value, {}), codec, BUILTIN_DICTIONARY))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    connection = op.get_bind()
+    dictionaries = {entry_id: bytes(data) for entry_id, data in
+                    connection.execute(sa.select(plan_data_dictionaries.c.id, plan_data_dictionaries.c.data))}
+    _rewrite_plan_data(lambda value: _serialize(_decode(value, dictionaries)))
+
+    with op.batch_alter_table('workout_plans') as batch_op:
+        batch_op.alter_column('plan_data', existing_type=sa.LargeBinary(), type_=sa.JSON(), existing_nullable=True,
+                              postgresql_using="convert_from(plan_data, 'UTF8')::json")
+    op.drop_table('plan_data_dictionaries')
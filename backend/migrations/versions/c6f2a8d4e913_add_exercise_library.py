@@ -0,0 +1,45 @@
+"""add_exercise_library
+
+Revision ID: c6f2a8d4e913
+Revises: 9a4e7c2b1f58
+Create Date: 2026-10-18 19:27:53.904116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f2a8d4e913'
+down_revision: Union[str, None] = '9a4e7c2b1f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_TYPE = sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('exercise_library',
+    sa.Column('id', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('type', sa.String(length=50), nullable=False),
+    sa.Column('instructions', sa.Text(), nullable=True),
+    sa.Column('equipment', JSON_TYPE, nullable=False),
+    sa.Column('experience_levels', JSON_TYPE, nullable=False),
+    sa.Column('sets', sa.Integer(), nullable=True),
+    sa.Column('reps', sa.String(length=50), nullable=True),
+    sa.Column('duration', sa.String(length=50), nullable=True),
+    sa.Column('usage_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('exercise_library')
@@ -0,0 +1,169 @@
+"""add_normalized_workout_plan_tables
+
+Revision ID: d8a3e61c5f07
+Revises: b41f6a0d2c93
+Create Date: 2026-10-18 16:22:38.914052
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a3e61c5f07'
+down_revision: Union[str, None] = 'b41f6a0d2c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('workout_plan_weeks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workout_plan_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('week_number', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['workout_plan_id'], ['workout_plans.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_workout_plan_weeks_workout_plan_id'), 'workout_plan_weeks', ['workout_plan_id'], unique=False)
+    op.create_table('workout_plan_days',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('week_id', sa.Integer(), nullable=False),
+    sa.Column('workout_plan_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('plan_day', sa.Integer(), nullable=False),
+    sa.Column('day_number', sa.Integer(), nullable=False),
+    sa.Column('focus', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['week_id'], ['workout_plan_weeks.id'], ),
+    sa.ForeignKeyConstraint(['workout_plan_id'], ['workout_plans.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_workout_plan_days_week_id'), 'workout_plan_days', ['week_id'], unique=False)
+    op.create_index('ix_workout_plan_days_plan_day', 'workout_plan_days', ['workout_plan_id', 'plan_day'], unique=False)
+    op.create_table('workout_plan_exercises',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.String(length=255), nullable=False),
+    sa.Column('sets', sa.Integer(), nullable=True),
+    sa.Column('reps', sa.String(length=255), nullable=True),
+    sa.Column('duration', sa.String(length=255), nullable=True),
+    sa.Column('instructions', sa.Text(), nullable=True),
+    sa.Column('equipment', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['day_id'], ['workout_plan_days.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_workout_plan_exercises_day_id'), 'workout_plan_exercises', ['day_id'], unique=False)
+
+    with op.batch_alter_table('workout_plans') as batch_op:
+        batch_op.alter_column('plan_data', existing_type=sa.JSON(), nullable=True)
+
+    _backfill()
+
+
+def _backfill() -> None:
+    """
+    Move every existing plan_data document into week/day/exercise rows.
+
+    plan_data is cleared once a plan's rows exist, so each plan is stored in
+    exactly one form and the two copies cannot drift apart.
+    """
+    bind = op.get_bind()
+    metadata = sa.MetaData()
+    plans = sa.Table('workout_plans', metadata, sa.Column('id', sa.Integer(), primary_key=True),
+                     sa.Column('plan_data', sa.JSON()))
+    weeks = sa.Table('workout_plan_weeks', metadata, sa.Column('id', sa.Integer(), primary_key=True),
+                     sa.Column('workout_plan_id', sa.Integer()), sa.Column('position', sa.Integer()),
+                     sa.Column('week_number', sa.Integer()))
+    days = sa.Table('workout_plan_days', metadata, sa.Column('id', sa.Integer(), primary_key=True),
+                    sa.Column('week_id', sa.Integer()), sa.Column('workout_plan_id', sa.Integer()),
+                    sa.Column('position', sa.Integer()), sa.Column('plan_day', sa.Integer()),
+                    sa.Column('day_number', sa.Integer()), sa.Column('focus', sa.String()))
+    exercises = sa.Table('workout_plan_exercises', metadata, sa.Column('id', sa.Integer(), primary_key=True),
+                         sa.Column('day_id', sa.Integer()), sa.Column('position', sa.Integer()),
+                         sa.Column('name', sa.String()), sa.Column('type', sa.String()),
+                         sa.Column('sets', sa.Integer()), sa.Column('reps', sa.String()),
+                         sa.Column('duration', sa.String()), sa.Column('instructions', sa.Text()),
+                         sa.Column('equipment', sa.JSON()))
+
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(plans.c.id, plans.c.plan_data)
+            .where(plans.c.id > last_id, plans.c.plan_data.isnot(None))
+            .order_by(plans.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not batch:
+            break
+        for plan_id, plan_data in batch:
+            if isinstance(plan_data, str):
+                plan_data = json.loads(plan_data)
+            plan_day = 0
+            for week_position, week in enumerate((plan_data or {}).get('weeks', [])):
+                week_id = bind.execute(weeks.insert().values(
+                    workout_plan_id=plan_id, position=week_position, week_number=week['week_number']
+                )).inserted_primary_key[0]
+                for day_position, day in enumerate(week.get('days', [])):
+                    plan_day += 1
+                    day_id = bind.execute(days.insert().values(
+                        week_id=week_id, workout_plan_id=plan_id, position=day_position, plan_day=plan_day,
+                        day_number=day['day_number'], focus=day['focus']
+                    )).inserted_primary_key[0]
+                    rows = [
+                        {'day_id': day_id, 'position': position, 'name': exercise['name'], 'type': exercise['type'],
+                         'sets': exercise.get('sets'), 'reps': exercise.get('reps'),
+                         'duration': exercise.get('duration'), 'instructions': exercise.get('instructions'),
+                         'equipment': exercise.get('equipment') or []}
+                        for position, exercise in enumerate(day.get('exercises', []))
+                    ]
+                    if rows:
+                        bind.execute(exercises.insert(), rows)
+        bind.execute(plans.update().where(plans.c.id.in_([plan_id for plan_id, _ in batch])).values(plan_data=sa.null()))
+        last_id = batch[-1][0]
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Plans saved in normalized mode have no plan_data; rebuild it before the
+    # rows are dropped and the column becomes NOT NULL again
+    bind = op.get_bind()
+    plan_ids = [row[0] for row in bind.execute(sa.text("SELECT id FROM workout_plans WHERE plan_data IS NULL"))]
+    for plan_id in plan_ids:
+        plan_weeks = []
+        for week_id, week_number in bind.execute(sa.text(
+                "SELECT id, week_number FROM workout_plan_weeks WHERE workout_plan_id = :id ORDER BY position"),
+                {'id': plan_id}):
+            plan_days = []
+            for day_id, day_number, focus in bind.execute(sa.text(
+                    "SELECT id, day_number, focus FROM workout_plan_days WHERE week_id = :id ORDER BY position"),
+                    {'id': week_id}):
+                plan_days.append({'day_number': day_number, 'focus': focus, 'exercises': [
+                    {'name': name, 'type': type_, 'sets': sets, 'reps': reps, 'duration': duration,
+                     'instructions': instructions,
+                     'equipment': json.loads(equipment) if isinstance(equipment, str) else equipment}
+                    for name, type_, sets, reps, duration, instructions, equipment in bind.execute(sa.text(
+                        "SELECT name, type, sets, reps, duration, instructions, equipment "
+                        "FROM workout_plan_exercises WHERE day_id = :id ORDER BY position"), {'id': day_id})
+                ]})
+            plan_weeks.append({'week_number': week_number, 'days': plan_days})
+        bind.execute(sa.text("UPDATE workout_plans SET plan_data = :data WHERE id = :id"),
+                     {'data': json.dumps({'weeks': plan_weeks}), 'id': plan_id})
+
+    with op.batch_alter_table('workout_plans') as batch_op:
+        batch_op.alter_column('plan_data', existing_type=sa.JSON(), nullable=False)
+
+    op.drop_index(op.f('ix_workout_plan_exercises_day_id'), table_name='workout_plan_exercises')
+    op.drop_table('workout_plan_exercises')
+    op.drop_index('ix_workout_plan_days_plan_day', table_name='workout_plan_days')
+    op.drop_index(op.f('ix_workout_plan_days_week_id'), table_name='workout_plan_days')
+    op.drop_table('workout_plan_days')
+    op.drop_index(op.f('ix_workout_plan_weeks_workout_plan_id'), table_name='workout_plan_weeks')
+    op.drop_table('workout_plan_weeks')
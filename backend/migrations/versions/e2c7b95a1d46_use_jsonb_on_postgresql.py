@@ -0,0 +1,50 @@
+"""use_jsonb_on_postgresql
+
+Revision ID: e2c7b95a1d46
+Revises: d8a3e61c5f07
+Create Date: 2026-10-18 18:03:12.641870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2c7b95a1d46'
+down_revision: Union[str, None] = 'd8a3e61c5f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSONB_COLUMNS = (
+    ('user_profiles', 'equipment', False),
+    ('user_profiles', 'workout_types', False),
+    ('workout_plans', 'plan_data', True),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Other databases keep the generic JSON type
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column, nullable in JSONB_COLUMNS:
+        op.alter_column(table, column,
+                        existing_type=sa.JSON(),
+                        type_=postgresql.JSONB(),
+                        existing_nullable=nullable,
+                        postgresql_using=f'{column}::jsonb')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column, nullable in JSONB_COLUMNS:
+        op.alter_column(table, column,
+                        existing_type=postgresql.JSONB(),
+                        type_=sa.JSON(),
+                        existing_nullable=nullable,
+                        postgresql_using=f'{column}::json')
@@ -0,0 +1,37 @@
+"""add_exercise_aliases
+
+Revision ID: f3b8d1e6a274
+Revises: c6f2a8d4e913
+Create Date: 2026-10-18 21:08:36.417925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1e6a274'
+down_revision: Union[str, None] = 'c6f2a8d4e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('exercise_aliases',
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('exercise_id', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_exercise_aliases_exercise_id'), 'exercise_aliases', ['exercise_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_exercise_aliases_exercise_id'), table_name='exercise_aliases')
+    op.drop_table('exercise_aliases')
@@ -1,19 +1,37 @@
 import pytest
-import requests
+from app import create_app
+from app.models.user_profile import db
+from app.utils.job_queue import job_queue
 
-BASE_URL = 'http://127.0.0.1:5002/api'
+PROFILE_DATA = {
+    "name": "Test User",
+    "age": 30,
+    "fitnessGoal": "Build Muscle",
+    "equipment": ["Dumbbells"],
+    "workoutTypes": ["Strength Training"],
+    "experienceLevel": "Beginner"
+}
 
-@pytest.fixture(scope='module')
-def new_profile():
+@pytest.fixture
+def app(tmp_path):
+    """Application backed by a temporary SQLite file and the fake LLM backend."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'LLM_BACKEND': 'fake',
+    })
+    yield app
+    job_queue.shutdown(wait=True)
+    with app.app_context():
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def new_profile(client):
     """Fixture to create a new profile for testing."""
-    profile_data = {
-        "name": "Test User",
-        "age": 30,
-        "fitnessGoal": "Build Muscle",
-        "equipment": ["Dumbbells"],
-        "workoutTypes": ["Strength Training"],
-        "experienceLevel": "Beginner"
-    }
-    response = requests.post(f"{BASE_URL}/profile", json=profile_data)
+    response = client.post("/api/profile", json=PROFILE_DATA)
     assert response.status_code == 201
-    return response.json()
+    return response.get_json()
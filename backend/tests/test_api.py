@@ -0,0 +1,109 @@
+"""
+API tests using the Flask test client and the fake LLM backend.
+"""
+import time
+
+import pytest
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_create_and_get_profile(client, new_profile):
+    token = new_profile['session_token']
+    response = client.get(f"/api/profile/{token}")
+    assert response.status_code == 200
+    assert response.get_json()['name'] == 'Test User'
+
+
+def test_update_profile(client, new_profile):
+    token = new_profile['session_token']
+    response = client.put(f"/api/profile/{token}", json={'equipment': ['Dumbbells', 'Kettlebell']})
+    assert response.status_code == 200
+    assert response.get_json()['equipment'] == ['Dumbbells', 'Kettlebell']
+
+
+def test_options_returns_valid_options_and_includes_selections(client):
+    selection = {'id': 'custom_goal', 'name': 'Custom Goal', 'type': 'goal'}
+    response = client.post("/api/options", json={'age': 42, 'selections': [selection]})
+    assert response.status_code == 200
+    options = response.get_json()
+    assert set(options) == {'fitness_goals', 'equipment_options', 'workout_types', 'experience_levels'}
+    assert options['fitness_goals'][0]['id'] == 'custom_goal'
+
+    client.post("/api/options", json={'age': 45, 'selections': [selection]})
+    assert client.get("/api/options/cache/stats").get_json()['hits'] >= 1
+
+
+def test_workout_plan_job_lifecycle(client, new_profile):
+    token = new_profile['session_token']
+    response = client.post(f"/api/profiles/{token}/workout-plan")
+    assert response.status_code == 202
+    assert response.headers['Location'].endswith(response.get_json()['id'])
+
+    job = wait_for_job(client, response.get_json()['id'])
+    assert job['status'] == 'done'
+
+    plan = client.get(f"/api/profiles/{token}/workout-plan").get_json()
+    assert plan['id'] == job['workout_plan_id']
+    assert len(plan['plan_data']['weeks']) == 3
+
+
+def test_workout_plan_stream_emits_days_weeks_and_complete(client, new_profile):
+    token = new_profile['session_token']
+    response = client.get(f"/api/profiles/{token}/workout-plan/stream")
+    assert response.mimetype == 'text/event-stream'
+    events = [line.split(': ', 1)[1] for line in response.get_data(as_text=True).splitlines()
+              if line.startswith('event: ')]
+    assert events.count('week') == 3
+    assert events.count('day') == 15
+    assert events[-1] == 'complete'
+
+
+def test_latest_workout_plan_follows_newest_plan(app, client, new_profile):
+    from app.models.latest_workout_plan import LatestWorkoutPlan
+
+    token = new_profile['session_token']
+    plan_ids = []
+    for _ in range(2):
+        job = wait_for_job(client, client.post(f"/api/profiles/{token}/workout-plan").get_json()['id'])
+        plan_ids.append(job['workout_plan_id'])
+
+    plan = client.get(f"/api/profiles/{token}/workout-plan").get_json()
+    assert plan['id'] == plan_ids[-1]
+    with app.app_context():
+        assert LatestWorkoutPlan.query.one().workout_plan_id == plan_ids[-1]
+
+
+@pytest.mark.parametrize('storage', ['json', 'normalized'])
+def test_workout_plan_week_and_day_endpoints(monkeypatch, client, new_profile, storage):
+    from app.utils import plan_storage
+    monkeypatch.setattr(plan_storage, 'WORKOUT_PLAN_STORAGE', storage)
+
+    token = new_profile['session_token']
+    wait_for_job(client, client.post(f"/api/profiles/{token}/workout-plan").get_json()['id'])
+    plan = client.get(f"/api/profiles/{token}/workout-plan").get_json()['plan_data']
+
+    week = client.get(f"/api/profiles/{token}/workout-plan/weeks/2").get_json()
+    assert week['days'] == plan['weeks'][1]['days']
+
+    first_day_of_week_2 = len(plan['weeks'][0]['days']) + 1
+    day = client.get(f"/api/profiles/{token}/workout-plan/days/{first_day_of_week_2}").get_json()
+    assert day['week_number'] == 2
+    assert day['exercises'] == plan['weeks'][1]['days'][0]['exercises']
+
+    assert client.get(f"/api/profiles/{token}/workout-plan/weeks/9").status_code == 404
+    assert client.get(f"/api/profiles/{token}/workout-plan/days/99").status_code == 404
+
+
+def test_missing_profile_returns_404(client):
+    missing = '00000000-0000-0000-0000-000000000000'
+    assert client.post(f"/api/profiles/{missing}/workout-plan").status_code == 404
+    assert client.get(f"/api/profile/{missing}").status_code == 404
@@ -0,0 +1,115 @@
+"""
+Tests for the async serving mode: the ASGI adapter and the async job runner.
+"""
+import asyncio
+import json
+
+from app.agents import fitness_options_agent as agent_module
+from app.agents.fitness_options_agent import FitnessOptionsAgent
+from app.models.workout_plan import WorkoutPlan
+from app.routes.api import fitness_options_agent
+from app.utils.asgi import create_asgi_app
+from app.utils.job_queue import job_queue
+from app.utils.options_cache import options_cache
+from tests.conftest import PROFILE_DATA
+from tests.test_api import wait_for_job
+
+
+def _send(asgi_app, method, path, body=None, query_string=b''):
+    """Send one HTTP request through an ASGI app; returns the messages it sent back."""
+    content = json.dumps(body).encode() if body is not None else b''
+    messages = [{'type': 'http.request', 'body': content}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Like a server, report the disconnect only once the response is complete
+        while not sent or sent[-1].get('more_body', sent[-1]['type'] == 'http.response.start'):
+            await asyncio.sleep(0.01)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'http_version': '1.1', 'method': method, 'path': path, 'query_string': query_string,
+             'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(content)).encode())],
+             'server': ('testserver', 80)}
+    asyncio.run(asgi_app(scope, receive, send))
+    return sent
+
+
+def _request(asgi_app, method, path, body=None, query_string=b''):
+    """Send one HTTP request through an ASGI app; returns (status, headers, JSON body)."""
+    start, *bodies = _send(asgi_app, method, path, body, query_string)
+    return start['status'], dict(start['headers']), json.loads(b''.join(m.get('body', b'') for m in bodies))
+
+
+def test_asgi_serves_options_natively_and_delegates_to_flask(app):
+    asgi_app = create_asgi_app(app)
+    options_cache.clear()
+
+    status, headers, options = _request(asgi_app, 'POST', '/api/options', {
+        'age': 42, 'selections': [{'id': 'custom_goal', 'name': 'Custom Goal', 'type': 'goal'}]
+    })
+    assert status == 200 and headers[b'x-options-source'] == b'llm'
+    assert options['fitness_goals'][0]['id'] == 'custom_goal'
+    # Served from the cache the native route filled
+    assert _request(asgi_app, 'POST', '/api/options', {'age': 42}, b'mode=rules')[1][b'x-options-source'] == b'rules'
+    assert _request(asgi_app, 'POST', '/api/options', {})[0] == 400
+
+    status, _, created = _request(asgi_app, 'POST', '/api/profile', PROFILE_DATA)
+    assert status == 201
+    status, _, profile = _request(asgi_app, 'GET', f"/api/profile/{created['session_token']}")
+    assert status == 200 and profile['name'] == PROFILE_DATA['name']
+
+
+def test_asgi_streams_flask_server_sent_events(app):
+    _, _, created = _request(create_asgi_app(app), 'POST', '/api/profile', PROFILE_DATA)
+
+    start, *bodies = _send(create_asgi_app(app), 'GET', f"/api/profiles/{created['session_token']}/workout-plan/stream")
+
+    assert start['status'] == 200
+    chunks = [message['body'] for message in bodies if message.get('body')]
+    # Sent event by event, not as one buffered body
+    assert len(chunks) > 1 and b'event: day' in chunks[0]
+    assert b'event: complete' in b''.join(chunks)
+
+
+def test_slow_async_generation_falls_back_and_fills_cache(monkeypatch):
+    original = FitnessOptionsAgent._agenerate_options
+
+    async def slow(self, *args):
+        await asyncio.sleep(0.3)
+        return await original(self, *args)
+
+    monkeypatch.setattr(FitnessOptionsAgent, '_agenerate_options', slow)
+    monkeypatch.setattr(agent_module, 'OPTIONS_LLM_TIMEOUT_SECONDS', 0.05)
+    options_cache.clear()
+
+    async def requests():
+        _, first = await fitness_options_agent.aget_options(33, [], 'llm')
+        # The generation keeps running on the loop after the fallback
+        await asyncio.sleep(0.5)
+        _, second = await fitness_options_agent.aget_options(33, [], 'llm')
+        return first, second
+
+    assert asyncio.run(requests()) == ('catalog', 'cache')
+
+
+def test_async_job_runner_generates_plans(app, client, new_profile, monkeypatch):
+    monkeypatch.setattr(job_queue, 'runner', 'async')
+    tokens = [new_profile['session_token']]
+    for age in (25, 55):
+        response = client.post("/api/profile", json={**PROFILE_DATA, 'age': age})
+        tokens.append(response.get_json()['session_token'])
+
+    jobs = [client.post(f"/api/profiles/{token}/workout-plan").get_json() for token in tokens]
+
+    assert [wait_for_job(client, job['id'])['status'] for job in jobs] == ['done'] * 3
+    assert job_queue._loop_thread is not None and job_queue._executor is None
+    for token in tokens:
+        plan = client.get(f"/api/profiles/{token}/workout-plan").get_json()
+        assert len(plan['plan_data']['weeks']) == 3
+    with app.app_context():
+        assert WorkoutPlan.query.count() == 3
@@ -0,0 +1,138 @@
+"""
+Tests for batch workout plan generation.
+"""
+import threading
+
+from app.models.batch_run import BatchRun, BatchRunItem
+from app.models.latest_workout_plan import LatestWorkoutPlan
+from app.models.user_profile import db
+from app.models.workout_plan import WorkoutPlan
+from app.utils.batch_generation import BatchGenerator, create_batch_run
+from app.utils.fake_llm import fake_workout_plan
+from app.utils.plan_templates import plan_template_store
+from app.utils.profile_bulk import import_profiles
+from app.utils.rate_limiter import AdaptiveRateLimiter, is_quota_error
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def import_cohort(goals):
+    rows = [
+        (number, {'name': f'User {number}', 'age': 30, 'fitnessGoal': goal, 'equipment': ['Dumbbells'],
+                  'workoutTypes': ['Strength Training'], 'experienceLevel': 'Beginner'}, None)
+        for number, goal in enumerate(goals, start=1)
+    ]
+    result = import_profiles(rows)
+    return [created['uuid'] for created in result.created]
+
+
+def wait_for_run(run_id):
+    for thread in threading.enumerate():
+        if thread.name == f'batch-run-{run_id}':
+            thread.join(timeout=30)
+
+
+def fast_limiter():
+    return AdaptiveRateLimiter(max_rate=1000, base_backoff=0.001, max_backoff=0.01)
+
+
+def test_identical_profiles_share_one_generation(app, monkeypatch):
+    monkeypatch.setattr(plan_template_store, 'enabled', False)
+    calls = []
+
+    def generate(profile):
+        calls.append(profile.fitness_goal)
+        return fake_workout_plan()
+
+    with app.app_context():
+        uuids = import_cohort(['Build Muscle'] * 5 + ['Lose Weight'] * 3)
+        run, missing = create_batch_run(uuids + ['not-a-profile'])
+        assert (run.total, missing) == (8, ['not-a-profile'])
+
+        result = BatchGenerator(generate=generate, commit_size=2, limiter=fast_limiter()).run(run.id)
+
+        assert sorted(calls) == ['Build Muscle', 'Lose Weight']
+        assert (result['status'], result['completed'], result['failed'], result['llm_calls']) == ('done', 8, 0, 2)
+        assert result['remaining'] == 0 and result['plans_per_minute'] > 0
+        assert WorkoutPlan.query.count() == 8
+        assert LatestWorkoutPlan.query.count() == 8
+        assert BatchRunItem.query.filter(BatchRunItem.workout_plan_id.is_(None)).count() == 0
+
+
+def test_resume_only_generates_pending_items(app, monkeypatch):
+    monkeypatch.setattr(plan_template_store, 'enabled', False)
+    calls = []
+
+    def failing(profile):
+        calls.append(profile.fitness_goal)
+        if profile.fitness_goal == 'Lose Weight':
+            raise RuntimeError('worker died')
+        return fake_workout_plan()
+
+    with app.app_context():
+        run, _ = create_batch_run(filters={})
+        assert run.total == 0
+
+        import_cohort(['Build Muscle'] * 2 + ['Lose Weight'] * 2)
+        run, _ = create_batch_run(filters={'experience_level': 'Beginner'})
+        result = BatchGenerator(generate=failing, limiter=fast_limiter()).run(run.id)
+        assert (result['completed'], result['failed']) == (2, 2)
+
+        # Put the failed items back in the queue, as if the process had stopped
+        db.session.execute(db.update(BatchRunItem).where(BatchRunItem.status == 'failed')
+                           .values(status='pending', error=None))
+        db.session.get(BatchRun, run.id).failed = 0
+        db.session.commit()
+
+        calls.clear()
+        result = BatchGenerator(generate=lambda profile: calls.append(profile.fitness_goal) or fake_workout_plan(),
+                                limiter=fast_limiter()).run(run.id)
+        assert calls == ['Lose Weight']
+        assert (result['status'], result['completed'], result['failed']) == ('done', 4, 0)
+        assert WorkoutPlan.query.count() == 4
+
+
+def test_quota_errors_back_off_and_retry(app, monkeypatch):
+    monkeypatch.setattr(plan_template_store, 'enabled', False)
+    attempts = []
+
+    def flaky(profile):
+        attempts.append(profile.uuid)
+        if len(attempts) < 3:
+            raise ResourceExhausted('429 quota exceeded')
+        return fake_workout_plan()
+
+    limiter = fast_limiter()
+    with app.app_context():
+        uuids = import_cohort(['Build Muscle'])
+        run, _ = create_batch_run(uuids)
+        result = BatchGenerator(generate=flaky, limiter=limiter).run(run.id)
+
+    assert len(attempts) == 3
+    assert limiter.throttled == 2 and limiter.rate < 1000
+    assert result['completed'] == 1
+    assert is_quota_error(ResourceExhausted()) and not is_quota_error(ValueError('bad plan'))
+
+
+def test_batch_endpoints(client, app):
+    with app.app_context():
+        uuids = import_cohort(['Build Muscle'] * 3)
+
+    response = client.post('/api/workout-plans/batch', json={'profile_uuids': 'nope'})
+    assert response.status_code == 400
+
+    response = client.post('/api/workout-plans/batch', json={'profile_uuids': uuids})
+    assert response.status_code == 202
+    run_id = response.get_json()['id']
+    assert response.headers['Location'].endswith(f'/api/workout-plans/batch/{run_id}')
+
+    wait_for_run(run_id)
+    run = client.get(f'/api/workout-plans/batch/{run_id}').get_json()
+    assert (run['status'], run['completed']) == ('done', 3)
+
+    response = client.post(f'/api/workout-plans/batch/{run_id}/resume')
+    assert response.status_code == 202
+    wait_for_run(run_id)
+    assert client.get('/api/workout-plans/batch/00000000-0000-0000-0000-000000000000').status_code == 404
@@ -0,0 +1,26 @@
+"""
+Tests for database engine configuration.
+"""
+from sqlalchemy import text
+
+from app.models.user_profile import db
+from app.utils.database import database_config, engine_options
+
+
+def test_database_url_and_pool_options(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgres://user:secret@db:5432/fitness')
+    config = database_config('sqlite:///unused.db')
+    assert config['SQLALCHEMY_DATABASE_URI'] == 'postgresql://user:secret@db:5432/fitness'
+
+    options = engine_options(config)
+    assert options['pool_pre_ping'] is True
+    assert options['pool_size'] == config['DB_POOL_SIZE']
+    assert 'connect_args' not in options
+
+
+def test_sqlite_connections_use_wal_and_busy_timeout(app):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert conn.execute(text('PRAGMA busy_timeout')).scalar() == app.config['SQLITE_BUSY_TIMEOUT_MS']
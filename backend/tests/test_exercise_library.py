@@ -0,0 +1,181 @@
+"""
+Tests for the local exercise library and id-based plan generation.
+"""
+import json
+from typing import ClassVar, List
+
+from app.models.exercise_library import ExerciseLibraryEntry
+from app.models.user_profile import db
+from app.models.workout_plan import WorkoutPlan
+from app.utils.exercise_library import (
+    ExerciseLibrary, exercise_id, exercise_library, harvest_exercises, hydrate_plan, seed_exercise_library
+)
+from app.utils import llm_registry
+from app.utils.fake_llm import LIBRARY_EXERCISE, FakeLLM, fake_workout_plan
+from app.utils.metrics import LLM_PARSE_FAILURES
+from app.utils.search import UserProfile, generate_structured_workout_plan
+from tests.test_api import wait_for_job
+
+
+def _library():
+    return ExerciseLibrary(harvest_exercises([(fake_workout_plan(), 'beginner')]).values())
+
+
+def test_harvest_merges_repeated_exercises():
+    plan = fake_workout_plan()
+    entries = harvest_exercises([(plan, 'Beginner'), (plan, 'Advanced')])
+
+    assert exercise_id("Dumbbell Bench Press") == 'dumbbell-bench-press'
+    rows = entries['dumbbell-rows']
+    assert rows['name'] == 'Dumbbell Rows' and rows['equipment'] == ['Dumbbells']
+    assert rows['experience_levels'] == ['beginner', 'advanced']
+    # Each of the 3 weeks plans it once, and the plan was harvested twice
+    assert rows['usage_count'] == 6
+    assert entries['squats']['equipment'] == []
+
+
+def test_query_needs_all_equipment_and_intersects_filters():
+    library = _library()
+
+    def ids(*args, **kwargs):
+        return {entry['id'] for entry in library.query(*args, **kwargs)}
+
+    dumbbells = ids(['dumbbells'])
+    assert 'dumbbell-rows' in dumbbells and 'squats' in dumbbells
+    # Needs a Yoga Mat too
+    assert 'dumbbell-bench-press' not in dumbbells
+    assert 'dumbbell-bench-press' in ids(['Dumbbells', 'Yoga Mat'])
+    assert ids([], ['HIIT']) == {'jumping-jacks', 'high-knees', 'burpees'}
+    assert ids(None, ['Cardio']) == {'light-jogging', 'stretching'}
+    assert ids(None, None, 'Advanced') == set()
+    assert len(library.query(limit=5)) == 5
+
+
+def test_hydrate_plan_fills_details_and_drops_unknown_ids():
+    library = _library()
+    plan = {'weeks': [{'week_number': 1, 'days': [{'day_number': 1, 'focus': 'Legs', 'exercises': [
+        {'id': 'squats', 'sets': 4, 'reps': '8'},
+        {'id': 'made-up-exercise', 'sets': 3},
+    ]}]}]}
+
+    hydrated, unknown = hydrate_plan(plan, library)
+
+    assert unknown == ['made-up-exercise']
+    exercise, = hydrated['weeks'][0]['days'][0]['exercises']
+    assert exercise['name'] == 'Squats' and exercise['sets'] == 4 and exercise['reps'] == '8'
+    assert exercise['instructions'] == library.get('squats')['instructions']
+
+
+def test_seed_is_idempotent_and_includes_stored_plans(app, client, new_profile):
+    token = new_profile['session_token']
+    response = client.post(f"/api/profiles/{token}/workout-plan")
+    assert wait_for_job(client, response.get_json()['id'])['status'] == 'done'
+
+    with app.app_context():
+        first = seed_exercise_library()
+        second = seed_exercise_library()
+
+        assert first['plans'] == 2 and first['added'] == 16 and first['total'] == 16
+        assert second['added'] == 0 and second['updated'] == 0
+        assert db.session.get(ExerciseLibraryEntry, 'squats').experience_levels == ['beginner']
+        assert len(exercise_library) == 16
+
+
+def test_plan_generation_references_library_exercises(app, client, new_profile):
+    token = new_profile['session_token']
+    with app.app_context():
+        seed_exercise_library(include_stored_plans=False)
+    failures = LLM_PARSE_FAILURES.value(schema='LibraryWorkoutPlan', kind='unknown_id')
+
+    response = client.post(f"/api/profiles/{token}/workout-plan")
+    assert wait_for_job(client, response.get_json()['id'])['status'] == 'done'
+
+    plan = client.get(f"/api/profiles/{token}/workout-plan").get_json()
+    exercises = [exercise for week in plan['plan_data']['weeks']
+                 for day in week['days'] for exercise in day['exercises']]
+    assert exercises
+    with app.app_context():
+        for exercise in exercises:
+            entry = exercise_library.get(exercise_id(exercise['name']))
+            assert entry is not None and exercise['instructions'] == entry['instructions']
+            # Only equipment the profile (Dumbbells) has
+            assert set(exercise['equipment']) <= {'Dumbbells'}
+        assert WorkoutPlan.query.count() == 1
+    assert LLM_PARSE_FAILURES.value(schema='LibraryWorkoutPlan', kind='unknown_id') == failures
+
+
+PROFILE = UserProfile('Library', 30, 'Build Muscle', ['Dumbbells'], ['Strength Training'], 'Beginner')
+
+
+class LibraryLLM(FakeLLM):
+    """FakeLLM that records every prompt; subclasses alter its library plan answers."""
+    prompts: ClassVar[List[str]] = []
+
+    def respond(self, prompt):
+        type(self).prompts.append(prompt)
+        text = super().respond(prompt)
+        return self.alter(json.loads(text), text) if LIBRARY_EXERCISE.search(prompt) else text
+
+    def alter(self, data, text):
+        return text
+
+
+class TruncatedLibraryLLM(LibraryLLM):
+    """Library plans are cut off halfway through."""
+
+    def alter(self, data, text):
+        return text[:len(text) // 2] if 'weeks' in data else text
+
+
+class UnknownIdLLM(LibraryLLM):
+    """The first day of week 2 only ever references exercises that are not in the library."""
+
+    def alter(self, data, text):
+        week = data['weeks'][1] if 'weeks' in data else data
+        if week['week_number'] == 2:
+            for reference in week['days'][0]['exercises']:
+                reference['id'] = 'made-up-exercise'
+        return json.dumps(data)
+
+
+def _generate_with(app, llm_class):
+    llm_class.prompts = []
+    llm_registry.set_llm_factory(lambda model_id, location: llm_class(model_id=model_id))
+    try:
+        with app.app_context():
+            seed_exercise_library(include_stored_plans=False)
+            return generate_structured_workout_plan(PROFILE, mode='single')
+    finally:
+        llm_registry.set_llm_factory(None)
+
+
+def _plan_prompts(prompts):
+    return [prompt for prompt in prompts if prompt.startswith('Generate a structured workout plan')]
+
+
+def test_truncated_library_plan_regenerates_missing_weeks(app):
+    plan = _generate_with(app, TruncatedLibraryLLM)
+
+    assert [week['week_number'] for week in plan['weeks']] == [1, 2, 3]
+    with app.app_context():
+        assert all(exercise_library.get(exercise_id(exercise['name'])) is not None
+                   for week in plan['weeks'] for day in week['days'] for exercise in day['exercises'])
+    # Only the lost weeks are re-prompted, from the library; no full plan is generated
+    week_prompts = [prompt for prompt in TruncatedLibraryLLM.prompts if prompt.startswith('Create week')]
+    assert week_prompts and all(LIBRARY_EXERCISE.search(prompt) for prompt in week_prompts)
+    assert not any(prompt.startswith('Create week 1 ') for prompt in week_prompts)
+    assert len(_plan_prompts(TruncatedLibraryLLM.prompts)) == 1
+
+
+def test_library_day_of_unknown_ids_falls_back_to_full_plan(app):
+    failures = LLM_PARSE_FAILURES.value(schema='LibraryWorkoutPlan', kind='empty_day')
+
+    plan = _generate_with(app, UnknownIdLLM)
+
+    # Week 2 was re-prompted before giving up on the library plan
+    assert any(prompt.startswith('Create week 2 ') for prompt in UnknownIdLLM.prompts)
+    library_prompt, full_prompt = _plan_prompts(UnknownIdLLM.prompts)
+    assert LIBRARY_EXERCISE.search(library_prompt) and not LIBRARY_EXERCISE.search(full_prompt)
+    names = [exercise['name'] for exercise in plan['weeks'][1]['days'][0]['exercises']]
+    assert names == [exercise['name'] for exercise in fake_workout_plan()['weeks'][1]['days'][0]['exercises']]
+    assert LLM_PARSE_FAILURES.value(schema='LibraryWorkoutPlan', kind='empty_day') == failures + 1
@@ -0,0 +1,132 @@
+"""
+Tests for exercise name canonicalization.
+"""
+import pytest
+
+from app.agents import workout_generator_agent
+from app.models.exercise_alias import ExerciseAlias
+from app.models.latest_workout_plan import LatestWorkoutPlan
+from app.models.user_profile import UserProfile, db
+from app.models.workout_plan import WorkoutPlan
+from app.utils import plan_storage
+from app.utils.exercise_library import seed_exercise_library
+from app.utils.exercise_names import ExerciseNameIndex, canonicalize_plan, canonicalize_stored_plans, name_tokens
+from app.utils.fake_llm import fake_workout_plan
+from tests.test_api import wait_for_job
+
+
+def _plan_with_names(*names):
+    plan = fake_workout_plan()
+    exercises = plan['weeks'][0]['days'][0]['exercises']
+    for exercise, name in zip(exercises, names):
+        exercise['name'] = name
+    return plan
+
+
+def _first_day_names(plan_data):
+    return [exercise['name'] for exercise in plan_data['weeks'][0]['days'][0]['exercises']]
+
+
+def test_name_variants_share_a_canonical_exercise():
+    index = ExerciseNameIndex(threshold=0.75)
+    canonical_id = index.add("Dumbbell Bench Press")
+
+    assert name_tokens("DB Bench Presses (flat)") == ('dumbbell', 'bench', 'press')
+    for variant in ("DB Bench Press", "dumbbell bench press (flat)", "Bench Press, Dumbbell"):
+        assert index.canonicalize(variant) == (canonical_id, "Dumbbell Bench Press", 'exact', 1.0), variant
+    typo = index.canonicalize("Dumbell Bench Press")
+    assert typo.exercise_id == canonical_id and typo.match == 'fuzzy' and typo.score >= 0.75
+    # Learned: an exact match from now on
+    assert index.canonicalize("Dumbell Bench Press").match == 'exact'
+
+    incline = index.canonicalize("Incline Dumbbell Bench Press")
+    assert incline.match == 'new' and incline.exercise_id == 'incline-dumbbell-bench-press'
+    assert index.canonicalize("pushups").exercise_id == index.canonicalize("Push-Ups").exercise_id
+    # New exercises are named with abbreviations spelled out
+    assert index.canonicalize("KB swings").name == "Kettlebell swings"
+
+
+def test_canonicalize_plan_rewrites_names():
+    index = ExerciseNameIndex()
+    index.add("Dumbbell Bench Press")
+    plan = _plan_with_names("DB Bench Press", "Dumbbell Bench Press", "dumbbell bench press (flat)")
+
+    canonical, stats = canonicalize_plan(plan, index, persist=False)
+
+    assert _first_day_names(canonical)[:3] == ["Dumbbell Bench Press"] * 3
+    assert stats['renamed'] == 2 and stats['exercises'] == 48
+    # The input plan is left as it was
+    assert _first_day_names(plan)[0] == "DB Bench Press"
+
+
+def test_generated_plans_are_saved_with_canonical_names(app, client, new_profile, monkeypatch):
+    with app.app_context():
+        seed_exercise_library(include_stored_plans=False)
+    monkeypatch.setattr(workout_generator_agent, 'generate_structured_workout_plan',
+                        lambda profile: _plan_with_names("DB Rows", "Dumbell Rows", "Cable Face Pulls"))
+
+    response = client.post(f"/api/profiles/{new_profile['session_token']}/workout-plan")
+    assert wait_for_job(client, response.get_json()['id'])['status'] == 'done'
+
+    plan = client.get(f"/api/profiles/{new_profile['session_token']}/workout-plan").get_json()
+    assert _first_day_names(plan['plan_data'])[:3] == ["Dumbbell Rows", "Dumbbell Rows", "Cable Face Pulls"]
+    with app.app_context():
+        aliases = {alias.key: alias.exercise_id for alias in ExerciseAlias.query.all()}
+    # Library names are exact matches and need no alias
+    assert aliases == {'dumbell row': 'dumbbell-rows', 'cable face pull': 'cable-face-pull'}
+
+
+def test_canonicalize_stored_plans_in_both_storage_modes(app, new_profile):
+    with app.app_context():
+        profile = UserProfile.query.filter_by(uuid=new_profile['session_token']).first()
+        for storage in ('json', 'normalized'):
+            plan = workout_generator_agent.WorkoutGeneratorAgent.build_workout_plan(
+                profile.id, _plan_with_names("DB Bench Press", "Dumbbell Bench Press", "db bench presses"))
+            plan_storage.attach_plan_content(plan, _plan_with_names(
+                "DB Bench Press", "Dumbbell Bench Press", "db bench presses"), storage)
+            db.session.add(plan)
+        db.session.commit()
+
+        dry_run = canonicalize_stored_plans(dry_run=True)
+        assert _first_day_names(WorkoutPlan.query.first().get_plan_data())[0] == "DB Bench Press"
+
+        stats = canonicalize_stored_plans(batch_size=1)
+
+        assert stats == dry_run
+        assert stats['plans'] == 2 and stats['plans_updated'] == 2
+        # Two renamed in the JSON plan and two normalized rows
+        assert stats['exercises_renamed'] == 4
+        assert stats['names_before'] - stats['names_after'] == 2
+        for plan in WorkoutPlan.query.all():
+            assert len(set(_first_day_names(plan.get_plan_data())[:3])) == 1
+        assert canonicalize_stored_plans()['exercises_renamed'] == 0
+
+
+@pytest.mark.parametrize('storage', ['json', 'normalized'])
+def test_canonicalized_plans_get_new_etags(app, client, new_profile, storage):
+    token = new_profile['session_token']
+    with app.app_context():
+        profile = UserProfile.query.filter_by(uuid=token).first()
+        plan = workout_generator_agent.WorkoutGeneratorAgent.build_workout_plan(profile.id, {'weeks': []})
+        plan_storage.attach_plan_content(plan, _plan_with_names("DB Bench Press", "Dumbbell Bench Press"), storage)
+        db.session.add(plan)
+        db.session.flush()
+        LatestWorkoutPlan.point_to(profile.id, plan.id)
+        db.session.commit()
+
+    base = f"/api/profiles/{token}/workout-plan"
+    # Each route's first day, from its response
+    first_day = {
+        base: lambda body: body['plan_data']['weeks'][0]['days'][0],
+        f"{base}/weeks/1": lambda body: body['days'][0],
+        f"{base}/days/1": lambda body: body,
+    }
+    etags = {url: client.get(url).headers['ETag'] for url in first_day}
+    with app.app_context():
+        canonicalize_stored_plans()
+
+    for url, day_of in first_day.items():
+        response = client.get(url, headers={'If-None-Match': etags[url]})
+        assert response.status_code == 200, url
+        names = [exercise['name'] for exercise in day_of(response.get_json())['exercises'][:2]]
+        assert names == ["Dumbbell Bench Press"] * 2, url
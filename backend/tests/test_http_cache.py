@@ -0,0 +1,51 @@
+"""
+Tests for ETag / conditional GET handling on profile and workout plan reads.
+"""
+from sqlalchemy import event
+
+from app.models.user_profile import db
+from tests.test_api import wait_for_job
+
+
+def test_profile_etag_revalidation(client, new_profile):
+    url = f"/api/profile/{new_profile['session_token']}"
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    not_modified = client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+
+    client.put(url, json={'age': 31})
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_workout_plan_304_does_not_load_plan_data(app, client, new_profile):
+    token = new_profile['session_token']
+    wait_for_job(client, client.post(f"/api/profiles/{token}/workout-plan").get_json()['id'])
+    url = f"/api/profiles/{token}/workout-plan"
+    etag = client.get(url).headers['ETag']
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url, headers={'If-None-Match': etag})
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert response.status_code == 304
+    assert statements
+    assert not any('plan_data' in statement for statement in statements)
+
+
+def test_missing_resources_are_not_cached(client):
+    response = client.get("/api/profile/00000000-0000-0000-0000-000000000000")
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
@@ -0,0 +1,92 @@
+"""
+Tests for the background job queue and its database job store.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.agents.workout_generator_agent import WorkoutGeneratorAgent
+from app.models.generation_job import GenerationJob, JOB_QUEUED, JOB_RUNNING
+from app.models.user_profile import db
+from app.utils.job_queue import JobQueue, JobStore
+
+from tests.test_api import wait_for_job
+
+
+class RecordingJobQueue(JobQueue):
+    """A queue that records submitted job ids instead of running them."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.submitted = []
+
+    def _submit(self, job_id):
+        self.submitted.append(job_id)
+
+
+def test_job_store_must_implement_every_method():
+    class PartialStore(JobStore):
+        def create_job(self, profile_uuid):
+            return {}, True
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+
+def test_enqueue_deduplicates_active_jobs(app, new_profile):
+    queue = RecordingJobQueue()
+    with app.app_context():
+        first, created = queue.enqueue_workout_plan(new_profile['profile']['uuid'])
+        second, created_again = queue.enqueue_workout_plan(new_profile['profile']['uuid'])
+
+        assert created and not created_again
+        assert second['id'] == first['id']
+        assert queue.submitted == [first['id']]
+        assert GenerationJob.query.count() == 1
+
+
+def test_init_app_resumes_queued_and_stale_jobs(app, new_profile):
+    queue = RecordingJobQueue()
+    queue.stale_after_seconds = 60
+    with app.app_context():
+        stale = GenerationJob(profile_uuid=new_profile['profile']['uuid'], status=JOB_RUNNING,
+                              started_at=datetime.utcnow() - timedelta(minutes=5))
+        db.session.add(stale)
+        db.session.commit()
+        stale_id = stale.id
+        # End the read transaction, so the requeue by init_app is visible
+        db.session.commit()
+
+        queue.init_app(app)
+
+        assert queue.submitted == [stale_id]
+        assert db.session.get(GenerationJob, stale_id).status == JOB_QUEUED
+
+
+def test_init_app_leaves_recently_started_jobs(app, new_profile):
+    queue = RecordingJobQueue()
+    with app.app_context():
+        db.session.add(GenerationJob(profile_uuid=new_profile['profile']['uuid'], status=JOB_RUNNING,
+                                     started_at=datetime.utcnow()))
+        db.session.commit()
+
+        queue.init_app(app)
+
+        assert queue.submitted == []
+
+
+def test_failed_generation_marks_the_job_failed(monkeypatch, client, new_profile):
+    def fail(profile_id):
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(WorkoutGeneratorAgent, 'generate_workout_plan', staticmethod(fail))
+    response = client.post(f"/api/profiles/{new_profile['session_token']}/workout-plan")
+
+    job = wait_for_job(client, response.get_json()['id'])
+    assert job['status'] == 'failed'
+    assert job['error'] == 'LLM unavailable'
+    assert job['workout_plan_id'] is None
+
+    # A failed job no longer blocks a new one for the profile
+    retry = client.post(f"/api/profiles/{new_profile['session_token']}/workout-plan")
+    assert retry.get_json()['id'] != job['id']
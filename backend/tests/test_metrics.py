@@ -0,0 +1,78 @@
+"""
+Tests for the metrics registry and the /metrics endpoint.
+"""
+import logging
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.outputs import Generation
+
+from app.models.workout_exercise import WeeklyWorkout
+from app.utils.llm_registry import get_parser
+from app.utils.metrics import LLM_PARSE_FAILURES, MetricsRegistry, _token_usage
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    registry = MetricsRegistry()
+    latency = registry.histogram('demo_seconds', 'Demo latency.', ('route',), buckets=(0.1, 1.0))
+    calls = registry.counter('demo_calls_total', 'Demo calls.', ('model',))
+    latency.observe(0.05, route='/a')
+    latency.observe(0.5, route='/a')
+    latency.observe(5, route='/a')
+    calls.inc(model='gemini "x"')
+    registry.register_collector(lambda: [('demo_ratio', 'gauge', 'Demo ratio.', [({'cache': 'c'}, 0.25)])])
+
+    lines = registry.render().splitlines()
+    assert '# TYPE demo_seconds histogram' in lines
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/a"} 3' in lines
+    assert 'demo_calls_total{model="gemini \\"x\\""} 1' in lines
+    assert 'demo_ratio{cache="c"} 0.25' in lines
+
+    with pytest.raises(ValueError):
+        calls.inc(route='/a')
+
+
+def test_metrics_endpoint_reports_routes_db_llm_and_caches(client):
+    client.post('/api/options', json={'age': 61, 'mode': 'llm'})
+    response = client.get('/api/options/static')
+    client.get('/api/options/static', headers={'If-None-Match': response.headers['ETag']})
+    client.post('/api/profile', json={
+        'name': 'Metrics', 'age': 30, 'fitnessGoal': 'Build Muscle', 'equipment': [],
+        'workoutTypes': [], 'experienceLevel': 'Beginner'
+    })
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/options",status="200"}' in body
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/profile",status="201"}' in body
+    assert 'db_query_duration_seconds_count{operation="INSERT"}' in body
+    assert 'llm_call_duration_seconds_count{model="gemini-2.0-flash-lite",status="ok"}' in body
+    assert 'llm_tokens_total{model="gemini-2.0-flash-lite",kind="completion"}' in body
+    assert 'cache_hit_ratio{cache="options"}' in body
+
+
+def test_parser_counts_unparseable_output():
+    before = LLM_PARSE_FAILURES.value(schema='WeeklyWorkout', kind='json')
+    with pytest.raises(OutputParserException):
+        get_parser(WeeklyWorkout).parse_result([Generation(text='not json')])
+    assert LLM_PARSE_FAILURES.value(schema='WeeklyWorkout', kind='json') == before + 1
+
+
+def test_token_usage_prefers_provider_counts():
+    from langchain_core.outputs import LLMResult
+
+    reported = LLMResult(generations=[[Generation(text='x', generation_info={
+        'usage_metadata': {'prompt_token_count': 12, 'candidates_token_count': 30}})]])
+    assert _token_usage(reported) == (12, 30)
+    assert _token_usage(LLMResult(generations=[[Generation(text='x')]])) == (None, None)
+
+
+def test_options_payload_is_not_logged_at_info(client, caplog):
+    with caplog.at_level(logging.INFO, logger='app'):
+        client.post('/api/options', json={'age': 19, 'mode': 'llm', 'selections': [{'id': 'x', 'name': 'X', 'type': 'goal'}]})
+    assert not any('fitness_goals' in record.getMessage() for record in caplog.records)
@@ -0,0 +1,83 @@
+"""
+Tests for Alembic data migrations, run against a temporary SQLite database.
+"""
+import json
+import os
+
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+
+from app.utils import plan_codec
+from app.utils.fake_llm import fake_workout_plan
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def migrate(tmp_path, monkeypatch):
+    """Alembic config and engine for a new database; migrate with command.upgrade(config, revision)."""
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    # No config file, so env.py leaves the app's logging configuration alone
+    config = Config()
+    config.set_main_option('script_location', os.path.join(BACKEND_DIR, 'migrations'))
+    config.set_main_option('sqlalchemy.url', url)
+    engine = sa.create_engine(url)
+    yield config, engine
+    engine.dispose()
+
+
+def _insert_plan(engine, plan_data):
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            "INSERT INTO user_profiles (id, uuid, name, age, fitness_goal, equipment, workout_types, experience_level) "
+            "VALUES (1, 'profile-1', 'Migrated', 30, 'Build Muscle', '[]', '[]', 'Beginner')"
+        ))
+        connection.execute(sa.text(
+            "INSERT INTO workout_plans (id, user_profile_id, start_date, end_date, plan_data) "
+            "VALUES (1, 1, '2026-01-01', '2026-01-22', :plan_data)"
+        ), {'plan_data': json.dumps(plan_data)})
+
+
+def test_normalized_backfill_moves_plan_data_into_rows(migrate):
+    config, engine = migrate
+    command.upgrade(config, 'b41f6a0d2c93')
+    _insert_plan(engine, fake_workout_plan())
+
+    command.upgrade(config, 'd8a3e61c5f07')
+
+    with engine.connect() as connection:
+        assert connection.execute(sa.text("SELECT plan_data FROM workout_plans")).scalar() is None
+        assert connection.execute(sa.text("SELECT count(*) FROM workout_plan_weeks")).scalar() == 3
+        assert connection.execute(sa.text("SELECT count(*) FROM workout_plan_days")).scalar() == 15
+        names = [name for name, in connection.execute(sa.text(
+            "SELECT name FROM workout_plan_exercises ORDER BY day_id, position"))]
+    expected = [exercise['name'] for week in fake_workout_plan()['weeks']
+                for day in week['days'] for exercise in day['exercises']]
+    assert names == expected
+
+
+@pytest.mark.parametrize('codec', ['zstd', 'zlib'])
+def test_compress_plan_data_round_trip(migrate, monkeypatch, codec):
+    monkeypatch.setenv('PLAN_DATA_CODEC', codec)
+    config, engine = migrate
+    command.upgrade(config, 'f3b8d1e6a274')
+    plan = fake_workout_plan()
+    _insert_plan(engine, plan)
+
+    command.upgrade(config, 'b7e4a19c2d05')
+
+    with engine.connect() as connection:
+        stored = connection.execute(sa.text("SELECT plan_data FROM workout_plans")).scalar()
+        dictionary_id, dictionary = connection.execute(sa.text("SELECT id, data FROM plan_data_dictionaries")).one()
+    # Rows written with the migration's frozen codec are readable by the live one
+    assert plan_codec.dictionary_id(bytes(dictionary)) == dictionary_id
+    assert plan_codec.describe(stored) == (codec, dictionary_id)
+    plan_codec.registry.register(bytes(dictionary))
+    assert plan_codec.decode(stored) == plan
+
+    command.downgrade(config, 'f3b8d1e6a274')
+    with engine.connect() as connection:
+        assert json.loads(connection.execute(sa.text("SELECT plan_data FROM workout_plans")).scalar()) == plan
@@ -0,0 +1,48 @@
+"""
+Tests for the fitness options response cache.
+"""
+from app.utils.options_cache import OptionsCache, make_options_cache_key
+
+
+def test_cache_key_buckets_age_and_normalizes_selections():
+    selections = [
+        {'id': 'dumbbells', 'name': 'Dumbbells', 'type': 'equipment'},
+        {'id': 'lose_weight', 'name': 'Lose Weight', 'type': 'goal'},
+    ]
+    key_a = make_options_cache_key(31, selections)
+    key_b = make_options_cache_key(45, list(reversed(selections)))
+    assert key_a == key_b
+    assert key_a[0] == 'adults'
+    assert make_options_cache_key(70, selections) != key_a
+
+
+def test_cache_returns_copies_and_counts_hits():
+    cache = OptionsCache(max_entries=2, ttl_seconds=60)
+    key = make_options_cache_key(25)
+    assert cache.get(key) is None
+
+    cache.set(key, {'fitness_goals': []})
+    cached = cache.get(key)
+    cached['fitness_goals'].append({'id': 'mutated'})
+    assert cache.get(key) == {'fitness_goals': []}
+
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = OptionsCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', {})
+    cache.set('b', {})
+    cache.get('a')
+    cache.set('c', {})
+    assert cache.get('b') is None
+    assert cache.get('a') == {}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_expires_entries():
+    cache = OptionsCache(max_entries=2, ttl_seconds=0)
+    cache.set('a', {})
+    assert cache.get('a') is None
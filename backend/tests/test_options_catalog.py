@@ -0,0 +1,132 @@
+"""
+Tests for the static options catalog and the /api/options catalog fallback.
+"""
+import gzip
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.agents import fitness_options_agent as agent_module
+from app.agents.fitness_options_agent import FitnessOptionsAgent
+from app.utils.fitness_options import get_fitness_options
+from app.utils.options_cache import options_cache
+from app.utils.options_catalog import options_catalog
+
+
+def test_catalog_indexes_options_by_id():
+    assert options_catalog.get('equipment_options', 'kettlebell')['name'] == 'Kettlebell'
+    assert options_catalog.get('equipment_options', 'missing') is None
+    assert options_catalog.get_selection({'type': 'level', 'id': 'advanced'})['name'] == 'Advanced'
+    assert options_catalog.get_selection({'type': 'unknown', 'id': 'advanced'}) is None
+
+
+def test_static_options_are_served_gzipped_with_etag(client):
+    response = client.get('/api/options/static', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == get_fitness_options()
+    etag = response.headers['ETag']
+
+    plain = client.get('/api/options/static')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_json() == get_fitness_options()
+    assert plain.headers['ETag'] == etag
+
+    cached = client.get('/api/options/static', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+
+
+def test_options_fall_back_to_catalog_on_llm_error(client, monkeypatch):
+    def failing(self, user_age, user_selections, cache_key):
+        raise RuntimeError('LLM unavailable')
+
+    monkeypatch.setattr(FitnessOptionsAgent, '_generate_options', failing)
+    options_cache.clear()
+    selection = {'id': 'kettlebell', 'name': 'Kettlebell', 'type': 'equipment'}
+    response = client.post('/api/options', json={'age': 72, 'selections': [selection]})
+    assert response.status_code == 200
+    assert response.headers['X-Options-Source'] == 'catalog'
+    options = response.get_json()
+    assert options['equipment_options'][0]['id'] == 'kettlebell'
+    assert options['fitness_goals'][0]['id'] in ('general_fitness', 'increase_flexibility')
+
+    monkeypatch.setattr(agent_module, 'OPTIONS_FALLBACK', 'off')
+    assert client.post('/api/options', json={'age': 72}).status_code == 500
+
+
+def test_slow_llm_falls_back_and_fills_cache(client, monkeypatch):
+    original = FitnessOptionsAgent._generate_options
+
+    def slow(self, *args):
+        time.sleep(0.3)
+        return original(self, *args)
+
+    monkeypatch.setattr(FitnessOptionsAgent, '_generate_options', slow)
+    monkeypatch.setattr(agent_module, 'OPTIONS_LLM_TIMEOUT_SECONDS', 0.05)
+    options_cache.clear()
+
+    response = client.post('/api/options', json={'age': 33})
+    assert response.headers['X-Options-Source'] == 'catalog'
+
+    time.sleep(0.5)
+    response = client.post('/api/options', json={'age': 33})
+    assert response.headers['X-Options-Source'] == 'cache'
+
+
+def _slow_agent(monkeypatch, workers, queue_size, seconds):
+    """An agent with `workers` LLM workers whose generations take `seconds`; records the cache keys generated."""
+    generated = []
+    lock = threading.Lock()
+
+    def slow(self, user_age, user_selections, cache_key):
+        with lock:
+            generated.append(cache_key)
+        time.sleep(seconds)
+        return {'generated_for': user_age}
+
+    monkeypatch.setattr(FitnessOptionsAgent, '_generate_options', slow)
+    monkeypatch.setattr(agent_module, 'OPTIONS_LLM_WORKERS', workers)
+    monkeypatch.setattr(agent_module, 'OPTIONS_LLM_QUEUE_SIZE', queue_size)
+    options_cache.clear()
+    return FitnessOptionsAgent(), generated
+
+
+def _concurrent_sources(agent, requests):
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        return list(pool.map(lambda request: agent.get_options(*request, mode='llm')[1], requests))
+
+
+def test_time_queued_for_a_worker_does_not_count_against_the_timeout(app, monkeypatch):
+    agent, generated = _slow_agent(monkeypatch, workers=2, queue_size=16, seconds=0.2)
+    monkeypatch.setattr(agent_module, 'OPTIONS_LLM_TIMEOUT_SECONDS', 0.35)
+    # Six different cache keys, three times as many as there are workers
+    requests = [(30, [{'id': f'goal_{n}', 'name': f'Goal {n}', 'type': 'goal'}]) for n in range(6)]
+
+    assert _concurrent_sources(agent, requests) == ['llm'] * 6
+    assert len(generated) == 6
+
+
+def test_concurrent_requests_for_one_cache_key_share_a_generation(app, monkeypatch):
+    agent, generated = _slow_agent(monkeypatch, workers=2, queue_size=16, seconds=0.2)
+
+    assert _concurrent_sources(agent, [(30, [])] * 5) == ['llm'] * 5
+    assert len(generated) == 1
+
+
+def test_full_generation_queue_serves_the_catalog_right_away(app, monkeypatch):
+    agent, generated = _slow_agent(monkeypatch, workers=1, queue_size=1, seconds=0.3)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        running = pool.submit(agent.get_options, 20, [], mode='llm')
+        # Wait until the first generation has the worker, so the second one is queued
+        while not generated:
+            time.sleep(0.01)
+        start = time.perf_counter()
+        others = [pool.submit(agent.get_options, age, [], mode='llm') for age in (40, 60)]
+        sources = [future.result()[1] for future in [running, *others]]
+
+    # One running and one queued; the third is turned away without waiting
+    assert sources[0] == 'llm' and sorted(sources[1:]) == ['catalog', 'llm']
+    assert len(generated) == 2
+    assert time.perf_counter() - start < 1.0
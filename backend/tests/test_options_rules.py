@@ -0,0 +1,66 @@
+"""
+Tests for the rule-based options ranking and the /api/options modes.
+"""
+import time
+
+from app.agents.fitness_options_agent import FitnessOptionsAgent
+from app.models.fitness_options import FitnessOptions
+from app.utils.fitness_options import get_fitness_options
+from app.utils.options_cache import options_cache
+from app.utils.options_rules import options_rules
+
+
+def ids(options, category):
+    return [option['id'] for option in options[category]]
+
+
+def test_rules_rank_catalog_by_age_band():
+    senior = options_rules.rank(70)
+    FitnessOptions.model_validate(senior)
+    assert ids(senior, 'workout_types')[0] == 'yoga'
+    assert ids(senior, 'workout_types')[-1] == 'crossfit'
+    assert senior['equipment_options'][0]['safety_considerations'].startswith('Use stable')
+
+    teen = options_rules.rank(15)
+    assert ids(teen, 'fitness_goals')[0] == 'general_fitness'
+    assert next(o for o in teen['fitness_goals'] if o['id'] == 'build_muscle')['age_specific_notes'] \
+        .startswith('Build strength with bodyweight')
+
+    unranked = options_rules.rank(None)
+    assert ids(unranked, 'workout_types') == [option['id'] for option in get_fitness_options()['workout_types']]
+    assert {option['relevance_score'] for option in unranked['workout_types']} == {5}
+
+
+def test_selections_score_ten_and_boost_related_options():
+    options = options_rules.rank(35, [{'type': 'goal', 'id': 'increase_flexibility', 'name': 'Increase Flexibility'}])
+    top_goal = options['fitness_goals'][0]
+    assert (top_goal['id'], top_goal['relevance_score']) == ('increase_flexibility', 10)
+    assert ids(options, 'workout_types')[0] == 'yoga'
+    assert {'yoga_mat', 'foam_roller'} <= set(ids(options, 'equipment_options')[:3])
+
+
+def test_rules_mode_skips_the_llm(client, monkeypatch):
+    def failing(self, *args):
+        raise AssertionError('LLM must not be called')
+
+    monkeypatch.setattr(FitnessOptionsAgent, '_generate_options', failing)
+    response = client.post('/api/options?mode=rules', json={'age': 28})
+    assert response.status_code == 200
+    assert response.headers['X-Options-Source'] == 'rules'
+    FitnessOptions.model_validate(response.get_json())
+
+    assert client.post('/api/options', json={'age': 28, 'mode': 'fast'}).status_code == 400
+
+
+def test_hybrid_mode_answers_with_rules_and_caches_the_refinement(client):
+    options_cache.clear()
+    response = client.post('/api/options', json={'age': 52, 'mode': 'hybrid'})
+    assert response.headers['X-Options-Source'] == 'rules'
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        response = client.post('/api/options', json={'age': 52, 'mode': 'hybrid'})
+        if response.headers['X-Options-Source'] == 'cache':
+            break
+        time.sleep(0.02)
+    assert response.headers['X-Options-Source'] == 'cache'
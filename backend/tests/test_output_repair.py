@@ -0,0 +1,185 @@
+"""
+Tests for structured output repair: tolerant JSON, coercion and subtree re-prompts.
+"""
+import json
+from typing import ClassVar, List
+
+import pytest
+
+from app.agents.fitness_options_agent import FitnessOptionsAgent
+from app.models.fitness_options import FitnessOptions
+from app.models.workout_exercise import Exercise
+from app.utils import llm_registry, search
+from app.utils.fake_llm import FakeLLM, fake_week, fake_workout_plan
+from app.utils.metrics import LLM_OUTPUT_REPAIRS, LLM_REPAIR_SAVED_TOKENS
+from app.utils.output_repair import coerce_to_schema, repair_json, subtree_of
+from app.utils.search import (
+    PLAN_REPAIR_UNITS, UserProfile, generate_structured_workout_plan, stream_structured_workout_plan
+)
+
+PROFILE = UserProfile('Repair', 30, 'Build Muscle', ['Dumbbells'], ['Strength Training'], 'Beginner')
+
+
+@pytest.mark.parametrize('text, expected, repair', [
+    ('```json\n{"a": [1, 2]}\n```', {'a': [1, 2]}, 'code_fence'),
+    ('Here you go: {"a": 1} Enjoy!', {'a': 1}, 'surrounding_text'),
+    ('{"a": [1, 2,], "b": {"c": 3,},}', {'a': [1, 2], 'b': {'c': 3}}, 'trailing_comma'),
+    ('{"a": 1, // the answer\n "b": 2}', {'a': 1, 'b': 2}, 'comment'),
+    ('{"a": "two\nlines"}', {'a': 'two\nlines'}, 'control_character'),
+    ('{"a": [{"b": 1}, {"b": 2}, {"b": "thr', {'a': [{'b': 1}, {'b': 2}, {'b': 'thr'}]}, 'truncated'),
+    ('{"a": [1, 2], "b": tr', {'a': [1, 2], 'b': None}, 'truncated'),
+    ('{"a": [1, 2], "b', {'a': [1, 2]}, 'truncated'),
+])
+def test_repair_json(text, expected, repair):
+    data, repairs = repair_json(text)
+    assert data == expected
+    assert repair in repairs
+
+
+def test_repair_json_rejects_prose():
+    with pytest.raises(ValueError):
+        repair_json("Sorry, I can't help with that.")
+
+
+def test_coerce_to_schema_fixes_field_types():
+    exercise = {'name': 'Row', 'type': 'Strength', 'sets': '4 sets', 'reps': 12, 'equipment': 'Dumbbells'}
+    data, coerced = coerce_to_schema(exercise, Exercise)
+    assert coerced == 5  # sets, reps, equipment and the missing duration and instructions
+    assert Exercise.model_validate(data).model_dump() == {
+        'name': 'Row', 'type': 'Strength', 'sets': 4, 'reps': '12', 'duration': None, 'instructions': None,
+        'equipment': ['Dumbbells'],
+    }
+
+
+def test_subtree_of_picks_the_smallest_unit():
+    assert subtree_of(('weeks', 1, 'days', 2, 'exercises'), PLAN_REPAIR_UNITS) == ('weeks', 1, 'days', 2)
+    assert subtree_of(('weeks', 1, 'week_number'), PLAN_REPAIR_UNITS) == ('weeks', 1)
+    assert subtree_of(('weeks',), PLAN_REPAIR_UNITS) == ()
+
+
+class RecordingLLM(FakeLLM):
+    """FakeLLM that breaks its first full response with `corrupt` and records every prompt."""
+    prompts: ClassVar[List[str]] = []
+    corrupt: ClassVar = None
+
+    def respond(self, prompt):
+        text = super().respond(prompt)
+        RecordingLLM.prompts.append(prompt)
+        if len(RecordingLLM.prompts) == 1:
+            return RecordingLLM.corrupt(text)
+        return text
+
+
+@pytest.fixture
+def recording_llm(app):
+    RecordingLLM.prompts = []
+    llm_registry.set_llm_factory(lambda model_id, location: RecordingLLM(model_id=model_id))
+    yield RecordingLLM
+    llm_registry.set_llm_factory(None)
+
+
+def test_plan_repairs_json_and_reprompts_only_the_invalid_day(recording_llm):
+    def corrupt(text):
+        plan = json.loads(text)
+        plan['weeks'][0]['days'][0]['exercises'][0]['sets'] = '4 sets'
+        del plan['weeks'][1]['days'][1]['exercises']
+        return "```json\n" + json.dumps(plan)[:-1] + ",}\n```"
+
+    recording_llm.corrupt = corrupt
+    saved_before = LLM_REPAIR_SAVED_TOKENS.value(schema='WorkoutPlanData')
+    subtrees_before = LLM_OUTPUT_REPAIRS.value(schema='WorkoutPlanData', repair='subtree')
+
+    plan = generate_structured_workout_plan(PROFILE, mode='single')
+
+    assert len(recording_llm.prompts) == 2
+    assert 'day 2 of week 2' in recording_llm.prompts[1]
+    assert plan['weeks'][0]['days'][0]['exercises'][0]['sets'] == 4
+    assert plan['weeks'][1]['days'][1]['exercises']
+    assert plan['weeks'][1]['days'][1]['day_number'] == 2
+    assert LLM_OUTPUT_REPAIRS.value(schema='WorkoutPlanData', repair='subtree') == subtrees_before + 1
+    assert LLM_REPAIR_SAVED_TOKENS.value(schema='WorkoutPlanData') > saved_before
+
+
+def test_truncated_plan_regenerates_the_missing_parts(recording_llm):
+    full = json.dumps(fake_workout_plan())
+    # Cut off inside the first day of week 3
+    week_3 = full.index('{"days"', full.index('{"days"', full.index('{"days"') + 1) + 1)
+    cut = full.index('"instructions"', week_3) + 40
+    recording_llm.corrupt = lambda text: text[:cut]
+
+    plan = generate_structured_workout_plan(PROFILE, mode='single')
+
+    assert [week['week_number'] for week in plan['weeks']] == [1, 2, 3]
+    assert len(plan['weeks'][2]['days'][0]['exercises']) > 0
+    # One full generation plus a re-prompt of the cut-off week (its week_number
+    # comes after the days, so the week is invalid as a whole), never a second full plan
+    assert len(recording_llm.prompts) == 2
+    assert sum('"weeks"' in prompt for prompt in recording_llm.prompts) == 1
+    assert recording_llm.prompts[1].startswith('Create week 3 ')
+
+
+def test_truncated_stream_is_repaired_before_the_plan_is_yielded(recording_llm):
+    full = json.dumps(fake_workout_plan())
+    cut = full.index('"instructions"', full.rindex('{"days"')) + 40
+    recording_llm.corrupt = lambda text: text[:cut]
+
+    events = list(stream_structured_workout_plan(PROFILE))
+
+    event, plan = events[-1]
+    assert event == 'plan'
+    assert [week['week_number'] for week in plan['weeks']] == [1, 2, 3]
+    assert len(recording_llm.prompts) == 2
+    assert recording_llm.prompts[1].startswith('Create week 3 ')
+
+
+def test_options_reprompt_only_the_invalid_category(recording_llm):
+    def corrupt(text):
+        options = json.loads(text)
+        del options['equipment_options'][0]['safety_considerations']
+        options['workout_types'][0]['relevance_score'] = 7.0
+        return json.dumps(options)
+
+    recording_llm.corrupt = corrupt
+    options = FitnessOptionsAgent().generate_personalized_options(
+        83, [{'id': 'yoga', 'name': 'Yoga', 'type': 'workout'}]
+    )
+
+    FitnessOptions.model_validate(options)
+    assert len(recording_llm.prompts) == 2
+    assert 'equipment_options' in recording_llm.prompts[1] and 'fitness_goals' not in recording_llm.prompts[1]
+    assert options['workout_types'][0]['relevance_score'] == 7
+
+
+class FlakyWeekLLM(FakeLLM):
+    """FakeLLM whose first answer for week 2 is not JSON; records every prompt."""
+    prompts: ClassVar[List[str]] = []
+
+    def respond(self, prompt):
+        FlakyWeekLLM.prompts.append(prompt)
+        if prompt.startswith('Create week 2 ') and sum(p.startswith('Create week 2 ') for p in self.prompts) == 1:
+            return "Sorry, something went wrong."
+        return super().respond(prompt)
+
+
+def test_parallel_plan_retries_only_the_failed_week(app):
+    FlakyWeekLLM.prompts = []
+    llm_registry.set_llm_factory(lambda model_id, location: FlakyWeekLLM(model_id=model_id))
+    try:
+        plan = generate_structured_workout_plan(PROFILE, mode='parallel')
+    finally:
+        llm_registry.set_llm_factory(None)
+
+    assert [week['week_number'] for week in plan['weeks']] == [1, 2, 3]
+    week_prompts = [prompt.split(' of ', 1)[0] for prompt in FlakyWeekLLM.prompts if prompt.startswith('Create week')]
+    assert sorted(week_prompts) == ['Create week 1', 'Create week 2', 'Create week 2', 'Create week 3']
+    # One skeleton, and no full-plan generation
+    assert sum('day_focuses' in prompt for prompt in FlakyWeekLLM.prompts) == 1
+
+
+def test_parallel_plan_rejects_a_dropped_week(app, monkeypatch):
+    # Every outline comes back as week 1, so weeks 2 and 3 are missing
+    monkeypatch.setattr(search, 'generate_workout_week',
+                        lambda profile, outline, skeleton: fake_week(1))
+
+    with pytest.raises(ValueError, match='skeleton'):
+        generate_structured_workout_plan(PROFILE, mode='parallel')
@@ -0,0 +1,90 @@
+"""
+Tests for compressed plan data storage.
+"""
+import json
+
+import pytest
+
+from app.models.plan_data_dictionary import PlanDataDictionary
+from app.models.user_profile import UserProfile, db
+from app.models.workout_plan import WorkoutPlan
+from app.utils import plan_codec
+from app.utils.fake_llm import fake_workout_plan
+from tests.test_api import wait_for_job
+
+
+def _variant(plan, number):
+    plan = json.loads(json.dumps(plan))
+    for week in plan['weeks']:
+        for day in week['days']:
+            for exercise in day['exercises']:
+                exercise['reps'] = f"{8 + number % 5}-{10 + number % 5}"
+    return plan
+
+
+@pytest.mark.parametrize('codec', ['zstd', 'zlib', 'none'])
+def test_encode_round_trips(codec):
+    plan = _variant(fake_workout_plan(), 3)
+    entry_id = plan_codec.registry.register(plan_codec.builtin_dictionary())
+
+    for dictionary in (entry_id, 0):
+        encoded = plan_codec.encode(plan, codec, dictionary)
+        assert plan_codec.decode(encoded) == plan
+        assert plan_codec.describe(encoded) == (codec, dictionary if codec != 'none' else 0)
+    if codec != 'none':
+        with_dictionary = plan_codec.encode(plan, codec, entry_id)
+        assert len(with_dictionary) < len(plan_codec.encode(plan, codec, 0)) < len(plan_codec.serialize(plan)) / 5
+
+
+def test_legacy_json_is_still_read():
+    plan = fake_workout_plan()
+
+    assert plan_codec.decode(json.dumps(plan)) == plan
+    assert plan_codec.decode(json.dumps(plan).encode('utf-8')) == plan
+    assert plan_codec.describe(json.dumps(plan)) == ('json', 0)
+    with pytest.raises(plan_codec.PlanCodecError):
+        plan_codec.decode(b'Z\x00\x00\x00\x07not a dictionary')
+
+
+def test_saved_plans_are_stored_compressed(app, client, new_profile):
+    token = new_profile['session_token']
+    response = client.post(f"/api/profiles/{token}/workout-plan")
+    assert wait_for_job(client, response.get_json()['id'])['status'] == 'done'
+
+    with app.app_context():
+        stored = db.session.execute(db.text("SELECT plan_data FROM workout_plans")).scalar()
+        assert plan_codec.describe(stored)[0] == plan_codec.effective_codec()
+        assert len(stored) < len(plan_codec.serialize(fake_workout_plan())) / 10
+        assert PlanDataDictionary.query.one().codec == 'builtin'
+    plan = client.get(f"/api/profiles/{token}/workout-plan").get_json()
+    assert plan['plan_data'] == plan_codec.decode(stored)
+    assert len(plan['plan_data']['weeks']) == 3
+
+
+def test_compress_stored_plans_trains_and_reencodes(app, new_profile):
+    with app.app_context():
+        profile = UserProfile.query.filter_by(uuid=new_profile['session_token']).first()
+        plans = [_variant(fake_workout_plan(), number) for number in range(6)]
+        for number, plan in enumerate(plans):
+            db.session.add(WorkoutPlan(user_profile_id=profile.id, end_date=profile.created_at, plan_data=plan))
+        db.session.commit()
+        # A row written before compression
+        db.session.execute(db.text("UPDATE workout_plans SET plan_data = :data WHERE id = 1"),
+                           {'data': json.dumps(plans[0])})
+        db.session.commit()
+        builtin = plan_codec.registry.current
+
+        stats = plan_codec.compress_stored_plans(batch_size=4, train=True, codec='zlib')
+
+        assert stats['plans'] == 6 and stats['recompressed'] == 6
+        assert stats['bytes_after'] < stats['bytes_before']
+        assert plan_codec.registry.current != builtin
+        assert PlanDataDictionary.query.count() == 2
+        db.session.expire_all()
+        assert [plan.plan_data for plan in WorkoutPlan.query.order_by(WorkoutPlan.id)] == plans
+        assert plan_codec.compress_stored_plans(codec='zlib')['recompressed'] == 0
+
+        # Another process reads rows written with a dictionary it hasn't loaded
+        plan_codec.registry.dictionaries.pop(plan_codec.registry.current)
+        db.session.expire_all()
+        assert WorkoutPlan.query.first().plan_data == plans[0]
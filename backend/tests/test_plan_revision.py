@@ -0,0 +1,139 @@
+"""
+Tests for recording profile changes and revising the latest plan incrementally.
+"""
+from app.models.profile_change import ProfileChange
+from app.models.user_profile import UserProfile
+from app.utils import llm_registry
+from app.utils.fake_llm import FakeLLM, fake_workout_plan
+from app.utils.plan_revision import needs_full_regeneration, plan_day_edits
+from tests.test_api import wait_for_job
+
+
+def _generate_plan(client, token):
+    response = client.post(f"/api/profiles/{token}/workout-plan")
+    assert wait_for_job(client, response.get_json()['id'])['status'] == 'done'
+    return client.get(f"/api/profiles/{token}/workout-plan").get_json()
+
+
+def test_update_profile_records_changed_fields(app, client, new_profile):
+    token = new_profile['session_token']
+    client.put(f"/api/profile/{token}", json={'equipment': ['Dumbbells', 'Kettlebell'], 'age': 30})
+    client.put(f"/api/profile/{token}", json={'equipment': ['Kettlebell'], 'name': 'Renamed'})
+
+    with app.app_context():
+        profile = UserProfile.query.filter_by(uuid=token).first()
+        changes = ProfileChange.pending(profile.id)
+        # The unchanged age is not recorded
+        assert [change.field for change in changes] == ['equipment', 'equipment', 'name']
+        assert ProfileChange.net_changes(changes) == {
+            'equipment': (['Dumbbells'], ['Kettlebell']),
+            'name': ('Test User', 'Renamed'),
+        }
+
+
+def test_plan_day_edits_replace_removed_and_spread_added_equipment():
+    plan = fake_workout_plan()
+    edits = plan_day_edits(plan, {'equipment': (['Dumbbells', 'Treadmill'], ['Treadmill', 'Kettlebell'])})
+
+    replaced = {(edit.week_index, edit.day_index, index) for edit in edits for index, _ in edit.replace}
+    assert replaced == {
+        (week_index, day_index, index)
+        for week_index, week in enumerate(plan['weeks'])
+        for day_index, day in enumerate(week['days'])
+        for index, exercise in enumerate(day['exercises'])
+        if 'Dumbbells' in exercise['equipment']
+    }
+    # One Kettlebell exercise per week, on the workout day with the fewest exercises
+    additions = [(edit.week_index, edit.day_index) for edit in edits if edit.add]
+    assert additions == [(0, 4), (1, 4), (2, 4)]
+    assert all('Kettlebell' in reason for edit in edits for reason in edit.add)
+    assert not needs_full_regeneration({'equipment': ([], ['Kettlebell'])})
+    assert needs_full_regeneration({'experience_level': ('Beginner', 'Advanced')})
+
+
+def test_regenerate_revises_only_affected_exercises(app, client, new_profile):
+    token = new_profile['session_token']
+    base = _generate_plan(client, token)
+    client.put(f"/api/profile/{token}", json={'equipment': ['Kettlebell']})
+
+    response = client.post(f"/api/profiles/{token}/workout-plan/regenerate")
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['mode'] == 'incremental'
+    assert body['changed_fields'] == ['equipment']
+    assert body['base_plan_id'] == base['id']
+    plan = body['workout_plan']
+    assert plan['id'] != base['id'] and plan['start_date'] == base['start_date']
+    assert client.get(f"/api/profiles/{token}/workout-plan").get_json()['id'] == plan['id']
+
+    base_days = [day for week in base['plan_data']['weeks'] for day in week['days']]
+    days = [day for week in plan['plan_data']['weeks'] for day in week['days']]
+    exercises = [exercise for day in days for exercise in day['exercises']]
+    assert not any('Dumbbells' in exercise['equipment'] for exercise in exercises)
+    assert body['regenerated']['exercises_replaced'] == sum(
+        'Dumbbells' in exercise['equipment'] for day in base_days for exercise in day['exercises']
+    )
+    assert body['regenerated']['exercises_added'] == 3
+    # Days without Dumbbells exercises or additions are untouched
+    assert days[1] == base_days[1] and days[3] == base_days[3]
+
+    # The changes are applied; nothing is left to regenerate
+    response = client.post(f"/api/profiles/{token}/workout-plan/regenerate")
+    assert response.status_code == 200
+    assert response.get_json()['mode'] == 'unchanged'
+
+
+class StaleEquipmentLLM(FakeLLM):
+    """FakeLLM whose day revisions keep using Dumbbells after they are removed."""
+
+    def respond(self, prompt):
+        return super().respond(prompt.replace('Available Equipment: Kettlebell', 'Available Equipment: Dumbbells'))
+
+
+def test_regenerate_rejects_revisions_using_removed_equipment(client, new_profile):
+    token = new_profile['session_token']
+    base = _generate_plan(client, token)
+    client.put(f"/api/profile/{token}", json={'equipment': ['Kettlebell']})
+
+    llm_registry.set_llm_factory(lambda model_id, location: StaleEquipmentLLM(model_id=model_id))
+    try:
+        response = client.post(f"/api/profiles/{token}/workout-plan/regenerate")
+    finally:
+        llm_registry.set_llm_factory(None)
+
+    assert response.status_code == 201
+    body = response.get_json()
+    exercises = [exercise for week in body['workout_plan']['plan_data']['weeks']
+                 for day in week['days'] for exercise in day['exercises']]
+    assert not any('Dumbbells' in exercise['equipment'] for exercise in exercises)
+    removed = sum('Dumbbells' in exercise['equipment'] for week in base['plan_data']['weeks']
+                  for day in week['days'] for exercise in day['exercises'])
+    # Every replacement still needed Dumbbells, so the exercises it replaced are dropped
+    assert body['regenerated']['replacements_rejected'] == removed
+    assert body['regenerated']['exercises_replaced'] == 0
+    assert body['regenerated']['exercises_removed'] == removed
+    assert body['regenerated']['additions_rejected'] == 3
+    assert body['regenerated']['exercises_added'] == 0
+
+
+def test_regenerate_queues_full_plan_for_plan_wide_changes(app, client, new_profile):
+    token = new_profile['session_token']
+    _generate_plan(client, token)
+    client.put(f"/api/profile/{token}", json={'experienceLevel': 'Advanced', 'equipment': ['Kettlebell']})
+
+    response = client.post(f"/api/profiles/{token}/workout-plan/regenerate")
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['mode'] == 'full'
+    assert body['changed_fields'] == ['equipment', 'experience_level']
+    assert wait_for_job(client, body['id'])['status'] == 'done'
+    with app.app_context():
+        profile = UserProfile.query.filter_by(uuid=token).first()
+        assert ProfileChange.pending(profile.id) == []
+
+
+def test_regenerate_without_plan_returns_404(client, new_profile):
+    response = client.post(f"/api/profiles/{new_profile['session_token']}/workout-plan/regenerate")
+    assert response.status_code == 404
@@ -0,0 +1,73 @@
+"""
+Tests for the workout plan template store.
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.models.user_profile import db
+from app.models.workout_plan_template import WorkoutPlanTemplate
+from app.utils.fake_llm import fake_workout_plan
+from app.utils.plan_templates import PlanTemplateStore, profile_fingerprint
+
+
+def make_profile(uuid='user-1', age=30, **overrides):
+    fields = {
+        'uuid': uuid,
+        'age': age,
+        'fitness_goal': 'Build Muscle',
+        'equipment': ['Dumbbells', 'Bench'],
+        'workout_types': ['Strength Training'],
+        'experience_level': 'Beginner',
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_fingerprint_normalizes_profile_fields():
+    base = profile_fingerprint(make_profile())
+    assert profile_fingerprint(make_profile(
+        uuid='user-2', age=45, equipment=['bench', 'DUMBBELLS', 'Bench'], fitness_goal=' build muscle '
+    )) == base
+    assert profile_fingerprint(make_profile(age=70)) != base
+    assert profile_fingerprint(make_profile(experience_level='Advanced')) != base
+
+
+def test_store_reuses_templates_with_per_user_variation(app):
+    store = PlanTemplateStore(max_age_days=30, max_entries=10, variation=True)
+    calls = []
+
+    def generate(profile):
+        calls.append(profile.uuid)
+        return fake_workout_plan()
+
+    with app.app_context():
+        first = store.get_plan_data(make_profile('user-1'), generate)
+        second = store.get_plan_data(make_profile('user-2'), generate)
+        again = store.get_plan_data(make_profile('user-2'), generate)
+
+        assert calls == ['user-1']
+        assert second == again
+        names = lambda plan: sorted(e['name'] for e in plan['weeks'][0]['days'][0]['exercises'])
+        assert names(second) == names(first)
+
+        stats = store.stats()
+        assert (stats['hits'], stats['misses']) == (2, 1)
+        assert stats['templates'] == 1
+        assert stats['total_template_hits'] == 2
+
+
+def test_stale_templates_are_regenerated_and_lru_evicted(app):
+    store = PlanTemplateStore(max_age_days=1, max_entries=1, variation=False)
+    with app.app_context():
+        store.get_plan_data(make_profile(), lambda profile: fake_workout_plan())
+        template = WorkoutPlanTemplate.query.one()
+        template.created_at = datetime.utcnow() - timedelta(days=2)
+        db.session.commit()
+
+        assert store.lookup(make_profile()) is None
+        assert store.stats()['stale'] == 1
+
+        store.store(make_profile(), fake_workout_plan())
+        store.store(make_profile(experience_level='Advanced'), fake_workout_plan())
+        assert WorkoutPlanTemplate.query.count() == 1
+        assert store.stats()['evictions'] == 1
@@ -0,0 +1,53 @@
+"""
+Tests for bulk profile import and export.
+"""
+import csv
+import io
+import json
+
+from tests.conftest import PROFILE_DATA
+
+
+def test_bulk_import_reports_row_errors_without_aborting(client):
+    duplicate = '6f1c2a52-3e0f-4a57-9d3f-1f0f7f1f2b11'
+    lines = [
+        json.dumps({**PROFILE_DATA, 'uuid': duplicate}),
+        json.dumps({**PROFILE_DATA, 'age': 'old'}),
+        'not json',
+        '',
+        json.dumps({**PROFILE_DATA, 'uuid': duplicate}),
+        json.dumps({**PROFILE_DATA, 'equipment': 'Dumbbells; Bench'}),
+    ]
+    response = client.post('/api/profiles/bulk?chunk_size=2', data="\n".join(lines),
+                           content_type='application/x-ndjson')
+    result = response.get_json()
+
+    assert response.status_code == 200
+    assert result['imported'] == 2
+    assert [error['row'] for error in result['errors']] == [2, 3, 4]
+    assert 'age' in result['errors'][0]['error']
+
+    created = {row['row']: row['uuid'] for row in result['created']}
+    assert created[1] == duplicate
+    profile = client.get(f"/api/profile/{created[5]}").get_json()
+    assert profile['equipment'] == ['Dumbbells', 'Bench']
+
+
+def test_csv_export_round_trips_through_import(client, new_profile):
+    export = client.get('/api/profiles/export?format=csv')
+    assert export.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(export.get_data(as_text=True))))
+    assert [row['uuid'] for row in rows] == [new_profile['session_token']]
+
+    # Re-importing the same uuids fails per row; fresh uuids import
+    rows.append({**rows[0], 'uuid': ''})
+    body = io.StringIO()
+    writer = csv.DictWriter(body, fieldnames=rows[0].keys())
+    writer.writeheader()
+    writer.writerows(rows)
+    result = client.post('/api/profiles/bulk', data=body.getvalue(), content_type='text/csv').get_json()
+    assert (result['imported'], result['failed']) == (1, 1)
+
+    ndjson = client.get('/api/profiles/export').get_data(as_text=True).splitlines()
+    assert len(ndjson) == 2
+    assert json.loads(ndjson[1])['equipment'] == PROFILE_DATA['equipment']
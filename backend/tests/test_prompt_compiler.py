@@ -0,0 +1,110 @@
+"""
+Tests for the prompt compiler: compact and native schema instructions and token budgets.
+"""
+import json
+from typing import ClassVar, List
+
+import pytest
+
+from app.models.fitness_options import FitnessOptions
+from app.models.workout_exercise import DailyWorkout, Exercise, WorkoutPlanData
+from app.utils import llm_registry
+from app.utils.fake_llm import FakeLLM
+from app.utils.metrics import LLM_PROMPT_TOKENS
+from app.utils.prompt_compiler import (
+    PromptBudgetExceeded, build_chain, compact_schema, estimate_tokens, format_instructions, response_schema
+)
+from app.utils.search import UserProfile, generate_structured_workout_plan
+
+PROFILE = UserProfile('Prompt', 30, 'Build Muscle', ['Dumbbells'], ['Strength Training'], 'Beginner')
+DAY_TEMPLATE = "Create day {day_number} of week 1 of a workout plan.\n{format_instructions}\n"
+
+
+class RecordingLLM(FakeLLM):
+    prompts: ClassVar[List[str]] = []
+
+    def respond(self, prompt):
+        RecordingLLM.prompts.append(prompt)
+        return super().respond(prompt)
+
+
+@pytest.fixture
+def recording_llm(app):
+    RecordingLLM.prompts = []
+    llm_registry.set_llm_factory(lambda model_id, location: RecordingLLM(model_id=model_id))
+    yield RecordingLLM
+    llm_registry.set_llm_factory(None)
+
+
+def test_compact_schema_lists_fields_and_nullability():
+    assert compact_schema(Exercise) == (
+        '{"name":str,"type":str,"sets":int?,"reps":str?,"duration":str?,"instructions":str?,"equipment":[str]}'
+    )
+
+
+@pytest.mark.parametrize('model', [WorkoutPlanData, FitnessOptions])
+def test_compact_instructions_are_a_fraction_of_the_full_schema(model):
+    full = format_instructions(model, 'full')
+    compact = format_instructions(model, 'compact')
+    assert estimate_tokens(compact) * 5 < estimate_tokens(full)
+    # Every field name is still spelled out
+    for name in json.loads(llm_registry.get_parser(model).get_format_instructions().split('```')[-2])['properties']:
+        assert f'"{name}"' in compact
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('Build muscle progressively') == 5
+    assert estimate_tokens('{"sets": 12}') == 5
+
+
+def test_response_schema_inlines_references_and_nullable_fields():
+    schema = response_schema(DailyWorkout)
+    assert '$ref' not in json.dumps(schema) and 'anyOf' not in json.dumps(schema)
+    exercise = schema['properties']['exercises']['items']
+    assert exercise['properties']['sets'] == {'type': 'integer', 'nullable': True}
+    assert exercise['properties']['equipment'] == {'type': 'array', 'items': {'type': 'string'}}
+
+
+def test_plan_prompt_uses_compact_schema(recording_llm):
+    before = LLM_PROMPT_TOKENS.count(chain='workout_plan')
+
+    plan = generate_structured_workout_plan(PROFILE, mode='single')
+
+    assert len(plan['weeks']) == 3
+    prompt, = recording_llm.prompts
+    assert compact_schema(WorkoutPlanData) in prompt
+    assert '"properties"' not in prompt
+    assert LLM_PROMPT_TOKENS.count(chain='workout_plan') == before + 1
+
+
+def test_native_mode_passes_the_schema_to_the_model():
+    RecordingLLM.prompts = []
+    chain = build_chain(RecordingLLM(), 'day', DAY_TEMPLATE, ['day_number'], DailyWorkout, parse=True, mode='native')
+
+    day = chain.invoke({'day_number': 2})
+
+    DailyWorkout.model_validate(day)
+    assert day['day_number'] == 2
+    # The prompt has no schema; FakeLLM routed on the response schema appended to it
+    prompt, schema = RecordingLLM.prompts[0].rsplit('\n', 1)
+    assert '"exercises"' not in prompt
+    assert json.loads(schema) == response_schema(DailyWorkout)
+
+
+def test_native_mode_falls_back_to_compact_instructions():
+    from langchain_core.language_models.fake import FakeListLLM
+    llm = FakeListLLM(responses=['{}'])
+    prompt = build_chain(llm, 'day', DAY_TEMPLATE, ['day_number'], DailyWorkout, mode='native').first
+    assert compact_schema(DailyWorkout) in prompt.format(day_number=1)
+
+
+def test_budget_rejects_prompts_before_calling_the_model():
+    RecordingLLM.prompts = []
+    chain = build_chain(RecordingLLM(), 'day', DAY_TEMPLATE, ['day_number'], DailyWorkout, budget=20)
+
+    with pytest.raises(PromptBudgetExceeded) as excinfo:
+        chain.invoke({'day_number': 1})
+
+    assert excinfo.value.tokens > 20
+    assert RecordingLLM.prompts == []
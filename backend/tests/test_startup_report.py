@@ -0,0 +1,37 @@
+"""
+Tests for startup import-time reporting and lazy agent construction.
+"""
+from app.utils.lazy import LazyObject
+from app.utils.startup_report import parse_importtime
+
+
+def test_parse_importtime_reads_depth_and_timings():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |   flask.json",
+        "import time:       456 |     138536 | flask",
+        "some unrelated warning",
+    ])
+    records = parse_importtime(output)
+    assert records == [
+        {'module': 'flask.json', 'depth': 1, 'self_us': 120, 'cumulative_us': 120},
+        {'module': 'flask', 'depth': 0, 'self_us': 456, 'cumulative_us': 138536},
+    ]
+
+
+def test_lazy_object_builds_target_once_on_first_use():
+    calls = []
+
+    class Service:
+        value = 42
+
+    def factory():
+        calls.append(1)
+        return Service()
+
+    lazy = LazyObject(factory)
+    assert not lazy.initialized
+    assert lazy.value == 42
+    assert lazy.value == 42
+    assert lazy.initialized
+    assert calls == [1]
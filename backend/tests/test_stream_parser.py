@@ -0,0 +1,51 @@
+"""
+Tests for the incremental workout plan stream parser.
+"""
+import json
+import os
+from app.utils.stream_parser import IncrementalPlanParser
+
+SAMPLE_PLAN_PATH = os.path.join(os.path.dirname(__file__), '..', 'workout_plan.json')
+
+
+def _sample_plan():
+    with open(SAMPLE_PLAN_PATH) as f:
+        return json.load(f)['plan_data']
+
+
+def test_emits_days_and_weeks_as_they_complete():
+    plan = _sample_plan()
+    text = "```json\n" + json.dumps(plan, indent=2) + "\n```"
+
+    parser = IncrementalPlanParser()
+    events = []
+    for start in range(0, len(text), 7):
+        events.extend(parser.feed(text[start:start + 7]))
+
+    weeks = [data for event, data in events if event == 'week']
+    days = [data for event, data in events if event == 'day']
+    assert weeks == plan['weeks']
+    assert len(days) == sum(len(week['days']) for week in plan['weeks'])
+    assert days[0] == {'week_index': 0, 'day': plan['weeks'][0]['days'][0]}
+    assert parser.done
+
+    # The first day is emitted before the first week is complete
+    assert events[0][0] == 'day'
+
+
+def test_ignores_braces_inside_strings():
+    parser = IncrementalPlanParser()
+    text = '{"weeks": [{"week_number": 1, "days": [{"day_number": 1, "focus": "Core {and} [mobility]", "exercises": []}]}]}'
+    events = list(parser.feed(text))
+    assert [event for event, _ in events] == ['day', 'week']
+    assert events[0][1]['day']['focus'] == 'Core {and} [mobility]'
+
+
+def test_malformed_key_skips_its_subtree():
+    parser = IncrementalPlanParser()
+    week = '{"week_number": 1, "da\\ys": [{"day_number": 1, "focus": "Legs", "exercises": []}]}'
+    text = '{"weeks": [' + week + ', {"week_number": 2, "days": [{"day_number": 1, "focus": "Core", "exercises": []}]}]}'
+    events = list(parser.feed(text))
+    # No day (or week) events from under the malformed key; the rest of the stream still parses
+    assert [(event, data['week_index']) for event, data in events if event == 'day'] == [('day', 1)]
+    assert parser.done
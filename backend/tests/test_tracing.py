@@ -0,0 +1,126 @@
+"""
+Tests for request and generation stage tracing.
+"""
+import json
+
+import pytest
+
+from app import create_app
+from app.utils import tracing
+from app.utils.search import UserProfile, generate_structured_workout_plan
+from app.utils.tracing import FileSpanExporter, InMemorySpanExporter, Tracer, tracer
+from tests.test_api import wait_for_job
+
+
+def span_names(spans):
+    return [span.name for span in spans]
+
+
+def by_name(spans, name):
+    return [span for span in spans if span.name == name]
+
+
+def test_spans_nest_and_record_errors(tmp_path):
+    memory = InMemorySpanExporter()
+    path = tmp_path / 'traces.jsonl'
+    local = Tracer([memory, FileSpanExporter(str(path))])
+
+    with pytest.raises(ValueError):
+        with local.span('root', kind='test'):
+            with local.span('child') as child:
+                child.set_attribute('items', 3)
+            with local.span('failing'):
+                raise ValueError('boom')
+
+    (trace,) = memory.traces()
+    root, child, failing = trace
+    assert span_names(trace) == ['root', 'child', 'failing']
+    assert child.parent_id == root.span_id and failing.trace_id == root.trace_id
+    assert child.attributes == {'items': 3} and child.status == 'OK'
+    assert failing.status == 'ERROR' and root.status == 'ERROR'
+    assert failing.events[0]['attributes']['exception.message'] == 'boom'
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['name'] for line in lines] == ['root', 'child', 'failing']
+    assert lines[1]['parent_id'] == lines[0]['context']['span_id']
+    assert lines[2]['status'] == {'status_code': 'ERROR', 'description': 'ValueError: boom'}
+
+
+def test_options_request_is_traced_by_stage(client):
+    response = client.post('/api/options', json={
+        'age': 47, 'mode': 'llm', 'selections': [{'id': 'yoga', 'name': 'Yoga', 'type': 'workout'}]
+    })
+    assert response.status_code == 200
+
+    trace = tracer.memory.traces()[-1]
+    root = trace[0]
+    assert root.name == 'POST /api/options'
+    assert root.attributes['http.status_code'] == 200
+    names = span_names(trace)
+    for name in ('fitness_options.get', 'fitness_options.chain', 'prompt.build', 'llm.call',
+                 'output.parse', 'options.merge_selections'):
+        assert name in names
+
+    (llm_call,) = by_name(trace, 'llm.call')
+    assert llm_call.attributes['llm.model'] == 'gemini-2.0-flash-lite'
+    assert llm_call.attributes['llm.output_tokens'] > 0
+    assert by_name(trace, 'prompt.build')[0].attributes['prompt.chars'] > 0
+    # The generation ran on the options executor but stays in the request's trace
+    assert llm_call.parent_id == by_name(trace, 'fitness_options.chain')[0].span_id
+
+
+def test_workout_plan_job_traces_generation_and_persist(client, new_profile):
+    response = client.post(f"/api/profiles/{new_profile['session_token']}/workout-plan")
+    assert wait_for_job(client, response.get_json()['id'])['status'] == 'done'
+
+    trace = next(spans for spans in tracer.memory.traces() if spans[0].name == 'job workout_plan')
+    names = span_names(trace)
+    for name in ('workout_plan.agent', 'profile.load', 'plan_template.lookup', 'workout_plan.generate',
+                 'llm.call', 'output.parse', 'plan_template.store', 'plan.persist'):
+        assert name in names
+    persist = by_name(trace, 'plan.persist')[0]
+    assert persist.attributes['plan.weeks'] == 3 and persist.attributes['plan.exercises'] > 0
+
+
+def test_parallel_generation_traces_each_week(app):
+    profile = UserProfile('Trace', 30, 'Build Muscle', ['Dumbbells'], ['Strength Training'], 'Beginner')
+    with tracer.span('test'):
+        generate_structured_workout_plan(profile, mode='parallel')
+
+    trace = tracer.memory.traces()[-1]
+    weeks = by_name(trace, 'workout_plan.week')
+    assert sorted(week.attributes['week_number'] for week in weeks) == [1, 2, 3]
+    assert all(week.attributes['retries'] == 0 for week in weeks)
+    schemas = [span.attributes['schema'] for span in by_name(trace, 'output.validate')]
+    assert sorted(schemas) == ['WeeklyWorkout'] * 3 + ['WorkoutPlanData', 'WorkoutPlanSkeleton']
+
+
+def test_debug_traces_view(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'LLM_BACKEND': 'fake',
+        'TRACING_DEBUG_VIEW': True,
+    })
+    client = app.test_client()
+    client.post('/api/options', json={'age': 33, 'mode': 'rules'})
+
+    body = client.get('/debug/traces?min_ms=0').get_json()
+    (trace,) = body['traces']
+    assert trace['name'] == 'POST /api/options'
+    assert trace['children'][0]['name'] == 'fitness_options.get'
+
+    assert client.get('/debug/traces').get_json()['traces'] == []
+    text = client.get('/debug/traces?min_ms=0&format=text').get_data(as_text=True)
+    assert 'POST /api/options' in text and 'options.rules_rank' in text
+
+
+def test_debug_traces_view_is_off_by_default(client):
+    assert client.get('/debug/traces').status_code == 404
+
+
+def test_langchain_config_is_empty_when_disabled(monkeypatch):
+    monkeypatch.setattr(tracer, 'enabled', False)
+    assert tracing.langchain_config('chain') == {}
+    with tracer.span('ignored') as span:
+        assert span is None
@@ -3,7 +3,21 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 
+const JOB_POLL_INTERVAL_MS = 2000;
 
+// Poll a workout plan generation job until it finishes
+const waitForJob = async (jobId) => {
+    while (true) {
+        const { data: job } = await axios.get(`http://localhost:5002/api/jobs/${jobId}`);
+        if (job.status === 'done') return job;
+        if (job.status === 'failed') {
+            const error = new Error(job.error || 'Workout plan generation failed');
+            error.response = { data: { error: job.error || 'Workout plan generation failed' } };
+            throw error;
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+};
 
 const ProfileSetup = () => {
     const navigate = useNavigate();
@@ -136,8 +150,10 @@ const ProfileSetup = () => {
             localStorage.setItem('sessionToken', session_token);
             localStorage.setItem('profile', JSON.stringify(profile));
 
-            // Step 2: Generate Workout Plan
-            const workoutResponse = await axios.post(`http://localhost:5002/api/profiles/${session_token}/workout-plan`);
+            // Step 2: Generate Workout Plan (queued as a background job)
+            const jobResponse = await axios.post(`http://localhost:5002/api/profiles/${session_token}/workout-plan`);
+            await waitForJob(jobResponse.data.id);
+            const workoutResponse = await axios.get(`http://localhost:5002/api/profiles/${session_token}/workout-plan`);
             localStorage.setItem('workoutPlan', JSON.stringify(workoutResponse.data));
             
             // Step 3: Navigate to dashboard
@@ -24,7 +24,14 @@ export default function WorkoutPlan({ profileId, profile }) {
   const generateWorkoutPlan = async () => {
     setLoading(true);
     try {
-      const response = await axios.post(`${API_BASE_URL}/profiles/${profileId}/workout-plan`);
+      const { data: queuedJob } = await axios.post(`${API_BASE_URL}/profiles/${profileId}/workout-plan`);
+      let job = queuedJob;
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        job = (await axios.get(`${API_BASE_URL}/jobs/${job.id}`)).data;
+      }
+      if (job.status !== 'done') throw new Error(job.error);
+      const response = await axios.get(`${API_BASE_URL}/profiles/${profileId}/workout-plan`);
       setWorkoutPlan(response.data);
       setError(null);
     } catch (error) {